@@ -0,0 +1,192 @@
+import asyncio
+from queue import Empty
+
+from PacketProbe.bindsocket import BindSocket
+from PacketProbe.rawframe import RawFrame
+
+"""
+    AsyncCapture - asyncio Capture Source
+
+    Embeds capture in an asyncio application without a capture thread. The AF_PACKET
+    socket is registered with loop.add_reader(), and every time it becomes readable the
+    callback drains all pending frames (up to batch_size) into the same bounded
+    FrameQueue the threaded backends use. Consumers iterate asynchronously:
+
+        async with AsyncCapture('eth0') as capture:
+            async for time_stamp, frame in capture.frames():
+                ...
+
+    Because there is no thread per interface, watching many interfaces is a matter of
+    starting one AsyncCapture per interface on the same loop.
+
+    Parsing runs through the usual RawFrame pipeline; records() yields the parsed
+    packet data dicts and can hand each batch to an executor so the loop stays
+    responsive:
+
+        with ThreadPoolExecutor() as executor:
+            async for record in capture.records(executor):
+                ...
+
+    Classes:
+        AsyncCapture: AF_PACKET capture driven by the asyncio event loop.
+
+    Functions:
+        parse_batch: Parses a batch of frames with RawFrame and returns the records.
+"""
+
+
+def _discard(_):
+    pass
+
+
+def parse_batch(batch, filter_type=None, lazy=False, quiet=True):
+    """
+    Parses a list of (timestamp, frame) tuples and returns the packet data dicts.
+
+    Module level so it can be sent to a process pool. Lazy records may hold memoryviews,
+    so process pools need ``lazy=False``. With ``quiet`` the packet descriptions are
+    discarded; sys.stdout is left alone, so concurrent calls in a thread pool are safe.
+    Frames too short to parse are skipped.
+    """
+    records = []
+    console = _discard if quiet else print
+    for time_stamp, frame in batch:
+        try:
+            RawFrame(frame, filter_type, time_stamp, lazy=lazy, sink=records.append, console=console)
+        except ValueError:
+            continue  # A header cut short, the rest of the batch still parses
+    return records
+
+
+class AsyncCapture(BindSocket):
+    """
+    Captures raw frames on the asyncio event loop instead of a capture thread.
+
+    Parameters
+    ----------
+    interface : str
+        Name of the interface to bind to.
+    batch_size : int
+        Maximum number of frames drained per wakeup.
+    snaplen : int
+        Size of the receive buffer; longer frames are truncated.
+    bpf_program : list, optional
+        Classic BPF program attached to the socket.
+    fanout : tuple, optional
+        ``(group_id, mode)`` of a PACKET_FANOUT group to join.
+    queue_size : int
+        Maximum number of frames waiting for the consumer.
+    queue_policy : str
+        'drop_newest', 'drop_oldest' or 'block'. With 'block' the socket is taken off the
+        loop while the queue is full, so the backlog stays in the kernel.
+    filter_type : str, optional
+        Frame type filter used by records().
+    lazy : bool
+        Hand memoryview slices of each frame to the parsers in records() instead of copying the payload.
+    """
+
+    def __init__(self, interface: str, batch_size: int = 1024, snaplen: int = 65535, bpf_program=None,
+                 fanout=None, queue_size: int = 65536, queue_policy: str = 'drop_newest', filter_type=None,
+                 lazy: bool = False):
+        # 'block' must never stall the loop: reading pauses before the queue could refuse a batch
+        self.pause_when_full = queue_policy == 'block'
+        super().__init__(interface, batch_size=batch_size, snaplen=snaplen, bpf_program=bpf_program, fanout=fanout,
+                         queue_size=queue_size, queue_policy='drop_newest' if self.pause_when_full else queue_policy)
+        self.filter_type = filter_type
+        self.lazy = lazy
+        self.loop = None
+        self.sock = None
+        self.buffer = bytearray(snaplen)
+        self.ready = asyncio.Event()
+        self.paused = False
+
+    def start_capturing(self):
+        """Opens the socket and registers it with the running event loop."""
+        self.loop = asyncio.get_running_loop()
+        self.sock = self.open_socket()
+        self.sock.setblocking(False)
+        self.is_capturing = True
+        self.loop.add_reader(self.sock, self.on_readable)
+        print(f"Listening on {self.interface}")
+
+    def on_readable(self):
+        """Reader callback: drains every pending frame into the queue."""
+        if self.pause_when_full and self.queue_full():
+            self.loop.remove_reader(self.sock)
+            self.paused = True
+            return
+        try:
+            batch = self.drain(self.sock, self.buffer)
+        except OSError as e:
+            print(f"Error receiving data: {e}")
+            return
+        if batch:
+            self.raw_packets.put(batch)
+            self.ready.set()
+        self.count_kernel_drops(self.sock)
+
+    def queue_full(self) -> bool:
+        queued = self.raw_packets.frames
+        return queued > 0 and queued + self.batch_size > self.raw_packets.maxsize
+
+    async def batches(self):
+        """Yields lists of (timestamp, frame) tuples until the capture is stopped."""
+        raw_packets = self.raw_packets
+        while True:
+            try:
+                batch = raw_packets.get(block=False)
+            except Empty:
+                if not self.is_capturing:
+                    return
+                self.ready.clear()
+                await self.ready.wait()
+                continue
+            if self.paused and not self.queue_full():
+                self.paused = False
+                self.loop.add_reader(self.sock, self.on_readable)
+            yield batch
+
+    async def frames(self):
+        """Yields (timestamp, frame) tuples until the capture is stopped."""
+        async for batch in self.batches():
+            for packet in batch:
+                yield packet
+
+    async def records(self, executor=None):
+        """
+        Yields the parsed packet data dicts, parsing each batch in ``executor`` if given.
+
+        ``executor`` is any concurrent.futures executor; None parses on the loop.
+        """
+        async for batch in self.batches():
+            if executor is None:
+                records = parse_batch(batch, self.filter_type, self.lazy)
+            else:
+                records = await self.loop.run_in_executor(executor, parse_batch, batch, self.filter_type, self.lazy)
+            for record in records:
+                yield record
+
+    def stop_capturing(self) -> None:
+        """Unregisters and closes the socket; iterators end once the queue is empty."""
+        if self.sock is None:
+            return
+        if not self.paused:
+            self.loop.remove_reader(self.sock)
+        self.next_stats = 0.0
+        self.count_kernel_drops(self.sock)
+        self.sock.close()
+        self.sock = None
+        self.is_capturing = False
+        self.ready.set()
+        print("Stopped capturing packets.")
+
+    async def __aenter__(self):
+        self.start_capturing()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.stop_capturing()
+
+    def __str__(self):
+        """Returns a string representation of the AsyncCapture instance."""
+        return f"AsyncCapture(interface={self.interface}, is_capturing={self.is_capturing})"
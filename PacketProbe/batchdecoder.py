@@ -0,0 +1,229 @@
+from itertools import islice
+
+from PacketProbe.pcapreader import LINKTYPE_ETHERNET, PcapReader
+from PacketProbe.protocols.decoders import IPV6_EXTENSION_HEADERS, decode_headers
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional and only needed for batch decoding
+    np = None
+
+"""
+    Batch Decoder - Columnar Header Arrays with NumPy
+
+    The high-throughput counterpart to RawFrame/PacketHandler for offline analytics and
+    bulk statistics. Instead of building Python objects per packet, the first HEADER_SPAN
+    bytes of every frame are packed into one contiguous buffer and decoded in a single
+    pass through NumPy structured dtypes with big-endian fields. The result is one array
+    per field, indexed by frame.
+
+    Frames whose headers are not at the fixed offsets (802.1Q tags, IPv4 options, IPv6
+    extension headers) or that are too short for their headers take a slow path through
+    the struct decoders in PacketProbe.protocols.decoders, one frame at a time, and are
+    flagged in the ``slow_path`` column.
+
+    Functions:
+        decode_batch: Decodes an iterable of (timestamp, frame) tuples, e.g. a capture batch.
+        decode_file: Decodes a pcap or pcapng file in chunks.
+
+    Columns (one entry per frame):
+        time_stamp    float64, NaN when the source had no timestamp
+        frame_length  uint32
+        ethertype     uint16, after any 802.1Q tags
+        ip_version    uint8, 4, 6 or 0 for non-IP frames
+        ip_length     uint32, IPv4 total length or IPv6 payload length plus the 40 byte header
+        ttl           uint8, TTL or hop limit
+        protocol      uint8, IPv4 protocol or the IPv6 upper-layer next header
+        src_ip        void16, IPv6 address bytes, IPv4 addresses as ::ffff:a.b.c.d
+        dst_ip        void16
+        src_port      uint16, 0 unless TCP/UDP with the ports present
+        dst_port      uint16
+        tcp_flags     uint8
+        slow_path     bool
+
+    Usage:
+        columns = decode_file('capture.pcap')
+        https = columns['dst_port'] == 443
+        print(columns['frame_length'][https].sum())
+"""
+
+HEADER_SPAN = 74  # Ethernet + IPv6 + TCP, enough for every fast-path header
+
+_PORT_PROTOCOLS = (6, 17)
+
+COLUMNS = (
+    ('time_stamp', 'f8'),
+    ('frame_length', 'u4'),
+    ('ethertype', 'u2'),
+    ('ip_version', 'u1'),
+    ('ip_length', 'u4'),
+    ('ttl', 'u1'),
+    ('protocol', 'u1'),
+    ('src_ip', 'V16'),
+    ('dst_ip', 'V16'),
+    ('src_port', 'u2'),
+    ('dst_port', 'u2'),
+    ('tcp_flags', 'u1'),
+    ('slow_path', '?'),
+)
+
+# (name, format, offset) of every fixed-offset field; the IPv4 and IPv6 layouts overlap
+_HEADER_FIELDS = (
+    ('ethertype', '>u2', 12),
+    ('v4_version_ihl', 'u1', 14),
+    ('v4_total_length', '>u2', 16),
+    ('v4_flags_fragment', '>u2', 20),
+    ('v4_ttl', 'u1', 22),
+    ('v4_protocol', 'u1', 23),
+    ('v4_src_port', '>u2', 34),
+    ('v4_dst_port', '>u2', 36),
+    ('v4_tcp_flags', 'u1', 47),
+    ('v6_version_class_flow', '>u4', 14),
+    ('v6_payload_length', '>u2', 18),
+    ('v6_next_header', 'u1', 20),
+    ('v6_hop_limit', 'u1', 21),
+    ('v6_src_port', '>u2', 54),
+    ('v6_dst_port', '>u2', 56),
+    ('v6_tcp_flags', 'u1', 67),
+)
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError("Batch decoding requires NumPy (pip install numpy).")
+
+
+def _header_dtype():
+    names, formats, offsets = zip(*_HEADER_FIELDS)
+    return np.dtype({'names': names, 'formats': formats, 'offsets': offsets, 'itemsize': HEADER_SPAN})
+
+
+def empty_columns(count: int = 0) -> dict:
+    """Returns zero-filled columns for ``count`` frames."""
+    _require_numpy()
+    return {name: np.zeros(count, dtype=dtype) for name, dtype in COLUMNS}
+
+
+def decode_batch(packets) -> dict:
+    """
+    Decodes the headers of many frames into columnar NumPy arrays.
+
+    Parameters
+    ----------
+    packets : iterable of (timestamp, frame)
+        The batches put on the capture queues and the tuples PcapReader yields both fit.
+        Frames may be bytes, bytearrays or memoryviews.
+
+    Returns
+    -------
+    dict
+        Column name to array, as listed in the module docstring.
+
+    Raises
+    ------
+    ImportError
+        If NumPy is not installed.
+    """
+    _require_numpy()
+    packets = packets if isinstance(packets, list) else list(packets)
+    count = len(packets)
+    columns = empty_columns(count)
+    if not count:
+        return columns
+
+    # Pack the fixed-offset part of every frame into one zero-padded buffer
+    frames = [frame for _, frame in packets]
+    buffer = b''.join([bytes(frame[:HEADER_SPAN]).ljust(HEADER_SPAN, b'\0') for frame in frames])
+    lengths = columns['frame_length']
+    lengths[:] = np.fromiter(map(len, frames), dtype=np.uint32, count=count)
+    # None (no timestamp) becomes NaN
+    columns['time_stamp'][:] = np.array([time_stamp for time_stamp, _ in packets], dtype=np.float64)
+
+    headers = np.frombuffer(buffer, dtype=_header_dtype())
+    raw = np.frombuffer(buffer, dtype=np.uint8).reshape(count, HEADER_SPAN)
+
+    ethertype = headers['ethertype']
+    version_ihl = headers['v4_version_ihl']
+    is_ipv4 = (ethertype == 0x0800) & (version_ihl >> 4 == 4)
+    is_ipv6 = (ethertype == 0x86DD) & (headers['v6_version_class_flow'] >> 28 == 6)
+    protocol = np.where(is_ipv4, headers['v4_protocol'], np.where(is_ipv6, headers['v6_next_header'], 0))
+
+    # Anything not at the fixed offsets, or shorter than its own headers, is decoded per frame
+    needed = np.where(is_ipv4, 34, 54) + np.where(protocol == 6, 20, np.where(protocol == 17, 8, 0))
+    slow_path = ((ethertype == 0x8100) | (ethertype == 0x88A8)
+                 | (is_ipv4 & (version_ihl & 0x0F != 5))
+                 | (is_ipv6 & np.isin(protocol, IPV6_EXTENSION_HEADERS))
+                 | ((is_ipv4 | is_ipv6) & (lengths < needed)))
+
+    columns['ethertype'][:] = ethertype
+    columns['ip_version'][:] = np.where(is_ipv4, 4, np.where(is_ipv6, 6, 0))
+    columns['ip_length'][:] = np.where(is_ipv4, headers['v4_total_length'],
+                                       np.where(is_ipv6, headers['v6_payload_length'].astype(np.uint32) + 40, 0))
+    columns['ttl'][:] = np.where(is_ipv4, headers['v4_ttl'], np.where(is_ipv6, headers['v6_hop_limit'], 0))
+    columns['protocol'][:] = protocol
+
+    source = np.zeros((count, 16), dtype=np.uint8)
+    destination = np.zeros((count, 16), dtype=np.uint8)
+    source[is_ipv4, 10:12] = destination[is_ipv4, 10:12] = 0xFF
+    source[is_ipv4, 12:] = raw[is_ipv4, 26:30]
+    destination[is_ipv4, 12:] = raw[is_ipv4, 30:34]
+    source[is_ipv6] = raw[is_ipv6, 22:38]
+    destination[is_ipv6] = raw[is_ipv6, 38:54]
+    columns['src_ip'][:] = source.view('V16').ravel()
+    columns['dst_ip'][:] = destination.view('V16').ravel()
+
+    # Non-first IPv4 fragments carry no transport header
+    has_ports = np.isin(protocol, _PORT_PROTOCOLS) & (is_ipv6 | (headers['v4_flags_fragment'] & 0x1FFF == 0))
+    columns['src_port'][:] = np.where(has_ports, np.where(is_ipv4, headers['v4_src_port'], headers['v6_src_port']), 0)
+    columns['dst_port'][:] = np.where(has_ports, np.where(is_ipv4, headers['v4_dst_port'], headers['v6_dst_port']), 0)
+    columns['tcp_flags'][:] = np.where(has_ports & (protocol == 6),
+                                       np.where(is_ipv4, headers['v4_tcp_flags'], headers['v6_tcp_flags']), 0)
+
+    columns['slow_path'][:] = slow_path
+    slow_indexes = np.flatnonzero(slow_path)
+    if len(slow_indexes):
+        rows = [_decode_slow(frames[index]) for index in slow_indexes]
+        for (name, dtype), values in zip(COLUMNS[2:12], zip(*rows)):
+            columns[name][slow_indexes] = np.array(values, dtype=dtype)
+
+    return columns
+
+
+def _decode_slow(frame):
+    """Decodes one frame with the struct decoders; returns the values of the columns ethertype through tcp_flags."""
+    return decode_headers(frame)[:10]
+
+
+def decode_file(path: str, chunk_size: int = 1 << 16) -> dict:
+    """
+    Decodes every frame of a pcap or pcapng file into columnar arrays.
+
+    The file is read through PcapReader in chunks of ``chunk_size`` frames, so only the
+    packed headers of one chunk are held in memory besides the growing columns.
+
+    Raises
+    ------
+    ImportError
+        If NumPy is not installed.
+    ValueError
+        If the file is not a pcap/pcapng file or its link type is not Ethernet.
+    """
+    _require_numpy()
+    chunks = []
+    with PcapReader(path) as reader:
+        if reader.linktype not in (None, LINKTYPE_ETHERNET):
+            raise ValueError(f"{path} has link type {reader.linktype}, only Ethernet can be batch decoded.")
+        packets = iter(reader)
+        while True:
+            chunk = list(islice(packets, chunk_size))
+            if not chunk:
+                break
+            chunks.append(decode_batch(chunk))
+            # The views point into the file mapping and must be released before it closes
+            for _, frame in chunk:
+                frame.release()
+            del chunk
+
+    if not chunks:
+        return empty_columns()
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name, _ in COLUMNS}
@@ -1,11 +1,15 @@
 import ctypes
+import select
 import threading
 import socket as _socket
 from abc import ABC
-from time import sleep
+from struct import Struct, pack
+from time import monotonic, perf_counter_ns, sleep, time
 
+from PacketProbe import instrumentation
 from PacketProbe.Interfaces.pcapnetworkinterface import PCAP
-from queue import Queue
+from PacketProbe.filters.bpf import attach_filter
+from PacketProbe.framequeue import FrameQueue
 
 """
     BindSocket and BindSocketPCAP - Network Socket Binding and Packet Capture
@@ -23,18 +27,87 @@ from queue import Queue
         ctypes: For handling C-style data structures and library calls.
         threading: For running capture loops in separate threads.
         socket: For creating network sockets and handling low-level network operations.
+        select: For blocking on socket readiness with a timeout instead of fixed sleeps.
         abc: For creating abstract base classes.
         time: For sleep intervals to control capture pacing.
-        queue: For thread-safe data handling with queues.
+        PacketProbe.framequeue: For the bounded capture-to-parser handoff with drop accounting.
 
 """
 
+SOL_PACKET = 263
+PACKET_STATISTICS = 6
+PACKET_FANOUT = 18
+PACKET_FANOUT_FLAG_DEFRAG = 0x8000
+FANOUT_MODES = {'hash': 0, 'lb': 1, 'cpu': 2}
+
+_kernel_stats = Struct('=2I')
+
+
+def join_fanout(sock: _socket.socket, group_id: int, mode: str = 'hash') -> None:
+    """
+    Adds a bound packet socket to a PACKET_FANOUT group.
+
+    Every socket in the group must be bound to the same interface and use the same mode.
+    Hash mode also sets PACKET_FANOUT_FLAG_DEFRAG so that IP fragments hash with their flow.
+    """
+    if mode not in FANOUT_MODES:
+        raise ValueError(f"Unknown fanout mode: {mode}")
+    if not 0 <= group_id <= 0xFFFF:
+        raise ValueError("Fanout group id must fit in 16 bits.")
+    type_flags = FANOUT_MODES[mode]
+    if mode == 'hash':
+        type_flags |= PACKET_FANOUT_FLAG_DEFRAG
+    # The DEFRAG flag sets bit 31, which does not fit the signed int setsockopt() accepts
+    sock.setsockopt(SOL_PACKET, PACKET_FANOUT, pack('=I', group_id | type_flags << 16))
+
 
 class BindSocket:
-    def __init__(self, interface: str):
+    """
+    Captures raw frames from an AF_PACKET socket.
+
+    The capture thread blocks in poll() until the socket becomes readable and then
+    drains every pending frame with non-blocking recv_into() calls. Each drained
+    batch is handed to the consumer as a single list of ``(timestamp, frame)``
+    tuples on ``raw_packets``, so the queue lock is taken once per wakeup instead
+    of once per frame.
+
+    Parameters
+    ----------
+    interface : str
+        Name of the interface to bind to.
+    batch_size : int
+        Maximum number of frames drained per wakeup.
+    poll_timeout : float
+        Seconds to block in poll() before re-checking ``is_capturing``.
+    snaplen : int
+        Size of the receive buffer; longer frames are truncated.
+    bpf_program : list, optional
+        Classic BPF program (see PacketProbe.filters.bpf) attached to the socket so that
+        non-matching frames are dropped in the kernel.
+    fanout : tuple, optional
+        ``(group_id, mode)`` of a PACKET_FANOUT group to join after binding, so that the
+        kernel shares the interface's frames between all sockets in the group.
+    queue_size : int
+        Maximum number of frames waiting on ``raw_packets`` for the consumer.
+    queue_policy : str
+        What happens when the consumer falls behind: 'drop_newest', 'drop_oldest' or
+        'block' (see PacketProbe.framequeue). Frames the kernel drops are counted too.
+    """
+
+    ETH_P_ALL = 0x0003
+    STATS_INTERVAL = 1.0
+
+    def __init__(self, interface: str, batch_size: int = 1024, poll_timeout: float = 0.5, snaplen: int = 65535,
+                 bpf_program=None, fanout=None, queue_size: int = 65536, queue_policy: str = 'drop_newest'):
         self.interface = interface
-        self.raw_packets = Queue()
+        self.batch_size = batch_size
+        self.poll_timeout = poll_timeout
+        self.snaplen = snaplen
+        self.bpf_program = bpf_program
+        self.fanout = fanout
+        self.raw_packets = FrameQueue(queue_size, queue_policy)
         self.is_capturing = False
+        self.next_stats = 0.0
 
     def start_capturing(self):
         self.is_capturing = True
@@ -42,28 +115,91 @@ class BindSocket:
         capture_thread.daemon = True
         capture_thread.start()
 
+    def open_socket(self) -> _socket.socket:
+        """Creates the raw socket, configures it and binds it to the interface."""
+        # Protocol 0 receives nothing until bind(), so no frame slips past the filter
+        sock = _socket.socket(_socket.AF_PACKET, _socket.SOCK_RAW, 0)
+        try:
+            self.configure_socket(sock)
+            sock.bind((self.interface, self.ETH_P_ALL))
+            if self.fanout:
+                join_fanout(sock, *self.fanout)  # Only a bound socket can join a group
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def configure_socket(self, sock: _socket.socket) -> None:
+        """Applies socket options before the socket starts receiving."""
+        if self.bpf_program:
+            attach_filter(sock, self.bpf_program)
+
+    def count_kernel_drops(self, sock: _socket.socket) -> None:
+        """Adds the frames the kernel dropped since the last call, at most once per STATS_INTERVAL."""
+        now = monotonic()
+        if now < self.next_stats:
+            return
+        self.next_stats = now + self.STATS_INTERVAL
+        try:
+            # struct tpacket_stats; reading it resets the kernel counters
+            _, drops = _kernel_stats.unpack(sock.getsockopt(SOL_PACKET, PACKET_STATISTICS, _kernel_stats.size))
+        except OSError:
+            return
+        self.raw_packets.record_drops('kernel', drops)
+
     def capture_packets(self) -> None:
         try:
-            sock = _socket.socket(_socket.AF_PACKET, _socket.SOCK_RAW, _socket.ntohs(0x0003))
-            sock.bind((self.interface, 0))
+            sock = self.open_socket()
         except OSError as e:
             print(f"Error binding to interface {self.interface}: {e}")
             return  # Exit gracefully if binding fails
 
         print(f"Listening on {self.interface}")
 
-        while self.is_capturing:
-            sleep(2)
+        sock.setblocking(False)
+        poller = select.poll()
+        poller.register(sock, select.POLLIN)
+        timeout = int(self.poll_timeout * 1000)
+        buffer = bytearray(self.snaplen)
+        recv_histogram = instrumentation.probe.histogram('capture_recv') if instrumentation.probe else None
+
+        try:
+            while self.is_capturing:
+                self.count_kernel_drops(sock)
+                try:
+                    if not poller.poll(timeout):
+                        continue  # Timed out, re-check is_capturing
+                    start = perf_counter_ns()
+                    batch = self.drain(sock, buffer)
+                except OSError as e:
+                    print(f"Error receiving data: {e}")
+                    continue
+                if batch:
+                    if recv_histogram is not None:
+                        recv_histogram.record((perf_counter_ns() - start) // len(batch), len(batch))
+                    self.raw_packets.put(batch)
+        except KeyboardInterrupt:
+            print("Stopping packet capture...")
+            self.is_capturing = False
+        finally:
+            self.next_stats = 0.0
+            self.count_kernel_drops(sock)
+            sock.close()
+
+    def drain(self, sock: _socket.socket, buffer: bytearray) -> list:
+        """Reads every frame pending on a non-blocking socket, up to batch_size."""
+        batch = []
+        append = batch.append
+        recv_into = sock.recv_into
+        view = memoryview(buffer)
+        time_stamp = time()  # One clock read per wakeup
+        for _ in range(self.batch_size):
             try:
-                data = sock.recv(4096)
-                self.raw_packets.put(data)
-            except KeyboardInterrupt:
-                print("Stopping packet capture...")
-                self.is_capturing = False
+                length = recv_into(buffer)
+            except BlockingIOError:
                 break
-            except OSError as e:
-                print(f"Error receiving data: {e}")
-                continue
+            append((time_stamp, bytes(view[:length])))
+        return batch
 
     def stop_capturing(self) -> None:
         """Stops the packet capturing."""
@@ -76,10 +212,10 @@ class BindSocket:
 
 
 class BindSocketPCAP(PCAP, ABC):
-    def __init__(self):
+    def __init__(self, queue_size: int = 65536, queue_policy: str = 'drop_newest'):
         super().__init__()
         self.current_interface = super().interfaces_selection()
-        self.raw_data = Queue()
+        self.raw_data = FrameQueue(queue_size, queue_policy)
 
     def start_packet_capture(self):
         errbuf = ctypes.create_string_buffer(self.PCAP_ERRBUF_SIZE)
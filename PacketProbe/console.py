@@ -0,0 +1,179 @@
+import sys
+import threading
+from collections import deque
+from time import monotonic
+
+"""
+    ConsoleRenderer - Decoupled, Rate-Limited Console Output
+
+    The packet handlers describe every packet in several lines of text. Printing them
+    from the parsing thread ties capture throughput to the speed of whatever drains
+    stdout: a slow terminal, a pager, a full pipe or journald. The handlers hand one
+    block of text per packet to a ConsoleRenderer instead, which only appends it to a
+    bounded buffer and returns; a background thread writes the buffered blocks to the
+    stream in one write per interval.
+
+    Two limits decide what is shown. A whole packet block is kept or dropped, so the
+    output never shows half a packet:
+
+        max_lines_per_second  Lines written per second. When more is offered, blocks
+                              are sampled: every n-th block is shown, with n chosen
+                              from the rate offered in the previous second, so the
+                              sample spreads over the whole second instead of showing
+                              its first packets only. A hard cap per second applies on top.
+        buffer_lines          Lines waiting for the stream. When the stream does not keep
+                              up, new blocks are dropped instead of stalling the parser.
+
+    Dropped output is counted, and a summary line reports it at most once per second
+    and once more at the end.
+
+    Classes:
+        ConsoleRenderer: Callable console output that writes from a background thread.
+
+    Usage:
+        with ConsoleRenderer(max_lines_per_second=1000) as console:
+            RawFrame(frame, console=console)
+"""
+
+
+class ConsoleRenderer:
+    """
+    Buffers console text and writes it to a stream from a background thread, within a line rate.
+
+    Instances are callable with a block of text (without a trailing newline), so they
+    can be passed as the ``console`` of RawFrame.
+
+    Parameters
+    ----------
+    max_lines_per_second : int
+        Lines written per second; more is sampled down to this rate.
+    buffer_lines : int
+        Lines held for a stream that does not keep up; more is dropped.
+    stream : file, optional
+        Where to write, sys.stdout by default.
+    interval : float
+        Seconds between writes to the stream.
+
+    Raises
+    ------
+    ValueError
+        If a limit is less than 1 or ``interval`` is not positive.
+    """
+
+    def __init__(self, max_lines_per_second: int = 1000, buffer_lines: int = 10000, stream=None,
+                 interval: float = 0.1):
+        if max_lines_per_second < 1 or buffer_lines < 1:
+            raise ValueError("Console limits must be at least one line.")
+        if interval <= 0:
+            raise ValueError("The console write interval must be positive.")
+
+        self.max_lines_per_second = max_lines_per_second
+        self.buffer_lines = buffer_lines
+        self.stream = stream if stream is not None else sys.stdout
+        self.interval = interval
+        self.buffer = deque()
+        self.buffered_lines = 0
+        self.lock = threading.Lock()
+        # Rate window, only touched by the writing thread
+        self.window_end = 0.0
+        self.window_lines = 0
+        self.offered_lines = 0
+        self.blocks_seen = 0
+        self.sample_every = 1
+        # Totals; the renderer thread compares them with what it reported last
+        self.lines_written = 0
+        self.suppressed_lines = 0
+        self.suppressed_blocks = 0
+        self.reported_lines = 0
+        self.reported_blocks = 0
+        self.next_summary = 0.0
+        self.is_open = True
+        self.wake = threading.Event()
+        self.render_thread = threading.Thread(target=self._render_periodically, daemon=True)
+        self.render_thread.start()
+
+    def __call__(self, text: str):
+        self.write(text)
+
+    def write(self, text: str):
+        """Queues one block of text, or counts it as suppressed. Never waits for the stream."""
+        lines = text.count('\n') + 1
+        now = monotonic()
+        if now >= self.window_end:
+            # Sample the next second at the rate this one was offered
+            self.sample_every = max(1, -(-self.offered_lines // self.max_lines_per_second))
+            self.window_end = now + 1.0
+            self.window_lines = 0
+            self.offered_lines = 0
+        self.offered_lines += lines
+        self.blocks_seen += 1
+
+        if self.blocks_seen % self.sample_every or self.window_lines + lines > self.max_lines_per_second:
+            self._suppress(lines)
+            return
+        with self.lock:
+            if self.buffered_lines + lines > self.buffer_lines:
+                full = True
+            else:
+                full = False
+                self.buffer.append(text)
+                self.buffered_lines += lines
+        if full:
+            self._suppress(lines)
+            return
+        self.window_lines += lines
+
+    def _suppress(self, lines: int):
+        self.suppressed_lines += lines
+        self.suppressed_blocks += 1
+
+    def _render_periodically(self):
+        while self.is_open:
+            self.wake.wait(self.interval)
+            self.wake.clear()
+            self.render()
+
+    def render(self, final: bool = False):
+        """Writes the buffered blocks, and the summary of the suppressed output if it is due, in one write."""
+        with self.lock:
+            blocks = list(self.buffer)
+            self.buffer.clear()
+            lines = self.buffered_lines
+            self.buffered_lines = 0
+        parts = blocks
+
+        suppressed_lines = self.suppressed_lines - self.reported_lines
+        if suppressed_lines and (final or monotonic() >= self.next_summary):
+            suppressed_blocks = self.suppressed_blocks - self.reported_blocks
+            parts.append(f"[console] {suppressed_lines} lines of {suppressed_blocks} packets not shown")
+            self.reported_lines += suppressed_lines
+            self.reported_blocks += suppressed_blocks
+            self.next_summary = monotonic() + 1.0
+        if not parts:
+            return
+        try:
+            self.stream.write('\n'.join(parts) + '\n')
+            self.stream.flush()
+        except (OSError, ValueError):
+            return  # A closed or broken stream must not take the capture down
+        self.lines_written += lines
+
+    def close(self):
+        """Stops the renderer thread and writes what is left, with the final summary."""
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.wake.set()
+        self.render_thread.join()
+        self.render(final=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns a string representation of the ConsoleRenderer instance."""
+        return (f"ConsoleRenderer(lines_written={self.lines_written}, "
+                f"suppressed_lines={self.suppressed_lines})")
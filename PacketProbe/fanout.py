@@ -0,0 +1,273 @@
+import multiprocessing
+import os
+import queue
+import signal
+from collections import Counter
+
+from PacketProbe import instrumentation
+from PacketProbe.bindsocket import FANOUT_MODES, BindSocket
+from PacketProbe.console import ConsoleRenderer
+from PacketProbe.flowtable import FlowTable
+from PacketProbe.pcapwriter import PcapWriter
+from PacketProbe.reassembly.fragments import FragmentReassembler
+from PacketProbe.reassembly.tcpstreams import StreamFileWriter, TCPReassembler
+from PacketProbe.rawframe import RawFrame
+from PacketProbe.ringsocket import BindSocketRing
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+from PacketProbe.sinks.recordlog import RecordLogWriter
+from PacketProbe.sinks.sqlitedb import SQLiteSink
+from PacketProbe.utils.helpers import _tee, _worker_path
+from PacketProbe.utils.packetDataCSV import close_csv_sink
+from PacketProbe.utils.packetType import determine_packet_type
+
+"""
+    FanoutCapture - PACKET_FANOUT Capture Across Worker Processes
+
+    Instead of one socket and one capture thread per interface, N worker processes each
+    open their own AF_PACKET socket (or TPACKET_V3 ring) and join a shared
+    PACKET_FANOUT group. The kernel spreads the interface's frames over the group, so
+    every worker captures, filters, parses and writes its share independently, on its
+    own core, with nothing passed between processes.
+
+    Classes:
+        FanoutCapture: Starts and stops the fanout worker processes.
+
+    Modes:
+        hash  Flow hash over addresses and ports, symmetric in both directions, so a flow
+              always lands on the same worker. IP fragments are reassembled by the kernel
+              before hashing (PACKET_FANOUT_FLAG_DEFRAG) so they follow their flow.
+        lb    Round-robin over the group, the most even spread for stateless work.
+        cpu   By the CPU that received the frame, which keeps RSS/RPS affinity.
+
+    Output:
+        Worker n appends to its own files, e.g. packet_data.json -> packet_data.n.json,
+        capture.pcap -> capture.n.pcap, capture.ppr -> capture.n_0001.ppr and
+        packets.db -> packets.n.db. In hash mode both directions of a flow reach the
+        same worker, so per-worker flow tables (flows.json -> flows.n.json) are complete.
+        For the same reason every worker reassembles whole TCP streams, into one shared
+        stream directory. The other modes spread a connection over several workers, so
+        flows and stream reassembly are only accepted in hash mode.
+"""
+
+def _run_fanout_worker(index, stop, options):
+    """Worker process: captures its share of the fanout group and runs the full RawFrame pipeline."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The parent sets ``stop`` on Ctrl+C
+    fanout = (options['group_id'], options['mode'])
+    if options['backend'] == 'ring':
+        capture = BindSocketRing(options['interface'], bpf_program=options['bpf_program'], fanout=fanout,
+                                 **options['ring_options'], **options['queue_options'])
+    else:
+        capture = BindSocket(options['interface'], bpf_program=options['bpf_program'], fanout=fanout,
+                             **options['queue_options'])
+
+    writer = None
+    if options['write_file']:
+        writer = PcapWriter(_worker_path(options['write_file'], index), **options['write_options'])
+    record_log = None
+    if options['record_log']:
+        record_log = RecordLogWriter(_worker_path(options['record_log'], index), **options['record_log_options'])
+    reassembler = None
+    if options['reassemble']:
+        reassembler = TCPReassembler(**options['reassembly_options'])
+        reassembler.add_consumer(StreamFileWriter(options['reassemble']))
+    # The other modes spread the fragments of a datagram over the workers, parse first fragments only
+    fragments = FragmentReassembler(**options['fragment_options']) if options['mode'] == 'hash' else None
+    console = print
+    if options['parse'] and options['console_options'] is not None:
+        console = ConsoleRenderer(**options['console_options'])
+    output = None
+    if not options['flows_only']:
+        output = JsonLinesWriter(_worker_path(options['output'], index), flush_interval=options['flush_interval'])
+    database = None
+    if options['sqlite'] and options['parse']:
+        database = SQLiteSink(_worker_path(options['sqlite'], index), flush_interval=options['flush_interval'])
+    flow_writer = None
+    flow_table = None
+    if options['flows'] and options['parse']:
+        flow_writer = JsonLinesWriter(_worker_path(options['flows'], index), flush_interval=options['flush_interval'])
+        flow_table = FlowTable(_tee(flow_writer, database.write_flow if database else None), **options['flow_options'])
+    sink = _tee(output, None if options['flows_only'] else database, flow_table)
+    filter_type = options['filter_type']
+    lazy = options['lazy']
+    parse = options['parse']
+    frames = 0
+    parse_errors = Counter()
+
+    capture.start_capturing()
+    try:
+        while not stop.is_set():
+            try:
+                batch = capture.raw_packets.get(timeout=capture.poll_timeout)
+            except queue.Empty:
+                continue
+            frames += len(batch)
+            if writer:
+                writer.write_batch(batch)
+            if record_log:
+                record_log.write_batch(batch)
+            if reassembler:
+                reassembler.feed_batch(batch)
+            if not parse:
+                continue
+            for time_stamp, frame in batch:
+                try:
+                    RawFrame(frame, filter_type, time_stamp, lazy=lazy, sink=sink, fragments=fragments,
+                             console=console)
+                except ValueError:
+                    parse_errors[determine_packet_type(frame)] += 1  # A header cut short, skip the frame
+    finally:
+        capture.stop_capturing()
+        if console is not print:
+            console.close()
+        if flow_table is not None:
+            flow_table.close()
+            flow_writer.close()
+        if output:
+            output.close()
+        if database:
+            database.close()
+        close_csv_sink()  # Forked workers skip atexit handlers
+        if writer:
+            writer.close()
+        if record_log:
+            record_log.close()
+        if reassembler:
+            reassembler.close()
+        print(f"Fanout worker {index} captured {frames} frames")
+        if parse_errors:
+            print(f"Fanout worker {index} skipped {sum(parse_errors.values())} frames too short to parse "
+                  f"({', '.join(f'{name}: {count}' for name, count in sorted(parse_errors.items()))})")
+        if capture.raw_packets.dropped:
+            print(f"Fanout worker {index} dropped {capture.raw_packets.dropped} frames "
+                  f"({capture.raw_packets.drop_summary()})")
+        instrumentation.dump_worker(index)
+
+
+class FanoutCapture:
+    """
+    Captures one interface with N processes sharing a PACKET_FANOUT group.
+
+    Parameters
+    ----------
+    interface : str
+        Interface every worker binds to.
+    workers : int
+        Number of worker processes (and sockets) in the group.
+    mode : str
+        Fanout mode: 'hash', 'lb' or 'cpu'.
+    backend : str
+        'socket' or 'ring', as for a single capture.
+    ring_options : dict, optional
+        Ring geometry for the 'ring' backend. Every worker maps its own ring.
+    bpf_program : list, optional
+        Classic BPF program attached to every worker socket.
+    filter_type : str, optional
+        Frame type filter passed on to RawFrame.
+    lazy : bool
+        Hand memoryview slices of each frame to the parsers instead of copying the payload.
+    parse : bool
+        Run RawFrame on every frame; when False the workers only write capture files.
+    write_file : str, optional
+        Name template for the per-worker capture files.
+    write_options : dict, optional
+        PcapWriter options for the per-worker capture files.
+    output : str
+        Name template for the per-worker JSON output.
+    group_id : int, optional
+        Fanout group id; derived from the process id when omitted.
+    queue_options : dict, optional
+        ``queue_size`` and ``queue_policy`` for every worker's frame queue.
+    flush_interval : float
+        Seconds between writes of each worker's buffered JSON output.
+    record_log : str, optional
+        Name template for the per-worker record logs.
+    record_log_options : dict, optional
+        RecordLogWriter options for the per-worker record logs.
+    sqlite : str, optional
+        Name template for the per-worker SQLite databases.
+    flows : str, optional
+        Name template for the per-worker flow records.
+    flow_options : dict, optional
+        FlowTable timeouts and size for every worker.
+    flows_only : bool
+        Write only the flow records, no per-packet JSON or SQLite rows.
+    reassemble : str, optional
+        Directory for the reassembled TCP stream files of all workers.
+    reassembly_options : dict, optional
+        TCPReassembler limits for every worker.
+    fragment_options : dict, optional
+        FragmentReassembler limits for every worker, in hash mode.
+    console_options : dict, optional
+        ConsoleRenderer limits for the packet descriptions of every worker. Without them
+        the descriptions are printed directly.
+
+    Raises
+    ------
+    ValueError
+        If ``workers`` is less than 1, the mode is unknown, or flows are tracked or TCP
+        streams reassembled in a mode other than 'hash'.
+    """
+
+    def __init__(self, interface: str, workers: int, mode: str = 'hash', backend: str = 'socket',
+                 ring_options=None, bpf_program=None, filter_type=None, lazy: bool = False, parse: bool = True,
+                 write_file: str = None, write_options=None, output: str = 'packet_data.json', group_id: int = None,
+                 queue_options=None, flush_interval: float = 1.0, record_log: str = None, record_log_options=None,
+                 sqlite: str = None, flows: str = None, flow_options=None, flows_only: bool = False,
+                 reassemble: str = None, reassembly_options=None, fragment_options=None, console_options=None):
+        if workers < 1:
+            raise ValueError("Fanout capture needs at least one worker.")
+        if mode not in FANOUT_MODES:
+            raise ValueError(f"Unknown fanout mode: {mode}")
+        if flows and mode != 'hash':
+            raise ValueError("Only hash fanout keeps a flow on one worker, track flows with mode 'hash'.")
+        if reassemble and mode != 'hash':
+            raise ValueError("Only hash fanout keeps a TCP connection on one worker, reassemble with mode 'hash'.")
+
+        self.interface = interface
+        self.workers = workers
+        self.mode = mode
+        self.group_id = os.getpid() & 0xFFFF if group_id is None else group_id
+        self.options = {
+            'interface': interface, 'mode': mode, 'group_id': self.group_id, 'backend': backend,
+            'ring_options': ring_options or {}, 'bpf_program': bpf_program, 'filter_type': filter_type,
+            'lazy': lazy, 'parse': parse, 'write_file': write_file, 'write_options': write_options or {},
+            'output': output, 'queue_options': queue_options or {},
+            'flush_interval': flush_interval, 'record_log': record_log,
+            'record_log_options': record_log_options or {}, 'sqlite': sqlite,
+            'flows': flows, 'flow_options': flow_options or {}, 'flows_only': flows_only,
+            'reassemble': reassemble, 'reassembly_options': reassembly_options or {},
+            'fragment_options': fragment_options or {}, 'console_options': console_options,
+        }
+        context = multiprocessing.get_context()
+        self.stop_event = context.Event()
+        self.processes = [
+            context.Process(target=_run_fanout_worker, name=f"PacketProbe-fanout-{index}", daemon=True,
+                            args=(index, self.stop_event, self.options))
+            for index in range(workers)
+        ]
+
+    def start(self):
+        print(f"Capturing {self.interface} with {self.workers} workers in fanout group {self.group_id} "
+              f"({self.mode})")
+        for process in self.processes:
+            process.start()
+
+    def wait(self):
+        """Blocks until the workers exit; Ctrl+C stops them cleanly."""
+        try:
+            for process in self.processes:
+                process.join()
+        except KeyboardInterrupt:
+            print("\n Packet capturing stopped")
+            self.stop()
+
+    def stop(self):
+        """Asks the workers to stop, letting them flush their output first."""
+        self.stop_event.set()
+        for process in self.processes:
+            process.join()
+
+    def __str__(self):
+        """Returns a string representation of the FanoutCapture instance."""
+        return (f"FanoutCapture(interface={self.interface}, workers={self.workers}, mode={self.mode}, "
+                f"group_id={self.group_id})")
@@ -0,0 +1,454 @@
+import ctypes
+import ipaddress
+import re
+import socket as _socket
+from collections import namedtuple
+
+"""
+    Classic BPF Filter Compiler
+
+    This module compiles frame-type filters and a small tcpdump-like expression language
+    into classic BPF (cBPF) programs and attaches them to capture sockets with
+    SO_ATTACH_FILTER, so that unwanted frames are dropped in the kernel before they are
+    ever copied to userspace.
+
+    Expression language:
+        Primitives:
+            ether proto <n>              EtherType equals <n> (decimal or 0x hex)
+            ip, ip6, arp, rarp, vlan,    Shorthands for the matching EtherType
+            lldp, eapol, mpls
+            ip proto <n>, ip6 proto <n>  IPv4 protocol / IPv6 next header equals <n>
+            proto <n>                    Either of the above
+            tcp, udp, icmp, icmp6        Transport protocol shorthands
+            [src|dst] host <addr>        IPv4 or IPv6 address
+            [src|dst] net <addr>/<len>   IPv4 or IPv6 prefix
+            [tcp|udp] [src|dst] port <n> TCP/UDP port (first IPv4 fragment only)
+        Operators (lowest to highest precedence): or / ||, and / &&, not / !, and parentheses.
+
+    Live capture:
+        Linux usually moves the 802.1Q tag of a received frame out of the packet data
+        into metadata before a packet socket sees it. Programs compiled with live=True
+        therefore match ``vlan`` on the SKF_AD_VLAN_TAG_PRESENT ancillary load as well as
+        on the EtherType; the userspace interpreter only ever sees the tag in the data.
+
+    Limitations:
+        Offsets assume an untagged Ethernet header; ``vlan`` matches the 802.1Q tag but
+        later primitives are not shifted past a tag left in the data. IPv6 transport
+        primitives do not walk extension headers.
+
+    Functions:
+        compile_filter(expression): Returns the cBPF program for an expression.
+        frame_type_expression(frame_type): Maps a -f/--frame_type choice to an expression.
+        attach_filter(sock, program): Attaches a program to a socket.
+        detach_filter(sock): Removes the socket's filter.
+"""
+
+# Instruction classes
+BPF_LD = 0x00
+BPF_LDX = 0x01
+BPF_ST = 0x02
+BPF_STX = 0x03
+BPF_ALU = 0x04
+BPF_JMP = 0x05
+BPF_RET = 0x06
+BPF_MISC = 0x07
+
+# Load sizes
+BPF_W = 0x00
+BPF_H = 0x08
+BPF_B = 0x10
+
+# Addressing modes
+BPF_IMM = 0x00
+BPF_ABS = 0x20
+BPF_IND = 0x40
+BPF_MEM = 0x60
+BPF_LEN = 0x80
+BPF_MSH = 0xA0
+
+# ALU operations
+BPF_ADD = 0x00
+BPF_SUB = 0x10
+BPF_MUL = 0x20
+BPF_DIV = 0x30
+BPF_OR = 0x40
+BPF_AND = 0x50
+BPF_LSH = 0x60
+BPF_RSH = 0x70
+BPF_NEG = 0x80
+BPF_MOD = 0x90
+BPF_XOR = 0xA0
+
+# Jump operations
+BPF_JA = 0x00
+BPF_JEQ = 0x10
+BPF_JGT = 0x20
+BPF_JGE = 0x30
+BPF_JSET = 0x40
+
+# Operand sources
+BPF_K = 0x00
+BPF_X = 0x08
+BPF_A = 0x10
+
+# Misc operations
+BPF_TAX = 0x00
+BPF_TXA = 0x80
+
+SO_ATTACH_FILTER = 26
+SO_DETACH_FILTER = 27
+
+# Ancillary data loads, only understood by the kernel
+SKF_AD_OFF = -0x1000
+SKF_AD_VLAN_TAG_PRESENT = 48
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_ARP = 0x0806
+ETHERTYPE_RARP = 0x8035
+ETHERTYPE_VLAN = 0x8100
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_MPLS = 0x8847
+ETHERTYPE_LLDP = 0x88CC
+ETHERTYPE_EAPOL = 0x888E
+
+BPFInstruction = namedtuple('BPFInstruction', ['code', 'jt', 'jf', 'k'])
+
+ETHERTYPE_KEYWORDS = {
+    'ip': ETHERTYPE_IPV4,
+    'ip6': ETHERTYPE_IPV6,
+    'arp': ETHERTYPE_ARP,
+    'rarp': ETHERTYPE_RARP,
+    'vlan': ETHERTYPE_VLAN,
+    'lldp': ETHERTYPE_LLDP,
+    'eapol': ETHERTYPE_EAPOL,
+    'mpls': ETHERTYPE_MPLS,
+}
+
+FRAME_TYPE_EXPRESSIONS = {
+    'ipv4': 'ip',
+    'ipv6': 'ip6',
+    'arp': 'arp',
+    'rarp': 'rarp',
+    'vlan': 'vlan',
+}
+
+# Loads used by the primitives: (code, k) pairs
+_LD_ETHERTYPE = (BPF_LD | BPF_H | BPF_ABS, 12)
+_LD_IP_PROTO = (BPF_LD | BPF_B | BPF_ABS, 23)
+_LD_IP_FRAGMENT = (BPF_LD | BPF_H | BPF_ABS, 20)
+_LD_IP6_NEXT_HEADER = (BPF_LD | BPF_B | BPF_ABS, 20)
+_LDX_IP_HEADER_LENGTH = (BPF_LDX | BPF_B | BPF_MSH, 14)
+_LD_VLAN_TAG_PRESENT = (BPF_LD | BPF_W | BPF_ABS, (SKF_AD_OFF + SKF_AD_VLAN_TAG_PRESENT) & 0xFFFFFFFF)
+
+_IP_SOURCE, _IP_DESTINATION = 26, 30
+_IP6_SOURCE, _IP6_DESTINATION = 22, 38
+_L4_SOURCE_PORT, _L4_DESTINATION_PORT = 14, 16  # Relative to X (IPv4 header length) + 14
+_IP6_L4 = 54
+
+_TOKEN = re.compile(r'\s*(\(|\)|&&|\|\||!|[^\s()!]+)')
+
+
+def _test(loads, operation, k):
+    """A leaf that runs some loads into A and then jumps on A <operation> k."""
+    return 'test', tuple(loads), operation, k
+
+
+def _and(*nodes):
+    node = nodes[0]
+    for other in nodes[1:]:
+        node = ('and', node, other)
+    return node
+
+
+def _or(*nodes):
+    node = nodes[0]
+    for other in nodes[1:]:
+        node = ('or', node, other)
+    return node
+
+
+def _not(node):
+    return 'not', node
+
+
+def _ether_proto(value):
+    return _test([_LD_ETHERTYPE], BPF_JEQ, value)
+
+
+def _ip_proto(values):
+    return _and(_ether_proto(ETHERTYPE_IPV4), _or(*(_test([_LD_IP_PROTO], BPF_JEQ, v) for v in values)))
+
+
+def _ip6_proto(values):
+    return _and(_ether_proto(ETHERTYPE_IPV6), _or(*(_test([_LD_IP6_NEXT_HEADER], BPF_JEQ, v) for v in values)))
+
+
+def _address_words(packed):
+    return [int.from_bytes(packed[i:i + 4], 'big') for i in range(0, len(packed), 4)]
+
+
+def _prefix(offset, network):
+    """Compares the address at offset against an IPv4/IPv6 network, one 32-bit word at a time."""
+    tests = []
+    remaining = network.prefixlen
+    for index, word in enumerate(_address_words(network.network_address.packed)):
+        if remaining <= 0:
+            break
+        bits = min(remaining, 32)
+        mask = (0xFFFFFFFF << (32 - bits)) & 0xFFFFFFFF
+        load = (BPF_LD | BPF_W | BPF_ABS, offset + 4 * index)
+        loads = [load] if mask == 0xFFFFFFFF else [load, (BPF_ALU | BPF_AND | BPF_K, mask)]
+        tests.append(_test(loads, BPF_JEQ, word & mask))
+        remaining -= bits
+    return _and(*tests) if tests else _test([], BPF_JA, 0)
+
+
+def _host_or_net(direction, network):
+    if network.version == 4:
+        offsets = {'src': [_IP_SOURCE], 'dst': [_IP_DESTINATION]}.get(direction, [_IP_SOURCE, _IP_DESTINATION])
+        guard = _ether_proto(ETHERTYPE_IPV4)
+    else:
+        offsets = {'src': [_IP6_SOURCE], 'dst': [_IP6_DESTINATION]}.get(direction, [_IP6_SOURCE, _IP6_DESTINATION])
+        guard = _ether_proto(ETHERTYPE_IPV6)
+    return _and(guard, _or(*(_prefix(offset, network) for offset in offsets)))
+
+
+def _port(direction, port, protocols):
+    relative = {'src': [_L4_SOURCE_PORT], 'dst': [_L4_DESTINATION_PORT]}.get(
+        direction, [_L4_SOURCE_PORT, _L4_DESTINATION_PORT])
+
+    ipv4 = _and(
+        _ip_proto(protocols),
+        _not(_test([_LD_IP_FRAGMENT], BPF_JSET, 0x1FFF)),  # Only the first fragment carries ports
+        _or(*(_test([_LDX_IP_HEADER_LENGTH, (BPF_LD | BPF_H | BPF_IND, offset)], BPF_JEQ, port)
+              for offset in relative)),
+    )
+    ipv6 = _and(
+        _ip6_proto(protocols),
+        _or(*(_test([(BPF_LD | BPF_H | BPF_ABS, _IP6_L4 + offset - _L4_SOURCE_PORT)], BPF_JEQ, port)
+              for offset in relative)),
+    )
+    return _or(ipv4, ipv6)
+
+
+class _Parser:
+    """Recursive-descent parser from expression text to a filter tree."""
+
+    def __init__(self, expression: str, live: bool = False):
+        self.expression = expression
+        self.live = live
+        self.tokens = _TOKEN.findall(expression)
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def take(self, *expected):
+        token = self.peek()
+        if token is None or (expected and token not in expected):
+            wanted = ' or '.join(expected) if expected else 'more input'
+            raise ValueError(f"Invalid filter {self.expression!r}: expected {wanted}, got {token!r}")
+        self.position += 1
+        return token
+
+    def number(self, limit):
+        token = self.take()
+        try:
+            value = int(token, 0)
+        except ValueError:
+            raise ValueError(f"Invalid filter {self.expression!r}: {token!r} is not a number")
+        if not 0 <= value <= limit:
+            raise ValueError(f"Invalid filter {self.expression!r}: {value} is out of range")
+        return value
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Empty filter expression")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f"Invalid filter {self.expression!r}: unexpected {self.peek()!r}")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.peek() in ('or', '||'):
+            self.take()
+            node = _or(node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.peek() in ('and', '&&'):
+            self.take()
+            node = _and(node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.peek() in ('not', '!'):
+            self.take()
+            return _not(self.parse_not())
+        if self.peek() == '(':
+            self.take()
+            node = self.parse_or()
+            self.take(')')
+            return node
+        return self.parse_primitive()
+
+    def parse_primitive(self):
+        token = self.take()
+
+        if token == 'ether':
+            self.take('proto')
+            return _ether_proto(self.number(0xFFFF))
+
+        if token in ('ip', 'ip6') and self.peek() == 'proto':
+            self.take()
+            value = self.number(0xFF)
+            return _ip_proto([value]) if token == 'ip' else _ip6_proto([value])
+
+        if token == 'proto':
+            value = self.number(0xFF)
+            return _or(_ip_proto([value]), _ip6_proto([value]))
+
+        if token in ('tcp', 'udp'):
+            protocol = 6 if token == 'tcp' else 17
+            if self.peek() in ('src', 'dst', 'port'):
+                direction = self.take() if self.peek() in ('src', 'dst') else None
+                self.take('port')
+                return _port(direction, self.number(0xFFFF), [protocol])
+            return _or(_ip_proto([protocol]), _ip6_proto([protocol]))
+
+        if token == 'icmp':
+            return _ip_proto([1])
+
+        if token == 'icmp6':
+            return _ip6_proto([58])
+
+        if token == 'vlan' and self.live:
+            return _or(_test([_LD_VLAN_TAG_PRESENT], BPF_JEQ, 1), _ether_proto(ETHERTYPE_VLAN))
+
+        if token in ETHERTYPE_KEYWORDS:
+            return _ether_proto(ETHERTYPE_KEYWORDS[token])
+
+        direction = None
+        if token in ('src', 'dst'):
+            direction = token
+            token = self.take('host', 'net', 'port')
+
+        if token == 'port':
+            return _port(direction, self.number(0xFFFF), [6, 17])
+
+        if token in ('host', 'net'):
+            address = self.take()
+            try:
+                if token == 'host':
+                    network = ipaddress.ip_network(address)
+                    if network.num_addresses != 1:
+                        raise ValueError
+                else:
+                    network = ipaddress.ip_network(address, strict=False)
+            except ValueError:
+                raise ValueError(f"Invalid filter {self.expression!r}: bad {token} {address!r}")
+            return _host_or_net(direction, network)
+
+        raise ValueError(f"Invalid filter {self.expression!r}: unknown primitive {token!r}")
+
+
+def _emit(node, on_true, on_false, code, labels):
+    """Appends instructions for node; jumps to on_true/on_false labels are resolved later."""
+    kind = node[0]
+    if kind == 'test':
+        _, loads, operation, k = node
+        for load_code, load_k in loads:
+            code.append((load_code, load_k))
+        if operation == BPF_JA:
+            code.append(('goto', on_true))
+        else:
+            code.append(('jump', BPF_JMP | operation | BPF_K, k, on_true, on_false))
+    elif kind == 'not':
+        _emit(node[1], on_false, on_true, code, labels)
+    else:
+        middle = len(labels)
+        labels.append(None)
+        if kind == 'and':
+            _emit(node[1], middle, on_false, code, labels)
+        else:
+            _emit(node[1], on_true, middle, code, labels)
+        labels[middle] = len(code)
+        _emit(node[2], on_true, on_false, code, labels)
+
+
+def compile_filter(expression: str, snaplen: int = 0x40000, live: bool = False) -> list:
+    """
+    Compiles a filter expression into a list of BPFInstruction tuples.
+
+    Matching frames are accepted with up to ``snaplen`` bytes, the rest are dropped.
+    ``live`` programs are for packet sockets and may use ancillary loads, which the
+    userspace interpreter does not support.
+
+    Raises
+    ------
+    ValueError
+        If the expression cannot be parsed or the program does not fit cBPF jump limits.
+    """
+    tree = _Parser(expression, live).parse()
+
+    accept, reject = 0, 1
+    labels = [None, None]
+    code = []
+    _emit(tree, accept, reject, code, labels)
+    labels[accept] = len(code)
+    code.append((BPF_RET | BPF_K, snaplen))
+    labels[reject] = len(code)
+    code.append((BPF_RET | BPF_K, 0))
+
+    program = []
+    for pc, entry in enumerate(code):
+        if entry[0] == 'jump':
+            _, operation, k, on_true, on_false = entry
+            jt = labels[on_true] - pc - 1
+            jf = labels[on_false] - pc - 1
+            if not (0 <= jt <= 255 and 0 <= jf <= 255):
+                raise ValueError(f"Filter {expression!r} is too large for classic BPF jumps")
+            program.append(BPFInstruction(operation, jt, jf, k))
+        elif entry[0] == 'goto':
+            program.append(BPFInstruction(BPF_JMP | BPF_JA, 0, 0, labels[entry[1]] - pc - 1))
+        else:
+            program.append(BPFInstruction(entry[0], 0, 0, entry[1]))
+    return program
+
+
+def frame_type_expression(frame_type: str) -> str:
+    """Maps a --frame_type choice (ipv4, ipv6, arp, rarp, vlan) to a filter expression."""
+    try:
+        return FRAME_TYPE_EXPRESSIONS[frame_type.lower()]
+    except KeyError:
+        raise ValueError(f"Unknown frame type: {frame_type}")
+
+
+class _SockFilter(ctypes.Structure):
+    _fields_ = [
+        ("code", ctypes.c_ushort),
+        ("jt", ctypes.c_ubyte),
+        ("jf", ctypes.c_ubyte),
+        ("k", ctypes.c_uint32)
+    ]
+
+
+class _SockFprog(ctypes.Structure):
+    _fields_ = [
+        ("len", ctypes.c_ushort),
+        ("filter", ctypes.POINTER(_SockFilter))
+    ]
+
+
+def attach_filter(sock: _socket.socket, program: list) -> None:
+    """Attaches a cBPF program to a socket with SO_ATTACH_FILTER."""
+    instructions = (_SockFilter * len(program))(*program)
+    fprog = _SockFprog(len(program), instructions)
+    sock.setsockopt(_socket.SOL_SOCKET, SO_ATTACH_FILTER, bytes(fprog))
+
+
+def detach_filter(sock: _socket.socket) -> None:
+    """Removes the socket's filter."""
+    sock.setsockopt(_socket.SOL_SOCKET, SO_DETACH_FILTER, 0)
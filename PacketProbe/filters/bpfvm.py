@@ -0,0 +1,396 @@
+from PacketProbe.filters.bpf import BPF_A, BPF_ABS, BPF_ADD, BPF_ALU, BPF_AND, BPF_B, BPF_DIV, BPF_H, BPF_IMM, \
+    BPF_IND, BPF_JA, BPF_JEQ, BPF_JGE, BPF_JGT, BPF_JMP, BPF_JSET, BPF_LD, BPF_LDX, BPF_LEN, BPF_LSH, BPF_MEM, \
+    BPF_MOD, BPF_MSH, BPF_MUL, BPF_NEG, BPF_OR, BPF_RET, BPF_RSH, BPF_ST, BPF_STX, BPF_SUB, BPF_TAX, \
+    BPF_TXA, BPF_W, BPF_X, BPF_XOR
+
+"""
+    Userspace Classic BPF Virtual Machine
+
+    This module evaluates the cBPF programs produced by PacketProbe.filters.bpf against
+    frames in userspace, so that capture file replay and the non-Linux capture paths use
+    exactly the same filter semantics as the kernel.
+
+    Two execution strategies are provided:
+        BPFInterpreter: Pre-decodes the program into a flat instruction array of
+                        (operation, jt, jf, k) tuples and runs a dispatch loop.
+        compile_program: Translates the program into Python source for a single closure,
+                         with constant offsets folded in. Instructions reached from more than
+                         one place become helper functions so the generated code stays linear
+                         in the program size. Typical filters such as an EtherType or port
+                         check become a length test, a couple of subscripts and a compare.
+
+    Both return the cBPF result: the number of bytes to accept, 0 to drop the frame.
+    Loads past the end of the frame drop it, as in the kernel.
+
+    Functions:
+        validate_program(program): Checks jumps, ALU operations, divisions and scratch memory indexes.
+        compile_program(program): Returns a specialised Python function for the program.
+"""
+
+MEMWORDS = 16
+_MASK = 0xFFFFFFFF
+
+# Pre-decoded operation identifiers, ordered roughly by how common they are
+_OP_LD_ABS = 0
+_OP_JMP_K = 1
+_OP_RET = 2
+_OP_LDX_MSH = 3
+_OP_LD_IND = 4
+_OP_ALU = 5
+_OP_JMP_X = 6
+_OP_JA = 7
+_OP_LD_OTHER = 8
+_OP_LDX_OTHER = 9
+_OP_ST = 10
+_OP_MISC = 11
+
+_SIZES = {BPF_W: 4, BPF_H: 2, BPF_B: 1}
+
+_ALU_OPERATORS = {
+    BPF_ADD: '+',
+    BPF_SUB: '-',
+    BPF_MUL: '*',
+    BPF_DIV: '//',
+    BPF_MOD: '%',
+    BPF_OR: '|',
+    BPF_AND: '&',
+    BPF_XOR: '^',
+    BPF_LSH: '<<',
+    BPF_RSH: '>>',
+}
+
+_JUMP_OPERATORS = {
+    BPF_JEQ: '==',
+    BPF_JGT: '>',
+    BPF_JGE: '>=',
+}
+
+
+def validate_program(program) -> None:
+    """
+    Checks that a program is safe to run: every jump lands inside the program and moves
+    forward, ALU operations are known, constant divisors are non-zero, scratch memory
+    indexes are in range and the last instruction returns.
+
+    Raises
+    ------
+    ValueError
+        If the program is empty or any instruction is invalid.
+    """
+    if not program:
+        raise ValueError("Empty BPF program")
+    length = len(program)
+    for pc, (code, jt, jf, k) in enumerate(program):
+        instruction_class = code & 0x07
+        if instruction_class == BPF_JMP:
+            if code & 0xF0 == BPF_JA:
+                targets = (pc + 1 + k,)
+            else:
+                targets = (pc + 1 + jt, pc + 1 + jf)
+            if any(target >= length for target in targets):
+                raise ValueError(f"BPF jump at {pc} leaves the program")
+        elif instruction_class == BPF_ALU and code & 0xF0 not in _ALU_OPERATORS and code & 0xF0 != BPF_NEG:
+            raise ValueError(f"Unknown BPF ALU operation {code & 0xF0:#x} at {pc}")
+        elif instruction_class == BPF_ALU and code & 0xF0 in (BPF_DIV, BPF_MOD) and code & BPF_X == 0 and k == 0:
+            raise ValueError(f"BPF division by constant zero at {pc}")
+        elif instruction_class in (BPF_ST, BPF_STX) and k >= MEMWORDS:
+            raise ValueError(f"BPF store at {pc} is outside scratch memory")
+        elif instruction_class in (BPF_LD, BPF_LDX) and code & 0xE0 == BPF_MEM and k >= MEMWORDS:
+            raise ValueError(f"BPF load at {pc} is outside scratch memory")
+    if program[-1][0] & 0x07 != BPF_RET:
+        raise ValueError("BPF program does not end with a return")
+
+
+def _alu(operation, a, operand):
+    """Applies a cBPF ALU operation with 32-bit wrap-around. Returns None on division by zero."""
+    if operation == BPF_ADD:
+        return (a + operand) & _MASK
+    if operation == BPF_SUB:
+        return (a - operand) & _MASK
+    if operation == BPF_MUL:
+        return (a * operand) & _MASK
+    if operation == BPF_DIV:
+        return a // operand if operand else None
+    if operation == BPF_MOD:
+        return a % operand if operand else None
+    if operation == BPF_OR:
+        return a | operand
+    if operation == BPF_AND:
+        return a & operand
+    if operation == BPF_XOR:
+        return a ^ operand
+    if operation == BPF_LSH:
+        return (a << operand) & _MASK if operand < 32 else 0
+    if operation == BPF_RSH:
+        return a >> operand
+    return -a & _MASK  # BPF_NEG
+
+
+class BPFInterpreter:
+    """
+    Runs a cBPF program with a pre-decoded dispatch loop.
+
+    Parameters
+    ----------
+    program : list
+        (code, jt, jf, k) instruction tuples, e.g. from compile_filter().
+
+    Raises
+    ------
+    ValueError
+        If the program fails validation.
+    """
+
+    def __init__(self, program):
+        validate_program(program)
+        self.program = list(program)
+        self.instructions = [self._decode(code, jt, jf, k) for code, jt, jf, k in self.program]
+
+    @staticmethod
+    def _decode(code, jt, jf, k):
+        instruction_class = code & 0x07
+        mode = code & 0xE0
+        if instruction_class == BPF_LD and mode == BPF_ABS:
+            return _OP_LD_ABS, _SIZES[code & 0x18], 0, k
+        if instruction_class == BPF_LD and mode == BPF_IND:
+            return _OP_LD_IND, _SIZES[code & 0x18], 0, k
+        if instruction_class == BPF_LD:
+            return _OP_LD_OTHER, mode, 0, k
+        if instruction_class == BPF_LDX and mode == BPF_MSH:
+            return _OP_LDX_MSH, 0, 0, k
+        if instruction_class == BPF_LDX:
+            return _OP_LDX_OTHER, mode, 0, k
+        if instruction_class in (BPF_ST, BPF_STX):
+            return _OP_ST, instruction_class == BPF_STX, 0, k
+        if instruction_class == BPF_ALU:
+            return _OP_ALU, code & 0xF0, code & BPF_X, k
+        if instruction_class == BPF_JMP:
+            if code & 0xF0 == BPF_JA:
+                return _OP_JA, 0, 0, k
+            return (_OP_JMP_X if code & BPF_X else _OP_JMP_K), code & 0xF0, (jt, jf), k
+        if instruction_class == BPF_RET:
+            return _OP_RET, code & 0x18, 0, k
+        return _OP_MISC, code & 0xF8, 0, k
+
+    def run(self, packet) -> int:
+        """Returns the number of bytes to accept (0 drops the frame)."""
+        instructions = self.instructions
+        length = len(packet)
+        a = x = 0
+        memory = None
+        pc = 0
+
+        while True:
+            op, arg, extra, k = instructions[pc]
+            pc += 1
+
+            if op == _OP_LD_ABS or op == _OP_LD_IND:
+                offset = k if op == _OP_LD_ABS else x + k
+                if offset + arg > length:
+                    return 0
+                if arg == 1:
+                    a = packet[offset]
+                elif arg == 2:
+                    a = packet[offset] << 8 | packet[offset + 1]
+                else:
+                    a = int.from_bytes(packet[offset:offset + 4], 'big')
+            elif op == _OP_JMP_K or op == _OP_JMP_X:
+                operand = k if op == _OP_JMP_K else x
+                if arg == BPF_JEQ:
+                    taken = a == operand
+                elif arg == BPF_JGT:
+                    taken = a > operand
+                elif arg == BPF_JGE:
+                    taken = a >= operand
+                else:
+                    taken = a & operand
+                pc += extra[0] if taken else extra[1]
+            elif op == _OP_RET:
+                return a if arg == BPF_A else k
+            elif op == _OP_LDX_MSH:
+                if k >= length:
+                    return 0
+                x = (packet[k] & 0x0F) << 2
+            elif op == _OP_ALU:
+                if arg == BPF_NEG:
+                    a = -a & _MASK
+                else:
+                    a = _alu(arg, a, x if extra else k)
+                    if a is None:
+                        return 0  # Division by zero in X
+            elif op == _OP_JA:
+                pc += k
+            elif op == _OP_LD_OTHER or op == _OP_LDX_OTHER:
+                if arg == BPF_IMM:
+                    value = k
+                elif arg == BPF_LEN:
+                    value = length
+                else:
+                    value = memory[k] if memory else 0
+                if op == _OP_LD_OTHER:
+                    a = value
+                else:
+                    x = value
+            elif op == _OP_ST:
+                if memory is None:
+                    memory = [0] * MEMWORDS
+                memory[k] = x if arg else a
+            elif arg == BPF_TAX:
+                x = a
+            elif arg == BPF_TXA:
+                a = x
+
+    __call__ = run
+
+
+def _load_expression(size, offset):
+    """Renders a big-endian load at offset, an int constant or the name of a local."""
+    def plus(value):
+        return offset + value if isinstance(offset, int) else f"{offset} + {value}"
+
+    if size == 1:
+        return f"p[{offset}]"
+    if size == 2:
+        return f"p[{offset}] << 8 | p[{plus(1)}]"
+    return f"int.from_bytes(p[{offset}:{plus(4)}], 'big')"
+
+
+def _folded(expression, value):
+    """Renders 'expression + value' with a constant value folded in."""
+    return f"{expression} + {value}" if value else expression
+
+
+class _Generator:
+    """Emits Python source for a validated cBPF program."""
+
+    def __init__(self, program):
+        self.program = program
+        self.uses_memory = any(code & 0x07 in (BPF_ST, BPF_STX) or
+                               (code & 0x07 in (BPF_LD, BPF_LDX) and code & 0xE0 == BPF_MEM)
+                               for code, _, _, _ in program)
+
+        predecessors = [0] * len(program)
+        for pc, (code, jt, jf, k) in enumerate(program):
+            instruction_class = code & 0x07
+            if instruction_class == BPF_RET:
+                continue
+            if instruction_class == BPF_JMP:
+                targets = (pc + 1 + k,) if code & 0xF0 == BPF_JA else {pc + 1 + jt, pc + 1 + jf}
+            else:
+                targets = (pc + 1,)
+            for target in targets:
+                predecessors[target] += 1
+        # Returns are short enough to inline everywhere
+        self.shared = {pc for pc, count in enumerate(predecessors)
+                       if count > 1 and program[pc][0] & 0x07 != BPF_RET}
+
+    def arguments(self):
+        return "p, n, A, X, M" if self.uses_memory else "p, n, A, X"
+
+    def goto(self, pc, indent):
+        """Continues execution at pc, either inline or through a shared block."""
+        if pc in self.shared:
+            return [f"{indent}return _b{pc}({self.arguments()})"]
+        return self.block(pc, indent)
+
+    def block(self, pc, indent):
+        lines = []
+        while True:
+            code, jt, jf, k = self.program[pc]
+            instruction_class = code & 0x07
+            mode = code & 0xE0
+
+            if instruction_class == BPF_LD and mode in (BPF_ABS, BPF_IND):
+                size = _SIZES[code & 0x18]
+                if mode == BPF_ABS:
+                    lines.append(f"{indent}if n < {k + size}: return 0")
+                    lines.append(f"{indent}A = {_load_expression(size, k)}")
+                else:
+                    lines.append(f"{indent}o = {_folded('X', k)}")
+                    lines.append(f"{indent}if n < o + {size}: return 0")
+                    lines.append(f"{indent}A = {_load_expression(size, 'o')}")
+            elif instruction_class in (BPF_LD, BPF_LDX) and mode != BPF_MSH:
+                register = 'A' if instruction_class == BPF_LD else 'X'
+                value = {BPF_IMM: str(k), BPF_LEN: 'n', BPF_MEM: f"M[{k}]"}[mode]
+                lines.append(f"{indent}{register} = {value}")
+            elif instruction_class == BPF_LDX:
+                lines.append(f"{indent}if n <= {k}: return 0")
+                lines.append(f"{indent}X = (p[{k}] & 15) << 2")
+            elif instruction_class in (BPF_ST, BPF_STX):
+                lines.append(f"{indent}M[{k}] = {'X' if instruction_class == BPF_STX else 'A'}")
+            elif instruction_class == BPF_ALU:
+                operation = code & 0xF0
+                operand = 'X' if code & BPF_X else str(k)
+                if operation == BPF_NEG:
+                    lines.append(f"{indent}A = -A & {_MASK}")
+                elif operation in (BPF_DIV, BPF_MOD):
+                    if code & BPF_X:
+                        lines.append(f"{indent}if not X: return 0")
+                    lines.append(f"{indent}A = A {_ALU_OPERATORS[operation]} {operand}")
+                elif operation == BPF_LSH:
+                    lines.append(f"{indent}A = (A << {operand}) & {_MASK} if {operand} < 32 else 0")
+                elif operation in (BPF_OR, BPF_AND, BPF_XOR, BPF_RSH):
+                    lines.append(f"{indent}A = A {_ALU_OPERATORS[operation]} {operand}")
+                else:
+                    lines.append(f"{indent}A = (A {_ALU_OPERATORS[operation]} {operand}) & {_MASK}")
+            elif instruction_class == BPF_JMP:
+                operation = code & 0xF0
+                if operation == BPF_JA:
+                    return lines + self.goto(pc + 1 + k, indent)
+                operand = 'X' if code & BPF_X else str(k)
+                if jt == jf:
+                    return lines + self.goto(pc + 1 + jt, indent)
+                if operation == BPF_JSET:
+                    condition = f"A & {operand}"
+                else:
+                    condition = f"A {_JUMP_OPERATORS[operation]} {operand}"
+                lines.append(f"{indent}if {condition}:")
+                lines.extend(self.goto(pc + 1 + jt, indent + '    '))
+                return lines + self.goto(pc + 1 + jf, indent)
+            elif instruction_class == BPF_RET:
+                lines.append(f"{indent}return {'A' if code & 0x18 == BPF_A else k}")
+                return lines
+            elif code & 0xF8 == BPF_TAX:
+                lines.append(f"{indent}X = A")
+            else:
+                lines.append(f"{indent}A = X")
+
+            pc += 1
+            if pc in self.shared:
+                return lines + self.goto(pc, indent)
+
+    def source(self):
+        lines = []
+        # Shared blocks only jump forward, so defining them last-first keeps names resolvable
+        for pc in sorted(self.shared, reverse=True):
+            lines.append(f"def _b{pc}({self.arguments()}):")
+            lines.extend(self.block(pc, '    '))
+        lines.append("def _filter(p):")
+        lines.append("    n = len(p)")
+        lines.append("    A = X = 0")
+        if self.uses_memory:
+            lines.append(f"    M = [0] * {MEMWORDS}")
+        lines.extend(self.goto(0, '    ') if 0 in self.shared else self.block(0, '    '))
+        return '\n'.join(lines) + '\n'
+
+
+def compile_program(program):
+    """
+    Translates a cBPF program into a specialised Python function.
+
+    The returned callable takes a frame (bytes, bytearray or memoryview) and returns the
+    same value the kernel would: the accepted length, or 0 to drop. Its truth value can be
+    used directly as a frame filter.
+
+    Raises
+    ------
+    ValueError
+        If the program fails validation.
+    """
+    validate_program(program)
+    source = _Generator(list(program)).source()
+    namespace = {}
+    exec(compile(source, '<bpf>', 'exec'), namespace)
+    function = namespace['_filter']
+    function.source = source
+    return function
@@ -0,0 +1,210 @@
+from collections import Counter, OrderedDict
+
+from PacketProbe.utils.helpers import _epoch
+
+"""
+    FlowTable - Bidirectional Flow Summaries
+
+    Folds the parsed packet data into one record per flow instead of one per packet.
+    A flow is keyed by its normalised 5-tuple: the lower (address, port) end first, so
+    both directions of a conversation update the same record. The first packet seen
+    decides which end is the source; packets and bytes are counted per direction and
+    the TCP flags of every segment are OR-ed together. ICMP and other IP protocols
+    without ports are tracked with port 0.
+
+    Flows live in an OrderedDict in least recently seen order. An update moves its
+    flow to the end, so expiry only ever looks at the front of the table and every
+    packet costs O(1):
+
+        idle      No packet for idle_timeout seconds. Checked against the oldest
+                  flows whenever a packet arrives, and by expire().
+        active    The flow has lasted active_timeout seconds. The record is emitted
+                  and counting starts over, so long-lived flows report periodically.
+        evicted   The table holds max_flows flows and a new one arrives; the least
+                  recently seen flow makes room.
+        end       Still open when the table is closed.
+
+    Timeouts run on packet time, so replaying a capture file expires flows as the
+    live capture would have. Every finished flow is handed to the sink as a dict.
+
+    Classes:
+        Flow: Compact per-flow counters.
+        FlowTable: Callable RawFrame sink that aggregates packets into flows.
+
+    Usage:
+        with FlowTable(sink=JsonLinesWriter('flows.json')) as flows:
+            RawFrame(frame, sink=flows)
+"""
+
+# Protocol names used in the packet data, mapped to IP protocol numbers
+PROTOCOL_NUMBERS = {'ICMP': 1, 'TCP': 6, 'UDP': 17}
+
+
+class Flow:
+    """
+    Counters of one bidirectional flow. ``source`` is the end that sent the first packet.
+    """
+
+    __slots__ = ('source_ip', 'source_port', 'destination_ip', 'destination_port', 'protocol', 'first_seen',
+                 'last_seen', 'packets', 'bytes', 'reverse_packets', 'reverse_bytes', 'tcp_flags')
+
+    def __init__(self, source_ip, source_port, destination_ip, destination_port, protocol, time_stamp):
+        self.source_ip = source_ip
+        self.source_port = source_port
+        self.destination_ip = destination_ip
+        self.destination_port = destination_port
+        self.protocol = protocol
+        self.first_seen = time_stamp
+        self.last_seen = time_stamp
+        self.packets = 0
+        self.bytes = 0
+        self.reverse_packets = 0
+        self.reverse_bytes = 0
+        self.tcp_flags = 0
+
+    def to_dict(self, reason: str) -> dict:
+        """Returns the flow record handed to the sink, with the reason it ended."""
+        return {
+            'source_ip': self.source_ip,
+            'source_port': self.source_port,
+            'destination_ip': self.destination_ip,
+            'destination_port': self.destination_port,
+            'protocol': self.protocol,
+            'first_seen': self.first_seen,
+            'last_seen': self.last_seen,
+            'packets': self.packets,
+            'bytes': self.bytes,
+            'reverse_packets': self.reverse_packets,
+            'reverse_bytes': self.reverse_bytes,
+            'tcp_flags': self.tcp_flags,
+            'end_reason': reason,
+        }
+
+    def __str__(self):
+        """Returns a string representation of the Flow instance."""
+        return (f"Flow({self.source_ip}:{self.source_port} -> {self.destination_ip}:{self.destination_port}, "
+                f"protocol={self.protocol}, packets={self.packets + self.reverse_packets})")
+
+
+class FlowTable:
+    """
+    Aggregates packet data into bidirectional flows and emits them when they end.
+
+    Instances are callable with a packet data dict, so they can be passed as the
+    ``sink`` of RawFrame. Packets without IP addresses (ARP, ...) are ignored.
+
+    Parameters
+    ----------
+    sink : callable, optional
+        Receives the dict of every finished flow.
+    idle_timeout : float
+        Seconds without a packet after which a flow ends.
+    active_timeout : float
+        Seconds after which a flow that is still active is reported and restarted.
+    max_flows : int
+        Maximum number of flows held; the least recently seen one is evicted beyond that.
+
+    Raises
+    ------
+    ValueError
+        If a timeout is not positive or ``max_flows`` is less than 1.
+    """
+
+    def __init__(self, sink=None, idle_timeout: float = 15.0, active_timeout: float = 1800.0,
+                 max_flows: int = 100000):
+        if idle_timeout <= 0 or active_timeout <= 0:
+            raise ValueError("Flow timeouts must be positive.")
+        if max_flows < 1:
+            raise ValueError("The flow table must hold at least one flow.")
+
+        self.sink = sink
+        self.idle_timeout = idle_timeout
+        self.active_timeout = active_timeout
+        self.max_flows = max_flows
+        self.flows = OrderedDict()
+        self.packets_seen = 0
+        self.flows_emitted = Counter()
+
+    def __call__(self, data):
+        self.update(data)
+
+    def update(self, data: dict):
+        """Counts one packet data dict towards its flow."""
+        source_ip = data.get('Source IP')
+        if source_ip is None:
+            return
+        destination_ip = data['Destination IP']
+        source_port = data.get('source_port', 0)
+        destination_port = data.get('destination_port', 0)
+        protocol = PROTOCOL_NUMBERS.get(data.get('protocol'), data.get('Protocol', data.get('Next Header')))
+        time_stamp = _epoch(data.get('time_stamps'))
+        length = data.get('bytes_length', 0)
+        self.packets_seen += 1
+
+        if (source_ip, source_port) <= (destination_ip, destination_port):
+            key = (source_ip, source_port, destination_ip, destination_port, protocol)
+        else:
+            key = (destination_ip, destination_port, source_ip, source_port, protocol)
+
+        # Expire first, so a flow that went idle starts over instead of being continued
+        self.expire(time_stamp)
+        flows = self.flows
+        flow = flows.get(key)
+        if flow is None:
+            if len(flows) >= self.max_flows:
+                self._emit(flows.popitem(last=False)[1], 'evicted')
+            flow = flows[key] = Flow(source_ip, source_port, destination_ip, destination_port, protocol,
+                                     time_stamp)
+        else:
+            flows.move_to_end(key)
+            if time_stamp - flow.first_seen >= self.active_timeout:
+                self._emit(flow, 'active')
+                flow = flows[key] = Flow(flow.source_ip, flow.source_port, flow.destination_ip,
+                                         flow.destination_port, protocol, time_stamp)
+
+        if time_stamp > flow.last_seen:
+            flow.last_seen = time_stamp
+        if source_ip == flow.source_ip and source_port == flow.source_port:
+            flow.packets += 1
+            flow.bytes += length
+        else:
+            flow.reverse_packets += 1
+            flow.reverse_bytes += length
+        if protocol == 6:
+            flow.tcp_flags |= data.get('flags', 0)
+
+    def expire(self, now: float):
+        """Emits the flows idle since before ``now - idle_timeout``, oldest first."""
+        flows = self.flows
+        deadline = now - self.idle_timeout
+        while flows:
+            key, flow = next(iter(flows.items()))
+            if flow.last_seen > deadline:
+                break
+            del flows[key]
+            self._emit(flow, 'idle')
+
+    def _emit(self, flow: Flow, reason: str):
+        self.flows_emitted[reason] += 1
+        if self.sink is not None:
+            self.sink(flow.to_dict(reason))
+
+    def close(self):
+        """Emits every flow that is still open."""
+        flows, self.flows = self.flows, OrderedDict()
+        for flow in flows.values():
+            self._emit(flow, 'end')
+
+    def __len__(self):
+        return len(self.flows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns a string representation of the FlowTable instance."""
+        return (f"FlowTable(flows={len(self.flows)}, packets_seen={self.packets_seen}, "
+                f"flows_emitted={sum(self.flows_emitted.values())})")
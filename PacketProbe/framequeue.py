@@ -0,0 +1,207 @@
+import threading
+from collections import Counter, deque
+from queue import Empty
+from time import monotonic, perf_counter_ns
+
+from PacketProbe import instrumentation
+
+"""
+    FrameQueue - Bounded Capture-to-Parser Handoff with Drop Accounting
+
+    The capture thread is the only producer and the processing loop the only consumer,
+    so the queue is a plain deque: append() and popleft() are atomic and need no lock.
+    A condition is only touched when one side actually has to sleep, which keeps the
+    common case (frames flowing) down to a deque operation and a flag check.
+
+    With the instrumentation enabled when the queue is created, the enqueue time of
+    every item is kept in a second deque, in the same order, and the time each item
+    waited is recorded in the queue_wait histogram when the consumer takes it out.
+
+    The queue is bounded in frames, not items: a batch from BindSocket counts as
+    len(batch) frames, a single frame from BindSocketPCAP as one. When the parser falls
+    behind, the policy decides what happens to new frames:
+
+        drop_newest   The incoming batch is dropped (counted as 'queue_full'). Cheapest,
+                      and what the kernel does when a socket buffer overflows.
+        drop_oldest   The oldest batches are evicted to make room (counted as
+                      'queue_evicted'), so the parser always works on recent traffic.
+        block         The capture thread waits for room. Nothing is lost in userspace,
+                      the backlog moves into the socket buffer and the kernel drops
+                      there instead (counted as 'kernel' by the capture backends).
+
+    Classes:
+        FrameQueue: Bounded single-producer, single-consumer queue of frames or frame batches.
+"""
+
+POLICIES = ('drop_newest', 'drop_oldest', 'block')
+
+
+def _weight(item) -> int:
+    return len(item) if isinstance(item, list) else 1
+
+
+class FrameQueue:
+    """
+    Bounded single-producer, single-consumer queue with a drop policy.
+
+    Mirrors the parts of ``queue.Queue`` the capture code uses (``put``, ``get``,
+    ``qsize``, ``empty``), so it is a drop-in replacement for ``raw_packets``.
+
+    Parameters
+    ----------
+    maxsize : int
+        Maximum number of frames waiting for the consumer.
+    policy : str
+        What to do when the queue is full: 'drop_newest', 'drop_oldest' or 'block'.
+
+    Raises
+    ------
+    ValueError
+        If the policy is unknown or ``maxsize`` is less than 1.
+    """
+
+    def __init__(self, maxsize: int = 65536, policy: str = 'drop_newest'):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue policy: {policy}")
+        if maxsize < 1:
+            raise ValueError("The frame queue must hold at least one frame.")
+
+        self.maxsize = maxsize
+        self.policy = policy
+        self.items = deque()
+        self.drops = Counter()
+
+        # Frame counters, each written by one side only so no lock is needed
+        self.frames_in = 0  # Producer
+        self.frames_evicted = 0  # Producer
+        self.frames_out = 0  # Consumer
+
+        # Enqueue times for the queue_wait histogram, only kept while instrumenting
+        probe = instrumentation.probe
+        self.wait_histogram = probe.histogram('queue_wait') if probe else None
+        self.enqueue_times = deque()
+
+        self.consumer_waiting = False
+        self.producer_waiting = False
+        self.not_empty = threading.Condition(threading.Lock())
+        self.not_full = threading.Condition(threading.Lock())
+
+    @property
+    def frames(self) -> int:
+        """Number of frames waiting for the consumer."""
+        return self.frames_in - self.frames_evicted - self.frames_out
+
+    def qsize(self) -> int:
+        return len(self.items)
+
+    def empty(self) -> bool:
+        return not self.items
+
+    def put(self, item) -> bool:
+        """
+        Hands a frame or batch to the consumer, applying the policy when the queue is full.
+
+        ``None`` is an end-of-capture marker and is never dropped. Returns False if the
+        item was dropped.
+        """
+        weight = _weight(item) if item is not None else 0
+        items = self.items
+        if weight and self.frames + weight > self.maxsize and items:
+            if self.policy == 'drop_newest':
+                self.drops['queue_full'] += weight
+                return False
+            if self.policy == 'drop_oldest':
+                self._evict(weight)
+            else:
+                self._wait_for_room(weight)
+
+        self.frames_in += weight
+        if self.wait_histogram is not None:
+            self.enqueue_times.append(perf_counter_ns())  # Before the item, so the consumer always finds it
+        items.append(item)
+        if self.consumer_waiting:
+            with self.not_empty:
+                self.not_empty.notify()
+        return True
+
+    def _evict(self, weight: int):
+        items = self.items
+        while items and self.frames + weight > self.maxsize:
+            try:
+                evicted = items.popleft()
+            except IndexError:
+                break  # The consumer took the last one first
+            if evicted is None:
+                items.appendleft(evicted)  # Never lose the end marker
+                break
+            if self.wait_histogram is not None:
+                self.enqueue_times.popleft()
+            evicted_weight = _weight(evicted)
+            self.frames_evicted += evicted_weight
+            self.drops['queue_evicted'] += evicted_weight
+
+    def _wait_for_room(self, weight: int):
+        with self.not_full:
+            self.producer_waiting = True
+            try:
+                while self.items and self.frames + weight > self.maxsize:
+                    self.not_full.wait(0.1)
+            finally:
+                self.producer_waiting = False
+
+    def get(self, block: bool = True, timeout: float = None):
+        """Removes and returns the oldest item, raising queue.Empty like Queue.get()."""
+        items = self.items
+        try:
+            item = items.popleft()
+        except IndexError:
+            if not block:
+                raise Empty
+            item = self._wait_for_item(timeout)
+
+        if self.wait_histogram is not None:
+            waited = perf_counter_ns() - self.enqueue_times.popleft()
+            if item is not None:
+                self.wait_histogram.record(waited)
+        if item is not None:
+            self.frames_out += _weight(item)
+        if self.producer_waiting:
+            with self.not_full:
+                self.not_full.notify()
+        return item
+
+    def _wait_for_item(self, timeout):
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.not_empty:
+            # Set the flag before re-checking, so an append that misses it is seen here
+            self.consumer_waiting = True
+            try:
+                while True:
+                    try:
+                        return self.items.popleft()
+                    except IndexError:
+                        pass
+                    remaining = None if deadline is None else deadline - monotonic()
+                    if remaining is not None and remaining <= 0:
+                        raise Empty
+                    self.not_empty.wait(remaining)
+            finally:
+                self.consumer_waiting = False
+
+    def record_drops(self, reason: str, frames: int):
+        """Counts frames lost before they reached the queue, e.g. in the kernel."""
+        if frames:
+            self.drops[reason] += frames
+
+    @property
+    def dropped(self) -> int:
+        """Total frames dropped for any reason."""
+        return sum(self.drops.values())
+
+    def drop_summary(self) -> str:
+        return ', '.join(f"{reason}: {count}" for reason, count in sorted(self.drops.items()))
+
+    def __str__(self):
+        """Returns a string representation of the FrameQueue instance."""
+        return (f"FrameQueue(policy={self.policy}, frames={self.frames}/{self.maxsize}, "
+                f"dropped={self.dropped})")
@@ -1,37 +1,82 @@
+import time
+from time import perf_counter_ns
+
+from PacketProbe.protocols.decoders import skip_ipv6_extensions
 from PacketProbe.protocols.packet.arp import ARP
 from PacketProbe.protocols.packet.ipv4 import IPV4
 from PacketProbe.protocols.packet.ipv6 import IPV6
 from PacketProbe.rawsegment import L3NetworkLayer
 from PacketProbe.utils.packet_info import Info
-from PacketProbe.utils.segmentType import determine_protocol_type
+from PacketProbe.utils.segmentType import determine_protocol_name, determine_protocol_type
+
+MORE_FRAGMENTS = 0x1
 
 
 class PacketHandler:
-    def _handle_ipv4_packet(self, payload: bytes):
+    def __init__(self, fragments=None, console=print, probe=None):
+        """
+        fragments is a FragmentReassembler shared by the frames of a capture. Fragmented
+        datagrams are then parsed once their last fragment arrives; without one only the
+        first fragment, which carries the transport header, is parsed beyond IP.
+
+        console receives the description of each packet as one block of text, e.g. a
+        ConsoleRenderer; by default it is printed.
+
+        probe is the Instrumentation when this frame is sampled for the latency histograms.
+        """
+        self.fragments = fragments
+        self.console = console
+        self.probe = probe
+
+    def _reassemble(self, key, offset: int, more_fragments: int, data, time_stamp):
+        """Returns the whole payload once the fragment completes its datagram, otherwise None."""
+        if self.fragments is None:
+            return data if offset == 0 else None
+        now = time.time() if time_stamp is None else time_stamp
+        return self.fragments.add(key, offset, more_fragments, data, now)
+
+    def _lap(self, stage: str, start: int) -> int:
+        """Records the time since ``start`` under ``stage`` and returns the current time."""
+        now = perf_counter_ns()
+        self.probe.record(stage, now - start)
+        return now
+
+    def _handle_ipv4_packet(self, payload: bytes, time_stamp=None):
         """Handles parsing of IPv4 packets and their Layer 3 details."""
-        print("IPv4 packet captured")
+        probe = self.probe
+        start = perf_counter_ns() if probe else 0
+        lines = ["IPv4 packet captured"]
         ipv4 = IPV4(payload)
         protocol = determine_protocol_type(payload)
-        layer3 = L3NetworkLayer(protocol=protocol, network_payload=ipv4.data)
+        network_payload = ipv4.data
+        if ipv4.flags & MORE_FRAGMENTS or ipv4.fragment_offset:
+            lines.append("\tIPv4 fragment")
+            key = (bytes(payload[12:20]), ipv4.protocol, ipv4.identification)
+            network_payload = self._reassemble(key, ipv4.fragment_offset * 8, ipv4.flags & MORE_FRAGMENTS,
+                                               payload[ipv4.ihl * 4:ipv4.total_length], time_stamp)
+        if probe:
+            start = self._lap('l3_parse', start)
+        layer3 = None
+        if network_payload is not None:
+            layer3 = L3NetworkLayer(protocol=protocol, network_payload=network_payload)
+        if probe:
+            start = self._lap('l4_parse', start)
 
-        print("\tIPv4 Info:")
+        lines.append("\tIPv4 Info:")
         ipv4_info = Info.get_ipv4_info(ipv4)
-        for key, value in ipv4_info.items():
-            print(f"\t\t{key}: {value}")
+        lines.extend(f"\t\t{key}: {value}" for key, value in ipv4_info.items())
 
         tcp_info = {}
         udp_info = {}
 
-        if protocol == 'TCP':
-            print("\tTCP Segment")
+        if layer3 and protocol == 'TCP':
+            lines.append("\tTCP Segment")
             tcp_info = layer3.tcp_info or {}
-            for key, value in tcp_info.items():
-                print(f"\t\t{key}: {value}")
-        elif protocol == 'UDP':
-            print("\tUDP Segment")
+            lines.extend(f"\t\t{key}: {value}" for key, value in tcp_info.items())
+        elif layer3 and protocol == 'UDP':
+            lines.append("\tUDP Segment")
             udp_info = layer3.udp_info or {}
-            for key, value in udp_info.items():
-                print(f"\t\t{key}: {value}")
+            lines.extend(f"\t\t{key}: {value}" for key, value in udp_info.items())
 
         # Merge the packet data appropriately
         packet_data = {
@@ -40,34 +85,50 @@ class PacketHandler:
             **tcp_info,
             **udp_info
         }
+        if probe:
+            self._lap('record_build', start)
+        self.console("\n".join(lines))
 
         return packet_data
 
-    def _handle_ipv6_packet(self, payload: bytes):
+    def _handle_ipv6_packet(self, payload: bytes, time_stamp=None):
         """Handles parsing of IPv6 packets and their Layer 3 details."""
-        print("IPv6 packet captured")
+        probe = self.probe
+        start = perf_counter_ns() if probe else 0
+        lines = ["IPv6 packet captured"]
         tcp_info = {}
         udp_info = {}
         ipv6 = IPV6(payload)
-        protocol = determine_protocol_type(payload)
-        layer3 = L3NetworkLayer(protocol=protocol, network_payload=ipv6.data)
+        # The transport header follows the extension headers, if there are any
+        next_header, transport, fragment = skip_ipv6_extensions(payload, 40, ipv6.next_header)
+        protocol = determine_protocol_name(next_header, ipv6=True)
+        network_payload = payload[transport:40 + ipv6.payload_length]
+        if fragment:
+            lines.append("\tIPv6 fragment")
+            fragment_offset, more_fragments, identification = fragment
+            key = (bytes(payload[8:40]), identification)
+            network_payload = self._reassemble(key, fragment_offset, more_fragments, network_payload, time_stamp)
+        if probe:
+            start = self._lap('l3_parse', start)
+        layer3 = None
+        if network_payload is not None:
+            layer3 = L3NetworkLayer(protocol=protocol, network_payload=network_payload)
+        if probe:
+            start = self._lap('l4_parse', start)
 
-        print("\tIPv6 Info:")
+        lines.append("\tIPv6 Info:")
         ipv6_info = Info.get_ipv6_info(ipv6)
-        for key, value in ipv6_info.items():
-            print(f"\t\t{key}: {value}")
+        lines.extend(f"\t\t{key}: {value}" for key, value in ipv6_info.items())
 
-        if protocol == 'TCP':
-            print("\tTCP Segment")
+        if layer3 and protocol == 'TCP':
+            lines.append("\tTCP Segment")
             tcp_info = layer3.tcp_info or {}
-            for key, value in tcp_info.items():
-                print(f"\t\t{key}: {value}")
+            lines.extend(f"\t\t{key}: {value}" for key, value in tcp_info.items())
 
-        elif protocol == 'UDP':
-            print("\tUDP Segment")
+        elif layer3 and protocol == 'UDP':
+            lines.append("\tUDP Segment")
             udp_info = layer3.udp_info or {}
-            for key, value in udp_info.items():
-                print(f"\t\t{key}: {value}")
+            lines.extend(f"\t\t{key}: {value}" for key, value in udp_info.items())
 
         # Merge the packet data appropriately
         packet_data = {
@@ -76,12 +137,20 @@ class PacketHandler:
             **tcp_info,
             **udp_info
         }
+        if probe:
+            self._lap('record_build', start)
+        self.console("\n".join(lines))
 
         return packet_data
 
     def _handle_arp_packet(self, payload: bytes):
-        print("ARP packet captured")
-        print("___________________")
+        self.console("ARP packet captured\n___________________")
+        probe = self.probe
+        start = perf_counter_ns() if probe else 0
         self.arp = ARP(payload)
+        if probe:
+            start = self._lap('l3_parse', start)
         data = Info.get_arp_info(self.arp)
+        if probe:
+            self._lap('record_build', start)
         return data
@@ -0,0 +1,261 @@
+import itertools
+import json
+import signal
+from array import array
+from time import perf_counter_ns
+
+from PacketProbe.utils.helpers import _worker_path
+
+"""
+    Instrumentation - Per-Stage Latency Histograms
+
+    Records where the time of every frame goes, stage by stage, with perf_counter_ns:
+
+        capture_recv  Reading a batch from the socket or ring, per frame of the batch.
+        queue_wait    From a batch entering raw_packets until the parser takes it out.
+        dispatch      Reading the EtherType and picking the handler.
+        l3_parse      Building the IPv4/IPv6/ARP header object.
+        l4_parse      Building the TCP/UDP layer and its fields.
+        record_build  Building the packet data dict, including its per-protocol CSV row.
+        sink.<name>   Each packet data output the record is written to.
+
+    Durations go into fixed-bucket histograms on a log scale: four buckets per power
+    of two, so a bucket is at most 25% wide at any magnitude, and recording a value
+    is a bit_length() and an array increment. Percentiles are reported as the upper
+    bound of their bucket.
+
+    The instrumentation is off unless enable() is called, and then the hot path pays
+    one check of a module global per frame. The per-frame stages are timed for one
+    frame in sample_every; capture_recv and queue_wait are timed for every batch. A
+    queue_wait alert threshold counts the batches that waited longer, so a parser
+    that falls behind shows up before frames are dropped.
+
+    The histograms are printed on SIGUSR1 and at the end of the capture. Worker
+    processes inherit the instrumentation when they are forked and dump their own
+    histograms when they stop, to per-worker files (latency.json -> latency.n.json).
+
+    Classes:
+        Histogram: Log-scale latency histogram in nanoseconds.
+        Instrumentation: The histograms of every stage and the sampling decision.
+
+    Functions:
+        enable(): Turns the instrumentation on and returns it.
+        disable(): Turns it off again.
+        dump_worker(): Dumps the histograms a worker process recorded.
+
+    Usage:
+        instruments = enable(sample_every=100)
+        ...
+        print(instruments.report())
+"""
+
+SUB_BUCKETS = 4
+BUCKETS = 64 * SUB_BUCKETS
+STAGES = ('capture_recv', 'queue_wait', 'dispatch', 'l3_parse', 'l4_parse', 'record_build')
+
+# The active Instrumentation, read by the hot path; None when disabled
+probe = None
+
+
+def _bucket(nanoseconds: int) -> int:
+    """Index of the bucket of a duration: the octave of its bit length and the two bits below the top one."""
+    if nanoseconds < SUB_BUCKETS:
+        return max(nanoseconds, 0)
+    bits = nanoseconds.bit_length()
+    return min((bits - 2) * SUB_BUCKETS + ((nanoseconds >> (bits - 3)) & 3), BUCKETS - 1)
+
+
+def _upper_bound(index: int) -> int:
+    """Smallest duration beyond the bucket ``index``."""
+    if index < SUB_BUCKETS:
+        return index + 1
+    octave, sub = divmod(index, SUB_BUCKETS)
+    return (SUB_BUCKETS + sub + 1) << (octave - 1)
+
+
+class Histogram:
+    """
+    Latency histogram with fixed log-scale buckets.
+
+    Parameters
+    ----------
+    alert_above : int, optional
+        Nanoseconds; every recorded duration above it is counted in ``alerts``.
+    """
+
+    __slots__ = ('counts', 'count', 'total', 'maximum', 'alert_above', 'alerts')
+
+    def __init__(self, alert_above: int = None):
+        self.counts = array('Q', bytes(8 * BUCKETS))
+        self.count = 0
+        self.total = 0
+        self.maximum = 0
+        self.alert_above = alert_above
+        self.alerts = 0
+
+    def record(self, nanoseconds: int, frames: int = 1):
+        """Records one duration, ``frames`` times (e.g. the per-frame share of a batch)."""
+        self.counts[_bucket(nanoseconds)] += frames
+        self.count += frames
+        self.total += nanoseconds * frames
+        if nanoseconds > self.maximum:
+            self.maximum = nanoseconds
+        if self.alert_above is not None and nanoseconds > self.alert_above:
+            self.alerts += 1
+
+    def percentile(self, percent: float) -> int:
+        """Returns the upper bound of the bucket holding the given percentile, 0 if nothing was recorded."""
+        if not self.count:
+            return 0
+        rank = self.count * percent / 100
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(_upper_bound(index), self.maximum)
+        return self.maximum
+
+    def to_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'mean_ns': self.total // self.count if self.count else 0,
+            'p50_ns': self.percentile(50),
+            'p90_ns': self.percentile(90),
+            'p99_ns': self.percentile(99),
+            'max_ns': self.maximum,
+            'alerts': self.alerts,
+            # Non-empty buckets only: upper bound in ns -> count
+            'buckets': {_upper_bound(index): count for index, count in enumerate(self.counts) if count},
+        }
+
+    def __str__(self):
+        """Returns a string representation of the Histogram instance."""
+        return f"Histogram(count={self.count}, p50={self.percentile(50)}ns, max={self.maximum}ns)"
+
+
+class Instrumentation:
+    """
+    Latency histograms of the processing stages.
+
+    Parameters
+    ----------
+    sample_every : int
+        Time the per-frame stages of one frame in this many.
+    queue_wait_alert : float, optional
+        Seconds a batch may wait in raw_packets before it counts as an alert.
+    path : str, optional
+        File the histograms are also written to as JSON on every dump.
+
+    Raises
+    ------
+    ValueError
+        If ``sample_every`` is less than 1 or ``queue_wait_alert`` is not positive.
+    """
+
+    def __init__(self, sample_every: int = 100, queue_wait_alert: float = None, path: str = None):
+        if sample_every < 1:
+            raise ValueError("The instrumentation must sample at least one frame in every N.")
+        if queue_wait_alert is not None and queue_wait_alert <= 0:
+            raise ValueError("The queue wait alert threshold must be positive.")
+
+        self.sample_every = sample_every
+        self.path = path
+        self.histograms = {stage: Histogram() for stage in STAGES}
+        if queue_wait_alert is not None:
+            self.histograms['queue_wait'].alert_above = int(queue_wait_alert * 1e9)
+        self.frames = itertools.count()
+
+    def histogram(self, stage: str) -> Histogram:
+        """Returns the histogram of a stage, creating it for new stages such as sinks."""
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        return histogram
+
+    def sample(self) -> bool:
+        """True for one frame in sample_every; the caller then times its per-frame stages."""
+        return not next(self.frames) % self.sample_every
+
+    def record(self, stage: str, nanoseconds: int, frames: int = 1):
+        self.histograms[stage].record(nanoseconds, frames)
+
+    def timed(self, stage: str, function):
+        """Wraps a callable, e.g. a sink, so one call in sample_every is recorded under ``stage``."""
+        histogram = self.histogram(stage)
+        every = self.sample_every
+        calls = itertools.count()
+
+        def call(*args, **kwargs):
+            if next(calls) % every:
+                return function(*args, **kwargs)
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.record(perf_counter_ns() - start)
+        return call
+
+    def to_dict(self) -> dict:
+        return {'sample_every': self.sample_every,
+                'stages': {stage: histogram.to_dict() for stage, histogram in self.histograms.items()}}
+
+    def report(self) -> str:
+        """Returns the histograms as a table in microseconds."""
+        lines = [f"Latency per stage in microseconds, 1 in {self.sample_every} frames timed:",
+                 f"{'stage':<24} {'count':>10} {'mean':>10} {'p50':>10} {'p90':>10} {'p99':>10} {'max':>10}"]
+        for stage, histogram in self.histograms.items():
+            if not histogram.count:
+                continue
+            figures = histogram.to_dict()
+            values = (figures[key] / 1000 for key in ('mean_ns', 'p50_ns', 'p90_ns', 'p99_ns', 'max_ns'))
+            line = f"{stage:<24} {histogram.count:>10} " + " ".join(f"{value:>10.1f}" for value in values)
+            if histogram.alerts:
+                line += f"  ({histogram.alerts} over {histogram.alert_above / 1000:.0f})"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def dump(self, *_):
+        """Prints the histograms and writes them to ``path``; also the SIGUSR1 handler."""
+        print(self.report())
+        if self.path:
+            try:
+                with open(self.path, 'w') as file:
+                    json.dump(self.to_dict(), file, indent=2)
+            except IOError as e:
+                print(f"Failed to save the latency histograms: {e}")
+
+    def __str__(self):
+        """Returns a string representation of the Instrumentation instance."""
+        return f"Instrumentation(sample_every={self.sample_every}, stages={len(self.histograms)})"
+
+
+def enable(sample_every: int = 100, queue_wait_alert: float = None, path: str = None) -> Instrumentation:
+    """
+    Turns the instrumentation on for the captures and parsers created from now on.
+
+    Installs dump() as the SIGUSR1 handler where there is one and this is the main thread.
+    """
+    global probe
+    probe = Instrumentation(sample_every, queue_wait_alert, path)
+    if hasattr(signal, 'SIGUSR1'):
+        try:
+            signal.signal(signal.SIGUSR1, probe.dump)
+        except ValueError:
+            pass  # Not the main thread
+    return probe
+
+
+def disable():
+    """Turns the instrumentation off."""
+    global probe
+    probe = None
+
+
+def dump_worker(index: int):
+    """Dumps the histograms a forked worker process recorded, if the instrumentation is on."""
+    if probe is None:
+        return
+    if probe.path:
+        probe.path = _worker_path(probe.path, index)
+    print(f"Worker {index}:")
+    probe.dump()
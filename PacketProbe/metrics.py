@@ -0,0 +1,229 @@
+import threading
+from array import array
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from time import monotonic, time
+
+from PacketProbe.trafficstats import ETHERTYPE_NAMES, PROTOCOL_NAMES
+from PacketProbe.utils.packetType import determine_packet_type
+
+"""
+    Metrics - Prometheus Text Format Endpoint
+
+    Exposes the health of a running capture over HTTP, in the Prometheus text
+    exposition format, so a daemon can be scraped and alerted on:
+
+        packetprobe_frames_captured_total         Frames that reached the capture queue or were refused by it.
+        packetprobe_frames_dropped_total          Frames lost, by reason (kernel, queue_full, queue_evicted).
+        packetprobe_frames_parsed_total           Frames handed to the parser or the worker processes.
+        packetprobe_parse_errors_total            Frames whose headers were too short to parse, by frame type.
+        packetprobe_queue_frames                  Frames waiting for the parser, and the queue capacity.
+        packetprobe_ethertype_*, _protocol_*      Packets and bytes per EtherType and IP protocol, as totals
+                                                  and as packets and bits per second since the previous scrape.
+        packetprobe_sink_backlog_records          Records buffered by each output and not yet written.
+        packetprobe_sink_flush_seconds            Time spent writing the buffered records, per output.
+
+    Nothing on the hot path takes a lock: the processing loop adds to plain integers
+    once per batch, the per-protocol counts are the arrays of a TrafficStats, and the
+    outputs keep their own counters. The server thread only reads them, and under the
+    GIL every single read is consistent; a scrape may see one counter a batch ahead
+    of another, which the next scrape evens out.
+
+    The server listens on 127.0.0.1 unless told otherwise and answers GET /metrics
+    from its own thread, one request at a time.
+
+    Classes:
+        CaptureMetrics: The counters of a capture and their rendering in the text format.
+        MetricsServer: Serves the rendered metrics over HTTP from a background thread.
+
+    Usage:
+        metrics = CaptureMetrics(TrafficStats(quiet=True))
+        server = MetricsServer(metrics, port=9108)
+        ...
+        server.close()
+"""
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _family(name: str, kind: str, description: str, samples) -> list:
+    """Returns the lines of one metric family; samples are (labels dict, value) or (suffix, labels, value)."""
+    lines = [f"# HELP packetprobe_{name} {description}", f"# TYPE packetprobe_{name} {kind}"]
+    for sample in samples:
+        suffix, labels, value = sample if len(sample) == 3 else ('',) + sample
+        label_text = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        lines.append(f"packetprobe_{name}{suffix}{{{label_text}}} {value}" if label_text
+                     else f"packetprobe_{name}{suffix} {value}")
+    return lines
+
+
+def _nonzero(counters) -> dict:
+    return {number: count for number, count in enumerate(counters) if count}
+
+
+class CaptureMetrics:
+    """
+    Counters of a running capture, rendered in the Prometheus text format.
+
+    Parameters
+    ----------
+    stats : TrafficStats, optional
+        Counts the packets and bytes per EtherType and IP protocol; without one these
+        metrics are left out.
+    """
+
+    def __init__(self, stats=None):
+        self.stats = stats
+        # Set once the capture and outputs exist
+        self.frame_queue = None
+        self.sinks = {}
+
+        # Written by the processing loop only
+        self.frames_parsed = 0
+        self.parse_errors = Counter()
+
+        self.start_time = time()
+        # Counter snapshots of the previous scrape, for the rates
+        self.previous_scrape = monotonic()
+        self.previous = None
+
+    def parse_error(self, frame):
+        """Counts a frame the parser rejected; only called on the error path."""
+        self.parse_errors[determine_packet_type(frame)] += 1
+
+    def _snapshot(self):
+        """
+        Copies the per-protocol counters and returns them with their rates since the previous scrape.
+
+        Both are (ethertype packets, ethertype bytes, protocol packets, protocol bytes);
+        the rates are {number: per second} for every non-zero counter.
+        """
+        now = monotonic()
+        elapsed = max(now - self.previous_scrape, 1e-9)
+        current = tuple(array('Q', counters) for counters in self.stats.counters)
+        previous = self.previous or (None,) * len(current)
+        rates = tuple({number: (count - (before[number] if before else 0)) / elapsed
+                       for number, count in _nonzero(counters).items()}
+                      for counters, before in zip(current, previous))
+        self.previous_scrape = now
+        self.previous = current
+        return current, rates
+
+    def render(self) -> str:
+        """Returns every metric in the Prometheus text format."""
+        lines = _family('start_time_seconds', 'gauge', "Time the capture started, in epoch seconds.",
+                        [({}, self.start_time)])
+
+        frame_queue = self.frame_queue
+        if frame_queue is not None:
+            drops = dict(frame_queue.drops)
+            lines += _family('frames_captured_total', 'counter',
+                             "Frames that reached the capture queue or were refused by it.",
+                             [({}, frame_queue.frames_in + drops.get('queue_full', 0))])
+            lines += _family('frames_dropped_total', 'counter', "Frames lost before parsing, by reason.",
+                             [({'reason': reason}, count) for reason, count in sorted(drops.items())])
+            lines += _family('queue_frames', 'gauge', "Frames waiting for the parser.", [({}, frame_queue.frames)])
+            lines += _family('queue_capacity_frames', 'gauge', "Frames the capture queue holds at most.",
+                             [({}, frame_queue.maxsize)])
+
+        lines += _family('frames_parsed_total', 'counter', "Frames handed to the parser or the worker processes.",
+                         [({}, self.frames_parsed)])
+        lines += _family('parse_errors_total', 'counter', "Frames too short to parse, by frame type.",
+                         [({'frame_type': frame_type}, count)
+                          for frame_type, count in sorted(dict(self.parse_errors).items())])
+
+        if self.stats is not None:
+            current, rates = self._snapshot()
+            for label, names, offset in (('ethertype', ETHERTYPE_NAMES, 0), ('protocol', PROTOCOL_NAMES, 2)):
+                packets, volume = current[offset:offset + 2]
+                packet_rates, byte_rates = rates[offset:offset + 2]
+                label_values = {number: {label: names.get(number, f'0x{number:04X}' if offset == 0 else str(number))}
+                                for number in packet_rates}
+                lines += _family(f'{label}_packets_total', 'counter', f"Packets captured per {label}.",
+                                 [(label_values[number], packets[number]) for number in packet_rates])
+                lines += _family(f'{label}_bytes_total', 'counter', f"Bytes captured per {label}.",
+                                 [(label_values[number], volume[number]) for number in packet_rates])
+                lines += _family(f'{label}_packets_per_second', 'gauge',
+                                 f"Packets per second per {label} since the previous scrape.",
+                                 [(label_values[number], round(rate, 3)) for number, rate in packet_rates.items()])
+                lines += _family(f'{label}_bits_per_second', 'gauge',
+                                 f"Bits per second per {label} since the previous scrape.",
+                                 [(label_values[number], round(byte_rates[number] * 8, 3))
+                                  for number in packet_rates])
+
+        sinks = {name: sink for name, sink in self.sinks.items() if sink is not None}
+        if sinks:
+            lines += _family('sink_backlog_records', 'gauge', "Records buffered by an output and not yet written.",
+                             [({'sink': name}, sink.backlog) for name, sink in sinks.items()])
+            samples = []
+            for name, sink in sinks.items():
+                samples.append(('_sum', {'sink': name}, round(sink.flush_seconds, 6)))
+                samples.append(('_count', {'sink': name}, sink.flushes))
+            lines += _family('sink_flush_seconds', 'summary', "Time spent writing buffered records to an output.",
+                             samples)
+        return '\n'.join(lines) + '\n'
+
+    def __str__(self):
+        """Returns a string representation of the CaptureMetrics instance."""
+        return f"CaptureMetrics(frames_parsed={self.frames_parsed}, parse_errors={sum(self.parse_errors.values())})"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # One line per scrape would drown the packet output
+
+
+class MetricsServer:
+    """
+    Serves the metrics of a capture over HTTP from a background thread.
+
+    Parameters
+    ----------
+    metrics : CaptureMetrics
+        The counters to render on every request.
+    port : int
+        Port to listen on; 0 picks a free one.
+    address : str
+        Address to listen on; the default only accepts local scrapers.
+
+    Raises
+    ------
+    OSError
+        If the address cannot be bound, e.g. the port is in use.
+    """
+
+    def __init__(self, metrics: CaptureMetrics, port: int = 9108, address: str = '127.0.0.1'):
+        self.metrics = metrics
+        self.server = HTTPServer((address, port), _MetricsHandler)
+        self.server.metrics = metrics
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def port(self) -> int:
+        return self.server.server_address[1]
+
+    def close(self):
+        """Stops serving and closes the listening socket."""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __str__(self):
+        """Returns a string representation of the MetricsServer instance."""
+        address, port = self.server.server_address[:2]
+        return f"MetricsServer(address={address}, port={port})"
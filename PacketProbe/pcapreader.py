@@ -0,0 +1,315 @@
+import mmap
+import threading
+import time
+from struct import Struct
+
+from PacketProbe.framequeue import FrameQueue
+
+"""
+    PcapReader and PcapFileSource - Offline Capture Files as a Frame Source
+
+    This module reads classic pcap and pcapng capture files through a memory map and
+    yields each frame together with its original capture timestamp. Frames are returned
+    as memoryviews into the mapping, so walking a multi-GB file does not copy anything
+    until a frame is actually kept.
+
+    Classes:
+        PcapReader: Iterates (timestamp, frame) pairs from a pcap or pcapng file.
+        PcapFileSource: Feeds a capture file into the same batch queue interface as
+                        BindSocket, either as fast as possible or paced in real time.
+
+    Supported formats:
+        - pcap with microsecond (0xa1b2c3d4) or nanosecond (0xa1b23c4d) timestamps, either byte order.
+        - pcapng Section Header, Interface Description (with if_tsresol / if_tsoffset),
+          Enhanced Packet, Simple Packet and obsolete Packet blocks. Other blocks are skipped.
+"""
+
+PCAP_MAGIC_MICRO = 0xA1B2C3D4
+PCAP_MAGIC_NANO = 0xA1B23C4D
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER_MAGIC = 0x1A2B3C4D
+
+PCAPNG_IDB = 0x00000001
+PCAPNG_PB = 0x00000002
+PCAPNG_SPB = 0x00000003
+PCAPNG_EPB = 0x00000006
+
+LINKTYPE_ETHERNET = 1
+
+_IF_TSRESOL = 9
+_IF_TSOFFSET = 14
+
+
+class PcapReader:
+    """
+    Memory-mapped reader for pcap and pcapng capture files.
+
+    Iterating the reader yields ``(timestamp, frame)`` tuples where ``timestamp`` is a
+    float in seconds since the epoch (``None`` for pcapng Simple Packet blocks, which
+    carry no timestamp) and ``frame`` is a memoryview into the file mapping. The views
+    stay valid until ``close()`` is called; copy them with ``bytes()`` to keep them.
+
+    Parameters
+    ----------
+    path : str
+        Path to the capture file.
+
+    Raises
+    ------
+    ValueError
+        If the file is empty or is neither a pcap nor a pcapng file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty.")
+        self._view = memoryview(self._map)
+
+        magic = self._map[:4]
+        if magic == PCAPNG_SHB.to_bytes(4, 'big'):
+            self.format = 'pcapng'
+            self.linktype = self._first_pcapng_linktype()
+        elif int.from_bytes(magic, 'little') in (PCAP_MAGIC_MICRO, PCAP_MAGIC_NANO):
+            self.format = 'pcap'
+            self._read_pcap_header('<')
+        elif int.from_bytes(magic, 'big') in (PCAP_MAGIC_MICRO, PCAP_MAGIC_NANO):
+            self.format = 'pcap'
+            self._read_pcap_header('>')
+        else:
+            self.close()
+            raise ValueError(f"{path} is not a pcap or pcapng file.")
+
+    def _read_pcap_header(self, byte_order: str):
+        magic, _, _, _, _, self.snaplen, self.linktype = Struct(byte_order + 'IHHiIII').unpack_from(self._map, 0)
+        self._byte_order = byte_order
+        self._resolution = 1e-9 if magic == PCAP_MAGIC_NANO else 1e-6
+
+    def _first_pcapng_linktype(self):
+        """Returns the link type of the first Interface Description Block, if any."""
+        byte_order = '>' if int.from_bytes(self._map[8:12], 'big') == PCAPNG_BYTE_ORDER_MAGIC else '<'
+        header = Struct(byte_order + 'II')
+        offset = 0
+        while offset + 12 <= len(self._map):
+            block_type, total_length = header.unpack_from(self._map, offset)
+            if block_type == PCAPNG_IDB:
+                return Struct(byte_order + 'H').unpack_from(self._map, offset + 8)[0]
+            if block_type in (PCAPNG_EPB, PCAPNG_SPB, PCAPNG_PB) or total_length < 12:
+                break
+            offset += total_length
+        return None
+
+    def __iter__(self):
+        if self.format == 'pcap':
+            return self._iter_pcap()
+        return self._iter_pcapng()
+
+    def _iter_pcap(self):
+        view = self._view
+        end = len(view)
+        record = Struct(self._byte_order + 'IIII')
+        unpack = record.unpack_from
+        header_size = record.size
+        resolution = self._resolution
+
+        offset = 24
+        while offset + header_size <= end:
+            seconds, fraction, captured, _ = unpack(view, offset)
+            offset += header_size
+            if offset + captured > end:
+                break  # Truncated final record
+            yield seconds + fraction * resolution, view[offset:offset + captured]
+            offset += captured
+
+    def _iter_pcapng(self):
+        view = self._view
+        end = len(view)
+        offset = 0
+        byte_order = '<'
+        interfaces = []
+
+        while offset + 12 <= end:
+            block_type = int.from_bytes(view[offset:offset + 4], 'little' if byte_order == '<' else 'big')
+
+            if block_type == PCAPNG_SHB:
+                # The byte order magic decides how the rest of the section is read
+                if int.from_bytes(view[offset + 8:offset + 12], 'little') == PCAPNG_BYTE_ORDER_MAGIC:
+                    byte_order = '<'
+                else:
+                    byte_order = '>'
+                interfaces = []
+
+            u32 = Struct(byte_order + 'I').unpack_from
+            total_length = u32(view, offset + 4)[0]
+            if total_length < 12 or offset + total_length > end:
+                break  # Truncated or corrupt block
+            body = offset + 8
+
+            if block_type == PCAPNG_EPB:
+                interface_id, high, low, captured, _ = Struct(byte_order + '5I').unpack_from(view, body)
+                resolution, ts_offset = interfaces[interface_id][1:] if interface_id < len(interfaces) else (1e-6, 0)
+                start = body + 20
+                yield ((high << 32) | low) * resolution + ts_offset, view[start:start + captured]
+
+            elif block_type == PCAPNG_SPB:
+                original = u32(view, body)[0]
+                captured = min(original, total_length - 16)
+                yield None, view[body + 4:body + 4 + captured]
+
+            elif block_type == PCAPNG_PB:
+                interface_id, _, high, low, captured, _ = Struct(byte_order + 'HH4I').unpack_from(view, body)
+                resolution, ts_offset = interfaces[interface_id][1:] if interface_id < len(interfaces) else (1e-6, 0)
+                start = body + 20
+                yield ((high << 32) | low) * resolution + ts_offset, view[start:start + captured]
+
+            elif block_type == PCAPNG_IDB:
+                interfaces.append(self._read_interface(view, body, offset + total_length - 4, byte_order))
+
+            offset += total_length
+
+    @staticmethod
+    def _read_interface(view, body: int, end: int, byte_order: str) -> tuple:
+        """Returns (linktype, timestamp resolution, timestamp offset) for an Interface Description Block."""
+        linktype = Struct(byte_order + 'H').unpack_from(view, body)[0]
+        resolution = 1e-6
+        ts_offset = 0
+
+        option = Struct(byte_order + 'HH')
+        position = body + 8
+        while position + 4 <= end:
+            code, length = option.unpack_from(view, position)
+            position += 4
+            if code == 0:
+                break  # opt_endofopt
+            if code == _IF_TSRESOL and length >= 1:
+                value = view[position]
+                resolution = 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+            elif code == _IF_TSOFFSET and length >= 8:
+                ts_offset = Struct(byte_order + 'q').unpack_from(view, position)[0]
+            position += (length + 3) & ~3
+
+        return linktype, resolution, ts_offset
+
+    def close(self):
+        """Releases the mapping. Views handed out by the iterator become invalid."""
+        self._view.release()
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns a string representation of the PcapReader instance."""
+        return f"PcapReader(path={self.path}, format={self.format}, linktype={self.linktype})"
+
+
+class PcapFileSource:
+    """
+    Replays a capture file into a batch queue, mirroring the BindSocket interface.
+
+    Batches of ``(timestamp, frame)`` tuples are put on ``raw_packets`` and a final
+    ``None`` marks the end of the file.
+
+    Parameters
+    ----------
+    path : str
+        Path to the pcap or pcapng file.
+    realtime : bool
+        Pace the replay to the original inter-frame gaps instead of running as fast as possible.
+    speed : float
+        Replay speed multiplier used in real-time mode (2.0 replays twice as fast).
+    batch_size : int
+        Maximum number of frames handed over per batch.
+    frame_filter : callable, optional
+        Called with a memoryview of each frame; frames for which it returns a falsy
+        value are skipped without being copied out of the file mapping.
+    queue_size : int
+        Maximum number of frames read ahead of the consumer. The reader waits for room
+        instead of dropping, so a replay never loses frames.
+    """
+
+    def __init__(self, path: str, realtime: bool = False, speed: float = 1.0, batch_size: int = 1024,
+                 frame_filter=None, queue_size: int = 65536):
+        self.path = path
+        self.frame_filter = frame_filter
+        self.realtime = realtime
+        self.speed = speed
+        self.batch_size = batch_size
+        self.raw_packets = FrameQueue(queue_size, 'block')
+        self.is_capturing = False
+
+    def start_capturing(self):
+        self.is_capturing = True
+        capture_thread = threading.Thread(target=self.capture_packets)
+        capture_thread.daemon = True
+        capture_thread.start()
+
+    def capture_packets(self) -> None:
+        try:
+            reader = PcapReader(self.path)
+        except (OSError, ValueError) as e:
+            print(f"Error opening capture file {self.path}: {e}")
+            self.raw_packets.put(None)
+            return
+
+        print(f"Reading {self.path} ({reader.format})")
+        if reader.linktype not in (None, LINKTYPE_ETHERNET):
+            print(f"Warning: link type {reader.linktype} is not Ethernet, frames may be misparsed")
+        put = self.raw_packets.put
+        frame_filter = self.frame_filter
+        batch = []
+        first_timestamp = None
+        started = time.perf_counter()
+
+        try:
+            for timestamp, frame in reader:
+                # The view must be released before the mapping can be closed, whichever way the loop ends
+                try:
+                    if not self.is_capturing:
+                        break
+                    if frame_filter is not None and not frame_filter(frame):
+                        continue
+
+                    if self.realtime and timestamp is not None:
+                        if first_timestamp is None:
+                            first_timestamp = timestamp
+                        delay = (timestamp - first_timestamp) / self.speed - (time.perf_counter() - started)
+                        if delay > 0:
+                            if batch:
+                                put(batch)  # Hand over what we have before waiting
+                                batch = []
+                            time.sleep(delay)
+
+                    batch.append((timestamp, bytes(frame)))
+                finally:
+                    frame.release()
+                if len(batch) >= self.batch_size:
+                    put(batch)
+                    batch = []
+
+            if batch:
+                put(batch)
+        finally:
+            try:
+                reader.close()
+            finally:
+                # Consumers wait for the end marker, it must not depend on the mapping closing cleanly
+                self.is_capturing = False
+                put(None)
+
+    def stop_capturing(self) -> None:
+        """Stops the replay."""
+        self.is_capturing = False
+        print("Stopped reading capture file.")
+
+    def __str__(self):
+        """Returns a string representation of the PcapFileSource instance."""
+        return f"PcapFileSource(path={self.path}, realtime={self.realtime}, is_capturing={self.is_capturing})"
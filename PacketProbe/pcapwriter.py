@@ -0,0 +1,191 @@
+import os
+import time
+from collections import deque
+from struct import Struct
+
+from PacketProbe.pcapreader import LINKTYPE_ETHERNET, PCAP_MAGIC_MICRO, PCAPNG_BYTE_ORDER_MAGIC, PCAPNG_EPB, \
+    PCAPNG_IDB, PCAPNG_SHB
+
+"""
+    PcapWriter - Buffered Raw Frame Sink with File Rotation
+
+    This module persists raw frames exactly as captured, without parsing them first.
+    The output file stays open for the lifetime of the writer and frames are appended
+    to an in-memory buffer that is written out in large chunks, so the per-frame cost
+    is a couple of struct packs and bytearray appends.
+
+    Classes:
+        PcapWriter: Writes classic pcap or pcapng files, rotating them by size and/or
+                    wall-clock interval and keeping a bounded number of files on disk.
+
+    File naming:
+        Without rotation frames go to ``path`` itself. With rotation every file gets a
+        sequence number before the extension, e.g. capture.pcap -> capture_0001.pcap.
+"""
+
+_pcap_header = Struct('<IHHiIII')
+_pcap_record = Struct('<IIII')
+_pcapng_shb = Struct('<IIIHHq')
+_pcapng_idb = Struct('<IIHHI')
+_pcapng_epb = Struct('<IIIIIII')
+_pcapng_trailer = Struct('<I')
+
+
+class PcapWriter:
+    """
+    Buffered pcap/pcapng writer with size- and time-based rotation.
+
+    Parameters
+    ----------
+    path : str
+        Output path. Used as the name template when rotation is enabled.
+    file_format : str
+        Either 'pcap' or 'pcapng'.
+    buffer_size : int
+        Number of buffered bytes that triggers a write to disk.
+    rotate_size : int, optional
+        Start a new file once the current one reaches this many bytes.
+    rotate_interval : float, optional
+        Start a new file once the current one has been open this many seconds.
+    max_files : int, optional
+        Delete the oldest rotated files so that at most this many remain.
+    snaplen : int
+        Frames are truncated to this many bytes.
+    linktype : int
+        Link-layer header type recorded in the file header.
+
+    Raises
+    ------
+    ValueError
+        If the file format is unknown or ``max_files`` is used without rotation.
+    """
+
+    def __init__(self, path: str, file_format: str = 'pcap', buffer_size: int = 1 << 20, rotate_size: int = None,
+                 rotate_interval: float = None, max_files: int = None, snaplen: int = 65535,
+                 linktype: int = LINKTYPE_ETHERNET):
+        if file_format not in ('pcap', 'pcapng'):
+            raise ValueError(f"Unknown capture file format: {file_format}")
+        if max_files is not None and not (rotate_size or rotate_interval):
+            raise ValueError("max_files requires rotate_size or rotate_interval.")
+
+        self.path = path
+        self.file_format = file_format
+        self.buffer_size = buffer_size
+        self.rotate_size = rotate_size
+        self.rotate_interval = rotate_interval
+        self.max_files = max_files
+        self.snaplen = snaplen
+        self.linktype = linktype
+
+        self.frames_written = 0
+        self.files = deque()
+        self._sequence = 0
+        self._buffer = bytearray()
+        self._file = None
+        self._file_bytes = 0
+        self._opened_at = 0.0
+        self._open_next()
+
+    def _next_path(self) -> str:
+        if not (self.rotate_size or self.rotate_interval):
+            return self.path
+        self._sequence += 1
+        stem, extension = os.path.splitext(self.path)
+        return f"{stem}_{self._sequence:04d}{extension or '.' + self.file_format}"
+
+    def _open_next(self):
+        path = self._next_path()
+        self._file = open(path, 'wb', buffering=0)  # We do our own buffering
+        self._file_bytes = 0
+        self._opened_at = time.time()
+        self.files.append(path)
+
+        if self.file_format == 'pcap':
+            self._buffer += _pcap_header.pack(PCAP_MAGIC_MICRO, 2, 4, 0, 0, self.snaplen, self.linktype)
+        else:
+            self._buffer += _pcapng_shb.pack(PCAPNG_SHB, 28, PCAPNG_BYTE_ORDER_MAGIC, 1, 0, -1)
+            self._buffer += _pcapng_trailer.pack(28)
+            self._buffer += _pcapng_idb.pack(PCAPNG_IDB, 20, self.linktype, 0, self.snaplen)
+            self._buffer += _pcapng_trailer.pack(20)
+
+        while self.max_files and len(self.files) > self.max_files:
+            oldest = self.files.popleft()
+            try:
+                os.remove(oldest)
+            except OSError as e:
+                print(f"Failed to remove old capture file {oldest}: {e}")
+
+    def _rotate(self):
+        self.flush()
+        self._file.close()
+        self._open_next()
+
+    def write(self, frame: bytes, time_stamp: float = None) -> None:
+        """Appends one frame to the buffer, rotating and flushing as needed."""
+        if time_stamp is None:
+            time_stamp = time.time()
+
+        if self.rotate_size and self._file_bytes + len(self._buffer) >= self.rotate_size:
+            self._rotate()
+        elif self.rotate_interval and time.time() - self._opened_at >= self.rotate_interval:
+            self._rotate()
+
+        original_length = len(frame)
+        if original_length > self.snaplen:
+            frame = frame[:self.snaplen]
+        captured = len(frame)
+        buffer = self._buffer
+
+        ticks = round(time_stamp * 1e6)
+        if self.file_format == 'pcap':
+            seconds, microseconds = divmod(ticks, 1000000)
+            buffer += _pcap_record.pack(seconds, microseconds, captured, original_length)
+            buffer += frame
+        else:
+            padding = -captured % 4
+            block_length = 32 + captured + padding
+            buffer += _pcapng_epb.pack(PCAPNG_EPB, block_length, 0, ticks >> 32, ticks & 0xFFFFFFFF,
+                                       captured, original_length)
+            buffer += frame
+            buffer += bytes(padding)
+            buffer += _pcapng_trailer.pack(block_length)
+
+        self.frames_written += 1
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_batch(self, batch) -> None:
+        """Appends an iterable of (timestamp, frame) tuples."""
+        write = self.write
+        for time_stamp, frame in batch:
+            write(frame, time_stamp)
+
+    def flush(self) -> None:
+        """Writes the buffered frames to the current file."""
+        if not self._buffer:
+            return
+        try:
+            self._file.write(self._buffer)
+            self._file_bytes += len(self._buffer)
+        except OSError as e:
+            print(f"Failed to write capture file {self._file.name}: {e}")
+        self._buffer.clear()
+
+    def close(self) -> None:
+        """Flushes the buffer and closes the current file."""
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns a string representation of the PcapWriter instance."""
+        return (f"PcapWriter(path={self.path}, file_format={self.file_format}, "
+                f"frames_written={self.frames_written}, files={len(self.files)})")
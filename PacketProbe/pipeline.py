@@ -0,0 +1,378 @@
+import contextlib
+import io
+import multiprocessing
+import signal
+import threading
+import time
+from collections import Counter, deque
+from multiprocessing.shared_memory import SharedMemory
+from struct import Struct
+
+from PacketProbe import instrumentation
+from PacketProbe.rawframe import RawFrame, to_json_line
+from PacketProbe.console import ConsoleRenderer
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+from PacketProbe.sinks.sqlitedb import SQLiteSink
+from PacketProbe.utils.packetDataCSV import close_csv_sink
+from PacketProbe.utils.helpers import _tee, _worker_path
+from PacketProbe.utils.packetType import determine_packet_type
+
+"""
+    FramePipeline - Multi-Process Parsing from a Shared-Memory Frame Ring
+
+    The capture thread copies every batch of frames into a byte ring that lives in a
+    multiprocessing.shared_memory block, and only a small (batch id, offset, count)
+    descriptor is sent to a worker process. Workers read the frames straight out of
+    the shared block, run them through RawFrame and serialise the results to JSON
+    lines, so frames are never pickled and parsing runs on as many cores as there are
+    workers.
+
+    Classes:
+        SharedFrameRing: Single-producer byte ring of (timestamp, frame) records in shared memory.
+        FramePipeline: Starts the workers, hands batches to the least busy one and collects the output.
+
+    Output:
+        ordered=True    Workers return their console output and JSON lines to one sink thread
+                        in the capturing process, which writes them in capture order.
+        ordered=False   Every worker prints directly and appends to its own file,
+                        e.g. packet_data.json -> packet_data.3.json.
+        sqlite          Either way, every worker inserts into its own database,
+                        e.g. packets.db -> packets.3.db.
+        parse_errors    Either way, workers count the frames too short to parse by frame type
+                        and send the counts back, which the sink thread adds up.
+
+    Batches go to the least busy worker, so the fragments of one datagram end up in
+    different workers and could never be reassembled. Workers parse without a
+    FragmentReassembler instead: the first fragment of a datagram, which carries the
+    transport header, is parsed beyond IP and the others at the IP layer only.
+
+    Ring layout:
+        The block starts with one 8-byte "batches done" counter per worker, followed by
+        the data area. Records are a 12-byte (timestamp, length) header plus the frame,
+        padded to 8 bytes. A batch is always stored contiguously; it starts over at the
+        beginning of the data area when it does not fit in front of the end. Space is
+        reclaimed once the worker a batch went to has counted it as done.
+
+    Usage:
+        pipeline = FramePipeline(workers=8)
+        for batch in batches:
+            pipeline.submit(batch)
+        pipeline.close()
+"""
+
+_RECORD = Struct('=dI')
+_NO_TIMESTAMP = float('nan')
+
+
+def _record_size(frame_length: int) -> int:
+    return (_RECORD.size + frame_length + 7) & ~7
+
+
+class SharedFrameRing:
+    """
+    Byte ring of (timestamp, frame) records in a shared memory block.
+
+    The capturing process creates the ring and is its only writer; workers attach to it
+    by name and only read records and bump their own "done" counter.
+
+    Parameters
+    ----------
+    size : int
+        Bytes available for frame records.
+    workers : int
+        Number of consumers, each with its own done counter.
+    name : str, optional
+        Name of an existing block to attach to. A new block is created when omitted.
+
+    Raises
+    ------
+    ValueError
+        If the ring is too small to hold a few maximum-size batches.
+    """
+
+    MIN_SIZE = 1 << 20
+
+    def __init__(self, size: int = 64 << 20, workers: int = 1, name: str = None):
+        if size < self.MIN_SIZE:
+            raise ValueError(f"The frame ring needs at least {self.MIN_SIZE} bytes.")
+
+        self.size = size
+        self.workers = workers
+        self.control_size = 8 * workers
+        self.owner = name is None
+        if self.owner:
+            self.memory = SharedMemory(create=True, size=self.control_size + size)
+        else:
+            # Workers are children of the creator and share its resource tracker, so attaching
+            # does not register the block a second time
+            self.memory = SharedMemory(name=name)
+        self.name = self.memory.name
+        self.done = self.memory.buf[:self.control_size].cast('Q')
+        self.data = self.memory.buf[self.control_size:self.control_size + size]
+
+        # Producer bookkeeping: batches handed out per worker and batches not yet reclaimed
+        self.assigned = [0] * workers
+        self.outstanding = deque()
+        self.head = 0
+        self.max_batch_bytes = size // 4
+
+    def pending(self, worker: int) -> int:
+        """Number of batches handed to ``worker`` that it has not finished yet."""
+        return self.assigned[worker] - self.done[worker]
+
+    def _reclaim(self):
+        outstanding = self.outstanding
+        done = self.done
+        while outstanding and done[outstanding[0][0]] > outstanding[0][1]:
+            outstanding.popleft()
+
+    def _reserve(self, size: int) -> int:
+        """Returns the offset of ``size`` contiguous free bytes, waiting for workers if needed."""
+        while True:
+            self._reclaim()
+            start = self.head if self.head + size <= self.size else 0
+            if not self.outstanding:
+                return start
+            tail = self.outstanding[0][2]
+            # head == tail only ever means empty, so the write must stop short of tail
+            if self.head >= tail:
+                # Free space is [head, size) and [0, tail)
+                if start == self.head or size < tail:
+                    return start
+            elif start == self.head and start + size < tail:
+                return start
+            time.sleep(0.0002)
+
+    def write(self, frames, worker: int):
+        """
+        Copies a list of (timestamp, frame) tuples into the ring for ``worker``.
+
+        The frames must fit in ``max_batch_bytes``. Returns the (offset, count) descriptor
+        the worker passes to ``read``.
+        """
+        size = sum(_record_size(len(frame)) for _, frame in frames)
+        start = position = self._reserve(size)
+        data = self.data
+        pack_into = _RECORD.pack_into
+        for time_stamp, frame in frames:
+            length = len(frame)
+            pack_into(data, position, _NO_TIMESTAMP if time_stamp is None else time_stamp, length)
+            body = position + _RECORD.size
+            data[body:body + length] = frame
+            position += (_RECORD.size + length + 7) & ~7
+
+        self.head = position
+        self.outstanding.append((worker, self.assigned[worker], start))
+        self.assigned[worker] += 1
+        return start, len(frames)
+
+    def split(self, batch):
+        """Splits a capture batch into chunks that each fit in ``max_batch_bytes``."""
+        chunk, chunk_size = [], 0
+        for packet in batch:
+            size = _record_size(len(packet[1]))
+            if chunk and chunk_size + size > self.max_batch_bytes:
+                yield chunk
+                chunk, chunk_size = [], 0
+            chunk.append(packet)
+            chunk_size += size
+        if chunk:
+            yield chunk
+
+    def read(self, start: int, count: int):
+        """Yields ``count`` (timestamp, frame) tuples from ``start``, copying each frame to bytes."""
+        data = self.data
+        unpack_from = _RECORD.unpack_from
+        position = start
+        for _ in range(count):
+            time_stamp, length = unpack_from(data, position)
+            body = position + _RECORD.size
+            yield None if time_stamp != time_stamp else time_stamp, bytes(data[body:body + length])
+            position += (_RECORD.size + length + 7) & ~7
+
+    def close(self):
+        """Detaches from the block and, in the creating process, removes it."""
+        self.done.release()
+        self.data.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+
+def _run_worker(index, ring_name, ring_size, workers, tasks, results, options):
+    """Worker process: parses the batches it is given until it receives None."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # The capturing process decides when to stop
+    ring = SharedFrameRing(ring_size, workers, name=ring_name)
+    filter_type = options['filter_type']
+    lazy = options['lazy']
+    output = None
+    if not options['ordered']:
+        output = JsonLinesWriter(_worker_path(options['output'], index), flush_interval=options['flush_interval'])
+    console = print
+    if output and options['console_options'] is not None:
+        console = ConsoleRenderer(**options['console_options'])
+    database = None
+    if options['sqlite']:
+        database = SQLiteSink(_worker_path(options['sqlite'], index), flush_interval=options['flush_interval'])
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            batch_id, start, count = task
+            lines = []
+            sink = _tee(lambda data: lines.append(to_json_line(data)), database)
+
+            # Ordered output sends the packet descriptions back, one block per packet
+            blocks = []
+            errors = Counter()
+            captured = io.StringIO() if output is None else None
+            with contextlib.redirect_stdout(captured) if captured else contextlib.nullcontext():
+                for time_stamp, frame in ring.read(start, count):
+                    try:
+                        RawFrame(frame, filter_type, time_stamp, lazy=lazy, sink=sink,
+                                 console=blocks.append if captured else console)
+                    except ValueError:
+                        errors[determine_packet_type(frame)] += 1  # A header cut short, skip the frame
+                    except Exception as e:
+                        print(f"Worker {index} failed to parse a frame: {e}")
+
+            # The frames are no longer needed once parsed, let the producer reuse the space
+            ring.done[index] += 1
+            if output is None:
+                if captured.getvalue():
+                    blocks.append(captured.getvalue().rstrip('\n'))
+                results.put((batch_id, blocks, lines, errors))
+            else:
+                if lines:
+                    output.write_lines(lines)
+                if errors:
+                    results.put((None, None, None, errors))
+    finally:
+        if console is not print:
+            console.close()
+        if output:
+            output.close()
+        if database:
+            database.close()
+        close_csv_sink()  # Forked workers skip atexit handlers
+        ring.close()
+        instrumentation.dump_worker(index)
+
+
+class FramePipeline:
+    """
+    Parses capture batches in worker processes fed from a SharedFrameRing.
+
+    Parameters
+    ----------
+    workers : int
+        Number of worker processes.
+    buffer_size : int
+        Bytes of shared memory for frames in flight.
+    ordered : bool
+        Collect all output in this process and write it in capture order. When False,
+        each worker prints directly and writes its own JSON file.
+    filter_type : str, optional
+        Frame type filter passed on to RawFrame.
+    lazy : bool
+        Hand memoryview slices of each frame to the parsers instead of copying the payload.
+    output : str
+        JSON lines output file (the name template for the per-worker files).
+    flush_interval : float
+        Seconds between writes of the buffered JSON output.
+    sqlite : str, optional
+        Name template for the per-worker SQLite databases.
+    console_options : dict, optional
+        ConsoleRenderer limits for the packet descriptions: of the sink thread when ordered,
+        of every worker otherwise. Without them the descriptions are printed directly.
+
+    Raises
+    ------
+    ValueError
+        If ``workers`` is less than 1 or the buffer is too small.
+    """
+
+    def __init__(self, workers: int = 2, buffer_size: int = 64 << 20, ordered: bool = True, filter_type=None,
+                 lazy: bool = False, output: str = 'packet_data.json', flush_interval: float = 1.0,
+                 sqlite: str = None, console_options=None):
+        if workers < 1:
+            raise ValueError("The pipeline needs at least one worker.")
+
+        self.workers = workers
+        self.ordered = ordered
+        self.output = output
+        self.flush_interval = flush_interval
+        self.ring = SharedFrameRing(buffer_size, workers)
+        self.frames_submitted = 0
+        self.parse_errors = Counter()
+        self.next_batch = 0
+
+        context = multiprocessing.get_context()
+        self.results = context.Queue()
+        self.tasks = [context.SimpleQueue() for _ in range(workers)]
+        options = {'filter_type': filter_type, 'lazy': lazy, 'ordered': ordered, 'output': output,
+                   'flush_interval': flush_interval, 'sqlite': sqlite, 'console_options': console_options}
+        self.processes = [
+            context.Process(target=_run_worker, name=f"PacketProbe-worker-{index}", daemon=True,
+                            args=(index, self.ring.name, buffer_size, workers, self.tasks[index], self.results,
+                                  options))
+            for index in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+        # Threads only after the fork, a child would inherit a lock held by one of them
+        self.console = None
+        if ordered and console_options is not None:
+            self.console = ConsoleRenderer(**console_options)
+        self.sink_thread = threading.Thread(target=self._collect, daemon=True)
+        self.sink_thread.start()
+
+    def submit(self, batch):
+        """Copies a batch of (timestamp, frame) tuples into the ring and queues it for a worker."""
+        ring = self.ring
+        for chunk in ring.split(batch):
+            worker = min(range(self.workers), key=ring.pending)
+            start, count = ring.write(chunk, worker)
+            self.tasks[worker].put((self.next_batch, start, count))
+            self.next_batch += 1
+            self.frames_submitted += count
+
+    def _collect(self):
+        """Sink thread: adds up the parse errors and, when ordered, writes worker output in batch order."""
+        pending = {}
+        next_batch = 0
+        console = self.console or print
+        writer = JsonLinesWriter(self.output, flush_interval=self.flush_interval) if self.ordered else None
+        with writer or contextlib.nullcontext():
+            while True:
+                result = self.results.get()
+                if result is None:
+                    break
+                batch_id, blocks, lines, errors = result
+                if errors:
+                    self.parse_errors.update(errors)
+                if batch_id is None:
+                    continue  # Only the error counts of an unordered worker
+                pending[batch_id] = (blocks, lines)
+                while next_batch in pending:
+                    blocks, lines = pending.pop(next_batch)
+                    for block in blocks:
+                        console(block)
+                    if lines:
+                        writer.write_lines(lines)
+                    next_batch += 1
+
+    def close(self):
+        """Lets the workers finish every queued batch, then stops them and the sink."""
+        for tasks in self.tasks:
+            tasks.put(None)
+        for process in self.processes:
+            process.join()
+        self.results.put(None)
+        self.sink_thread.join()
+        if self.console:
+            self.console.close()
+        self.ring.close()
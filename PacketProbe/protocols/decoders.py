@@ -0,0 +1,257 @@
+from struct import Struct
+from ipaddress import IPv6Address
+
+"""
+    Precompiled Header Decoders
+
+    One module-level struct.Struct per header layout, so every header is decoded with a
+    single unpack_from call at a given offset instead of a series of slices and
+    int.from_bytes calls. The decode_* functions return the header fields in the order
+    the matching protocol class stores them, with bit fields already split out, and
+    the protocol classes (IPV4, IPV6, ARP, RARP, VLAN, TCP, UDP, ICMP, MPLS) build
+    their attributes from them.
+
+    The decoders do no length checking of their own: a buffer that is too short raises
+    struct.error, so callers check the minimum header length first.
+
+    decode_headers walks a whole frame (802.1Q tags, IPv4 options, IPv6 extension headers)
+    and returns the summary fields that the batch decoder and the record log store;
+    decode_tcp_segment locates the TCP header and payload of a frame for stream reassembly.
+
+    Usage:
+        destination, source, ethertype = decode_ethernet(frame)
+        if ethertype == 0x0800:
+            version, ihl, *_, protocol, checksum, source_ip, destination_ip = decode_ipv4(frame, 14)
+"""
+
+ETHERNET_HEADER = Struct('!6s6sH')
+VLAN_HEADER = Struct('!HHH')
+IPV4_HEADER = Struct('!BBHHHBBH4s4s')
+IPV6_HEADER = Struct('!IHBB16s16s')
+# The same header with the addresses as 64-bit halves: IPv6Address is built faster from an int than from bytes
+IPV6_HEADER_WORDS = Struct('!IHBBQQQQ')
+ARP_HEADER = Struct('!HHBBH6s4s6s4s')
+TCP_HEADER = Struct('!HHLLBBHHH')
+UDP_HEADER = Struct('!4H')
+ICMP_HEADER = Struct('!BBHHH')
+MPLS_HEADER = Struct('!L')
+
+IPV4_MAPPED_PREFIX = bytes(10) + b'\xff\xff'
+IPV6_EXTENSION_HEADERS = (0, 43, 44, 51, 60)
+
+_ethernet = ETHERNET_HEADER.unpack_from
+_vlan = VLAN_HEADER.unpack_from
+_ipv4 = IPV4_HEADER.unpack_from
+_ipv6 = IPV6_HEADER.unpack_from
+_ipv6_words = IPV6_HEADER_WORDS.unpack_from
+_tcp = TCP_HEADER.unpack_from
+_mpls = MPLS_HEADER.unpack_from
+_ports = Struct('!HH').unpack_from
+_fragment = Struct('!HL').unpack_from
+
+# Headers whose fields need no splitting are returned straight from unpack_from:
+#   decode_arp  -> (hardware_type, protocol_type, hardware_length, protocol_length, opcode,
+#                   sender_mac, sender_ip, receiver_mac, receiver_ip), also used for RARP
+#   decode_udp  -> (source_port, destination_port, length, checksum)
+#   decode_icmp -> (type, code, checksum, identifier, sequence_number)
+decode_arp = ARP_HEADER.unpack_from
+decode_udp = UDP_HEADER.unpack_from
+decode_icmp = ICMP_HEADER.unpack_from
+
+
+def decode_ethernet(buffer, offset: int = 0):
+    """Returns (destination_mac, source_mac, ethertype) of the Ethernet header at offset."""
+    return _ethernet(buffer, offset)
+
+
+def decode_vlan(buffer, offset: int = 0):
+    """
+    Decodes an 802.1Q tag starting at its TPID (offset 12 within an Ethernet frame).
+
+    Returns (tpid, priority, drop_eligible, vlan_id, ethertype).
+    """
+    tpid, tci, ethertype = _vlan(buffer, offset)
+    return tpid, tci >> 13, (tci >> 12) & 0x1, tci & 0x0FFF, ethertype
+
+
+def decode_ipv4(buffer, offset: int = 0):
+    """
+    Returns (version, ihl, tos, total_length, identification, flags, fragment_offset, ttl,
+    protocol, header_checksum, source_ip, destination_ip) of the IPv4 header at offset.
+    """
+    version_ihl, tos, total_length, identification, flags_fragment, ttl, protocol, checksum, source, destination \
+        = _ipv4(buffer, offset)
+    return (version_ihl >> 4, version_ihl & 0x0F, tos, total_length, identification, flags_fragment >> 13,
+            flags_fragment & 0x1FFF, ttl, protocol, checksum, source, destination)
+
+
+def decode_ipv6(buffer, offset: int = 0):
+    """
+    Returns (version, traffic_class, flow_label, payload_length, next_header, hop_limit,
+    source_ip, destination_ip) of the IPv6 header at offset, with the addresses as IPv6Address.
+    """
+    first_word, payload_length, next_header, hop_limit, source_high, source_low, destination_high, \
+        destination_low = _ipv6_words(buffer, offset)
+    return (first_word >> 28, (first_word >> 20) & 0xFF, first_word & 0xFFFFF, payload_length, next_header,
+            hop_limit, IPv6Address(source_high << 64 | source_low),
+            IPv6Address(destination_high << 64 | destination_low))
+
+
+def decode_tcp(buffer, offset: int = 0):
+    """
+    Returns (source_port, destination_port, sequence_number, acknowledgment_number, data_offset,
+    flags, window_size, checksum, urgent_pointer) of the TCP header at offset.
+    """
+    source_port, destination_port, sequence, acknowledgment, offset_byte, flags, window, checksum, urgent \
+        = _tcp(buffer, offset)
+    return (source_port, destination_port, sequence, acknowledgment, offset_byte >> 4, flags, window, checksum,
+            urgent)
+
+
+def decode_mpls(buffer, offset: int = 0):
+    """Returns (label, experimental, bottom_of_stack, ttl) of the MPLS label stack entry at offset."""
+    entry, = _mpls(buffer, offset)
+    return entry >> 12, (entry >> 9) & 0x7, (entry >> 8) & 0x1, entry & 0xFF
+
+
+def skip_ipv6_extensions(buffer, offset: int, protocol: int):
+    """
+    Follows the IPv6 extension headers starting at offset, where protocol is the Next Header
+    value that points at them.
+
+    Returns (protocol, offset, fragment) of the header after them. fragment is None, or
+    (fragment_offset, more_fragments, identification) of a Fragment header, with the offset
+    in bytes. The walk stops after the Fragment header of a non-first fragment, since
+    what follows it is not a header.
+    """
+    length = len(buffer)
+    fragment = None
+    while protocol in IPV6_EXTENSION_HEADERS and length >= offset + 8:
+        next_header, header_length = buffer[offset], buffer[offset + 1]
+        if protocol == 44:
+            offset_flags, identification = _fragment(buffer, offset + 2)
+            fragment = (offset_flags & 0xFFF8, offset_flags & 0x1, identification)
+            offset += 8
+            protocol = next_header
+            if fragment[0]:
+                break
+            continue
+        elif protocol == 51:
+            offset += (header_length + 2) * 4
+        else:
+            offset += (header_length + 1) * 8
+        protocol = next_header
+    return protocol, offset, fragment
+
+
+def decode_headers(frame):
+    """
+    Walks the headers of an Ethernet frame, following 802.1Q tags, IPv4 options and IPv6
+    extension headers.
+
+    Returns (ethertype, ip_version, ip_length, ttl, protocol, source_ip, destination_ip,
+    source_port, destination_port, tcp_flags, payload_offset). Addresses are 16 bytes,
+    IPv4 as ::ffff:a.b.c.d; fields of layers that are absent or truncated are 0, and
+    payload_offset is where the bytes after the last decoded header start.
+    """
+    length = len(frame)
+    if length < 14:
+        return 0, 0, 0, 0, 0, bytes(16), bytes(16), 0, 0, 0, length
+
+    ethertype = _ethernet(frame)[2]
+    offset = 14
+    while ethertype in (0x8100, 0x88A8) and length >= offset + 4:
+        ethertype = _vlan(frame, offset - 2)[2]
+        offset += 4
+
+    version = ip_length = ttl = protocol = 0
+    source = destination = bytes(16)
+    payload = offset
+    transport = None
+    if ethertype == 0x0800 and length >= offset + 20:
+        version_ihl, _, ip_length, _, flags_fragment, ttl, protocol, _, source_ip, destination_ip \
+            = _ipv4(frame, offset)
+        version = version_ihl >> 4
+        if version == 4:
+            source = IPV4_MAPPED_PREFIX + source_ip
+            destination = IPV4_MAPPED_PREFIX + destination_ip
+            payload = min(offset + (version_ihl & 0x0F) * 4, length)
+            if flags_fragment & 0x1FFF == 0:
+                transport = payload
+        else:
+            version = ip_length = ttl = protocol = 0
+    elif ethertype == 0x86DD and length >= offset + 40:
+        first_word, payload_length, protocol, ttl, source, destination = _ipv6(frame, offset)
+        version = first_word >> 28
+        if version == 6:
+            ip_length = payload_length + 40
+            protocol, transport, fragment = skip_ipv6_extensions(frame, offset + 40, protocol)
+            if fragment and fragment[0]:
+                payload = transport
+                transport = None  # Non-first fragment
+            else:
+                transport = payload = min(transport, length)
+        else:
+            version = ttl = protocol = 0
+            source = destination = bytes(16)
+
+    source_port = destination_port = tcp_flags = 0
+    if transport is not None:
+        if protocol == 6 and length >= transport + 20:
+            source_port, destination_port, _, _, offset_byte, tcp_flags, _, _, _ = _tcp(frame, transport)
+            payload = min(transport + max(offset_byte >> 4, 5) * 4, length)
+        elif protocol == 17 and length >= transport + 8:
+            source_port, destination_port = _ports(frame, transport)
+            payload = transport + 8
+        elif protocol in (1, 58) and length >= transport + 8:
+            payload = transport + 8
+
+    return (ethertype, version, ip_length, ttl, protocol, source, destination, source_port, destination_port,
+            tcp_flags, payload)
+
+
+def decode_tcp_segment(frame):
+    """
+    Finds the TCP segment in an Ethernet frame, following 802.1Q tags, IPv4 options and IPv6
+    extension headers.
+
+    Returns (source_ip, destination_ip, source_port, destination_port, sequence_number, flags,
+    payload_start, payload_end) with 16-byte addresses as in decode_headers, or None for frames
+    that carry no TCP header or only part of a segment (other protocols, fragments, truncation).
+    payload_end excludes any Ethernet padding after the IP datagram.
+    """
+    length = len(frame)
+    if length < 14:
+        return None
+    ethertype = _ethernet(frame)[2]
+    offset = 14
+    while ethertype in (0x8100, 0x88A8) and length >= offset + 4:
+        ethertype = _vlan(frame, offset - 2)[2]
+        offset += 4
+
+    if ethertype == 0x0800 and length >= offset + 20:
+        version_ihl, _, ip_length, _, flags_fragment, _, protocol, _, source_ip, destination_ip = _ipv4(frame, offset)
+        if version_ihl >> 4 != 4 or protocol != 6 or flags_fragment & 0x3FFF:
+            return None
+        source = IPV4_MAPPED_PREFIX + source_ip
+        destination = IPV4_MAPPED_PREFIX + destination_ip
+        end = offset + ip_length
+        transport = offset + (version_ihl & 0x0F) * 4
+    elif ethertype == 0x86DD and length >= offset + 40:
+        first_word, payload_length, protocol, _, source, destination = _ipv6(frame, offset)
+        if first_word >> 28 != 6:
+            return None
+        end = offset + 40 + payload_length
+        protocol, transport, fragment = skip_ipv6_extensions(frame, offset + 40, protocol)
+        if protocol != 6 or fragment:
+            return None
+    else:
+        return None
+
+    end = min(end, length)
+    if end < transport + 20:
+        return None
+    source_port, destination_port, sequence, _, offset_byte, flags, _, _, _ = _tcp(frame, transport)
+    start = min(transport + max(offset_byte >> 4, 5) * 4, end)
+    return source, destination, source_port, destination_port, sequence, flags, start, end
+
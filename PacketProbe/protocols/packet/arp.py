@@ -1,3 +1,6 @@
+from PacketProbe.protocols.decoders import decode_arp
+
+
 class ARP:
     """
     Arp is communication mechanism coverts the IP address in to MAC address
@@ -52,15 +55,8 @@ class ARP:
         if self.payload_length < 28:
             raise ValueError("Payload does not have the minimum length")
 
-        self.hardware_type = int.from_bytes(payload[0:2], 'big')
-        self.protocol_type = int.from_bytes(payload[2:4], 'big')
-        self.hardware_length = payload[4]
-        self.protocol_length = payload[5]
-        self.opcode = int.from_bytes(payload[6:8], 'big')
-        self.sender_mac = payload[8:14]  # MAC is 6 bytes
-        self.sender_ip = payload[14:18]  # IP is 4 bytes
-        self.receiver_mac = payload[18:24]  # Target MAC is 6 bytes
-        self.receiver_ip = payload[24:28]  # Target IP is 4 bytes
+        (self.hardware_type, self.protocol_type, self.hardware_length, self.protocol_length, self.opcode,
+         self.sender_mac, self.sender_ip, self.receiver_mac, self.receiver_ip) = decode_arp(payload)
 
     def __str__(self) -> str:
         sender_mac = ":".join(f"{byte:02x}" for byte in self.sender_mac)
@@ -1,3 +1,6 @@
+from PacketProbe.protocols.decoders import decode_ipv4
+
+
 class IPV4:
     """
       A class for parsing and representing an IPv4 packet header.
@@ -75,19 +78,10 @@ class IPV4:
         if self.payload_length < 20:
             raise ValueError("Payload does not have the minimum required length for an IPv4 header.")
 
-        # Parse the IPv4 header
-        self.version = (frame_payload[0] >> 4) & 0x0F  # Extracting the version (first 4 bits)
-        self.ihl = frame_payload[0] & 0x0F  # Extracting the Internet Header Length (last 4 bits)
-        self.tos = frame_payload[1]  # Type of Service
-        self.total_length = int.from_bytes(frame_payload[2:4], 'big')  # Total Length
-        self.identification = int.from_bytes(frame_payload[4:6], 'big')  # Identification
-        self.flags = (frame_payload[6] >> 5) & 0x07  # Flags (first 3 bits)
-        self.fragment_offset = ((frame_payload[6] & 0x1F) << 8) | frame_payload[7]  # Fragment Offset
-        self.ttl = frame_payload[8]  # Time to Live
-        self.protocol = frame_payload[9]  # Protocol
-        self.header_checksum = int.from_bytes(frame_payload[10:12], 'big')  # Header Checksum
-        self.source_ip = frame_payload[12:16]  # Source IP (bytes)
-        self.destination_ip = frame_payload[16:20]  # Destination IP (bytes)
+        # Parse the IPv4 header in one unpack
+        (self.version, self.ihl, self.tos, self.total_length, self.identification, self.flags,
+         self.fragment_offset, self.ttl, self.protocol, self.header_checksum, self.source_ip,
+         self.destination_ip) = decode_ipv4(frame_payload)
 
         header_length = self.ihl * 4
         self.data = frame_payload[header_length:] if self.version == 4 else None
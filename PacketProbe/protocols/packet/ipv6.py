@@ -1,4 +1,5 @@
-import ipaddress
+from PacketProbe.protocols.decoders import decode_ipv6
+
 
 class IPV6:
     def __init__(self, frame_payload):
@@ -10,23 +11,9 @@ class IPV6:
         if len(frame_payload) < 40:
             raise ValueError("Incomplete IPv6 header: must be at least 40 bytes.")
 
-        # The first byte contains version and traffic class
-        self.version = (frame_payload[0] >> 4) & 0x0F  # Extract version (4 bits)
-        self.traffic_class = ((frame_payload[0] & 0x0F) << 4) | (frame_payload[1] >> 4)  # Extract traffic class (8 bits)
-
-        # Flow label (20 bits)
-        self.flow_label = ((frame_payload[1] & 0x0F) << 16) | (frame_payload[2] << 8) | frame_payload[3]
-
-        # Payload length (16 bits)
-        self.payload_length = (frame_payload[4] << 8) | frame_payload[5]
-
-        # Next header and hop limit
-        self.next_header = frame_payload[6]  # 8 bits for next header
-        self.hop_limit = frame_payload[7]  # 8 bits for hop limit
-
-        # Source and destination IPs are 128 bits each (16 bytes)
-        self.source_ip = ipaddress.IPv6Address(frame_payload[8:24])  # Source IP (16 bytes)
-        self.destination_ip = ipaddress.IPv6Address(frame_payload[24:40])  # Destination IP (16 bytes)
+        # Version, traffic class, flow label, payload length, next header, hop limit and both addresses
+        (self.version, self.traffic_class, self.flow_label, self.payload_length, self.next_header,
+         self.hop_limit, self.source_ip, self.destination_ip) = decode_ipv6(frame_payload)
 
         # The remaining data is the payload of the IPv6 packet
         self.data = frame_payload[40:]  # Data starts after the 40-byte IPv6 header
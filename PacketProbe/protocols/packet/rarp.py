@@ -1,3 +1,6 @@
+from PacketProbe.protocols.decoders import decode_arp
+
+
 class RARP:
     """
     Reverse Address Resolution Protocol (RARP) is a networking protocol that is used to map a physical (MAC) address to
@@ -11,18 +14,10 @@ class RARP:
         if self.payload_length < 28:
             raise ValueError("Does not have enough length for RARP packet")
 
-        # Extracting fields from the payload
-        self.hardware_address_type = int.from_bytes(payload[0:2], byteorder='big')  # Hardware Type
-        self.protocol_type = int.from_bytes(payload[2:4], byteorder='big')  # Protocol Type
-        self.hardware_length = payload[4]  # Hardware Address Length
-        self.protocol_length = payload[5]  # Protocol Address Length
-        self.opcode = int.from_bytes(payload[6:8], byteorder='big')  # Operation Code
-
-        # Extracting addresses
-        self.sender_hardware_address = payload[8:14]  # Sender Hardware Address (6 bytes)
-        self.sender_protocol_address = payload[14:18]  # Sender Protocol Address (4 bytes)
-        self.target_hardware_address = payload[18:24]  # Target Hardware Address (6 bytes)
-        self.target_protocol_address = payload[24:28]  # Target Protocol Address (4 bytes)
+        # Extracting fields and addresses from the payload, laid out like ARP
+        (self.hardware_address_type, self.protocol_type, self.hardware_length, self.protocol_length, self.opcode,
+         self.sender_hardware_address, self.sender_protocol_address, self.target_hardware_address,
+         self.target_protocol_address) = decode_arp(payload)
 
     def __str__(self):
         return (f"RARP Packet:\n"
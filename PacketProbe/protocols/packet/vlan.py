@@ -1,16 +1,17 @@
+from PacketProbe.protocols.decoders import decode_vlan
+
+
 class VLAN:
     __slots__ = ('vlan_id', 'priority', 'de', 'ethertype', 'payload')
 
     def __init__(self, packet: bytes):
         """Initialize the VLAN object by parsing the VLAN packet."""
-        if len(packet) < 4:
+        if len(packet) < 6:
             raise ValueError("Packet too short to contain VLAN header")
 
-        # The first two bytes of the VLAN header are reserved and not used in IEEE 802.1Q
-        self.de = packet[:2]  # 2 bytes of the reserved field (Drop Eligible Indicator)
-        self.priority = (packet[2] & 0b11100000) >> 5  # 3 bits for priority
-        self.vlan_id = int.from_bytes(packet[2:4], 'big') & 0x0FFF  # Extract the VLAN ID
-        self.ethertype = int.from_bytes(packet[4:6], 'big')  # EtherType field
+        # The first two bytes are the 0x8100 tag protocol identifier in front of the tag control information
+        self.de = packet[:2]
+        _, self.priority, _, self.vlan_id, self.ethertype = decode_vlan(packet)
         self.payload = packet[6:]  # Remaining packet data after the VLAN header
 
     def __str__(self):
@@ -1,21 +1,15 @@
+from PacketProbe.protocols.decoders import decode_icmp
+
+
 class ICMP:
     def __init__(self, transport_payload):
         self.payload_length = len(transport_payload)
 
-        # Extract the type (1 byte)
-        self.type = transport_payload[0]
-
-        # Extract the code (1 byte)
-        self.code = transport_payload[1]
-
-        # Extract the checksum (2 bytes)
-        self.checksum = int.from_bytes(transport_payload[2:4], byteorder='big')
-
-        # Extract the identifier (2 bytes, for Echo Request/Reply)
-        self.identifier = int.from_bytes(transport_payload[4:6], byteorder='big')
+        if self.payload_length < 8:
+            raise ValueError("Payload is too short for an ICMP header")
 
-        # Extract the sequence number (2 bytes, for Echo Request/Reply)
-        self.sequence_number = int.from_bytes(transport_payload[6:8], byteorder='big')
+        # Type, code, checksum, and the identifier and sequence number used by Echo Request/Reply
+        self.type, self.code, self.checksum, self.identifier, self.sequence_number = decode_icmp(transport_payload)
 
         # The remaining bytes are the data (if any)
         self.data = transport_payload[8:]
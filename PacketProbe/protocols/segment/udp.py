@@ -1,19 +1,16 @@
+from PacketProbe.protocols.decoders import decode_udp
+
+
 class UDP:
     def __init__(self, transport_payload):
         # Ensure packet_payload is in byte form, and its length is sufficient for UDP header.
         self.payload_length = len(transport_payload)
 
-        # Extract the source port (2 bytes)
-        self.source_port = int.from_bytes(transport_payload[0:2], byteorder='big')
-
-        # Extract the destination port (2 bytes)
-        self.destination_port = int.from_bytes(transport_payload[2:4], byteorder='big')
-
-        # Extract the length (2 bytes) and convert it to an integer
-        self.length = int.from_bytes(transport_payload[4:6], byteorder='big')
+        if self.payload_length < 8:
+            raise ValueError("Payload is too short for a UDP header")
 
-        # Extract the checksum (2 bytes)
-        self.checksum = int.from_bytes(transport_payload[6:8], byteorder='big')
+        # Source port, destination port, length and checksum (2 bytes each)
+        self.source_port, self.destination_port, self.length, self.checksum = decode_udp(transport_payload)
 
         # The remaining bytes are the data
         self.data = transport_payload[8:]
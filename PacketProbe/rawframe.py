@@ -1,47 +1,77 @@
 import json
 import datetime
+from time import perf_counter_ns
 
+from PacketProbe import instrumentation
 from PacketProbe.handlepackets import PacketHandler
 from PacketProbe.utils.packetType import determine_packet_type
 
 
-def save_data(data):
+# --frame_type choices mapped to the names returned by determine_packet_type
+FRAME_TYPES = {
+    'ipv4': 'IPv4',
+    'ipv6': 'IPv6',
+    'arp': 'ARP',
+    'rarp': 'RARP',
+    'vlan': '802.1Q VLAN',
+}
+
+
+def convert_bytes(obj):
+    """Converts bytes and memoryviews to a hex string for JSON serialization."""
+    if isinstance(obj, (bytes, memoryview)):
+        return obj.hex()
+    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+
+
+def to_json_line(data) -> str:
+    """Serializes packet data to one line of JSON."""
+    return json.dumps(data, default=convert_bytes)
+
+
+def save_data(data, path='packet_data.json'):
     """Saves packet data to a JSON file, handling serialization."""
     try:
-        def convert_bytes(obj):
-            """Converts bytes to a hex string for JSON serialization."""
-            if isinstance(obj, bytes):
-                return obj.hex()
-            raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
-
-        with open('packet_data.json', 'a') as file:
-            json.dump(data, file, default=convert_bytes)
-            file.write('\n')
+        with open(path, 'a') as file:
+            file.write(to_json_line(data) + '\n')
     except IOError as e:
         print(f"Failed to save packet data: {e}")
 
 
 class RawFrame:
-    def __init__(self, _bytes: bytes, filter_type=None):
+    def __init__(self, _bytes: bytes, filter_type=None, time_stamp=None, lazy=False, sink=save_data,
+                 fragments=None, console=print):
         self.name = self.__class__.__name__
         self.bytes = _bytes
         self.bytes_length = len(_bytes)
-        self.destination_mac = self.format_mac(_bytes[:6])
-        self.source_mac = self.format_mac(_bytes[6:12])
+        # Only frames sampled for the latency histograms are timed
+        probe = instrumentation.probe
+        if probe is not None and not probe.sample():
+            probe = None
+        start = perf_counter_ns() if probe else 0
         self.packet_type = determine_packet_type(_bytes)
-        self.payload = _bytes[14:]
+        if probe:
+            probe.record('dispatch', perf_counter_ns() - start)
 
-        # Timestamp for data collection
-        self.time_stamps = datetime.datetime.now().isoformat()
+        # Stop before any parsing if the frame type doesn't match the filter
+        if filter_type and FRAME_TYPES.get(filter_type.lower()) != self.packet_type:
+            return
 
-        self.packet_handler = PacketHandler()
-        packet_data = self.handle_packets()
+        self.destination_mac = self.format_mac(_bytes[:6])
+        self.source_mac = self.format_mac(_bytes[6:12])
+        # Lazy mode hands a view of the frame down instead of copying the payload; the
+        # parsers slice it into their data without copying either
+        self.payload = memoryview(_bytes)[14:] if lazy else _bytes[14:]
 
-        if filter_type:
-            print(f"Filtering for packet type: {filter_type}")
+        # Timestamp for data collection, the capture time when the source provides one
+        if time_stamp is None:
+            self.time_stamps = datetime.datetime.now().isoformat()
+        else:
+            self.time_stamps = datetime.datetime.fromtimestamp(time_stamp).isoformat()
 
-        if filter_type and filter_type.lower() != self.filter_type.lower():
-            return  # Stop processing if the packet type doesn't match the filter
+        self.time_stamp = time_stamp
+        self.packet_handler = PacketHandler(fragments=fragments, console=console, probe=probe)
+        packet_data = self.handle_packets()
 
         if packet_data:
             packet_data.update({
@@ -50,7 +80,7 @@ class RawFrame:
                 'source_mac': self.source_mac,
                 'destination_mac': self.destination_mac
             })
-            save_data(packet_data)
+            sink(packet_data)
 
     def format_mac(self, mac_bytes):
         """Formats a MAC address in a human-readable format."""
@@ -59,10 +89,10 @@ class RawFrame:
     def handle_packets(self):
         """Handles packet processing based on its frame type."""
         if self.packet_type == 'IPv4':
-            data = self.packet_handler._handle_ipv4_packet(self.payload)
+            data = self.packet_handler._handle_ipv4_packet(self.payload, self.time_stamp)
             return data
         elif self.packet_type == 'IPv6':
-            data = self.packet_handler._handle_ipv6_packet(self.payload)
+            data = self.packet_handler._handle_ipv6_packet(self.payload, self.time_stamp)
             return data
         elif self.packet_type == 'ARP':
             data = self.packet_handler._handle_arp_packet(self.payload)
@@ -0,0 +1,184 @@
+from collections import Counter, OrderedDict
+
+"""
+    FragmentReassembler - IPv4 and IPv6 Fragment Reassembly
+
+    Collects the fragments of IP datagrams and returns the reassembled payload once
+    the last hole is filled. Datagrams are keyed by (source, destination, protocol,
+    identification) for IPv4 and (source, destination, identification) of the
+    Fragment header for IPv6; the caller builds the key.
+
+    Every datagram keeps a list of hole descriptors (RFC 815), so completeness is known
+    without sorting or scanning the received pieces: a fragment only splits or removes
+    the holes it overlaps, and the datagram is complete when no hole is left. Pieces
+    are copied once on arrival and written into one buffer on completion.
+
+    Incomplete datagrams expire on a timer wheel: one slot per tick, and a datagram is
+    filed under the slot of the tick it times out in. Advancing the clock only visits
+    the slots that became due, never the whole table.
+
+    Limits (fragment floods):
+        max_datagram_size  Datagrams that would grow beyond it are dropped.
+        max_fragments      Fragments per datagram; floods of tiny fragments are dropped.
+        memory_limit       Bytes of buffered fragments over all datagrams. Beyond it the
+                           oldest incomplete datagrams are dropped.
+
+    Classes:
+        FragmentReassembler: Reassembles fragmented IP payloads within time and memory limits.
+
+    Usage:
+        fragments = FragmentReassembler(timeout=30)
+        payload = fragments.add(key, offset, more_fragments, data, time_stamp)
+        if payload is not None:
+            ...  # The whole datagram payload has arrived
+"""
+
+# Hole descriptors are open-ended until the last fragment tells the size
+UNKNOWN_END = float('inf')
+
+
+class Datagram:
+    """Fragments received so far for one datagram."""
+
+    __slots__ = ('holes', 'pieces', 'size', 'buffered', 'deadline')
+
+    def __init__(self, deadline: int):
+        self.holes = [(0, UNKNOWN_END)]  # [first, last) byte ranges still missing
+        self.pieces = []  # (offset, bytes) in arrival order
+        self.size = None
+        self.buffered = 0
+        self.deadline = deadline  # Tick of the timer wheel slot holding this datagram
+
+
+class FragmentReassembler:
+    """
+    Reassembles IP datagrams from their fragments.
+
+    Parameters
+    ----------
+    timeout : float
+        Seconds after the first fragment after which an incomplete datagram is dropped.
+    max_datagram_size : int
+        Largest reassembled payload accepted, in bytes.
+    max_fragments : int
+        Largest number of fragments accepted for one datagram.
+    memory_limit : int
+        Bytes of buffered fragments held over all datagrams.
+    tick : float
+        Resolution of the timer wheel in seconds.
+
+    Raises
+    ------
+    ValueError
+        If a limit is less than 1 or ``timeout`` or ``tick`` is not positive.
+    """
+
+    def __init__(self, timeout: float = 30.0, max_datagram_size: int = 65535, max_fragments: int = 64,
+                 memory_limit: int = 4 << 20, tick: float = 1.0):
+        if timeout <= 0 or tick <= 0:
+            raise ValueError("The fragment timeout and tick must be positive.")
+        if max_datagram_size < 1 or max_fragments < 1 or memory_limit < 1:
+            raise ValueError("Fragment reassembly limits must be at least 1.")
+
+        self.timeout_ticks = max(int(-(-timeout // tick)), 1)
+        self.tick = tick
+        self.max_datagram_size = max_datagram_size
+        self.max_fragments = max_fragments
+        self.memory_limit = memory_limit
+        self.datagrams = OrderedDict()  # Oldest first
+        self.wheel = [set() for _ in range(self.timeout_ticks + 1)]
+        self.current_tick = None
+        self.memory = 0
+        self.stats = Counter()
+
+    def add(self, key, offset: int, more_fragments: bool, data, now: float):
+        """
+        Adds the fragment of ``key`` carrying ``data`` at byte ``offset`` of the payload.
+
+        ``now`` is the capture time in seconds. Returns the reassembled payload as bytes
+        once the datagram is complete, otherwise None.
+        """
+        self.stats['fragments'] += 1
+        self.advance(now)
+        end = offset + len(data)
+
+        datagram = self.datagrams.get(key)
+        if datagram is None:
+            datagram = self.datagrams[key] = Datagram(self.current_tick + self.timeout_ticks)
+            self.wheel[datagram.deadline % len(self.wheel)].add(key)
+
+        if end > self.max_datagram_size or len(datagram.pieces) >= self.max_fragments:
+            self._drop(key, datagram, 'oversized')
+            return None
+        if not more_fragments:
+            if datagram.size is not None and datagram.size != end:
+                self._drop(key, datagram, 'inconsistent')
+                return None
+            datagram.size = end
+        elif datagram.size is not None and end > datagram.size:
+            self._drop(key, datagram, 'inconsistent')
+            return None
+
+        # Cut the fragment out of the holes it overlaps
+        holes = []
+        for first, last in datagram.holes:
+            if end <= first or offset >= last:
+                holes.append((first, last))
+                continue
+            if first < offset:
+                holes.append((first, offset))
+            if end < last and more_fragments:
+                holes.append((end, last))
+        if datagram.size is not None:
+            holes = [(first, min(last, datagram.size)) for first, last in holes if first < datagram.size]
+        datagram.holes = holes
+
+        piece = bytes(data)
+        datagram.pieces.append((offset, piece))
+        datagram.buffered += len(piece)
+        self.memory += len(piece)
+
+        if not holes:
+            payload = bytearray(datagram.size)
+            for piece_offset, piece in datagram.pieces:
+                payload[piece_offset:piece_offset + len(piece)] = piece[:datagram.size - piece_offset]
+            self._remove(key, datagram)
+            self.stats['reassembled'] += 1
+            return bytes(payload)
+
+        while self.memory > self.memory_limit and self.datagrams:
+            oldest_key, oldest = next(iter(self.datagrams.items()))
+            self._drop(oldest_key, oldest, 'evicted')
+        return None
+
+    def advance(self, now: float):
+        """Moves the timer wheel to ``now``, dropping the datagrams whose timeout passed."""
+        tick = int(now // self.tick)
+        if self.current_tick is None:
+            self.current_tick = tick
+            return
+        if tick <= self.current_tick:
+            return
+        wheel = self.wheel
+        # After a jump of a whole rotation or more, every slot is due once
+        for due in range(max(self.current_tick + 1, tick - len(wheel) + 1), tick + 1):
+            slot = wheel[due % len(wheel)]
+            for key in list(slot):
+                datagram = self.datagrams[key]
+                if datagram.deadline <= tick:
+                    self._drop(key, datagram, 'timed_out')
+        self.current_tick = tick
+
+    def _remove(self, key, datagram: Datagram):
+        del self.datagrams[key]
+        self.wheel[datagram.deadline % len(self.wheel)].discard(key)
+        self.memory -= datagram.buffered
+
+    def _drop(self, key, datagram: Datagram, reason: str):
+        self._remove(key, datagram)
+        self.stats[reason] += 1
+
+    def __str__(self):
+        """Returns a string representation of the FragmentReassembler instance."""
+        return (f"FragmentReassembler(datagrams={len(self.datagrams)}, memory={self.memory}, "
+                f"reassembled={self.stats['reassembled']})")
@@ -0,0 +1,360 @@
+import os
+from bisect import bisect_right
+from collections import Counter, OrderedDict
+from ipaddress import IPv6Address
+
+from PacketProbe.protocols.decoders import decode_tcp_segment
+
+"""
+    TCPReassembler - Memory-Bounded TCP Stream Reassembly
+
+    Rebuilds the byte streams of TCP connections from captured segments and hands
+    them to registered consumers as contiguous chunks, in order, once per direction.
+
+    Sequence numbers are tracked per direction as 64-bit stream offsets from the
+    initial sequence number, so wrap-around is handled once, on the way in. A segment
+    that starts at or before the next expected offset is delivered at once, trimmed
+    of anything already delivered, as a memoryview of the captured frame (no copy).
+    Segments that arrive ahead of a gap are copied once and kept in a sorted interval
+    list; overlaps are trimmed against what is already buffered (the first copy wins).
+    When the gap fills, the buffered pieces that have become contiguous are joined
+    into one chunk, so a stream is never rebuilt by repeated concatenation.
+
+    Limits:
+        max_depth      Bytes delivered per direction. Later data is counted and dropped,
+                       which is usually all an analyser needs (headers, handshakes).
+        memory_budget  Bytes of out-of-order data held over all streams, plus a fixed
+                       charge per stream. Above it the least recently active streams are
+                       evicted, so a flood of half-open connections cannot exhaust memory.
+
+    Consumers are callables taking (stream, direction, data). direction is 0 for data
+    sent by the stream's client (the end that sent the first segment seen) and 1 for
+    the server. Chunks are bytes or memoryviews and are only valid during the call.
+    When a stream ends (both FINs delivered, RST, eviction or close()) every consumer
+    receives data=None once for each direction.
+
+    Classes:
+        TCPStream: One reassembled connection, passed to the consumers.
+        TCPReassembler: Reassembles the TCP streams of captured frames.
+        StreamFileWriter: Consumer that appends each direction of each stream to its own file.
+
+    Usage:
+        reassembler = TCPReassembler(max_depth=1 << 20)
+        reassembler.add_consumer(StreamFileWriter('streams'))
+        reassembler.feed_batch(batch)
+        reassembler.close()
+"""
+
+FIN, SYN, RST = 0x01, 0x02, 0x04
+SEQUENCE_MASK = 0xFFFFFFFF
+HALF_SEQUENCE = 1 << 31
+# Rough bytes of bookkeeping charged to the memory budget for every stream
+STREAM_OVERHEAD = 512
+
+
+def _format_address(address: bytes) -> str:
+    """Formats a 16-byte address from decode_tcp_segment, IPv4-mapped ones as plain IPv4."""
+    ip = IPv6Address(address)
+    return str(ip.ipv4_mapped or ip)
+
+
+class HalfStream:
+    """Reassembly state of one direction of a stream."""
+
+    __slots__ = ('initial_sequence', 'offset', 'starts', 'pieces', 'buffered', 'fin', 'closed')
+
+    def __init__(self):
+        self.initial_sequence = None  # Sequence number of stream offset 0
+        self.offset = 0  # Next stream offset to deliver
+        self.starts = []  # Sorted offsets of the buffered pieces
+        self.pieces = []  # Buffered bytes, non-overlapping
+        self.buffered = 0
+        self.fin = None  # Stream offset of the FIN
+        self.closed = False
+
+
+class TCPStream:
+    """
+    One TCP connection. The client is the end that sent the first segment seen.
+    """
+
+    __slots__ = ('client', 'client_port', 'server', 'server_port', 'halves', 'delivered')
+
+    def __init__(self, client: bytes, client_port: int, server: bytes, server_port: int):
+        self.client = client
+        self.client_port = client_port
+        self.server = server
+        self.server_port = server_port
+        self.halves = (HalfStream(), HalfStream())
+        self.delivered = [0, 0]
+
+    def endpoints(self, direction: int = 0):
+        """Returns ((address, port), (address, port)) of the sender and receiver of ``direction``."""
+        client = (_format_address(self.client), self.client_port)
+        server = (_format_address(self.server), self.server_port)
+        return (client, server) if direction == 0 else (server, client)
+
+    def __str__(self):
+        """Returns a string representation of the TCPStream instance."""
+        (client, client_port), (server, server_port) = self.endpoints()
+        return f"TCPStream({client}:{client_port} -> {server}:{server_port}, delivered={self.delivered})"
+
+
+class TCPReassembler:
+    """
+    Reassembles TCP streams from captured frames or decoded segments.
+
+    Parameters
+    ----------
+    max_depth : int
+        Maximum number of bytes delivered per direction of a stream.
+    memory_budget : int
+        Maximum number of bytes of buffered out-of-order data and per-stream bookkeeping.
+
+    Raises
+    ------
+    ValueError
+        If ``max_depth`` or ``memory_budget`` is less than 1.
+    """
+
+    def __init__(self, max_depth: int = 1 << 20, memory_budget: int = 64 << 20):
+        if max_depth < 1:
+            raise ValueError("The stream depth must be at least one byte.")
+        if memory_budget < 1:
+            raise ValueError("The reassembly memory budget must be at least one byte.")
+
+        self.max_depth = max_depth
+        self.memory_budget = memory_budget
+        self.streams = OrderedDict()  # Least recently active first
+        self.consumers = []
+        self.memory = 0
+        self.stats = Counter()
+
+    def add_consumer(self, consumer):
+        """Registers a callable that receives (stream, direction, data) for every chunk."""
+        self.consumers.append(consumer)
+
+    def feed(self, frame):
+        """Reassembles the TCP segment of one Ethernet frame; other frames are ignored."""
+        segment = decode_tcp_segment(frame)
+        if segment is None:
+            return
+        source, destination, source_port, destination_port, sequence, flags, start, end = segment
+        self.add_segment(source, destination, source_port, destination_port, sequence, flags,
+                         memoryview(frame)[start:end])
+
+    def feed_batch(self, batch):
+        """Reassembles every frame of a list of (timestamp, frame) tuples."""
+        feed = self.feed
+        for _, frame in batch:
+            feed(frame)
+
+    def add_segment(self, source, destination, source_port: int, destination_port: int, sequence: int,
+                    flags: int, payload):
+        """Adds one decoded TCP segment; ``payload`` is any bytes-like object."""
+        self.stats['segments'] += 1
+        if (source, source_port) <= (destination, destination_port):
+            key = (source, source_port, destination, destination_port)
+        else:
+            key = (destination, destination_port, source, source_port)
+
+        streams = self.streams
+        stream = streams.get(key)
+        if stream is None:
+            # Pure ACKs and resets of connections we never saw open nothing
+            if flags & RST or not (payload or flags & (SYN | FIN)):
+                return
+            stream = streams[key] = TCPStream(source, source_port, destination, destination_port)
+            self.memory += STREAM_OVERHEAD
+            self.stats['streams'] += 1
+        else:
+            streams.move_to_end(key)
+
+        if flags & RST:
+            self._end(key, stream, 'reset')
+            return
+        direction = 0 if source_port == stream.client_port and source == stream.client else 1
+        self._receive(stream, direction, sequence, flags, payload)
+        if stream.halves[0].closed and stream.halves[1].closed:
+            self._end(key, stream, 'closed')
+        elif self.memory > self.memory_budget:
+            self._evict()
+
+    def _receive(self, stream: TCPStream, direction: int, sequence: int, flags: int, payload):
+        half = stream.halves[direction]
+        if flags & SYN:
+            sequence = (sequence + 1) & SEQUENCE_MASK  # The SYN occupies one sequence number
+        if half.initial_sequence is None:
+            half.initial_sequence = sequence
+
+        # Offset of the segment relative to the next expected byte, within +-2 GB
+        expected = (half.initial_sequence + half.offset) & SEQUENCE_MASK
+        start = half.offset + ((sequence - expected + HALF_SEQUENCE) & SEQUENCE_MASK) - HALF_SEQUENCE
+        end = start + len(payload)
+        if flags & FIN:
+            half.fin = end
+
+        if end > self.max_depth:
+            kept = max(self.max_depth - start, 0)
+            self.stats['truncated_bytes'] += len(payload) - kept
+            payload = payload[:kept]
+            end = start + kept
+
+        if end <= half.offset:
+            self.stats['duplicate_bytes'] += len(payload)
+        elif start <= half.offset:
+            self._deliver(stream, direction, half, memoryview(payload)[half.offset - start:], end)
+        else:
+            self._buffer(half, start, end, memoryview(payload))
+
+        if half.fin is not None and half.offset >= min(half.fin, self.max_depth):
+            half.closed = True
+
+    def _deliver(self, stream: TCPStream, direction: int, half: HalfStream, chunk, end: int):
+        """Delivers ``chunk`` ending at ``end``, joined with the buffered pieces it makes contiguous."""
+        half.offset = end
+        starts = half.starts
+        if starts and starts[0] <= end:
+            pieces = half.pieces
+            parts = [chunk]
+            count = 0
+            for piece_start, piece in zip(starts, pieces):
+                if piece_start > half.offset:
+                    break
+                count += 1
+                piece_end = piece_start + len(piece)
+                if piece_end > half.offset:
+                    parts.append(memoryview(piece)[half.offset - piece_start:])
+                    half.offset = piece_end
+                half.buffered -= len(piece)
+                self.memory -= len(piece)
+            del starts[:count]
+            del pieces[:count]
+            chunk = b''.join(parts)
+
+        stream.delivered[direction] += len(chunk)
+        self.stats['delivered_bytes'] += len(chunk)
+        for consumer in self.consumers:
+            consumer(stream, direction, chunk)
+
+    def _buffer(self, half: HalfStream, start: int, end: int, payload):
+        """Copies the parts of an out-of-order segment that are not buffered yet into the interval list."""
+        starts = half.starts
+        pieces = half.pieces
+        index = bisect_right(starts, start)
+        cursor = start
+        if index and starts[index - 1] + len(pieces[index - 1]) > cursor:
+            cursor = starts[index - 1] + len(pieces[index - 1])
+
+        stored = 0
+        while cursor < end:
+            if index < len(starts) and starts[index] <= cursor:
+                cursor = max(cursor, starts[index] + len(pieces[index]))
+                index += 1
+                continue
+            stop = min(starts[index], end) if index < len(starts) else end
+            starts.insert(index, cursor)
+            pieces.insert(index, bytes(payload[cursor - start:stop - start]))
+            stored += stop - cursor
+            index += 1
+            cursor = stop
+
+        half.buffered += stored
+        self.memory += stored
+        self.stats['duplicate_bytes'] += (end - start) - stored
+
+    def _end(self, key, stream: TCPStream, reason: str):
+        del self.streams[key]
+        self.memory -= STREAM_OVERHEAD + stream.halves[0].buffered + stream.halves[1].buffered
+        self.stats[f'{reason}_streams'] += 1
+        for consumer in self.consumers:
+            consumer(stream, 0, None)
+            consumer(stream, 1, None)
+
+    def _evict(self):
+        """Ends the least recently active streams until the buffered data fits the budget again."""
+        streams = self.streams
+        while self.memory > self.memory_budget and streams:
+            key, stream = next(iter(streams.items()))
+            self._end(key, stream, 'evicted')
+
+    def close(self):
+        """Ends every open stream; data still waiting behind a gap is discarded."""
+        while self.streams:
+            key, stream = next(iter(self.streams.items()))
+            self._end(key, stream, 'open')
+
+    def __str__(self):
+        """Returns a string representation of the TCPReassembler instance."""
+        return (f"TCPReassembler(streams={len(self.streams)}, memory={self.memory}, "
+                f"delivered_bytes={self.stats['delivered_bytes']})")
+
+
+class StreamFileWriter:
+    """
+    Consumer that appends each direction of each stream to its own file, named after
+    the sender and receiver, e.g. ``10.0.0.1.40000-10.0.0.5.443``.
+
+    A file stays open from the first chunk of its direction until the stream ends. At
+    most ``max_open`` files are open at once; above that the least recently written one
+    is closed and opened again for appending when more data arrives.
+
+    Parameters
+    ----------
+    directory : str
+        Directory for the stream files, created if needed.
+    max_open : int
+        Number of stream files kept open at once.
+
+    Raises
+    ------
+    ValueError
+        If ``max_open`` is less than 1.
+    """
+
+    def __init__(self, directory: str, max_open: int = 256):
+        if max_open < 1:
+            raise ValueError("The stream writer needs at least one open file.")
+
+        self.directory = os.path.abspath(directory)
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_open = max_open
+        self.files = OrderedDict()  # (stream, direction) -> handle, least recently written first
+        self.bytes_written = 0
+
+    def path(self, stream: TCPStream, direction: int) -> str:
+        (sender, sender_port), (receiver, receiver_port) = stream.endpoints(direction)
+        return os.path.join(self.directory, f"{sender}.{sender_port}-{receiver}.{receiver_port}")
+
+    def _close(self, file):
+        try:
+            file.close()
+        except IOError as e:
+            print(f"Failed to save stream data: {e}")
+
+    def __call__(self, stream: TCPStream, direction: int, data):
+        files = self.files
+        key = (stream, direction)
+        if data is None:
+            file = files.pop(key, None)
+            if file is not None:
+                self._close(file)
+            return
+        try:
+            file = files.get(key)
+            if file is None:
+                if len(files) >= self.max_open:
+                    self._close(files.popitem(last=False)[1])
+                file = files[key] = open(self.path(stream, direction), 'ab')
+            else:
+                files.move_to_end(key)
+            file.write(data)
+        except IOError as e:
+            print(f"Failed to save stream data: {e}")
+            return
+        self.bytes_written += len(data)
+
+    def __str__(self):
+        """Returns a string representation of the StreamFileWriter instance."""
+        return (f"StreamFileWriter(directory={self.directory}, open_files={len(self.files)}, "
+                f"bytes_written={self.bytes_written})")
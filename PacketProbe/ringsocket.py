@@ -0,0 +1,177 @@
+import mmap
+import select
+import socket as _socket
+from struct import Struct
+from time import perf_counter_ns
+
+from PacketProbe import instrumentation
+from PacketProbe.bindsocket import SOL_PACKET, BindSocket
+
+"""
+    BindSocketRing - PACKET_MMAP (TPACKET_V3) Ring Buffer Capture
+
+    This module provides a Linux capture backend that shares a receive ring with the
+    kernel instead of calling recv() once per frame. The kernel fills fixed-size blocks
+    with as many frames as fit and hands a whole block over at once, either when it is
+    full or when the block timeout expires. The capture thread walks each block through
+    a memoryview over the mapped ring and only copies out frames accepted by the
+    optional frame filter.
+
+    Classes:
+        BindSocketRing: TPACKET_V3 RX ring backend with the same queue interface as BindSocket.
+
+    Tuning:
+        block_size: Bytes per block. Larger blocks mean fewer wakeups and more latency.
+        block_count: Number of blocks in the ring; block_size * block_count is the ring memory.
+        frame_size: Upper bound on a single frame slot. Must be a multiple of 16.
+        block_timeout: Milliseconds before the kernel retires a partially filled block.
+"""
+
+PACKET_RX_RING = 5
+PACKET_VERSION = 10
+TPACKET_V3 = 2
+
+TP_STATUS_KERNEL = 0
+TP_STATUS_USER = 1
+TPACKET_ALIGNMENT = 16
+
+# struct tpacket_req3
+_tpacket_req3 = Struct('=7I')
+# struct tpacket_hdr_v1: block_status, num_pkts, offset_to_first_pkt, blk_len (after version/offset_to_priv)
+_block_header = Struct('=4I')
+_BLOCK_HEADER_OFFSET = 8
+# struct tpacket3_hdr: tp_next_offset, tp_sec, tp_nsec, tp_snaplen, tp_len, tp_status, tp_mac, tp_net
+_frame_header = Struct('=6I2H')
+_block_status = Struct('=I')
+
+
+class BindSocketRing(BindSocket):
+    """
+    Captures raw frames from a TPACKET_V3 memory-mapped receive ring.
+
+    Parameters
+    ----------
+    interface : str
+        Name of the interface to bind to.
+    block_size : int
+        Size of a ring block in bytes. Must be a multiple of the page size.
+    block_count : int
+        Number of blocks in the ring.
+    frame_size : int
+        Size of a frame slot in bytes. Must be a multiple of 16 and fit in a block.
+    block_timeout : int
+        Milliseconds after which the kernel hands over a block that is not yet full.
+    frame_filter : callable, optional
+        Called with a memoryview of each frame; frames for which it returns a falsy
+        value are skipped without being copied out of the ring.
+    poll_timeout : float
+        Seconds to block in poll() before re-checking ``is_capturing``.
+    bpf_program : list, optional
+        Classic BPF program attached to the socket; rejected frames never enter the ring.
+    fanout : tuple, optional
+        ``(group_id, mode)`` of a PACKET_FANOUT group to join; each socket in the group maps its own ring.
+    queue_size : int
+        Maximum number of frames waiting on ``raw_packets`` for the consumer.
+    queue_policy : str
+        'drop_newest', 'drop_oldest' or 'block' once ``raw_packets`` is full. With 'block'
+        the ring fills up instead and the kernel drops, which is counted as well.
+    """
+
+    def __init__(self, interface: str, block_size: int = 1 << 22, block_count: int = 64, frame_size: int = 2048,
+                 block_timeout: int = 64, frame_filter=None, poll_timeout: float = 0.5, bpf_program=None,
+                 fanout=None, queue_size: int = 65536, queue_policy: str = 'drop_newest'):
+        super().__init__(interface, poll_timeout=poll_timeout, bpf_program=bpf_program, fanout=fanout,
+                         queue_size=queue_size, queue_policy=queue_policy)
+
+        if block_size % mmap.PAGESIZE:
+            raise ValueError(f"Ring block size must be a multiple of the page size ({mmap.PAGESIZE}).")
+        if frame_size % TPACKET_ALIGNMENT or frame_size > block_size:
+            raise ValueError(f"Ring frame size must be a multiple of {TPACKET_ALIGNMENT} and fit in a block.")
+        if block_count < 1:
+            raise ValueError("Ring needs at least one block.")
+
+        self.block_size = block_size
+        self.block_count = block_count
+        self.frame_size = frame_size
+        self.block_timeout = block_timeout
+        self.frame_filter = frame_filter
+
+    def configure_socket(self, sock: _socket.socket) -> None:
+        """Attaches the filter, switches the socket to TPACKET_V3 and configures the RX ring."""
+        super().configure_socket(sock)
+        sock.setsockopt(SOL_PACKET, PACKET_VERSION, TPACKET_V3)
+        frame_count = (self.block_size // self.frame_size) * self.block_count
+        request = _tpacket_req3.pack(self.block_size, self.block_count, self.frame_size, frame_count,
+                                     self.block_timeout, 0, 0)
+        sock.setsockopt(SOL_PACKET, PACKET_RX_RING, request)
+
+    def capture_packets(self) -> None:
+        try:
+            sock = self.open_socket()
+            ring = mmap.mmap(sock.fileno(), self.block_size * self.block_count,
+                             mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        except OSError as e:
+            print(f"Error setting up ring on interface {self.interface}: {e}")
+            return  # Exit gracefully if the ring cannot be configured
+
+        print(f"Listening on {self.interface} (TPACKET_V3 ring, "
+              f"{self.block_count} x {self.block_size} bytes)")
+
+        poller = select.poll()
+        poller.register(sock, select.POLLIN | select.POLLERR)
+        timeout = int(self.poll_timeout * 1000)
+        view = memoryview(ring)
+        block_index = 0
+        recv_histogram = instrumentation.probe.histogram('capture_recv') if instrumentation.probe else None
+
+        try:
+            while self.is_capturing:
+                self.count_kernel_drops(sock)
+                offset = block_index * self.block_size
+                status = _block_status.unpack_from(ring, offset + _BLOCK_HEADER_OFFSET)[0]
+                if not status & TP_STATUS_USER:
+                    poller.poll(timeout)
+                    continue  # Block still owned by the kernel
+
+                start = perf_counter_ns()
+                batch = self.walk_block(view, offset)
+                if batch:
+                    if recv_histogram is not None:
+                        recv_histogram.record((perf_counter_ns() - start) // len(batch), len(batch))
+                    self.raw_packets.put(batch)
+                block_index = (block_index + 1) % self.block_count
+        except KeyboardInterrupt:
+            print("Stopping packet capture...")
+            self.is_capturing = False
+        finally:
+            self.next_stats = 0.0
+            self.count_kernel_drops(sock)
+            view.release()
+            ring.close()
+            sock.close()
+
+    def walk_block(self, view: memoryview, offset: int) -> list:
+        """Copies out the accepted frames of one user-owned block and returns it to the kernel."""
+        _, num_packets, first_packet, _ = _block_header.unpack_from(view, offset + _BLOCK_HEADER_OFFSET)
+        frame_filter = self.frame_filter
+        unpack_frame = _frame_header.unpack_from
+        batch = []
+        append = batch.append
+
+        position = offset + first_packet
+        for _ in range(num_packets):
+            next_offset, seconds, nanoseconds, snaplen, _, _, mac, _ = unpack_frame(view, position)
+            start = position + mac
+            frame = view[start:start + snaplen]
+            if frame_filter is None or frame_filter(frame):
+                append((seconds + nanoseconds * 1e-9, bytes(frame)))
+            frame.release()
+            position += next_offset
+
+        _block_status.pack_into(view, offset + _BLOCK_HEADER_OFFSET, TP_STATUS_KERNEL)
+        return batch
+
+    def __str__(self):
+        """Returns a string representation of the BindSocketRing instance."""
+        return (f"BindSocketRing(interface={self.interface}, is_capturing={self.is_capturing}, "
+                f"block_size={self.block_size}, block_count={self.block_count})")
@@ -0,0 +1,113 @@
+import threading
+from time import perf_counter
+
+"""
+    BufferedSink - Background Flushing Shared by the Batched Outputs
+
+    The JSON lines writer, the CSV pool and the SQLite sink all buffer records on the
+    caller's thread and write them from a background thread, when batch_size records
+    are waiting or every flush_interval seconds. BufferedSink holds that machinery:
+    the buffer lock, the write lock that keeps batches in order, the wake event, the
+    flush thread, close() and the write counters read by the metrics endpoint.
+
+    A subclass only says how to take the buffered records (_take) and how to write
+    them out (_write) and its output closed (_close_output).
+
+    Classes:
+        BufferedSink: Base of the sinks written from a background flush thread.
+"""
+
+
+class BufferedSink:
+    """
+    Buffers records and writes them out from a background thread.
+
+    Subclasses set up their buffers and output, then call _start_flushing().
+
+    Parameters
+    ----------
+    batch_size : int
+        Number of buffered records that triggers a write.
+    flush_interval : float
+        Seconds after which buffered records are written even if the batch is not full.
+    name : str
+        Name of the output in error messages.
+
+    Raises
+    ------
+    ValueError
+        If ``batch_size`` is less than 1 or ``flush_interval`` is not positive.
+    """
+
+    def __init__(self, batch_size: int, flush_interval: float, name: str):
+        if batch_size < 1:
+            raise ValueError(f"The {name} batch size must be at least 1.")
+        if flush_interval <= 0:
+            raise ValueError(f"The {name} flush interval must be positive.")
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.write_lock = threading.Lock()
+        self.wake = threading.Event()
+        # Written by whichever thread flushes, under write_lock
+        self.records_written = 0
+        self.flushes = 0
+        self.flush_seconds = 0.0
+        self.is_open = True
+        self.output_closed = False
+        self.flush_thread = threading.Thread(target=self._flush_periodically, daemon=True)
+
+    def _start_flushing(self):
+        self.flush_thread.start()
+
+    def _take(self):
+        """Returns the buffered records and empties the buffers; called under lock. Falsy when there are none."""
+        raise NotImplementedError
+
+    def _write(self, batch) -> int:
+        """Writes what _take returned and returns the number of records written; called under write_lock."""
+        raise NotImplementedError
+
+    def _close_output(self):
+        """Closes the file or connection; called under write_lock after the last flush."""
+        raise NotImplementedError
+
+    def _flush_periodically(self):
+        while self.is_open:
+            self.wake.wait(self.flush_interval)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered record out."""
+        with self.lock:
+            batch = self._take()
+        # Serialises the writes, and keeps batches in order when close() races the thread
+        with self.write_lock:
+            if not batch or self.output_closed:
+                return
+            start = perf_counter()
+            try:
+                self.records_written += self._write(batch)
+            finally:
+                self.flushes += 1
+                self.flush_seconds += perf_counter() - start
+
+    def close(self):
+        """Stops the flush thread, writes what is left and closes the output."""
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.wake.set()
+        self.flush_thread.join()
+        self.flush()
+        with self.write_lock:
+            self.output_closed = True
+            self._close_output()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,104 @@
+import csv
+import io
+import os
+
+from PacketProbe.sinks.buffered import BufferedSink
+
+"""
+    CSVSink - Pooled, Batched CSV Output for the Per-Protocol Files
+
+    The Info.get_*_info helpers save every header they extract to a per-protocol CSV
+    file (PacketProbe/data/ipv4.csv, tcp.csv, ...). Instead of opening the file and
+    building a DictWriter for every row, CSVSink only snapshots the row on the parse
+    path. A background thread groups the buffered rows by file and writes each group
+    with one writerows() call, through one handle per file that stays open for the
+    whole capture.
+
+    The header of a file is written once, when the sink creates the file, from the keys
+    of its first row, and is then cached with the handle. Every flush is encoded first
+    and then handed to the kernel in a single append, so several processes (pipeline
+    or fanout workers) writing the same file never interleave inside a row.
+
+    Classes:
+        CSVSink: Buffers protocol rows and appends them to their CSV files from a background thread.
+"""
+
+
+class CSVSink(BufferedSink):
+    """
+    Pools one append handle per CSV file and writes buffered rows in batches.
+
+    Parameters
+    ----------
+    directory : str
+        Directory holding the CSV files, relative to the working directory at creation.
+    batch_size : int
+        Number of buffered rows that triggers a write.
+    flush_interval : float
+        Seconds after which buffered rows are written even if the batch is not full.
+
+    Raises
+    ------
+    ValueError
+        If ``batch_size`` is less than 1 or ``flush_interval`` is not positive.
+    """
+
+    def __init__(self, directory: str = 'PacketProbe/data', batch_size: int = 1000, flush_interval: float = 1.0):
+        super().__init__(batch_size, flush_interval, 'CSV sink')
+        # Rows are written later from another thread, so pin the directory now
+        self.directory = os.path.abspath(directory)
+        self.rows = []
+        self.files = {}  # filename -> (handle, header)
+        self._start_flushing()
+
+    def write(self, filename: str, packet_data: dict):
+        """Buffers one row for ``filename``; the caller may keep modifying ``packet_data``."""
+        with self.lock:
+            self.rows.append((filename, packet_data.copy()))
+            full = len(self.rows) >= self.batch_size
+        if full:
+            self.wake.set()
+
+    def _open(self, filename: str, header):
+        path = os.path.join(self.directory, filename)
+        new = not os.path.isfile(path)
+        handle = open(path, 'ab', buffering=0)
+        self.files[filename] = (handle, header)
+        return handle, new
+
+    def _take(self):
+        rows, self.rows = self.rows, []
+        return rows
+
+    def _write(self, rows) -> int:
+        grouped = {}
+        for filename, packet_data in rows:
+            grouped.setdefault(filename, []).append(packet_data)
+
+        written = 0
+        for filename, group in grouped.items():
+            text = io.StringIO()
+            writer = csv.writer(text)
+            try:
+                if filename in self.files:
+                    handle = self.files[filename][0]
+                else:
+                    handle, new = self._open(filename, tuple(group[0]))
+                    if new:
+                        writer.writerow(group[0].keys())
+                writer.writerows(packet_data.values() for packet_data in group)
+                handle.write(text.getvalue().encode('utf-8'))
+            except (IOError, ValueError) as e:
+                print(f"Failed to save packet data to {filename}: {e}")
+                continue
+            written += len(group)
+        return written
+
+    def _close_output(self):
+        for handle, _ in self.files.values():
+            handle.close()
+        self.files.clear()
+
+    def __str__(self):
+        """Returns a string representation of the CSVSink instance."""
+        return f"CSVSink(directory={self.directory}, files={len(self.files)}, records_written={self.records_written})"
@@ -0,0 +1,95 @@
+from PacketProbe.rawframe import to_json_line
+from PacketProbe.sinks.buffered import BufferedSink
+
+"""
+    JsonLinesWriter - Batched JSON Lines Output
+
+    rawframe.save_data opens the output file, writes one line and closes it again for
+    every packet. JsonLinesWriter keeps the file open for the whole capture: records
+    are encoded to JSON as they arrive and appended to an in-memory buffer, and a
+    background thread writes the buffer out in one call when it reaches batch_size
+    records or every flush_interval seconds, whichever comes first. close() stops the
+    thread and writes whatever is left. The number of buffered records and the time
+    spent in each write are kept for the metrics endpoint.
+
+    Classes:
+        JsonLinesWriter: Callable RawFrame sink that writes packet data as batched JSON lines.
+
+    Usage:
+        with JsonLinesWriter('packet_data.json') as writer:
+            RawFrame(frame, sink=writer)
+"""
+
+
+class JsonLinesWriter(BufferedSink):
+    """
+    Buffers packet data as JSON lines and writes it out from a background thread.
+
+    Instances are callable with a packet data dict, so they can be passed as the
+    ``sink`` of RawFrame.
+
+    Parameters
+    ----------
+    path : str
+        File to append to.
+    batch_size : int
+        Number of buffered records that triggers a write.
+    flush_interval : float
+        Seconds after which buffered records are written even if the batch is not full.
+
+    Raises
+    ------
+    ValueError
+        If ``batch_size`` is less than 1 or ``flush_interval`` is not positive.
+    """
+
+    def __init__(self, path: str = 'packet_data.json', batch_size: int = 1000, flush_interval: float = 1.0):
+        super().__init__(batch_size, flush_interval, 'JSON writer')
+        self.path = path
+        self.file = open(path, 'a', buffering=1 << 20)
+        self.buffer = []
+        self._start_flushing()
+
+    def __call__(self, data):
+        self.write_line(to_json_line(data))
+
+    def write_line(self, line: str):
+        """Buffers one already encoded JSON line."""
+        with self.lock:
+            self.buffer.append(line)
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wake.set()
+
+    def write_lines(self, lines):
+        """Buffers already encoded JSON lines, e.g. the output of a worker process."""
+        with self.lock:
+            self.buffer.extend(lines)
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wake.set()
+
+    @property
+    def backlog(self) -> int:
+        """Records buffered and not yet written."""
+        return len(self.buffer)
+
+    def _take(self):
+        lines, self.buffer = self.buffer, []
+        return lines
+
+    def _write(self, lines) -> int:
+        try:
+            self.file.write('\n'.join(lines) + '\n')
+            self.file.flush()
+        except IOError as e:
+            print(f"Failed to save packet data: {e}")
+            return 0
+        return len(lines)
+
+    def _close_output(self):
+        self.file.close()
+
+    def __str__(self):
+        """Returns a string representation of the JsonLinesWriter instance."""
+        return f"JsonLinesWriter(path={self.path}, records_written={self.records_written})"
@@ -0,0 +1,490 @@
+import glob
+import ipaddress
+import mmap
+import os
+import time
+from bisect import bisect_left
+from struct import Struct
+
+from PacketProbe.protocols.decoders import IPV4_MAPPED_PREFIX, decode_headers
+
+"""
+    Record Log - Append-Only Binary Records with Per-Segment Indexes
+
+    A compact binary format for parsed packets that is cheap to write and to read back.
+    Every frame becomes one record: a fixed 64-byte header holding the summary fields
+    (timestamp, lengths, ethertype, IP version, TTL, protocol, addresses, ports, TCP flags)
+    followed by a variable section with the bytes after the last decoded header.
+
+    Records are appended to segment files (capture_0001.ppr, capture_0002.ppr, ...). When a
+    segment reaches segment_size it is finished with an index and a trailer and the next
+    one is started:
+
+        segment   = file header | record* | time index | protocol index | trailer
+        record    = RECORD_HEADER | payload
+        time idx  = (timestamp, offset) of every index_stride-th record
+        proto idx = directory of (protocol, count, position) + one u32 offset array per protocol
+        trailer   = counts and positions of the above, earliest/latest timestamp, magic
+
+    The reader maps a segment with mmap and hands out Record objects that decode a field
+    only when it is read, straight from the mapping. A time range is found by bisecting
+    the sparse time index (then scanning at most index_stride records) and a protocol by
+    reading its offset array, so neither needs a scan of the segment. A segment without
+    a trailer (still being written, or the writer died) is scanned once on open and
+    indexed in memory instead.
+
+    Classes:
+        RecordLogWriter: Appends records to rotating segment files.
+        RecordLog: Reads every segment of a log, with time range and protocol queries.
+        Segment: One memory-mapped segment file.
+        Record: Lazy view of one record.
+
+    Usage:
+        with RecordLogWriter('capture.ppr') as log:
+            log.write_batch(batch)
+
+        for record in RecordLog('capture.ppr').between(start, end):
+            print(record.source_ip, record.destination_port)
+"""
+
+FILE_MAGIC = b'PPRL'
+TRAILER_MAGIC = b'PPRX'
+FORMAT_VERSION = 1
+NON_IP_PROTOCOL = 0  # Protocol value (and index key) of frames without an IP layer
+
+FILE_HEADER = Struct('<4sHH')
+# record_length, time_stamp, frame_length, ethertype, ip_version, ttl, protocol, tcp_flags, ip_length,
+# source_port, destination_port, source_ip, destination_ip
+RECORD_HEADER = Struct('<IdIHBBBBIHH16s16s2x')
+TIME_ENTRY = Struct('<dQ')
+PROTOCOL_ENTRY = Struct('<HIQ')
+# records_end, record_count, time_index_position, time_index_count, index_stride,
+# protocol_index_position, protocol_count, earliest, latest, time_ordered, magic
+TRAILER = Struct('<QIQIIQIdd?3x4s')
+
+_record_length = Struct('<I')
+
+
+def _field(fmt: str, position: int, doc: str):
+    unpack_from = Struct('<' + fmt).unpack_from
+
+    def get(self):
+        return unpack_from(self.mapping, self.offset + position)[0]
+
+    return property(get, doc=doc)
+
+
+def _address(position: int):
+    def get(self):
+        if not self.ip_version:
+            return None
+        start = self.offset + position
+        packed = self.mapping[start:start + 16]
+        if packed[:12] == IPV4_MAPPED_PREFIX:
+            return ipaddress.IPv4Address(packed[12:])
+        return ipaddress.IPv6Address(packed)
+
+    return property(get)
+
+
+class Record:
+    """
+    Lazy view of one record in a mapped segment; every attribute is decoded on access.
+
+    Parameters
+    ----------
+    mapping : mmap.mmap
+        The segment mapping.
+    offset : int
+        Where the record starts.
+    """
+
+    __slots__ = ('mapping', 'offset')
+
+    def __init__(self, mapping, offset: int):
+        self.mapping = mapping
+        self.offset = offset
+
+    record_length = _field('I', 0, "Length of the record including its header.")
+    time_stamp = _field('d', 4, "Capture time in seconds since the epoch.")
+    frame_length = _field('I', 12, "Length of the captured frame.")
+    ethertype = _field('H', 16, "Ethertype after any 802.1Q tags.")
+    ip_version = _field('B', 18, "4, 6 or 0 for non-IP frames.")
+    ttl = _field('B', 19, "TTL or hop limit.")
+    protocol = _field('B', 20, "IPv4 protocol or IPv6 upper-layer header, 0 for non-IP frames.")
+    tcp_flags = _field('B', 21, "TCP flags byte.")
+    ip_length = _field('I', 22, "IPv4 total length or IPv6 payload length plus the header.")
+    source_port = _field('H', 26, "TCP/UDP source port, 0 otherwise.")
+    destination_port = _field('H', 28, "TCP/UDP destination port, 0 otherwise.")
+    source_ip = _address(30)
+    destination_ip = _address(46)
+
+    @property
+    def payload(self) -> bytes:
+        """The bytes after the last decoded header, as stored."""
+        start = self.offset + RECORD_HEADER.size
+        return self.mapping[start:self.offset + self.record_length]
+
+    def to_dict(self) -> dict:
+        return {
+            'time_stamp': self.time_stamp, 'frame_length': self.frame_length, 'ethertype': self.ethertype,
+            'ip_version': self.ip_version, 'ttl': self.ttl, 'protocol': self.protocol, 'tcp_flags': self.tcp_flags,
+            'ip_length': self.ip_length, 'source_port': self.source_port,
+            'destination_port': self.destination_port,
+            'source_ip': str(self.source_ip) if self.ip_version else None,
+            'destination_ip': str(self.destination_ip) if self.ip_version else None,
+            'payload': self.payload,
+        }
+
+    def __str__(self):
+        """Returns a string representation of the Record instance."""
+        return (f"Record(time_stamp={self.time_stamp}, protocol={self.protocol}, "
+                f"source={self.source_ip}:{self.source_port}, destination={self.destination_ip}:"
+                f"{self.destination_port}, frame_length={self.frame_length})")
+
+
+class RecordLogWriter:
+    """
+    Appends packet records to rotating, indexed segment files.
+
+    Parameters
+    ----------
+    path : str
+        Name template for the segments, e.g. capture.ppr -> capture_0001.ppr, capture_0002.ppr.
+    segment_size : int
+        Bytes after which a segment is finished and the next one started. At most 4 GiB,
+        so record offsets fit the 32-bit protocol index.
+    index_stride : int
+        Every index_stride-th record gets a time index entry. Larger strides mean a smaller
+        index and longer scans after the bisection.
+    payload_limit : int, optional
+        Store at most this many payload bytes per record; None keeps the whole payload.
+    buffer_size : int
+        Bytes buffered before they are written to the segment.
+
+    Raises
+    ------
+    ValueError
+        If ``segment_size`` or ``index_stride`` is out of range.
+    """
+
+    def __init__(self, path: str, segment_size: int = 256 << 20, index_stride: int = 64, payload_limit: int = None,
+                 buffer_size: int = 1 << 20):
+        if not 1 << 16 <= segment_size <= 1 << 32:
+            raise ValueError("Record log segments must be between 64 KiB and 4 GiB.")
+        if index_stride < 1:
+            raise ValueError("The time index stride must be at least 1.")
+
+        self.path = path
+        self.segment_size = segment_size
+        self.index_stride = index_stride
+        self.payload_limit = payload_limit
+        self.buffer_size = buffer_size
+        self.records_written = 0
+        self.files = []
+        self._sequence = 0
+        self._file = None
+        self._open_next()
+
+    def _open_next(self):
+        self._sequence += 1
+        stem, extension = os.path.splitext(self.path)
+        path = f"{stem}_{self._sequence:04d}{extension or '.ppr'}"
+        self._file = open(path, 'wb', buffering=0)  # We do our own buffering
+        self.files.append(path)
+        self._buffer = bytearray(FILE_HEADER.pack(FILE_MAGIC, FORMAT_VERSION, 0))
+        self._position = len(self._buffer)  # Offset of the next record in the segment
+        self._count = 0
+        self._time_index = []
+        self._protocols = {}
+        self._earliest = self._latest = self._previous = 0.0
+        self._time_ordered = True
+
+    def write(self, frame, time_stamp: float = None) -> None:
+        """Decodes the headers of one frame and appends its record."""
+        if time_stamp is None:
+            time_stamp = time.time()
+        (ethertype, ip_version, ip_length, ttl, protocol, source, destination, source_port, destination_port,
+         tcp_flags, payload_offset) = decode_headers(frame)
+        end = len(frame)
+        if self.payload_limit is not None:
+            end = min(end, payload_offset + self.payload_limit)
+        payload = frame[payload_offset:end]
+        record_length = RECORD_HEADER.size + len(payload)
+
+        if self._count and self._position + record_length > self.segment_size:
+            self._finish_segment()
+            self._file.close()
+            self._open_next()
+
+        position = self._position
+        if self._count % self.index_stride == 0:
+            self._time_index.append((time_stamp, position))
+        if self._count == 0:
+            self._earliest = self._latest = time_stamp
+        elif time_stamp < self._previous:
+            self._time_ordered = False
+            self._earliest = min(self._earliest, time_stamp)
+        else:
+            self._latest = max(self._latest, time_stamp)
+        self._previous = time_stamp
+        offsets = self._protocols.get(protocol)
+        if offsets is None:
+            offsets = self._protocols[protocol] = []
+        offsets.append(position)
+
+        buffer = self._buffer
+        buffer += RECORD_HEADER.pack(record_length, time_stamp, len(frame), ethertype, ip_version, ttl, protocol,
+                                     tcp_flags, min(ip_length, 0xFFFFFFFF), source_port, destination_port, source,
+                                     destination)
+        buffer += payload
+        self._position += record_length
+        self._count += 1
+        self.records_written += 1
+        if len(buffer) >= self.buffer_size:
+            self.flush()
+
+    def write_batch(self, batch) -> None:
+        """Appends an iterable of (timestamp, frame) tuples."""
+        write = self.write
+        for time_stamp, frame in batch:
+            write(frame, time_stamp)
+
+    def flush(self) -> None:
+        """Writes the buffered records to the current segment."""
+        if not self._buffer:
+            return
+        try:
+            self._file.write(self._buffer)
+        except OSError as e:
+            print(f"Failed to write record log {self._file.name}: {e}")
+        self._buffer.clear()
+
+    def _finish_segment(self):
+        """Appends the time index, the protocol index and the trailer to the current segment."""
+        buffer = self._buffer
+        records_end = self._position
+        time_index_position = records_end
+        for entry in self._time_index:
+            buffer += TIME_ENTRY.pack(*entry)
+
+        protocol_index_position = time_index_position + TIME_ENTRY.size * len(self._time_index)
+        arrays_position = protocol_index_position + PROTOCOL_ENTRY.size * len(self._protocols)
+        arrays = bytearray()
+        for protocol, offsets in sorted(self._protocols.items()):
+            buffer += PROTOCOL_ENTRY.pack(protocol, len(offsets), arrays_position + len(arrays))
+            arrays += Struct(f'<{len(offsets)}I').pack(*offsets)
+        buffer += arrays
+        buffer += TRAILER.pack(records_end, self._count, time_index_position, len(self._time_index),
+                               self.index_stride, protocol_index_position, len(self._protocols), self._earliest,
+                               self._latest, self._time_ordered, TRAILER_MAGIC)
+        self.flush()
+
+    def close(self) -> None:
+        """Finishes the current segment and closes it."""
+        if self._file is None:
+            return
+        self._finish_segment()
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns a string representation of the RecordLogWriter instance."""
+        return f"RecordLogWriter(path={self.path}, records_written={self.records_written}, files={len(self.files)})"
+
+
+class Segment:
+    """
+    One memory-mapped record log segment.
+
+    Parameters
+    ----------
+    path : str
+        Path to the segment file.
+
+    Raises
+    ------
+    ValueError
+        If the file is not a record log segment.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            if size < FILE_HEADER.size:
+                raise ValueError(f"{path} is too short to be a record log segment.")
+            self.mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, _ = FILE_HEADER.unpack_from(self.mapping)
+        if magic != FILE_MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{path} is not a version {FORMAT_VERSION} record log segment.")
+
+        self.complete = size >= FILE_HEADER.size + TRAILER.size and self.mapping[-4:] == TRAILER_MAGIC
+        if self.complete:
+            self._read_trailer()
+        else:
+            self._scan()
+
+    def _read_trailer(self):
+        (self.records_end, self.count, time_index_position, time_index_count, self.index_stride,
+         self.protocol_index_position, self.protocol_count, self.earliest, self.latest, self.time_ordered,
+         _) = TRAILER.unpack_from(self.mapping, len(self.mapping) - TRAILER.size)
+        self.time_index = list(TIME_ENTRY.iter_unpack(
+            self.mapping[time_index_position:time_index_position + TIME_ENTRY.size * time_index_count]))
+        self.time_keys = [time_stamp for time_stamp, _ in self.time_index]
+        self.protocol_index = {}
+        position = self.protocol_index_position
+        for _ in range(self.protocol_count):
+            protocol, count, array_position = PROTOCOL_ENTRY.unpack_from(self.mapping, position)
+            self.protocol_index[protocol] = (count, array_position)
+            position += PROTOCOL_ENTRY.size
+
+    def _scan(self):
+        """Indexes an unfinished segment in memory by walking its records."""
+        offsets, protocols = [], {}
+        position, size = FILE_HEADER.size, len(self.mapping)
+        earliest = latest = previous = 0.0
+        ordered = True
+        while position + RECORD_HEADER.size <= size:
+            record = Record(self.mapping, position)
+            record_length = record.record_length
+            if record_length < RECORD_HEADER.size or position + record_length > size:
+                break  # Torn write at the end of the file
+            time_stamp = record.time_stamp
+            if not offsets:
+                earliest = latest = time_stamp
+            elif time_stamp < previous:
+                ordered = False
+            earliest, latest, previous = min(earliest, time_stamp), max(latest, time_stamp), time_stamp
+            offsets.append(position)
+            protocols.setdefault(record.protocol, []).append(position)
+            position += record_length
+
+        self.records_end = position
+        self.count = len(offsets)
+        self.index_stride = 1
+        self.time_index = [(Record(self.mapping, offset).time_stamp, offset) for offset in offsets]
+        self.time_keys = [time_stamp for time_stamp, _ in self.time_index]
+        self.earliest, self.latest, self.time_ordered = earliest, latest, ordered
+        self.scanned_protocols = protocols
+        self.protocol_index = {}
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        """Yields every record in write order."""
+        return self._records_from(FILE_HEADER.size)
+
+    def _records_from(self, position: int):
+        records_end = self.records_end
+        read_length = _record_length.unpack_from
+        while position < records_end:
+            yield Record(self.mapping, position)
+            position += read_length(self.mapping, position)[0]
+
+    def record_at(self, offset: int) -> Record:
+        """Returns the record starting at ``offset``."""
+        if not FILE_HEADER.size <= offset < self.records_end:
+            raise IndexError(f"No record at offset {offset}")
+        return Record(self.mapping, offset)
+
+    def between(self, start: float, end: float):
+        """Yields the records with start <= time_stamp <= end."""
+        if self.count == 0 or start > self.latest or end < self.earliest:
+            return
+        if not self.time_ordered:
+            for record in self:
+                if start <= record.time_stamp <= end:
+                    yield record
+            return
+
+        # The last index entry before start, then scan forward. Not at start: the records
+        # of a batch share a timestamp, and some of them may come before that entry.
+        index = max(bisect_left(self.time_keys, start) - 1, 0)
+        for record in self._records_from(self.time_index[index][1]):
+            time_stamp = record.time_stamp
+            if time_stamp > end:
+                return
+            if time_stamp >= start:
+                yield record
+
+    def offsets(self, protocol: int):
+        """Returns the offsets of every record with the given protocol."""
+        if not self.complete:
+            return self.scanned_protocols.get(protocol, [])
+        if protocol not in self.protocol_index:
+            return []
+        count, position = self.protocol_index[protocol]
+        return Struct(f'<{count}I').unpack_from(self.mapping, position)
+
+    def by_protocol(self, protocol: int):
+        """Yields the records with the given protocol (0 for non-IP frames)."""
+        for offset in self.offsets(protocol):
+            yield Record(self.mapping, offset)
+
+    def close(self):
+        self.mapping.close()
+
+    def __str__(self):
+        """Returns a string representation of the Segment instance."""
+        return f"Segment(path={self.path}, records={self.count}, complete={self.complete})"
+
+
+class RecordLog:
+    """
+    Reads every segment written for one record log path.
+
+    Parameters
+    ----------
+    path : str
+        The path given to RecordLogWriter (its segments are found next to it), or a single segment file.
+    """
+
+    def __init__(self, path: str):
+        stem, extension = os.path.splitext(path)
+        paths = sorted(glob.glob(f"{glob.escape(stem)}_[0-9][0-9][0-9][0-9]{extension or '.ppr'}"))
+        if not paths and os.path.isfile(path):
+            paths = [path]
+        if not paths:
+            raise FileNotFoundError(f"No record log segments found for {path}")
+        self.path = path
+        self.segments = [Segment(segment_path) for segment_path in paths]
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def __iter__(self):
+        for segment in self.segments:
+            yield from segment
+
+    def between(self, start: float, end: float):
+        """Yields the records with start <= time_stamp <= end, skipping segments outside the range."""
+        for segment in self.segments:
+            yield from segment.between(start, end)
+
+    def by_protocol(self, protocol: int):
+        """Yields the records with the given protocol (0 for non-IP frames)."""
+        for segment in self.segments:
+            yield from segment.by_protocol(protocol)
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def __str__(self):
+        """Returns a string representation of the RecordLog instance."""
+        return f"RecordLog(path={self.path}, segments={len(self.segments)})"
@@ -0,0 +1,259 @@
+import sqlite3
+
+from PacketProbe.sinks.buffered import BufferedSink
+from PacketProbe.utils.helpers import _epoch
+
+"""
+    SQLiteSink - Indexed SQLite Output
+
+    Stores the parsed packet data in a normalised SQLite database, so questions like
+    "all traffic to 10.0.0.5:443 in the last 5 minutes" are answered from indexes
+    instead of by scanning a JSON file:
+
+        frames      One row per packet: capture time (epoch seconds), length, MACs and protocol.
+        ip_headers  The IPv4 or IPv6 header of a frame; TTL/Hop Limit and Total/Payload Length
+                    share a column, the version tells them apart.
+        l4_headers  The TCP or UDP header of a frame.
+        flows       Finished flow records from the FlowTable, written with write_flow().
+
+    The header rows share the id of their frame. Records are reduced to row tuples as
+    they arrive and a background thread inserts them, one transaction per batch, with
+    one executemany() per table so every statement is prepared once per batch. The
+    database runs in WAL mode, so it can be queried while a capture is writing to it.
+    The number of buffered records and the time spent in each transaction are kept
+    for the metrics endpoint.
+
+    Classes:
+        SQLiteSink: Callable RawFrame sink that inserts packet data in batched transactions.
+
+    Usage:
+        with SQLiteSink('packets.db') as database:
+            RawFrame(frame, sink=database)
+            database.traffic(destination_ip='10.0.0.5', destination_port=443, since=time.time() - 300)
+"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    id INTEGER PRIMARY KEY,
+    time_stamp REAL NOT NULL,
+    bytes_length INTEGER,
+    source_mac TEXT,
+    destination_mac TEXT,
+    protocol TEXT
+);
+CREATE TABLE IF NOT EXISTS ip_headers (
+    frame_id INTEGER PRIMARY KEY REFERENCES frames(id),
+    version INTEGER,
+    source_ip TEXT,
+    destination_ip TEXT,
+    protocol INTEGER,
+    ttl INTEGER,
+    length INTEGER,
+    identification INTEGER,
+    flags INTEGER,
+    fragment_offset INTEGER,
+    traffic_class INTEGER,
+    flow_label INTEGER
+);
+CREATE TABLE IF NOT EXISTS l4_headers (
+    frame_id INTEGER PRIMARY KEY REFERENCES frames(id),
+    source_port INTEGER,
+    destination_port INTEGER,
+    sequence_number INTEGER,
+    acknowledgment_number INTEGER,
+    flags INTEGER,
+    window_size INTEGER,
+    length INTEGER,
+    checksum INTEGER
+);
+CREATE TABLE IF NOT EXISTS flows (
+    id INTEGER PRIMARY KEY,
+    source_ip TEXT,
+    source_port INTEGER,
+    destination_ip TEXT,
+    destination_port INTEGER,
+    protocol INTEGER,
+    first_seen REAL,
+    last_seen REAL,
+    packets INTEGER,
+    bytes INTEGER,
+    reverse_packets INTEGER,
+    reverse_bytes INTEGER,
+    tcp_flags INTEGER,
+    end_reason TEXT
+);
+CREATE INDEX IF NOT EXISTS frames_time_stamp ON frames(time_stamp);
+CREATE INDEX IF NOT EXISTS ip_headers_source ON ip_headers(source_ip);
+CREATE INDEX IF NOT EXISTS ip_headers_destination ON ip_headers(destination_ip);
+CREATE INDEX IF NOT EXISTS l4_headers_source_port ON l4_headers(source_port);
+CREATE INDEX IF NOT EXISTS l4_headers_destination_port ON l4_headers(destination_port);
+CREATE INDEX IF NOT EXISTS flows_first_seen ON flows(first_seen);
+CREATE INDEX IF NOT EXISTS flows_source ON flows(source_ip);
+CREATE INDEX IF NOT EXISTS flows_destination ON flows(destination_ip);
+"""
+
+INSERT_FRAME = "INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?)"
+INSERT_IP_HEADER = "INSERT INTO ip_headers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_L4_HEADER = "INSERT INTO l4_headers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+INSERT_FLOW = ("INSERT INTO flows (source_ip, source_port, destination_ip, destination_port, protocol, first_seen, "
+               "last_seen, packets, bytes, reverse_packets, reverse_bytes, tcp_flags, end_reason) "
+               "VALUES (:source_ip, :source_port, :destination_ip, :destination_port, :protocol, :first_seen, "
+               ":last_seen, :packets, :bytes, :reverse_packets, :reverse_bytes, :tcp_flags, :end_reason)")
+
+TRAFFIC_QUERY = """
+SELECT frames.time_stamp, frames.protocol, ip_headers.source_ip, l4_headers.source_port,
+       ip_headers.destination_ip, l4_headers.destination_port, frames.bytes_length
+FROM frames
+JOIN ip_headers ON ip_headers.frame_id = frames.id
+LEFT JOIN l4_headers ON l4_headers.frame_id = frames.id
+"""
+
+
+class SQLiteSink(BufferedSink):
+    """
+    Inserts packet data into a normalised, indexed SQLite database from a background thread.
+
+    Instances are callable with a packet data dict, so they can be passed as the
+    ``sink`` of RawFrame.
+
+    Parameters
+    ----------
+    path : str
+        Database file, created with the schema if it does not exist.
+    batch_size : int
+        Number of buffered records that triggers a transaction.
+    flush_interval : float
+        Seconds after which buffered records are committed even if the batch is not full.
+
+    Raises
+    ------
+    ValueError
+        If ``batch_size`` is less than 1 or ``flush_interval`` is not positive.
+    """
+
+    def __init__(self, path: str = 'packet_data.db', batch_size: int = 1000, flush_interval: float = 1.0):
+        super().__init__(batch_size, flush_interval, 'SQLite sink')
+        self.path = path
+        # Only used under write_lock, but from both the caller and the flush thread
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        self.next_id = self.connection.execute("SELECT coalesce(max(id), 0) + 1 FROM frames").fetchone()[0]
+        self.frames = []
+        self.ip_headers = []
+        self.l4_headers = []
+        self.flows = []
+        self._start_flushing()
+
+    def __call__(self, data):
+        self.write(data)
+
+    def write(self, data: dict):
+        """Buffers one packet data dict as rows of the three tables."""
+        get = data.get
+        source_ip = get('Source IP')
+        if 'Opcode' in data:
+            protocol = 'ARP'
+        else:
+            protocol = get('protocol')
+        time_stamp = _epoch(get('time_stamps'))
+
+        with self.lock:
+            frame_id = self.next_id
+            self.next_id += 1
+            self.frames.append((frame_id, time_stamp, get('bytes_length'), get('source_mac'),
+                                get('destination_mac'), protocol))
+            if source_ip is not None:
+                self.ip_headers.append((
+                    frame_id, get('Version'), source_ip, get('Destination IP'),
+                    get('Protocol', get('Next Header')), get('TTL', get('Hop Limit')),
+                    get('Total Length', get('Payload Length')), get('Identification'), get('Flags'),
+                    get('Fragment Offset'), get('Traffic Class'), get('Flow Label'),
+                ))
+            if 'source_port' in data:
+                self.l4_headers.append((
+                    frame_id, data['source_port'], get('destination_port'), get('sequence_number'),
+                    get('acknowledgment_number'), get('flags'), get('window_size'), get('length'),
+                    get('check_sum', get('checksum')),
+                ))
+            full = len(self.frames) >= self.batch_size
+        if full:
+            self.wake.set()
+
+    def write_flow(self, flow: dict):
+        """Buffers one finished flow record, as emitted by the FlowTable."""
+        with self.lock:
+            self.flows.append(flow)
+
+    @property
+    def backlog(self) -> int:
+        """Frames and flows buffered and not yet committed."""
+        return len(self.frames) + len(self.flows)
+
+    def _take(self):
+        frames, self.frames = self.frames, []
+        ip_headers, self.ip_headers = self.ip_headers, []
+        l4_headers, self.l4_headers = self.l4_headers, []
+        flows, self.flows = self.flows, []
+        if not (frames or flows):
+            return None
+        return frames, ip_headers, l4_headers, flows
+
+    def _write(self, batch) -> int:
+        frames, ip_headers, l4_headers, flows = batch
+        connection = self.connection
+        try:
+            connection.execute("BEGIN")
+            connection.executemany(INSERT_FRAME, frames)
+            connection.executemany(INSERT_IP_HEADER, ip_headers)
+            connection.executemany(INSERT_L4_HEADER, l4_headers)
+            connection.executemany(INSERT_FLOW, flows)
+            connection.execute("COMMIT")
+        except sqlite3.Error as e:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            print(f"Failed to save packet data to {self.path}: {e}")
+            return 0
+        return len(frames)
+
+    def _close_output(self):
+        self.connection.close()
+        self.connection = None
+
+    def traffic(self, source_ip=None, destination_ip=None, source_port=None, destination_port=None,
+                since=None, until=None):
+        """
+        Returns the IP packets matching every given field, oldest first.
+
+        Each row is (time_stamp, protocol, source_ip, source_port, destination_ip,
+        destination_port, bytes_length); ``since`` and ``until`` are epoch seconds.
+        Buffered records are committed first, so the result includes them.
+        """
+        conditions = []
+        parameters = []
+        for column, value in (('ip_headers.source_ip', source_ip), ('ip_headers.destination_ip', destination_ip),
+                              ('l4_headers.source_port', source_port),
+                              ('l4_headers.destination_port', destination_port)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        if since is not None:
+            conditions.append("frames.time_stamp >= ?")
+            parameters.append(since)
+        if until is not None:
+            conditions.append("frames.time_stamp < ?")
+            parameters.append(until)
+
+        query = TRAFFIC_QUERY
+        if conditions:
+            query += "WHERE " + " AND ".join(conditions) + "\n"
+        query += "ORDER BY frames.time_stamp"
+
+        self.flush()
+        with self.write_lock:
+            return self.connection.execute(query, parameters).fetchall()
+
+    def __str__(self):
+        """Returns a string representation of the SQLiteSink instance."""
+        return f"SQLiteSink(path={self.path}, records_written={self.records_written})"
@@ -0,0 +1,194 @@
+from array import array
+from time import time
+
+from PacketProbe.utils.packetType import PACKET_TYPES
+from PacketProbe.utils.segmentType import IP_PROTOCOLS, IPV6_NEXT_HEADERS
+
+"""
+    TrafficStats - Counters Without Parsing
+
+    Counts packets and bytes per EtherType and per IP protocol without parsing the
+    frames: only the EtherType bytes and, for IPv4 and IPv6, the protocol byte are
+    read. The counters are preallocated arrays of unsigned 64-bit integers indexed by
+    the numbers themselves (65536 EtherTypes, 256 IP protocols), so counting a frame
+    is a few index operations, with no string names, dicts, printing or file writes
+    on the way. Names are only looked up when a report is built.
+
+    Every report_interval seconds of capture time a report is built with the totals
+    of the interval and since the start, printed, and handed to the sink if there is
+    one. Reports are checked once per batch, so on a quiet live interface they are
+    emitted with the next batch that arrives.
+
+    Classes:
+        TrafficStats: Counts frames by EtherType and IP protocol and reports periodic totals.
+
+    Usage:
+        stats = TrafficStats(report_interval=10, sink=JsonLinesWriter('stats.json'))
+        stats.count_batch(batch)
+        stats.close()
+"""
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+# Offsets of the protocol byte in an Ethernet frame: IPv4 Protocol and IPv6 Next Header
+IPV4_PROTOCOL = 14 + 9
+IPV6_NEXT_HEADER = 14 + 6
+
+ETHERTYPE_NAMES = {int(ethertype, 16): name for ethertype, name in PACKET_TYPES.items()}
+PROTOCOL_NAMES = {**IPV6_NEXT_HEADERS, **IP_PROTOCOLS}
+
+
+def _counters(size: int) -> array:
+    return array('Q', bytes(8 * size))
+
+
+def _breakdown(packets, bytes_, previous_packets=None, previous_bytes=None) -> dict:
+    """Returns {number: (packets, bytes)} for every non-zero counter, minus the previous values if given."""
+    result = {}
+    for number, count in enumerate(packets):
+        if previous_packets is not None:
+            count -= previous_packets[number]
+        if count:
+            volume = bytes_[number] - (previous_bytes[number] if previous_bytes is not None else 0)
+            result[number] = (count, volume)
+    return result
+
+
+class TrafficStats:
+    """
+    Counts packets and bytes per EtherType and IP protocol and reports them periodically.
+
+    Parameters
+    ----------
+    report_interval : float
+        Seconds of capture time between reports.
+    sink : callable, optional
+        Receives the dict of every report, e.g. a JsonLinesWriter.
+    quiet : bool
+        Do not print the reports.
+
+    Raises
+    ------
+    ValueError
+        If ``report_interval`` is not positive.
+    """
+
+    def __init__(self, report_interval: float = 10.0, sink=None, quiet: bool = False):
+        if report_interval <= 0:
+            raise ValueError("The stats report interval must be positive.")
+
+        self.report_interval = report_interval
+        self.sink = sink
+        self.quiet = quiet
+        self.ethertype_packets = _counters(1 << 16)
+        self.ethertype_bytes = _counters(1 << 16)
+        self.protocol_packets = _counters(256)
+        self.protocol_bytes = _counters(256)
+        self.truncated = 0  # Frames too short for an EtherType
+        # Counter values at the last report, for the interval totals
+        self.previous = tuple(array('Q', counters) for counters in self.counters)
+        self.interval_start = None
+        self.next_report = None
+        self.last_time_stamp = None
+        self.reports = 0
+
+    @property
+    def counters(self):
+        return self.ethertype_packets, self.ethertype_bytes, self.protocol_packets, self.protocol_bytes
+
+    def count(self, frame, time_stamp: float):
+        """Counts one frame captured at ``time_stamp`` (epoch seconds)."""
+        self.count_batch([(time_stamp, frame)])
+
+    def count_batch(self, batch):
+        """Counts every frame of a list of (timestamp, frame) tuples, then reports if an interval has passed."""
+        if not batch:
+            return
+        ethertype_packets = self.ethertype_packets
+        ethertype_bytes = self.ethertype_bytes
+        protocol_packets = self.protocol_packets
+        protocol_bytes = self.protocol_bytes
+        for _, frame in batch:
+            length = len(frame)
+            if length < 14:
+                self.truncated += 1
+                continue
+            ethertype = frame[12] << 8 | frame[13]
+            ethertype_packets[ethertype] += 1
+            ethertype_bytes[ethertype] += length
+            if ethertype == ETHERTYPE_IPV4 and length > IPV4_PROTOCOL:
+                protocol = frame[IPV4_PROTOCOL]
+            elif ethertype == ETHERTYPE_IPV6 and length > IPV6_NEXT_HEADER:
+                protocol = frame[IPV6_NEXT_HEADER]
+            else:
+                continue
+            protocol_packets[protocol] += 1
+            protocol_bytes[protocol] += length
+
+        time_stamp = batch[-1][0]
+        if time_stamp is None:
+            time_stamp = time()  # pcapng Simple Packet Blocks carry no timestamp
+        self.last_time_stamp = time_stamp
+        if self.next_report is None:
+            self.interval_start = batch[0][0] if batch[0][0] is not None else time_stamp
+            self.next_report = self.interval_start + self.report_interval
+        if time_stamp >= self.next_report:
+            self.report(time_stamp)
+
+    def report(self, now: float) -> dict:
+        """Builds the report of the interval ending at ``now`` and of the totals, prints it and hands it to the sink."""
+        ethertype_packets, ethertype_bytes, protocol_packets, protocol_bytes = self.counters
+        previous_ethertype_packets, previous_ethertype_bytes, previous_protocol_packets, previous_protocol_bytes = \
+            self.previous
+        start = self.interval_start if self.interval_start is not None else now
+        interval = {
+            'ethertypes': _breakdown(ethertype_packets, ethertype_bytes, previous_ethertype_packets,
+                                     previous_ethertype_bytes),
+            'protocols': _breakdown(protocol_packets, protocol_bytes, previous_protocol_packets,
+                                    previous_protocol_bytes),
+        }
+        total = {
+            'ethertypes': _breakdown(ethertype_packets, ethertype_bytes),
+            'protocols': _breakdown(protocol_packets, protocol_bytes),
+        }
+        report = {'time_stamp': now, 'interval_seconds': now - start}
+        for name, counts in (('interval', interval), ('total', total)):
+            report[name] = {
+                'packets': sum(packets for packets, _ in counts['ethertypes'].values()),
+                'bytes': sum(volume for _, volume in counts['ethertypes'].values()),
+                'ethertypes': {ETHERTYPE_NAMES.get(number, f'0x{number:04X}'): list(values)
+                               for number, values in counts['ethertypes'].items()},
+                'protocols': {PROTOCOL_NAMES.get(number, str(number)): list(values)
+                              for number, values in counts['protocols'].items()},
+            }
+
+        self.previous = tuple(array('Q', counters) for counters in self.counters)
+        self.interval_start = now
+        while self.next_report is not None and self.next_report <= now:
+            self.next_report += self.report_interval
+        self.reports += 1
+        if not self.quiet:
+            self.print_report(report)
+        if self.sink is not None:
+            self.sink(report)
+        return report
+
+    @staticmethod
+    def print_report(report: dict):
+        interval = report['interval']
+        seconds = report['interval_seconds']
+        rate = f", {interval['packets'] / seconds:.0f} packets/s" if seconds > 0 else ""
+        print(f"Stats: {interval['packets']} packets, {interval['bytes']} bytes in {seconds:.1f}s{rate} "
+              f"({report['total']['packets']} packets, {report['total']['bytes']} bytes in total)")
+        for field in ('ethertypes', 'protocols'):
+            if interval[field]:
+                print("\t" + ", ".join(f"{name}: {packets}" for name, (packets, _) in interval[field].items()))
+
+    def close(self):
+        """Emits the final report, covering what was counted since the last one."""
+        if self.last_time_stamp is not None:
+            self.report(self.last_time_stamp)
+
+    def __str__(self):
+        """Returns a string representation of the TrafficStats instance."""
+        return f"TrafficStats(packets={sum(self.ethertype_packets)}, reports={self.reports})"
@@ -1,4 +1,4 @@
-__all__ = ['_timestamp', '_struct']
+__all__ = ['_timestamp', '_struct', '_worker_path', '_tee', '_epoch']
 
 
 def _timestamp():
@@ -8,9 +8,37 @@ def _timestamp():
 
 
 def _struct():
-    from struct import Struct
+    from PacketProbe.protocols.decoders import TCP_HEADER, UDP_HEADER
 
-    tcp_header_unpack = Struct('!2H2LB').unpack_from
-    udp_header_unpack = Struct('!4H').unpack_from
+    tcp_header_unpack = TCP_HEADER.unpack_from
+    udp_header_unpack = UDP_HEADER.unpack_from
 
     return tcp_header_unpack, udp_header_unpack
+
+
+def _worker_path(path, index):
+    """Inserts a worker number before the extension: capture.pcap -> capture.3.pcap."""
+    stem, dot, extension = path.rpartition('.')
+    return f"{stem}.{index}.{extension}" if dot else f"{path}.{index}"
+
+
+def _tee(*sinks):
+    """Combines RawFrame sinks into one that hands every record to each of them; None entries are skipped."""
+    sinks = [sink for sink in sinks if sink is not None]
+    if len(sinks) == 1:
+        return sinks[0]
+
+    def sink(data):
+        for each in sinks:
+            each(data)
+
+    return sink
+
+
+def _epoch(time_stamp):
+    """Converts the ISO timestamp RawFrame adds to a record back to epoch seconds."""
+    import datetime
+
+    if time_stamp is None:
+        return datetime.datetime.now().timestamp()
+    return datetime.datetime.fromisoformat(time_stamp).timestamp()
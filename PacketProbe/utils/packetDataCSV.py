@@ -1,22 +1,40 @@
-import csv
+import atexit
 import os
 
+from PacketProbe.sinks.csvpool import CSVSink
+
+_sink = None
+
+
+def csv_sink():
+    """Returns the process-wide CSVSink, starting it on first use."""
+    global _sink
+    if _sink is None:
+        _sink = CSVSink()
+    return _sink
 
-def save_packet_to_csv(packet_data, filename):
-    """Saves packet data to a CSV file."""
-    if not packet_data:
-        return  # Skip if packet data is empty
 
-    file = f"PacketProbe/data/{filename}"
+def close_csv_sink():
+    """Writes the buffered rows and closes the CSV files. Worker processes call it before exiting."""
+    global _sink
+    if _sink is not None:
+        _sink.close()
+        _sink = None
 
-    # Check if the file already exists
-    file_exists = os.path.isfile(file)
 
-    with open(file, mode='a', newline='', encoding='utf-8') as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=packet_data.keys())
+def _forget_csv_sink():
+    # A forked child has no flush thread and must not write rows buffered by its parent
+    global _sink
+    _sink = None
 
-        # Write the header only if the file is new
-        if not file_exists:
-            writer.writeheader()
 
-        writer.writerow(packet_data)
+atexit.register(close_csv_sink)
+os.register_at_fork(after_in_child=_forget_csv_sink)
+
+
+def save_packet_to_csv(packet_data, filename):
+    """Saves packet data to a CSV file."""
+    if not packet_data:
+        return  # Skip if packet data is empty
+
+    csv_sink().write(filename, packet_data)
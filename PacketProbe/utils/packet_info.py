@@ -1,3 +1,5 @@
+import ipaddress
+
 from PacketProbe.protocols.packet.arp import ARP
 from PacketProbe.protocols.packet.eapol import EAPOL
 from PacketProbe.protocols.packet.ipv4 import IPV4
@@ -26,7 +28,9 @@ class Info:
 
     @staticmethod
     def format_ipv6(ipv6_bytes):
-        """Format IPv6 address from bytes to human-readable string."""
+        """Format IPv6 address from bytes (or an IPv6Address) to human-readable string."""
+        if isinstance(ipv6_bytes, ipaddress.IPv6Address):
+            ipv6_bytes = ipv6_bytes.packed
         return ':'.join(
             f"{(ipv6_bytes[i] << 8) + ipv6_bytes[i + 1]:x}" for i in range(0, len(ipv6_bytes), 2)
         )
@@ -0,0 +1,75 @@
+"""
+    Batch decoder benchmark
+
+    Compares decoding a large batch of frames into columnar arrays with
+    PacketProbe.batchdecoder against building the per-packet protocol classes
+    (IPV4/IPV6 plus TCP/UDP) for the same frames.
+
+    Usage:
+        python -m benchmarks.batch_decode [-n FRAMES]
+"""
+import argparse
+import socket
+import struct
+import time
+
+from PacketProbe.batchdecoder import decode_batch
+from PacketProbe.protocols.packet.ipv4 import IPV4
+from PacketProbe.protocols.packet.ipv6 import IPV6
+from PacketProbe.protocols.segment.tcp import TCP
+from PacketProbe.protocols.segment.udp import UDP
+
+
+def _frames():
+    """TCP and UDP over IPv4 and IPv6, with one IPv4 frame carrying options (slow path) in twenty."""
+    mac = bytes.fromhex('00112233445566778899aabb')
+    tcp = struct.pack('!HHLLBBHHH', 40000, 443, 1, 2, 0x50, 0x18, 512, 0, 0) + bytes(100)
+    udp = struct.pack('!4H', 53, 5353, 108, 0) + bytes(100)
+    v4 = socket.inet_aton('10.0.0.1'), socket.inet_aton('10.0.0.5')
+    v6 = socket.inet_pton(socket.AF_INET6, 'fe80::1'), socket.inet_pton(socket.AF_INET6, '2001:db8::5')
+    frames = []
+    for index in range(20):
+        protocol, l4 = (6, tcp) if index % 2 else (17, udp)
+        if index % 4 < 2:
+            header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(l4), index, 0x4000, 64, protocol, 0, *v4)
+            frames.append(mac + b'\x08\x00' + header + l4)
+        else:
+            header = struct.pack('!IHBB16s16s', 6 << 28, len(l4), protocol, 64, *v6)
+            frames.append(mac + b'\x86\xdd' + header + l4)
+    frames[0] = mac + b'\x08\x00' + struct.pack('!BBHHHBBH4s4s', 0x46, 0, 24 + len(udp), 0, 0, 64, 17, 0, *v4) \
+        + bytes(4) + udp
+    return frames
+
+
+def _per_packet(packets):
+    for _, frame in packets:
+        if frame[12:14] == b'\x08\x00':
+            network = IPV4(frame[14:])
+            protocol = network.protocol
+        else:
+            network = IPV6(frame[14:])
+            protocol = network.next_header
+        TCP(network.data) if protocol == 6 else UDP(network.data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark columnar batch decoding against per-packet parsing.")
+    parser.add_argument('-n', '--frames', type=int, default=200000, help='Number of frames to decode.')
+    args = parser.parse_args()
+
+    frames = _frames()
+    packets = [(1700000000.0 + index, frames[index % len(frames)]) for index in range(args.frames)]
+
+    results = {}
+    for name, function in (('per-packet classes', _per_packet), ('decode_batch', decode_batch)):
+        start = time.perf_counter_ns()
+        function(packets)
+        results[name] = (time.perf_counter_ns() - start) / args.frames
+
+    print(f"{args.frames:,} frames, {1 / len(frames):.0%} on the slow path")
+    for name, ns in results.items():
+        print(f"{name:<20}: {ns:>8,.0f} ns/frame {1e9 / ns:>14,.0f} frames/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+    Synthetic frame corpus
+
+    Builds deterministic Ethernet frames for the benchmarks: TCP, UDP and ICMP over
+    IPv4 and IPv6, ARP, and 802.1Q VLAN-tagged IPv4, with payload sizes drawn from a
+    fixed list. A mix names the share of each kind of frame; the same count, mix and
+    seed always give the same frames, so results of different releases are comparable.
+
+    Mixes:
+        mixed  Every kind of frame, weighted towards TCP and UDP.
+        web    Mostly TCP over IPv4 and IPv6 with large payloads.
+        dns    Small UDP datagrams.
+        l2     ARP and VLAN-tagged frames.
+
+    Usage:
+        python -m benchmarks.corpus -n FRAMES [--mix MIX] [--seed SEED] -w corpus.pcap
+"""
+import argparse
+import random
+import socket
+import struct
+
+from PacketProbe.pcapwriter import PcapWriter
+
+START_TIME = 1700000000.0
+MACS = bytes.fromhex('001122334455') + bytes.fromhex('66778899aabb')
+IPV4_HOSTS = [socket.inet_aton(f'10.0.{subnet}.{host}') for subnet in range(4) for host in range(1, 17)]
+IPV6_HOSTS = [socket.inet_pton(socket.AF_INET6, f'2001:db8::{subnet:x}:{host:x}')
+              for subnet in range(4) for host in range(1, 17)]
+PORTS = [53, 80, 123, 443, 8080]
+
+# mix: {kind: weight}
+MIXES = {
+    'mixed': {'tcp4': 30, 'udp4': 20, 'icmp4': 5, 'tcp6': 15, 'udp6': 10, 'icmp6': 5, 'arp': 5, 'vlan': 10},
+    'web': {'tcp4': 70, 'tcp6': 25, 'udp4': 5},
+    'dns': {'udp4': 80, 'udp6': 20},
+    'l2': {'arp': 50, 'vlan': 50},
+}
+# mix: payload sizes in bytes
+PAYLOAD_SIZES = {
+    'mixed': [0, 64, 512, 1400],
+    'web': [0, 0, 512, 1400, 1400],
+    'dns': [32, 64, 128],
+    'l2': [0, 64],
+}
+
+
+def _transport(rng, protocol, payload_size):
+    payload = bytes(rng.getrandbits(8) for _ in range(min(payload_size, 16))) + bytes(max(payload_size - 16, 0))
+    if protocol == 6:
+        header = struct.pack('!HHLLBBHHH', rng.randrange(1024, 65536), rng.choice(PORTS), rng.getrandbits(32),
+                             rng.getrandbits(32), 0x50, rng.choice((0x02, 0x10, 0x18, 0x11)), 64240, 0, 0)
+    elif protocol == 17:
+        header = struct.pack('!4H', rng.randrange(1024, 65536), rng.choice(PORTS), 8 + len(payload), 0)
+    else:
+        header = struct.pack('!BBHHH', 8, 0, 0, rng.getrandbits(16), rng.getrandbits(16))
+    return header + payload
+
+
+def _ipv4(rng, protocol, l4):
+    source, destination = rng.sample(IPV4_HOSTS, 2)
+    return struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(l4), rng.getrandbits(16), 0x4000, 64, protocol, 0,
+                       source, destination) + l4
+
+
+def _ipv6(rng, protocol, l4):
+    source, destination = rng.sample(IPV6_HOSTS, 2)
+    return struct.pack('!IHBB16s16s', 6 << 28 | rng.getrandbits(20), len(l4), protocol, 64, source,
+                       destination) + l4
+
+
+def _frame(rng, kind, payload_size):
+    if kind == 'arp':
+        sender, target = rng.sample(IPV4_HOSTS, 2)
+        return MACS + b'\x08\x06' + bytes.fromhex('0001080006040001') + MACS[6:] + sender + bytes(6) + target
+    if kind == 'vlan':
+        l4 = _transport(rng, 6, payload_size)
+        return MACS + struct.pack('!HHH', 0x8100, rng.randrange(1, 4095), 0x0800) + _ipv4(rng, 6, l4)
+    protocol = {'tcp': 6, 'udp': 17, 'icmp': 1}[kind[:-1]]
+    if kind.endswith('6'):
+        l4 = _transport(rng, protocol, payload_size)
+        return MACS + b'\x86\xdd' + _ipv6(rng, 58 if protocol == 1 else protocol, l4)
+    return MACS + b'\x08\x00' + _ipv4(rng, protocol, _transport(rng, protocol, payload_size))
+
+
+def synthetic_frames(count: int, mix: str = 'mixed', seed: int = 0):
+    """Returns ``count`` (timestamp, frame) tuples of the given mix, 100 microseconds apart."""
+    if mix not in MIXES:
+        raise ValueError(f"Unknown frame mix: {mix}")
+    rng = random.Random(seed)
+    kinds = list(MIXES[mix])
+    weights = list(MIXES[mix].values())
+    sizes = PAYLOAD_SIZES[mix]
+    return [(START_TIME + index * 1e-4, _frame(rng, kind, rng.choice(sizes)))
+            for index, kind in enumerate(rng.choices(kinds, weights, k=count))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic frame corpus to a pcap file.")
+    parser.add_argument('-n', '--frames', type=int, default=100000, help='Number of frames.')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed', help='Protocol mix.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the generator.')
+    parser.add_argument('-w', '--write', required=True, help='Capture file to write.')
+    args = parser.parse_args()
+
+    writer = PcapWriter(args.write)
+    for time_stamp, frame in synthetic_frames(args.frames, args.mix, args.seed):
+        writer.write(frame, time_stamp)
+    writer.close()
+    print(f"Wrote {writer.frames_written:,} frames to {args.write}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+    Frame queue handoff benchmark
+
+    Moves batches from a producer thread to a consumer thread through queue.Queue and
+    through PacketProbe.framequeue.FrameQueue, the way the capture thread hands
+    batches to the processing loop.
+
+    Usage:
+        python -m benchmarks.frame_queue [-n BATCHES] [--batch_size FRAMES]
+"""
+import argparse
+import threading
+import time
+from queue import Queue
+
+from PacketProbe.framequeue import FrameQueue
+
+
+def _handoff(frame_queue, batches, batch):
+    def produce():
+        for _ in range(batches):
+            frame_queue.put(batch)
+        frame_queue.put(None)
+
+    producer = threading.Thread(target=produce)
+    start = time.perf_counter_ns()
+    producer.start()
+    while frame_queue.get() is not None:
+        pass
+    elapsed = time.perf_counter_ns() - start
+    producer.join()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the capture-to-parser batch handoff.")
+    parser.add_argument('-n', '--batches', type=int, default=200000, help='Number of batches to hand over.')
+    parser.add_argument('--batch_size', type=int, default=1, help='Frames per batch.')
+    args = parser.parse_args()
+
+    batch = [(0.0, bytes(64))] * args.batch_size
+    queues = (
+        ('queue.Queue', Queue()),
+        ('FrameQueue', FrameQueue(args.batches * args.batch_size + 1, 'block')),
+        ('FrameQueue bounded', FrameQueue(64 * args.batch_size, 'block')),
+    )
+    print(f"{args.batches:,} batches of {args.batch_size} frame(s)")
+    for name, frame_queue in queues:
+        ns = _handoff(frame_queue, args.batches, batch) / args.batches
+        print(f"{name:<20}: {ns:>8,.0f} ns/batch {1e9 / ns:>14,.0f} batches/s")
+
+
+if __name__ == '__main__':
+    main()
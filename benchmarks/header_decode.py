@@ -0,0 +1,94 @@
+"""
+    Header decoder microbenchmark
+
+    Reports ns/header for building each protocol class as it was before the
+    precompiled decoders (``before``, loaded from git) and as it is now (``after``),
+    plus the cost of the unpack_from decoder in PacketProbe.protocols.decoders alone.
+    Both class columns include the length check and the payload slice, so only the
+    way the fields are decoded differs.
+
+    The old classes are read with ``git show`` from the revision before
+    PacketProbe/protocols/decoders.py was added, or from --before REVISION.
+
+    Usage:
+        python -m benchmarks.header_decode [-n HEADERS] [--before REVISION]
+"""
+import argparse
+import socket
+import struct
+import subprocess
+import time
+import types
+from importlib import import_module
+
+from PacketProbe.protocols import decoders
+
+# protocol: (sample header, unpack_from decode, module, class name)
+PROTOCOLS = {
+    '802.1Q': (struct.pack('!HHH', 0x8100, 0x2005, 0x0800), decoders.decode_vlan,
+               'PacketProbe.protocols.packet.vlan', 'VLAN'),
+    'IPv4': (struct.pack('!BBHHHBBH4s4s', 0x45, 0, 40, 1, 0x4000, 64, 6, 0, socket.inet_aton('10.0.0.1'),
+                         socket.inet_aton('10.0.0.5')), decoders.decode_ipv4, 'PacketProbe.protocols.packet.ipv4',
+             'IPV4'),
+    'IPv6': (struct.pack('!IHBB16s16s', 6 << 28, 0, 6, 64, bytes(15) + b'\x01', bytes(15) + b'\x02'),
+             decoders.decode_ipv6, 'PacketProbe.protocols.packet.ipv6', 'IPV6'),
+    'ARP/RARP': (bytes.fromhex('0001080006040001') + bytes(20), decoders.decode_arp,
+                 'PacketProbe.protocols.packet.arp', 'ARP'),
+    'TCP': (struct.pack('!HHLLBBHHH', 40000, 443, 1, 2, 0x50, 0x18, 512, 0, 0), decoders.decode_tcp,
+            'PacketProbe.protocols.segment.tcp', 'TCP'),
+    'UDP': (struct.pack('!4H', 53, 5353, 8, 0), decoders.decode_udp, 'PacketProbe.protocols.segment.udp', 'UDP'),
+    'ICMP': (bytes([8, 0, 0, 0, 0, 1, 0, 1]), decoders.decode_icmp, 'PacketProbe.protocols.segment.icmp', 'ICMP'),
+    'MPLS': (struct.pack('!L', (16 << 12) | 0x140), decoders.decode_mpls, 'PacketProbe.protocols.packet.unicast',
+             'MPLSUnicast'),
+}
+
+
+def _git(*arguments) -> str:
+    return subprocess.run(('git',) + arguments, check=True, capture_output=True, text=True).stdout
+
+
+def _decoders_parent() -> str:
+    """The revision just before the precompiled decoders were added."""
+    added = _git('log', '--diff-filter=A', '--format=%H', '--', 'PacketProbe/protocols/decoders.py').split()
+    if not added:
+        raise ValueError("PacketProbe/protocols/decoders.py has no history, pass --before.")
+    return added[-1] + '^'
+
+
+def _old_class(revision: str, module: str, name: str):
+    """Loads a protocol class from the source of its module at a git revision."""
+    old = types.ModuleType(f'{module}@{revision}')
+    exec(compile(_git('show', f"{revision}:{module.replace('.', '/')}.py"), old.__name__, 'exec'), old.__dict__)
+    return getattr(old, name)
+
+
+def _time_per_header(function, header, count):
+    start = time.perf_counter_ns()
+    for _ in range(count):
+        function(header)
+    return (time.perf_counter_ns() - start) / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the protocol classes before and after unpack_from.")
+    parser.add_argument('-n', '--headers', type=int, default=200000, help='Number of headers per measurement.')
+    parser.add_argument('--before', help='Git revision of the old classes (default: before decoders.py).')
+    args = parser.parse_args()
+
+    try:
+        revision = args.before or _decoders_parent()
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        parser.error(f"Cannot find the old classes in git: {e}")
+
+    print(f"Classes before: {revision}")
+    print(f"{'protocol':<10} {'before':>12} {'after':>12} {'speedup':>8} {'decoder':>12}")
+    for name, (header, decoder, module, class_name) in PROTOCOLS.items():
+        before_ns = _time_per_header(_old_class(revision, module, class_name), header, args.headers)
+        after_ns = _time_per_header(getattr(import_module(module), class_name), header, args.headers)
+        decoder_ns = _time_per_header(decoder, header, args.headers)
+        print(f"{name:<10} {before_ns:>9,.0f} ns {after_ns:>9,.0f} ns {before_ns / after_ns:>7.1f}x "
+              f"{decoder_ns:>9,.0f} ns")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+    JSON output benchmark
+
+    Compares rawframe.save_data, which opens and closes the output file for every
+    record, with the batched JsonLinesWriter for the same packet data dicts.
+
+    Usage:
+        python -m benchmarks.json_output [-n RECORDS]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from PacketProbe.rawframe import save_data
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+
+RECORD = {
+    'protocol': 'TCP', 'Version': 4, 'TTL': 64, 'Source IP': '10.0.0.1', 'Destination IP': '10.0.0.5',
+    'source_port': 40000, 'destination_port': 443, 'data': bytes(64), 'time_stamps': '2024-01-01T00:00:00',
+    'bytes_length': 118, 'source_mac': '66:77:88:99:aa:bb', 'destination_mac': '00:11:22:33:44:55',
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark per-record and batched JSON lines output.")
+    parser.add_argument('-n', '--records', type=int, default=50000, help='Number of records to write.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'packet_data.json')
+        start = time.perf_counter_ns()
+        for _ in range(args.records):
+            save_data(RECORD, path)
+        per_record = (time.perf_counter_ns() - start) / args.records
+
+        os.remove(path)
+        start = time.perf_counter_ns()
+        with JsonLinesWriter(path) as writer:
+            for _ in range(args.records):
+                writer(RECORD)
+        batched = (time.perf_counter_ns() - start) / args.records
+
+    print(f"{args.records:,} records")
+    for name, ns in (('save_data', per_record), ('JsonLinesWriter', batched)):
+        print(f"{name:<20}: {ns:>8,.0f} ns/record {1e9 / ns:>14,.0f} records/s")
+
+
+if __name__ == '__main__':
+    main()
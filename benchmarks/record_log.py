@@ -0,0 +1,84 @@
+"""
+    Record log benchmark
+
+    Writes the same frames as JSON lines (RawFrame + JsonLinesWriter) and as a binary
+    record log, then compares reading them back: a full scan for one field, a time
+    range query and a protocol query.
+
+    Usage:
+        python -m benchmarks.record_log [-n FRAMES]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from PacketProbe.rawframe import RawFrame
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+from PacketProbe.sinks.recordlog import RecordLog, RecordLogWriter
+from benchmarks.batch_decode import _frames
+
+
+def _timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the binary record log against JSON lines.")
+    parser.add_argument('-n', '--frames', type=int, default=100000, help='Number of frames to write.')
+    args = parser.parse_args()
+
+    frames = _frames()
+    packets = [(1700000000.0 + index * 0.001, frames[index % len(frames)]) for index in range(args.frames)]
+    window = (1700000000.0 + args.frames * 0.0005, 1700000000.0 + args.frames * 0.0005 + 1.0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        cwd = os.getcwd()
+        os.chdir(directory)
+        os.makedirs(os.path.join('PacketProbe', 'data'))
+        try:
+            def write_json():
+                with JsonLinesWriter('packet_data.json') as writer, contextlib.redirect_stdout(io.StringIO()):
+                    for time_stamp, frame in packets:
+                        RawFrame(frame, None, time_stamp, sink=writer)
+
+            def write_log():
+                with RecordLogWriter('capture.ppr', segment_size=16 << 20) as writer:
+                    writer.write_batch(packets)
+
+            def load_json():
+                with open('packet_data.json') as file:
+                    return [json.loads(line) for line in file]
+
+            results = {'write': (_timed(write_json)[0], _timed(write_log)[0])}
+            with RecordLog('capture.ppr') as log:
+                results['scan ttl'] = (
+                    _timed(lambda: [record.get('TTL', record.get('Hop Limit')) for record in load_json()])[0],
+                    _timed(lambda: [record.ttl for record in log])[0])
+                results['1 s time range'] = (
+                    _timed(lambda: [record for record in load_json()
+                                    if window[0] <= datetime.fromisoformat(record['time_stamps']).timestamp()
+                                    <= window[1]])[0],
+                    _timed(lambda: list(log.between(*window)))[0])
+                results['udp only'] = (_timed(lambda: [record for record in load_json()
+                                                       if record['protocol'] == 'UDP'])[0],
+                                       _timed(lambda: list(log.by_protocol(17)))[0])
+            sizes = (os.path.getsize('packet_data.json'),
+                     sum(os.path.getsize(segment.path) for segment in log.segments))
+        finally:
+            os.chdir(cwd)
+
+    print(f"{args.frames:,} frames, JSON {sizes[0] / 1e6:.1f} MB, record log {sizes[1] / 1e6:.1f} MB")
+    print(f"{'':<16}{'JSON lines':>12}{'record log':>12}")
+    for name, (json_seconds, log_seconds) in results.items():
+        print(f"{name:<16}{json_seconds * 1000:>10,.0f}ms{log_seconds * 1000:>10,.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+    End-to-end throughput benchmark
+
+    Runs every processing stage over the same synthetic corpus (benchmarks.corpus)
+    and reports frames per second and ns/frame for each, as JSON:
+
+        packet_type        determine_packet_type on every frame.
+        parser.<class>     Each protocol class on the headers of its frames (IPv4, IPv6,
+                           ARP, 802.1Q, TCP, UDP, ICMP).
+        L3NetworkLayer     The transport layer of every IP frame.
+        RawFrame           Whole frames end to end, with the sink and console discarded, with
+                           copied and zero-copy (--lazy) payloads. The per-protocol CSV rows
+                           are part of this stage.
+        sink.<class>       Each output, fed the frames or the packet data of the corpus,
+                           including closing it, so background writes are counted.
+
+    Each stage runs --repeat times and the fastest run is kept. With --baseline the
+    results are compared with an earlier JSON file, and every stage that lost more
+    than --tolerance of its throughput is listed; the exit status is then 1.
+
+    Usage:
+        python -m benchmarks.throughput [-n FRAMES] [--mix MIX] [-o results.json]
+                                        [--baseline previous.json] [--tolerance 0.1]
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from benchmarks.corpus import MIXES, synthetic_frames
+from PacketProbe.flowtable import FlowTable
+from PacketProbe.pcapwriter import PcapWriter
+from PacketProbe.protocols.packet.arp import ARP
+from PacketProbe.protocols.packet.ipv4 import IPV4
+from PacketProbe.protocols.packet.ipv6 import IPV6
+from PacketProbe.protocols.packet.vlan import VLAN
+from PacketProbe.protocols.segment.icmp import ICMP
+from PacketProbe.protocols.segment.tcp import TCP
+from PacketProbe.protocols.segment.udp import UDP
+from PacketProbe.rawframe import RawFrame, save_data
+from PacketProbe.rawsegment import L3NetworkLayer
+from PacketProbe.reassembly.tcpstreams import TCPReassembler
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+from PacketProbe.sinks.recordlog import RecordLogWriter
+from PacketProbe.sinks.sqlitedb import SQLiteSink
+from PacketProbe.trafficstats import TrafficStats
+from PacketProbe.utils.packetDataCSV import close_csv_sink
+from PacketProbe.utils.packetType import determine_packet_type
+
+TRANSPORTS = {6: 'TCP', 17: 'UDP', 1: 'ICMP', 58: 'ICMP'}
+
+
+def _discard(_):
+    pass
+
+
+def _each(function, items):
+    def run():
+        for item in items:
+            function(item)
+    return run
+
+
+def _split(frames):
+    """Sorts the headers of the corpus by protocol: {name: [header bytes]} and [(transport, segment)]."""
+    headers = {'IPv4': [], 'IPv6': [], 'ARP': [], '802.1Q': [], 'TCP': [], 'UDP': [], 'ICMP': []}
+    segments = []
+    for _, frame in frames:
+        ethertype = frame[12:14]
+        if ethertype == b'\x81\x00':
+            headers['802.1Q'].append(frame[12:])
+            ethertype, frame = frame[16:18], frame[:12] + frame[16:]
+        if ethertype == b'\x08\x06':
+            headers['ARP'].append(frame[14:])
+        elif ethertype == b'\x08\x00':
+            headers['IPv4'].append(frame[14:])
+            protocol, segment = frame[23], frame[14 + (frame[14] & 0x0F) * 4:]
+        elif ethertype == b'\x86\xdd':
+            headers['IPv6'].append(frame[14:])
+            protocol, segment = frame[20], frame[54:]
+        else:
+            continue
+        if ethertype != b'\x08\x06' and protocol in TRANSPORTS:
+            headers[TRANSPORTS[protocol]].append(segment)
+            segments.append((TRANSPORTS[protocol], segment))
+    return headers, segments
+
+
+def stages(frames, records, directory):
+    """Returns {stage: (items, run)}; run() processes the items once."""
+    headers, segments = _split(frames)
+    raw = [frame for _, frame in frames]
+    paths = itertools.count()
+
+    def path(name):
+        return os.path.join(directory, f"{next(paths)}.{name}")
+
+    def json_lines():
+        with JsonLinesWriter(path('json')) as writer:
+            for record in records:
+                writer(record)
+
+    def sqlite():
+        with SQLiteSink(path('db')) as database:
+            for record in records:
+                database(record)
+
+    def flow_table():
+        with FlowTable() as flows:
+            for record in records:
+                flows(record)
+
+    def save_json():
+        output = path('json')
+        for record in records:
+            save_data(record, output)
+
+    def pcap():
+        writer = PcapWriter(path('pcap'))
+        writer.write_batch(frames)
+        writer.close()
+
+    def record_log():
+        with RecordLogWriter(path('ppr')) as writer:
+            writer.write_batch(frames)
+
+    def tcp_streams():
+        reassembler = TCPReassembler()
+        reassembler.feed_batch(frames)
+        reassembler.close()
+
+    def traffic_stats():
+        stats = TrafficStats(quiet=True)
+        stats.count_batch(frames)
+        stats.close()
+
+    result = {'packet_type': (len(raw), _each(determine_packet_type, raw))}
+    parsers = [('IPv4', IPV4), ('IPv6', IPV6), ('ARP', ARP), ('802.1Q', VLAN), ('TCP', TCP), ('UDP', UDP),
+               ('ICMP', ICMP)]
+    for name, parser in parsers:
+        items = headers[name]
+        if items:
+            result[f'parser.{parser.__name__}'] = (len(items), _each(parser, items))
+    if segments:
+        result['L3NetworkLayer'] = (len(segments), _each(lambda item: L3NetworkLayer(*item), segments))
+    for name, lazy in (('RawFrame', False), ('RawFrame.lazy', True)):
+        result[name] = (len(frames), _each(lambda item, lazy=lazy: RawFrame(item[1], None, item[0], lazy=lazy,
+                                                                            sink=_discard, console=_discard),
+                                           frames))
+    result.update({
+        'sink.save_data': (len(records), save_json),
+        'sink.JsonLinesWriter': (len(records), json_lines),
+        'sink.SQLiteSink': (len(records), sqlite),
+        'sink.FlowTable': (len(records), flow_table),
+        'sink.PcapWriter': (len(frames), pcap),
+        'sink.RecordLogWriter': (len(frames), record_log),
+        'sink.TCPReassembler': (len(frames), tcp_streams),
+        'sink.TrafficStats': (len(frames), traffic_stats),
+    })
+    return result
+
+
+def measure(items: int, run, repeat: int) -> dict:
+    """Runs ``run`` ``repeat`` times and returns the figures of the fastest run."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        run()
+        elapsed = time.perf_counter_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    best = max(best, 1)
+    return {'frames': items, 'ns_per_frame': round(best / items, 1), 'pps': round(items * 1e9 / best)}
+
+
+def regressions(results: dict, baseline: dict, tolerance: float):
+    """Returns [(stage, baseline pps, pps)] for every stage slower than the baseline beyond the tolerance."""
+    slower = []
+    for stage, figures in results['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if previous and figures['pps'] < previous['pps'] * (1 - tolerance):
+            slower.append((stage, previous['pps'], figures['pps']))
+    return slower
+
+
+@contextlib.contextmanager
+def _working_directory(directory):
+    # RawFrame writes its CSV rows below the working directory
+    cwd = os.getcwd()
+    os.makedirs(os.path.join(directory, 'PacketProbe', 'data'), exist_ok=True)
+    os.chdir(directory)
+    try:
+        yield
+    finally:
+        close_csv_sink()
+        os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the throughput of every processing stage.")
+    parser.add_argument('-n', '--frames', type=int, default=20000, help='Number of frames in the corpus.')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed', help='Protocol mix of the corpus.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the corpus generator.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per stage; the fastest is reported.')
+    parser.add_argument('--stage', action='append', help='Only run the stages starting with this name.')
+    parser.add_argument('--label', help='Label stored with the results, e.g. a release or commit.')
+    parser.add_argument('-o', '--output', help='Write the JSON results to this file instead of stdout.')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with.')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Fraction of throughput a stage may lose against the baseline.')
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.frames, args.mix, args.seed)
+    results = {
+        'label': args.label,
+        'python': f"{platform.python_implementation()} {platform.python_version()}",
+        'platform': platform.platform(),
+        'corpus': {'frames': len(frames), 'mix': args.mix, 'seed': args.seed,
+                   'bytes': sum(len(frame) for _, frame in frames)},
+        'repeat': args.repeat,
+        'stages': {},
+    }
+    with tempfile.TemporaryDirectory() as directory, _working_directory(directory):
+        records = []
+        for time_stamp, frame in frames:
+            RawFrame(frame, None, time_stamp, sink=records.append, console=_discard)
+        for stage, (items, run) in stages(frames, records, directory).items():
+            if args.stage and not stage.startswith(tuple(args.stage)):
+                continue
+            figures = results['stages'][stage] = measure(items, run, args.repeat)
+            print(f"{stage:<24} {figures['ns_per_frame']:>12,.0f} ns/frame {figures['pps']:>12,} frames/s",
+                  file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            slower = regressions(results, json.load(file), args.tolerance)
+        results['regressions'] = [{'stage': stage, 'baseline_pps': before, 'pps': after}
+                                  for stage, before, after in slower]
+        for stage, before, after in slower:
+            print(f"Regression: {stage} {before:,} -> {after:,} frames/s", file=sys.stderr)
+
+    text = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(text + '\n')
+    else:
+        print(text)
+    if results.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
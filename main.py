@@ -14,10 +14,317 @@ def main():
         '-f', '--frame_type',
         type=str,
         choices=['ipv4', 'ipv6', 'arp', 'rarp', 'vlan'],
-        help='The type of packet to capture. If not specified, all packet types are captured.'
+        help='The type of packet to capture. If not specified, all packet types are captured. On live Linux '
+             'sockets "vlan" also matches frames whose tag the kernel moved into metadata; those frames are '
+             'captured and written without the tag.'
+    )
+    parser.add_argument(
+        '-b', '--backend',
+        type=str,
+        choices=['socket', 'ring'],
+        default='socket',
+        help='The Linux capture backend: a plain AF_PACKET socket or a PACKET_MMAP (TPACKET_V3) ring.'
+    )
+    parser.add_argument(
+        '--ring_block_size',
+        type=int,
+        default=1 << 22,
+        help='Size of a ring block in bytes (multiple of the page size). Larger blocks favour throughput.'
+    )
+    parser.add_argument(
+        '--ring_block_count',
+        type=int,
+        default=64,
+        help='Number of blocks in the ring.'
+    )
+    parser.add_argument(
+        '--ring_frame_size',
+        type=int,
+        default=2048,
+        help='Size of a frame slot in the ring in bytes (multiple of 16).'
+    )
+    parser.add_argument(
+        '--ring_block_timeout',
+        type=int,
+        default=64,
+        help='Milliseconds before a partially filled block is handed over. Smaller values favour latency.'
+    )
+    parser.add_argument(
+        '-r', '--read',
+        type=str,
+        help='Read frames from a pcap or pcapng file instead of capturing from an interface.'
+    )
+    parser.add_argument(
+        '--realtime',
+        action='store_true',
+        help='When reading a file, replay frames at their original pace instead of as fast as possible.'
+    )
+    parser.add_argument(
+        '--speed',
+        type=float,
+        default=1.0,
+        help='Replay speed multiplier for --realtime (2.0 replays twice as fast).'
+    )
+    parser.add_argument(
+        '-w', '--write',
+        type=str,
+        help='Write raw frames to this pcap/pcapng file.'
+    )
+    parser.add_argument(
+        '--write_format',
+        type=str,
+        choices=['pcap', 'pcapng'],
+        default='pcap',
+        help='The capture file format used by --write.'
+    )
+    parser.add_argument(
+        '--rotate_size',
+        type=int,
+        help='Start a new capture file after this many megabytes.'
+    )
+    parser.add_argument(
+        '--rotate_interval',
+        type=float,
+        help='Start a new capture file after this many seconds.'
+    )
+    parser.add_argument(
+        '--max_files',
+        type=int,
+        help='Keep at most this many rotated capture files, deleting the oldest.'
+    )
+    parser.add_argument(
+        '--no_parse',
+        action='store_true',
+        help='Only write raw frames with --write, skip parsing and the JSON/CSV outputs.'
+    )
+    parser.add_argument(
+        '-e', '--expression',
+        type=str,
+        help='A tcpdump-like filter (e.g. "tcp port 443 and host 10.0.0.5") compiled to BPF and run in the kernel.'
+    )
+    parser.add_argument(
+        '--lazy',
+        action='store_true',
+        help='Hand memoryview slices of each frame to the parsers instead of copying the payload at every layer.'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='Parse frames in this many worker processes fed from a shared-memory ring (0 parses in-process).'
+    )
+    parser.add_argument(
+        '--worker_buffer',
+        type=int,
+        default=64,
+        help='Megabytes of shared memory for frames waiting for a worker.'
+    )
+    parser.add_argument(
+        '--per_worker_sinks',
+        action='store_true',
+        help='Let each worker print directly and write its own packet_data.<n>.json instead of one ordered output.'
+    )
+    parser.add_argument(
+        '--fanout',
+        type=int,
+        default=0,
+        help='Capture with this many worker processes sharing the interface through PACKET_FANOUT (Linux only).'
+    )
+    parser.add_argument(
+        '--fanout_mode',
+        type=str,
+        choices=['hash', 'lb', 'cpu'],
+        default='hash',
+        help='How the kernel spreads frames over the fanout workers: by flow hash, round-robin or receiving CPU.'
+    )
+    parser.add_argument(
+        '--queue_size',
+        type=int,
+        default=65536,
+        help='Maximum number of captured frames waiting for the parser. Bounds memory when parsing falls behind.'
+    )
+    parser.add_argument(
+        '--queue_policy',
+        type=str,
+        choices=['drop_newest', 'drop_oldest', 'block'],
+        default='drop_newest',
+        help='What to do when the queue is full: drop new frames, evict the oldest, or block and let the kernel drop.'
+    )
+    parser.add_argument(
+        '--flush_interval',
+        type=float,
+        default=1.0,
+        help='Seconds between writes of the buffered JSON output (it is also written every 1000 records).'
+    )
+    parser.add_argument(
+        '--record_log',
+        type=str,
+        help='Append every frame as a compact binary record to indexed segments (<name>_0001.ppr, ...).'
+    )
+    parser.add_argument(
+        '--segment_size',
+        type=int,
+        default=256,
+        help='Megabytes after which a record log segment is finished and indexed (at most 4096).'
+    )
+    parser.add_argument(
+        '--sqlite',
+        type=str,
+        help='Also insert the parsed packets into this SQLite database, indexed by time, IP address and port.'
+    )
+    parser.add_argument(
+        '--flows',
+        type=str,
+        help='Aggregate the parsed packets into bidirectional flows and write each finished flow to this file.'
+    )
+    parser.add_argument(
+        '--flows_only',
+        action='store_true',
+        help='With --flows, write only the flow records and no per-packet JSON or SQLite rows.'
+    )
+    parser.add_argument(
+        '--idle_timeout',
+        type=float,
+        default=15.0,
+        help='Seconds without a packet after which a flow ends.'
+    )
+    parser.add_argument(
+        '--active_timeout',
+        type=float,
+        default=1800.0,
+        help='Seconds after which a flow that is still active is written out and counted anew.'
+    )
+    parser.add_argument(
+        '--max_flows',
+        type=int,
+        default=100000,
+        help='Maximum number of flows tracked at once; the least recently seen flow is written out beyond that.'
+    )
+    parser.add_argument(
+        '--reassemble',
+        type=str,
+        help='Reassemble TCP streams and write each direction of each connection to a file in this directory.'
+    )
+    parser.add_argument(
+        '--stream_depth',
+        type=float,
+        default=1,
+        help='Megabytes reassembled per direction of a TCP stream; later data is dropped.'
+    )
+    parser.add_argument(
+        '--stream_memory',
+        type=float,
+        default=64,
+        help='Megabytes of out-of-order TCP data held over all streams before the oldest streams are evicted.'
+    )
+    parser.add_argument(
+        '--fragment_timeout',
+        type=float,
+        default=30.0,
+        help='Seconds after its first fragment after which an incomplete IP datagram is dropped.'
+    )
+    parser.add_argument(
+        '--fragment_memory',
+        type=float,
+        default=4,
+        help='Megabytes of IP fragments held for reassembly before the oldest incomplete datagrams are dropped.'
+    )
+    parser.add_argument(
+        '--stats_only',
+        action='store_true',
+        help='Only count packets and bytes per EtherType and IP protocol, without parsing or per-packet output.'
+    )
+    parser.add_argument(
+        '--stats_interval',
+        type=float,
+        default=10.0,
+        help='Seconds of capture time between the reports of --stats_only.'
+    )
+    parser.add_argument(
+        '--stats_file',
+        type=str,
+        help='With --stats_only, also append every report to this file as a JSON line.'
+    )
+    parser.add_argument(
+        '--console_rate',
+        type=int,
+        default=1000,
+        help='Lines of packet descriptions printed per second; beyond that packets are sampled.'
+    )
+    parser.add_argument(
+        '--console_buffer',
+        type=int,
+        default=10000,
+        help='Lines of packet descriptions held for a slow terminal before new ones are dropped.'
+    )
+    parser.add_argument(
+        '--instrument',
+        action='store_true',
+        help='Record per-stage latency histograms, printed on SIGUSR1 and when the capture ends.'
+    )
+    parser.add_argument(
+        '--instrument_sample',
+        type=int,
+        default=100,
+        help='With --instrument, time the parsing stages of one frame in this many.'
+    )
+    parser.add_argument(
+        '--instrument_file',
+        type=str,
+        help='With --instrument, also write the histograms to this JSON file on every dump.'
+    )
+    parser.add_argument(
+        '--queue_wait_alert',
+        type=float,
+        help='With --instrument, warn when a batch waits longer than this many seconds for the parser.'
+    )
+    parser.add_argument(
+        '--metrics_port',
+        type=int,
+        help='Serve capture health metrics in the Prometheus text format on this port, at /metrics.'
+    )
+    parser.add_argument(
+        '--metrics_address',
+        type=str,
+        default='127.0.0.1',
+        help='Address the metrics endpoint listens on.'
     )
     args = parser.parse_args()
-    PacketProbe(interface=args.interface)
+    ring_options = {
+        'block_size': args.ring_block_size,
+        'block_count': args.ring_block_count,
+        'frame_size': args.ring_frame_size,
+        'block_timeout': args.ring_block_timeout,
+    }
+    write_options = {
+        'file_format': args.write_format,
+        'rotate_size': args.rotate_size * 1024 * 1024 if args.rotate_size else None,
+        'rotate_interval': args.rotate_interval,
+        'max_files': args.max_files,
+    }
+    PacketProbe(interface=args.interface, filter_type=args.frame_type, filter_expression=args.expression,
+                backend=args.backend, ring_options=ring_options,
+                read_file=args.read, realtime=args.realtime, speed=args.speed,
+                write_file=args.write, write_options=write_options, parse=not args.no_parse, lazy=args.lazy,
+                workers=args.workers, worker_buffer=args.worker_buffer * 1024 * 1024,
+                ordered=not args.per_worker_sinks, fanout=args.fanout, fanout_mode=args.fanout_mode,
+                queue_size=args.queue_size, queue_policy=args.queue_policy, flush_interval=args.flush_interval,
+                record_log=args.record_log, record_log_options={'segment_size': args.segment_size * 1024 * 1024},
+                sqlite=args.sqlite, flows=args.flows, flows_only=args.flows_only,
+                flow_options={'idle_timeout': args.idle_timeout, 'active_timeout': args.active_timeout,
+                              'max_flows': args.max_flows},
+                reassemble=args.reassemble,
+                reassembly_options={'max_depth': int(args.stream_depth * 1024 * 1024),
+                                    'memory_budget': int(args.stream_memory * 1024 * 1024)},
+                fragment_options={'timeout': args.fragment_timeout,
+                                  'memory_limit': int(args.fragment_memory * 1024 * 1024)},
+                stats_only=args.stats_only, stats_options={'report_interval': args.stats_interval},
+                stats_file=args.stats_file,
+                console_options={'max_lines_per_second': args.console_rate, 'buffer_lines': args.console_buffer},
+                instrument_options={'sample_every': args.instrument_sample, 'queue_wait_alert': args.queue_wait_alert,
+                                    'path': args.instrument_file} if args.instrument else None,
+                metrics_options={'port': args.metrics_port, 'address': args.metrics_address}
+                if args.metrics_port is not None else None)
 
 
 if __name__ == "__main__":
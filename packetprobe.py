@@ -1,8 +1,28 @@
 import argparse
+from time import monotonic, time
 
+from PacketProbe import instrumentation
 from PacketProbe.bindsocket import BindSocketPCAP, BindSocket
+from PacketProbe.console import ConsoleRenderer
+from PacketProbe.fanout import FanoutCapture
+from PacketProbe.filters.bpf import compile_filter, frame_type_expression
+from PacketProbe.filters.bpfvm import compile_program
+from PacketProbe.flowtable import FlowTable
+from PacketProbe.metrics import CaptureMetrics, MetricsServer
+from PacketProbe.pcapreader import PcapFileSource
+from PacketProbe.pcapwriter import PcapWriter
+from PacketProbe.pipeline import FramePipeline
 from PacketProbe.rawframe import RawFrame
+from PacketProbe.reassembly.fragments import FragmentReassembler
+from PacketProbe.reassembly.tcpstreams import StreamFileWriter, TCPReassembler
+from PacketProbe.ringsocket import BindSocketRing
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+from PacketProbe.sinks.recordlog import RecordLogWriter
+from PacketProbe.sinks.sqlitedb import SQLiteSink
+from PacketProbe.trafficstats import TrafficStats
+from PacketProbe.utils.helpers import _tee
 from PacketProbe.utils.osRecognition import find_os
+from PacketProbe.utils.packetDataCSV import close_csv_sink
 from PacketProbe.Interfaces.networkinterfaces import NetworkInterfaces
 
 
@@ -18,6 +38,26 @@ class PacketProbe:
     Modules:
         argparse: For parsing command-line arguments.
         PacketProbe.bindsocket: Contains classes for binding to sockets and packet capture.
+        PacketProbe.ringsocket: Provides the PACKET_MMAP (TPACKET_V3) ring capture backend.
+        PacketProbe.pcapreader: Replays pcap/pcapng files through the same processing pipeline.
+        PacketProbe.pcapwriter: Persists raw frames to rotating pcap/pcapng files.
+        PacketProbe.filters.bpf: Compiles frame-type and expression filters to kernel BPF programs.
+        PacketProbe.filters.bpfvm: Runs the same BPF programs in userspace for files and pcap capture.
+        PacketProbe.pipeline: Parses frames in worker processes fed from a shared-memory ring.
+        PacketProbe.fanout: Captures one interface with worker processes in a PACKET_FANOUT group.
+        PacketProbe.framequeue: Bounds the frames waiting for the parser and counts what is dropped.
+        PacketProbe.sinks.buffered: Background flush thread and write counters shared by the batched sinks.
+        PacketProbe.sinks.jsonlines: Writes the parsed packet data as batched JSON lines.
+        PacketProbe.sinks.csvpool: Writes the per-protocol CSV files through pooled handles.
+        PacketProbe.sinks.recordlog: Appends compact, indexed binary packet records.
+        PacketProbe.sinks.sqlitedb: Inserts the parsed packet data into an indexed SQLite database.
+        PacketProbe.flowtable: Aggregates the parsed packets into bidirectional flow records.
+        PacketProbe.reassembly.tcpstreams: Reassembles TCP byte streams within depth and memory limits.
+        PacketProbe.reassembly.fragments: Reassembles fragmented IPv4 and IPv6 datagrams before parsing.
+        PacketProbe.trafficstats: Counts packets and bytes per EtherType and IP protocol without parsing.
+        PacketProbe.console: Writes the packet descriptions from a background thread within a line rate.
+        PacketProbe.instrumentation: Records per-stage latency histograms, dumped on SIGUSR1 and at exit.
+        PacketProbe.metrics: Serves capture health metrics over HTTP in the Prometheus text format.
         PacketProbe.rawpacket: Provides packet processing capabilities.
         PacketProbe.utils.osRecognition: Contains utilities for recognizing the operating system.
         PacketProbe.Interfaces.networkinterfaces: Manages and lists available network interfaces.
@@ -32,13 +72,173 @@ class PacketProbe:
         Run the script from the command line with optional arguments for interface and packet type:
             python packetprobe.py -i <interface_name> -p <packet_type>
 
+        On Linux the capture backend can be switched to the memory-mapped ring:
+            python main.py -i <interface_name> --backend ring --ring_block_size 4194304
+
+        Capture files are read instead of a live interface with -r, optionally paced in real time:
+            python main.py -r capture.pcapng --realtime
+
+        Raw frames can be written to rotating capture files, with or without parsing:
+            python main.py -i eth0 -w capture.pcap --rotate_size 100 --max_files 10 --no_parse
+
+        Filters are compiled to classic BPF and attached to the capture socket:
+            python main.py -i eth0 -e "tcp port 443 and net 10.0.0.0/8"
+
+        Parsing can be spread over worker processes, with output in capture order or per worker:
+            python main.py -i eth0 --workers 8 [--per_worker_sinks]
+
+        On Linux each worker can capture its own share of the interface through PACKET_FANOUT:
+            python main.py -i eth0 --fanout 8 --fanout_mode hash
+
+        Memory is bounded by the frames queued for the parser; what happens when it falls behind is a policy:
+            python main.py -i eth0 --queue_size 100000 --queue_policy drop_oldest
+
+        Packets can also be kept as indexed binary records, which are fast to query later:
+            python main.py -i eth0 --record_log capture.ppr --segment_size 256
+
+        Parsed packets can also be inserted into SQLite, indexed by time, address and port:
+            python main.py -i eth0 --sqlite packets.db
+
+        Packets can be summarised per flow, alongside or instead of the per-packet output:
+            python main.py -i eth0 --flows flows.json --idle_timeout 15 --active_timeout 1800 [--flows_only]
+
+        TCP byte streams can be reassembled into one file per connection and direction:
+            python main.py -r capture.pcap --reassemble streams --stream_depth 1 --stream_memory 64
+
+        Fragmented datagrams are reassembled before parsing, within a timeout and a memory limit:
+            python main.py -i eth0 --fragment_timeout 30 --fragment_memory 4
+
+        For capacity monitoring, frames can only be counted, with periodic interval and total reports:
+            python main.py -i eth0 --stats_only --stats_interval 10 [--stats_file stats.json]
+
+        Packet descriptions are written by a background thread, sampled down to a line rate:
+            python main.py -i eth0 --console_rate 200 --console_buffer 10000
+
+        Per-stage latency histograms are recorded for a sample of the frames and printed on SIGUSR1 and at exit:
+            python main.py -i eth0 --instrument --instrument_sample 100 --queue_wait_alert 0.5
+
+        A daemon exposes its capture, drop, parse, queue and output metrics for Prometheus to scrape:
+            python main.py -i eth0 --metrics_port 9108 [--metrics_address 0.0.0.0]
+
 """
 
-    def __init__(self, interface=None, filter_type=None):
+    DROP_REPORT_INTERVAL = 5.0
+
+    def __init__(self, interface=None, filter_type=None, backend='socket', ring_options=None,
+                 read_file=None, realtime=False, speed=1.0, write_file=None, write_options=None, parse=True,
+                 filter_expression=None, lazy=False, workers=0, worker_buffer=64 << 20, ordered=True,
+                 fanout=0, fanout_mode='hash', queue_size=65536, queue_policy='drop_newest',
+                 flush_interval=1.0, record_log=None, record_log_options=None, sqlite=None,
+                 flows=None, flow_options=None, flows_only=False, reassemble=None, reassembly_options=None,
+                 fragment_options=None, stats_only=False, stats_options=None, stats_file=None,
+                 console_options=None, instrument_options=None, metrics_options=None):
 
         self.os_name = find_os()
-        if self.os_name == 'nt':
-            self.bind_socket_pcap = BindSocketPCAP()
+        if fanout and (read_file or self.os_name != 'posix'):
+            raise ValueError("Fanout capture needs a live interface on Linux.")
+        if fanout and workers:
+            raise ValueError("Fanout capture already runs in worker processes, do not combine it with workers.")
+        if flows and workers:
+            raise ValueError("Workers split the packets of a flow, track flows in-process or with --fanout instead.")
+        if flows and fanout and fanout_mode != 'hash':
+            raise ValueError("Only hash fanout keeps a flow on one worker, use --fanout_mode hash.")
+        if reassemble and fanout and fanout_mode != 'hash':
+            raise ValueError("Only hash fanout keeps a TCP connection on one worker, use --fanout_mode hash.")
+        if flows_only and not flows:
+            raise ValueError("Only writing flows needs a flow output file.")
+        if stats_only and fanout:
+            raise ValueError("Stats-only mode counts in-process, do not combine it with fanout.")
+        if metrics_options is not None and fanout:
+            raise ValueError("The metrics endpoint counts in-process, do not combine it with fanout.")
+
+        # Before any capture queue or worker exists, so they all record into the histograms
+        self.instruments = instrumentation.enable(**instrument_options) if instrument_options is not None else None
+        self.reported_queue_alerts = 0
+
+        # Fanout workers open their own per-worker capture files
+        self.pcap_writer = PcapWriter(write_file, **(write_options or {})) if write_file and not fanout else None
+        self.record_log = None
+        if record_log and not fanout:
+            self.record_log = RecordLogWriter(record_log, **(record_log_options or {}))
+        self.reassembler = None
+        if reassemble and not fanout:
+            self.reassembler = TCPReassembler(**(reassembly_options or {}))
+            self.reassembler.add_consumer(StreamFileWriter(reassemble))
+        # Stats-only mode counts the raw frames and never parses them
+        self.stats = None
+        self.stats_writer = None
+        if stats_only:
+            parse = False
+            if stats_file:
+                self.stats_writer = JsonLinesWriter(stats_file, flush_interval=flush_interval)
+            self.stats = TrafficStats(sink=self.stats_writer, **(stats_options or {}))
+        elif metrics_options is not None:
+            # Only for its per-protocol counters, which the metrics endpoint reads
+            self.stats = TrafficStats(report_interval=float('inf'), quiet=True)
+        self.metrics = CaptureMetrics(self.stats)
+        self.metrics_server = None
+        self.parse = parse
+        self.lazy = lazy
+        self.reported_drops = 0
+        self.next_drop_report = 0.0
+        queue_options = {'queue_size': queue_size, 'queue_policy': queue_policy}
+        console_options = console_options or {}
+
+        self.filter_type = filter_type
+        self.filter_expression = filter_expression or (frame_type_expression(filter_type) if filter_type else None)
+        # Live Linux capture filters in the kernel, everything else runs the program in userspace
+        live_filter = not read_file and self.os_name == 'posix'
+        self.bpf_program = None
+        if self.filter_expression:
+            self.bpf_program = compile_filter(self.filter_expression, live=live_filter)
+            print(f"Filtering for: {self.filter_expression}")
+
+        self.frame_filter = None
+        if self.bpf_program and not live_filter:
+            self.frame_filter = compile_program(self.bpf_program)
+
+        # Start the workers before any capture thread exists, so forking them is safe. The
+        # Windows pcap source hands over single frames and keeps parsing in this process.
+        self.pipeline = None
+        if workers and parse and (read_file or self.os_name != 'nt'):
+            self.pipeline = FramePipeline(workers, buffer_size=worker_buffer, ordered=ordered,
+                                          filter_type=filter_type, lazy=lazy, flush_interval=flush_interval,
+                                          sqlite=sqlite, console_options=console_options)
+            self.metrics.parse_errors = self.pipeline.parse_errors  # Counted by the workers
+
+        # One long-lived output file for in-process parsing; workers write their own
+        self.json_writer = None
+        self.database = None
+        self.flow_writer = None
+        self.flow_table = None
+        self.fragments = None
+        self.console = None
+        if parse and not self.pipeline and not fanout:
+            self.fragments = FragmentReassembler(**(fragment_options or {}))
+            self.console = ConsoleRenderer(**console_options)
+            if not flows_only:
+                self.json_writer = JsonLinesWriter(flush_interval=flush_interval)
+            if sqlite:
+                self.database = SQLiteSink(sqlite, flush_interval=flush_interval)
+            if flows:
+                self.flow_writer = JsonLinesWriter(flows, flush_interval=flush_interval)
+                flow_sink = _tee(self.flow_writer, self.database.write_flow if self.database else None)
+                self.flow_table = FlowTable(flow_sink, **(flow_options or {}))
+        sinks = [self.json_writer, None if flows_only else self.database, self.flow_table]
+        if self.instruments:
+            sinks = [self.instruments.timed(f'sink.{type(sink).__name__}', sink) if sink is not None else None
+                     for sink in sinks]
+        self.sink = _tee(*sinks)
+        self.metrics.sinks = {'json': self.json_writer, 'sqlite': self.database, 'flows': self.flow_writer,
+                              'stats': self.stats_writer}
+
+        if read_file:
+            self.bind_socket = PcapFileSource(read_file, realtime=realtime, speed=speed,
+                                              frame_filter=self.frame_filter, queue_size=queue_size)
+            self.bind_socket.start_capturing()
+
+        elif self.os_name == 'nt':
+            self.bind_socket_pcap = BindSocketPCAP(**queue_options)
             self.bind_socket_pcap.start_packet_capture()
 
         elif self.os_name == 'posix':
@@ -48,17 +248,41 @@ class PacketProbe:
             else:
                 self.interface = interface
             print("Current interface:", self.interface)
-            self.bind_socket = BindSocket(self.interface)
+            if fanout:
+                capture = FanoutCapture(self.interface, fanout, mode=fanout_mode, backend=backend,
+                                        ring_options=ring_options, bpf_program=self.bpf_program,
+                                        filter_type=filter_type, lazy=lazy, parse=parse,
+                                        write_file=write_file, write_options=write_options,
+                                        queue_options=queue_options, flush_interval=flush_interval,
+                                        record_log=record_log, record_log_options=record_log_options,
+                                        sqlite=sqlite, flows=flows, flow_options=flow_options,
+                                        flows_only=flows_only, reassemble=reassemble,
+                                        reassembly_options=reassembly_options, fragment_options=fragment_options,
+                                        console_options=console_options)
+                capture.start()
+                capture.wait()
+                return
+            if backend == 'ring':
+                self.bind_socket = BindSocketRing(self.interface, bpf_program=self.bpf_program,
+                                                  **(ring_options or {}), **queue_options)
+            else:
+                self.bind_socket = BindSocket(self.interface, bpf_program=self.bpf_program, **queue_options)
             self.bind_socket.start_capturing()
 
         else:
             self._ni = NetworkInterfaces()
             self.interface = self._ni.interface
             print("Current interface:", self.interface)
-            self.bind_socket = BindSocket(self.interface)
+            self.bind_socket = BindSocket(self.interface, **queue_options)
             self.bind_socket.start_capturing()
 
-        self.filter_type = filter_type
+        if metrics_options is not None:
+            capture = getattr(self, 'bind_socket_pcap', None)
+            self.metrics.frame_queue = capture.raw_data if capture else self.bind_socket.raw_packets
+            self.metrics_server = MetricsServer(self.metrics, **metrics_options)
+            print(f"Serving metrics on http://{metrics_options.get('address', '127.0.0.1')}:"
+                  f"{self.metrics_server.port}/metrics")
+
         self.process_frames()
 
     def process_frames(self):
@@ -69,21 +293,146 @@ class PacketProbe:
                 try:
                     while True:
                         frame = self.bind_socket_pcap.raw_data.get()
-                        RawFrame(frame, self.filter_type)
+                        self.report_drops(self.bind_socket_pcap.raw_data)
+                        self.report_queue_wait(self.bind_socket_pcap.raw_data)
+                        if self.frame_filter and not self.frame_filter(frame):
+                            continue
+                        if self.pcap_writer:
+                            self.pcap_writer.write(frame)
+                        if self.record_log:
+                            self.record_log.write(frame)
+                        if self.reassembler:
+                            self.reassembler.feed(frame)
+                        if self.stats:
+                            self.stats.count(frame, time())
+                        if self.parse:
+                            self.metrics.frames_parsed += 1
+                            try:
+                                RawFrame(frame, self.filter_type, lazy=self.lazy, sink=self.sink,
+                                         fragments=self.fragments, console=self.console)
+                            except ValueError:
+                                self.metrics.parse_error(frame)
                 except KeyboardInterrupt:
                     print("\n Packet capturing stopped")
                 finally:
-                    pass
+                    self.report_drops(self.bind_socket_pcap.raw_data, final=True)
+                    self.close_outputs()
+                    self.close_writer()
         elif hasattr(self, 'bind_socket'):
             # Process packets from BindSocket on non-Windows platforms
             print(self.bind_socket.raw_packets)
             if self.bind_socket.raw_packets:
                 try:
                     while True:
-                        frame = self.bind_socket.raw_packets.get()
-                        RawFrame(frame, self.filter_type)
+                        batch = self.bind_socket.raw_packets.get()
+                        if batch is None:
+                            break  # End of a capture file
+                        self.report_drops(self.bind_socket.raw_packets)
+                        self.report_queue_wait(self.bind_socket.raw_packets)
+                        if self.pcap_writer:
+                            self.pcap_writer.write_batch(batch)
+                        if self.record_log:
+                            self.record_log.write_batch(batch)
+                        if self.reassembler:
+                            self.reassembler.feed_batch(batch)
+                        if self.stats:
+                            self.stats.count_batch(batch)
+                        if not self.parse:
+                            continue
+                        self.metrics.frames_parsed += len(batch)
+                        if self.pipeline:
+                            self.pipeline.submit(batch)
+                            continue
+                        for time_stamp, frame in batch:
+                            try:
+                                RawFrame(frame, self.filter_type, time_stamp, lazy=self.lazy, sink=self.sink,
+                                         fragments=self.fragments, console=self.console)
+                            except ValueError:
+                                self.metrics.parse_error(frame)  # A header cut short, skip the frame
                 except KeyboardInterrupt:
                     print("\n Packet capturing stopped")
                 finally:
-                    pass
+                    self.report_drops(self.bind_socket.raw_packets, final=True)
+                    self.close_pipeline()
+                    self.close_outputs()
+                    self.close_writer()
+
+    def report_drops(self, frame_queue, final=False):
+        """Prints new drops at most every DROP_REPORT_INTERVAL seconds, and a total at the end."""
+        dropped = frame_queue.dropped
+        if final:
+            if dropped:
+                print(f"Dropped {dropped} frames ({frame_queue.drop_summary()})")
+            return
+        if dropped == self.reported_drops or monotonic() < self.next_drop_report:
+            return
+        print(f"Warning: dropped {dropped - self.reported_drops} more frames, "
+              f"{dropped} in total ({frame_queue.drop_summary()})")
+        self.reported_drops = dropped
+        self.next_drop_report = monotonic() + self.DROP_REPORT_INTERVAL
+
+    def report_queue_wait(self, frame_queue):
+        """Prints a warning when batches waited in the queue longer than the alert threshold."""
+        histogram = frame_queue.wait_histogram
+        if histogram is None or histogram.alerts == self.reported_queue_alerts:
+            return
+        if monotonic() < self.next_drop_report:
+            return
+        print(f"Warning: {histogram.alerts - self.reported_queue_alerts} more batches waited over "
+              f"{histogram.alert_above / 1e6:.0f} ms for the parser (longest {histogram.maximum / 1e6:.0f} ms)")
+        self.reported_queue_alerts = histogram.alerts
+        self.next_drop_report = monotonic() + self.DROP_REPORT_INTERVAL
+
+    def close_pipeline(self):
+        """Waits for the workers to parse every frame handed to them, then stops them."""
+        if self.pipeline:
+            self.pipeline.close()
+            print(f"Workers parsed {self.pipeline.frames_submitted} frames")
+
+    def close_outputs(self):
+        """
+        Emits the open flows and the last stats report, writes the buffered packet data and closes
+        the outputs and the metrics endpoint.
+        """
+        if self.console:
+            self.console.close()  # Before the summaries, so they come after the last packet
+        if self.stats:
+            self.stats.close()
+            if self.stats_writer:
+                self.stats_writer.close()
+        if self.flow_table is not None:
+            self.flow_table.close()
+            self.flow_writer.close()
+            print(f"Wrote {sum(self.flow_table.flows_emitted.values())} flows "
+                  f"from {self.flow_table.packets_seen} packets")
+        if self.fragments and self.fragments.stats['fragments']:
+            stats = self.fragments.stats
+            print(f"Reassembled {stats['reassembled']} datagrams from {stats['fragments']} fragments "
+                  f"({stats['timed_out']} timed out, {stats['evicted'] + stats['oversized']} dropped)")
+        parse_errors = self.metrics.parse_errors
+        if parse_errors:
+            print(f"Skipped {sum(parse_errors.values())} frames too short to parse "
+                  f"({', '.join(f'{name}: {count}' for name, count in sorted(parse_errors.items()))})")
+        if self.json_writer:
+            self.json_writer.close()
+        if self.database:
+            self.database.close()
+        close_csv_sink()
+        if self.instruments:
+            self.instruments.dump()
+        if self.metrics_server:
+            self.metrics_server.close()
 
+    def close_writer(self):
+        """Flushes and closes the raw capture file, the record log and the stream files, if they are being written."""
+        if self.pcap_writer:
+            self.pcap_writer.close()
+            print(f"Wrote {self.pcap_writer.frames_written} frames to {len(self.pcap_writer.files)} file(s)")
+        if self.record_log:
+            self.record_log.close()
+            print(f"Wrote {self.record_log.records_written} records to {len(self.record_log.files)} segment(s)")
+        if self.reassembler:
+            self.reassembler.close()
+            stats = self.reassembler.stats
+            print(f"Reassembled {stats['delivered_bytes']} bytes from {stats['streams']} TCP streams "
+                  f"({stats['evicted_streams']} evicted)")
@@ -0,0 +1,76 @@
+import os
+import socket
+import struct
+import tempfile
+import unittest
+
+from PacketProbe.utils.packetDataCSV import close_csv_sink
+
+"""
+    Shared test helpers: frame builders, sample frames, the fixture for tests that
+    parse frames, and the check that gates the tests needing AF_PACKET sockets.
+"""
+
+
+def ethernet(ethertype, payload=b''):
+    return bytes.fromhex('001122334455') + bytes.fromhex('66778899aabb') + struct.pack('!H', ethertype) + payload
+
+
+def ipv4(protocol, source, destination, l4=b'', flags_fragment=0x4000):
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(l4), 1, flags_fragment, 64, protocol, 0,
+                         socket.inet_aton(source), socket.inet_aton(destination))
+    return ethernet(0x0800, header + l4)
+
+
+def ipv6(next_header, source, destination, l4=b''):
+    header = struct.pack('!IHBB16s16s', 6 << 28, len(l4), next_header, 64,
+                         socket.inet_pton(socket.AF_INET6, source), socket.inet_pton(socket.AF_INET6, destination))
+    return ethernet(0x86DD, header + l4)
+
+
+def ports(source, destination):
+    return struct.pack('!HH', source, destination) + bytes(16)
+
+
+def ipv4_fragments(data, size=16):
+    frames = []
+    for offset in range(0, len(data), size):
+        more = 0x2000 if offset + size < len(data) else 0
+        frames.append(ipv4(17, '10.0.0.1', '10.0.0.5', data[offset:offset + size],
+                           flags_fragment=more | offset // 8))
+    return frames
+
+
+FRAMES = {
+    'arp': ethernet(0x0806, bytes(28)),
+    'tcp4': ipv4(6, '10.0.0.1', '10.0.0.5', ports(40000, 443)),
+    'udp4': ipv4(17, '192.168.1.7', '10.0.0.5', ports(53, 5353)),
+    'icmp4': ipv4(1, '10.0.0.5', '10.0.0.1', bytes(8)),
+    'fragment4': ipv4(17, '10.0.0.1', '10.0.0.5', ports(443, 443), flags_fragment=0x0010),
+    'tcp6': ipv6(6, 'fe80::1', '2001:db8::5', ports(443, 50000)),
+    'icmp6': ipv6(58, 'fe80::1', 'fe80::2', bytes(8)),
+    'vlan': ethernet(0x8100, bytes(4)),
+}
+
+
+def packet_sockets_allowed():
+    try:
+        socket.socket(socket.AF_PACKET, socket.SOCK_RAW, 0).close()
+    except (AttributeError, OSError):
+        return False
+    return True
+
+
+class ParsingTestCase(unittest.TestCase):
+    """Runs each test in a temporary directory, where RawFrame writes its per-protocol CSV files."""
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+        os.makedirs(os.path.join('PacketProbe', 'data'))
+
+    def tearDown(self):
+        close_csv_sink()  # Write the buffered rows into the temporary directory
+        os.chdir(self.cwd)
+        self.directory.cleanup()
@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+import io
+import socket
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from PacketProbe.asynccapture import AsyncCapture, parse_batch
+from PacketProbe.filters.bpf import compile_filter
+from helpers import FRAMES, ParsingTestCase, packet_sockets_allowed
+
+PORT = 9997
+
+
+# lo delivers every frame twice to a packet socket, once outgoing and once incoming
+def send_datagrams(count):
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sender:
+        for index in range(count):
+            sender.sendto(bytes([index]), ('127.0.0.1', PORT))
+
+
+class TestParseBatch(ParsingTestCase):
+    def test_records_for_ip_frames(self):
+        batch = [(1700000000.0, FRAMES['udp4']), (1700000001.0, FRAMES['arp']), (None, FRAMES['vlan'])]
+        records = parse_batch(batch)
+        self.assertEqual(len(records), 2)
+        self.assertEqual(records[0]['bytes_length'], len(FRAMES['udp4']))
+
+    def test_filter_type(self):
+        batch = [(None, FRAMES['udp4']), (None, FRAMES['arp']), (None, FRAMES['tcp4'])]
+        self.assertEqual(len(parse_batch(batch, filter_type='ipv4')), 2)
+
+    def test_truncated_frames_are_skipped(self):
+        batch = [(None, FRAMES['arp']), (None, FRAMES['tcp4'][:20]), (None, FRAMES['arp'])]
+        self.assertEqual(len(parse_batch(batch)), 2)
+
+    def test_concurrent_calls_leave_stdout_alone(self):
+        batch = [(None, FRAMES['udp4']), (None, FRAMES['tcp4']), (None, FRAMES['arp'])]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            with ThreadPoolExecutor(4) as executor:
+                results = list(executor.map(parse_batch, [batch] * 40))
+            self.assertIs(sys.stdout, output)
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual([len(records) for records in results], [3] * 40)
+
+
+@unittest.skipUnless(packet_sockets_allowed(), "AF_PACKET sockets are not permitted")
+class TestAsyncCapture(ParsingTestCase):
+    def capture(self, **options):
+        return AsyncCapture('lo', bpf_program=compile_filter(f'udp and dst port {PORT}'), **options)
+
+    async def collect(self, iterate, count):
+        items = []
+
+        async def consume():
+            async for item in iterate():
+                items.append(item)
+                if len(items) == count:
+                    return
+
+        await asyncio.wait_for(consume(), 5)
+        return items
+
+    def test_frames(self):
+        async def run():
+            async with self.capture() as capture:
+                send_datagrams(20)
+                return await self.collect(capture.frames, 40)
+
+        frames = asyncio.run(run())
+        self.assertEqual([frame[-1] for _, frame in frames], [index // 2 for index in range(40)])
+
+    def test_records_in_executor(self):
+        async def run():
+            async with self.capture() as capture:
+                send_datagrams(10)
+                with ThreadPoolExecutor(1) as executor:
+                    return await self.collect(lambda: capture.records(executor), 20)
+
+        records = asyncio.run(run())
+        self.assertEqual(len(records), 20)
+
+    def test_block_policy_pauses_reading_instead_of_dropping(self):
+        async def run():
+            async with self.capture(queue_size=4, queue_policy='block', batch_size=2) as capture:
+                send_datagrams(30)
+                await asyncio.sleep(0.1)  # Let the queue fill up
+                paused = capture.paused
+                frames = await self.collect(capture.frames, 60)
+                return paused, frames, capture.raw_packets.dropped
+
+        paused, frames, dropped = asyncio.run(run())
+        self.assertTrue(paused)
+        self.assertEqual(len(frames), 60)
+        self.assertEqual(dropped, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
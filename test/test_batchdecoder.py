@@ -0,0 +1,77 @@
+import ipaddress
+import math
+import os
+import struct
+import tempfile
+import unittest
+
+from PacketProbe.batchdecoder import COLUMNS, _decode_slow, decode_batch, decode_file, np
+from PacketProbe.pcapwriter import PcapWriter
+from helpers import FRAMES, ethernet, ipv4, ipv6, ports
+
+TCP_SYN = struct.pack('!HHLLBBHHH', 1234, 80, 0, 0, 0x50, 0x02, 0, 0, 0)
+
+SLOW_FRAMES = {
+    'vlan_tcp4': (ethernet(0x8100, struct.pack('!HH', 100, 0x0800)) + ipv4(6, '10.1.1.1', '10.2.2.2', TCP_SYN)[14:]),
+    'options4': ethernet(0x0800, struct.pack('!BBHHHBBH4s4s', 0x46, 0, 44, 1, 0, 32, 17, 0, bytes([1, 1, 1, 1]),
+                                             bytes([2, 2, 2, 2])) + bytes(4) + ports(53, 53)[:8]),
+    'hop_by_hop6': ipv6(0, '::1', '::2', bytes([6, 0]) + bytes(6) + TCP_SYN),
+    'fragment6': ipv6(44, '::1', '::2', bytes([17, 0, 0, 1]) + bytes(4) + ports(53, 53)[:8]),
+    'truncated4': ipv4(6, '10.0.0.1', '10.0.0.2', TCP_SYN)[:40],
+}
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class TestBatchDecoder(unittest.TestCase):
+    def assert_row(self, columns, index, expected):
+        names = [name for name, _ in COLUMNS[2:12]]
+        actual = tuple(bytes(columns[name][index]) if name.endswith('_ip') else int(columns[name][index])
+                       for name in names)
+        self.assertEqual(actual, tuple(expected))
+
+    def test_fast_path_matches_struct_decoders(self):
+        columns = decode_batch([(float(index), frame) for index, frame in enumerate(FRAMES.values())])
+        for index, (name, frame) in enumerate(FRAMES.items()):
+            with self.subTest(frame=name):
+                self.assertEqual(bool(columns['slow_path'][index]), name == 'vlan')
+                self.assert_row(columns, index, _decode_slow(frame))
+        self.assertEqual(columns['time_stamp'].tolist(), list(range(len(FRAMES))))
+
+    def test_columns(self):
+        columns = decode_batch([(None, FRAMES['tcp4']), (None, FRAMES['tcp6']), (None, FRAMES['fragment4'])])
+        self.assertTrue(math.isnan(columns['time_stamp'][0]))
+        self.assertEqual(columns['ip_version'].tolist(), [4, 6, 4])
+        self.assertEqual(columns['dst_port'].tolist(), [443, 50000, 0])
+        self.assertEqual(ipaddress.IPv6Address(bytes(columns['src_ip'][0])).ipv4_mapped,
+                         ipaddress.IPv4Address('10.0.0.1'))
+        self.assertEqual(ipaddress.IPv6Address(bytes(columns['dst_ip'][1])), ipaddress.IPv6Address('2001:db8::5'))
+
+    def test_slow_path(self):
+        columns = decode_batch([(0.0, frame) for frame in SLOW_FRAMES.values()])
+        self.assertTrue(columns['slow_path'].all())
+        self.assertEqual(columns['ethertype'].tolist(), [0x0800, 0x0800, 0x86DD, 0x86DD, 0x0800])
+        self.assertEqual(columns['protocol'].tolist(), [6, 17, 6, 17, 6])
+        self.assertEqual(columns['src_port'].tolist(), [1234, 53, 1234, 53, 0])
+        self.assertEqual(columns['tcp_flags'].tolist(), [0x02, 0, 0x02, 0, 0])
+
+    def test_decode_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'mixed.pcapng')
+            writer = PcapWriter(path, file_format='pcapng')
+            for index, frame in enumerate(list(FRAMES.values()) + list(SLOW_FRAMES.values())):
+                writer.write(frame, 1000.0 + index)
+            writer.close()
+
+            columns = decode_file(path, chunk_size=3)
+            self.assertEqual(len(columns['frame_length']), len(FRAMES) + len(SLOW_FRAMES))
+            self.assertEqual(columns['time_stamp'][-1], 1000.0 + len(FRAMES) + len(SLOW_FRAMES) - 1)
+            self.assertEqual(int(columns['slow_path'].sum()), len(SLOW_FRAMES) + 1)
+
+    def test_empty_batch(self):
+        columns = decode_batch([])
+        self.assertEqual(set(columns), {name for name, _ in COLUMNS})
+        self.assertEqual(len(columns['src_port']), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import socket
+import unittest
+
+from PacketProbe.filters.bpf import BPF_RET, BPF_K, attach_filter, compile_filter, frame_type_expression
+from helpers import FRAMES
+
+
+class TestBPFCompiler(unittest.TestCase):
+    def kernel_matches(self, expression):
+        """Runs the compiled program in the kernel on an AF_UNIX socket and reports which frames pass."""
+        sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        with sender, receiver:
+            attach_filter(receiver, compile_filter(expression))
+            receiver.setblocking(False)
+            matched = set()
+            for name, frame in FRAMES.items():
+                sender.send(frame)
+                try:
+                    receiver.recv(2048)
+                    matched.add(name)
+                except BlockingIOError:
+                    pass
+            return matched
+
+    def test_program_ends_with_accept_and_reject(self):
+        program = compile_filter('ip')
+        self.assertEqual(program[-2:], [(BPF_RET | BPF_K, 0, 0, 0x40000), (BPF_RET | BPF_K, 0, 0, 0)])
+
+    def test_ethertype_primitives(self):
+        self.assertEqual(self.kernel_matches('arp'), {'arp'})
+        self.assertEqual(self.kernel_matches('vlan'), {'vlan'})
+        self.assertEqual(self.kernel_matches('ether proto 0x86dd'), {'tcp6', 'icmp6'})
+
+    def test_protocols(self):
+        self.assertEqual(self.kernel_matches('tcp'), {'tcp4', 'tcp6'})
+        self.assertEqual(self.kernel_matches('udp'), {'udp4', 'fragment4'})
+        self.assertEqual(self.kernel_matches('icmp or icmp6'), {'icmp4', 'icmp6'})
+        self.assertEqual(self.kernel_matches('ip proto 1'), {'icmp4'})
+
+    def test_hosts_and_nets(self):
+        self.assertEqual(self.kernel_matches('dst host 10.0.0.5'), {'tcp4', 'udp4', 'fragment4'})
+        self.assertEqual(self.kernel_matches('src net 192.168.0.0/16'), {'udp4'})
+        self.assertEqual(self.kernel_matches('host 2001:db8::5'), {'tcp6'})
+        self.assertEqual(self.kernel_matches('net fe80::/10'), {'tcp6', 'icmp6'})
+
+    def test_ports_skip_non_first_fragments(self):
+        self.assertEqual(self.kernel_matches('port 443'), {'tcp4', 'tcp6'})
+        self.assertEqual(self.kernel_matches('udp src port 53'), {'udp4'})
+        self.assertEqual(self.kernel_matches('tcp dst port 443'), {'tcp4'})
+
+    def test_boolean_operators(self):
+        self.assertEqual(self.kernel_matches('not ip and not ip6'), {'arp', 'vlan'})
+        self.assertEqual(self.kernel_matches('(tcp || udp) && ! dst host 10.0.0.5'), {'tcp6'})
+
+    def test_frame_type_expressions(self):
+        self.assertEqual(self.kernel_matches(frame_type_expression('ipv6')), {'tcp6', 'icmp6'})
+        with self.assertRaises(ValueError):
+            frame_type_expression('token-ring')
+
+    def test_invalid_expressions(self):
+        for expression in ('', 'tcp and', 'port 70000', 'host 10.0.0.0/8', 'bogus', '(ip'):
+            with self.assertRaises(ValueError, msg=expression):
+                compile_filter(expression)
+
+
+if __name__ == '__main__':
+    unittest.main()
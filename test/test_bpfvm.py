@@ -0,0 +1,97 @@
+import socket
+import unittest
+
+from PacketProbe.filters.bpf import BPF_ABS, BPF_ADD, BPF_ALU, BPF_AND, BPF_B, BPF_DIV, BPF_H, BPF_IMM, BPF_JEQ, \
+    BPF_JGT, BPF_JMP, BPF_K, BPF_LD, BPF_LDX, BPF_LEN, BPF_MEM, BPF_MISC, BPF_MOD, BPF_RET, BPF_A, BPF_ST, BPF_TAX, \
+    BPF_TXA, BPF_W, BPF_X, attach_filter, compile_filter
+from PacketProbe.filters.bpfvm import BPFInterpreter, compile_program, validate_program
+from helpers import FRAMES
+
+EXPRESSIONS = [
+    'ip', 'arp', 'tcp', 'udp', 'icmp or icmp6', 'dst host 10.0.0.5', 'src net 192.168.0.0/16',
+    'host 2001:db8::5', 'net fe80::/10', 'port 443', 'udp src port 53', 'not ip and not ip6',
+    '(tcp || udp) && ! dst host 10.0.0.5',
+]
+
+# Exercises scratch memory, X arithmetic, division, length loads and returning A
+ARITHMETIC = [
+    (BPF_LD | BPF_W | BPF_LEN, 0, 0, 0),
+    (BPF_ST, 0, 0, 3),
+    (BPF_LD | BPF_B | BPF_ABS, 0, 0, 14),
+    (BPF_ALU | BPF_AND | BPF_K, 0, 0, 0x0F),
+    (BPF_MISC | BPF_TAX, 0, 0, 0),
+    (BPF_LD | BPF_MEM, 0, 0, 3),
+    (BPF_ALU | BPF_DIV | BPF_X, 0, 0, 0),
+    (BPF_ALU | BPF_ADD | BPF_K, 0, 0, 7),
+    (BPF_JMP | BPF_JGT | BPF_K, 0, 2, 8),
+    (BPF_ALU | BPF_MOD | BPF_K, 0, 0, 5),
+    (BPF_RET | BPF_A, 0, 0, 0),
+    (BPF_LDX | BPF_W | BPF_IMM, 0, 0, 2),
+    (BPF_MISC | BPF_TXA, 0, 0, 0),
+    (BPF_RET | BPF_A, 0, 0, 0),
+]
+
+
+def kernel_result(program, frame):
+    """Returns how many bytes of frame the kernel accepts under program (0 means dropped)."""
+    sender, receiver = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    with sender, receiver:
+        attach_filter(receiver, program)
+        receiver.setblocking(False)
+        sender.send(frame)
+        try:
+            return len(receiver.recv(65536))
+        except BlockingIOError:
+            return 0
+
+
+class TestBPFVirtualMachine(unittest.TestCase):
+    def assert_same_as_kernel(self, program):
+        interpreter = BPFInterpreter(program)
+        compiled = compile_program(program)
+        for name, frame in FRAMES.items():
+            expected = kernel_result(program, frame)
+            for view in (frame, memoryview(frame)):
+                self.assertEqual(min(interpreter(view), len(frame)), expected, name)
+                self.assertEqual(min(compiled(view), len(frame)), expected, name)
+
+    def test_compiled_expressions_match_kernel(self):
+        for expression in EXPRESSIONS:
+            with self.subTest(expression=expression):
+                self.assert_same_as_kernel(compile_filter(expression))
+
+    def test_arithmetic_program_matches_kernel(self):
+        self.assert_same_as_kernel(ARITHMETIC)
+
+    def test_short_frames_are_dropped(self):
+        program = compile_filter('port 443')
+        for frame in (b'', FRAMES['tcp4'][:20], FRAMES['tcp4'][:35]):
+            self.assertEqual(BPFInterpreter(program)(frame), 0)
+            self.assertEqual(compile_program(program)(frame), 0)
+
+    def test_division_by_zero_in_x_drops(self):
+        program = [(BPF_LDX | BPF_W | BPF_IMM, 0, 0, 0), (BPF_ALU | BPF_DIV | BPF_X, 0, 0, 0), (BPF_RET | BPF_K, 0, 0, 1)]
+        self.assertEqual(BPFInterpreter(program)(b'x'), 0)
+        self.assertEqual(compile_program(program)(b'x'), 0)
+
+    def test_ethertype_check_is_specialised(self):
+        source = compile_program(compile_filter('ip')).source
+        self.assertNotIn('def _b', source)
+        self.assertIn('A == 2048', source)
+
+    def test_validation(self):
+        invalid = [
+            [],
+            [(BPF_LD | BPF_H | BPF_ABS, 0, 0, 12)],
+            [(BPF_JMP | BPF_JEQ | BPF_K, 5, 0, 1), (BPF_RET | BPF_K, 0, 0, 0)],
+            [(BPF_ALU | BPF_DIV | BPF_K, 0, 0, 0), (BPF_RET | BPF_K, 0, 0, 0)],
+            [(BPF_ALU | 0xB0 | BPF_K, 0, 0, 1), (BPF_RET | BPF_K, 0, 0, 0)],  # Not an ALU operation
+            [(BPF_ST, 0, 0, 16), (BPF_RET | BPF_K, 0, 0, 0)],
+        ]
+        for program in invalid:
+            with self.assertRaises(ValueError):
+                validate_program(program)
+
+
+if __name__ == '__main__':
+    unittest.main()
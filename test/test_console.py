@@ -0,0 +1,80 @@
+import io
+import threading
+import time
+import unittest
+
+from PacketProbe.console import ConsoleRenderer
+from PacketProbe.rawframe import RawFrame
+from helpers import FRAMES, ParsingTestCase
+
+
+class BlockedStream(io.StringIO):
+    """A terminal that stops reading until it is released."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def write(self, text):
+        self.released.wait()
+        return super().write(text)
+
+
+class TestConsoleRenderer(unittest.TestCase):
+    def test_blocks_are_written_in_one_piece(self):
+        stream = io.StringIO()
+        with ConsoleRenderer(stream=stream, interval=60) as console:
+            console("packet 1\n\tfield")
+            console("packet 2")
+            self.assertEqual(stream.getvalue(), "")
+        self.assertEqual(stream.getvalue(), "packet 1\n\tfield\npacket 2\n")
+        self.assertEqual(console.lines_written, 3)
+
+    def test_output_over_the_rate_is_sampled(self):
+        stream = io.StringIO()
+        with ConsoleRenderer(max_lines_per_second=10, stream=stream, interval=60) as console:
+            for index in range(100):
+                console(f"packet {index}")
+            self.assertEqual(console.lines_written + len(console.buffer), 10)
+            # The next second samples every 10th packet instead of showing the first ones
+            console.window_end = 0
+            for index in range(100, 200):
+                console(f"packet {index}")
+        shown = stream.getvalue().splitlines()
+        self.assertEqual(shown[:10], [f"packet {index}" for index in range(10)])
+        self.assertEqual(shown[10:20], [f"packet {index}" for index in range(109, 200, 10)])
+        self.assertEqual(shown[-1], "[console] 180 lines of 180 packets not shown")
+
+    def test_a_blocked_stream_does_not_block_the_writer(self):
+        stream = BlockedStream()
+        console = ConsoleRenderer(buffer_lines=5, stream=stream, interval=0.01)
+        started = time.monotonic()
+        for index in range(50):
+            console(f"packet {index}")
+            time.sleep(0.001)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertGreaterEqual(console.suppressed_blocks, 40)
+        stream.released.set()
+        console.close()
+        self.assertIn("packets not shown", stream.getvalue())
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            ConsoleRenderer(max_lines_per_second=0)
+        with self.assertRaises(ValueError):
+            ConsoleRenderer(interval=0)
+
+
+class TestPacketDescriptions(ParsingTestCase):
+    def test_packet_descriptions_go_to_the_console(self):
+        blocks = []
+        RawFrame(FRAMES['udp4'], time_stamp=1700000000.0, sink=lambda data: None, console=blocks.append)
+        RawFrame(FRAMES['arp'], time_stamp=1700000000.0, sink=lambda data: None, console=blocks.append)
+        self.assertEqual(len(blocks), 2)
+        self.assertTrue(blocks[0].startswith("IPv4 packet captured\n\tIPv4 Info:"))
+        self.assertIn("\tUDP Segment", blocks[0])
+        self.assertEqual(blocks[1], "ARP packet captured\n___________________")
+
+
+if __name__ == '__main__':
+    unittest.main()
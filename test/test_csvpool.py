@@ -0,0 +1,91 @@
+import csv
+import io
+import os
+import tempfile
+import unittest
+import unittest.mock
+
+from PacketProbe.sinks.csvpool import CSVSink
+
+ROWS = [{'Version': 4, 'TTL': 64 - index, 'Source IP': f'10.0.0.{index}'} for index in range(30)]
+
+
+def dict_writer_output(rows, header=True):
+    """What the previous open-per-row save_packet_to_csv produced for the same rows."""
+    text = io.StringIO()
+    for index, row in enumerate(rows):
+        writer = csv.DictWriter(text, fieldnames=row.keys())
+        if header and index == 0:
+            writer.writeheader()
+        writer.writerow(row)
+    return text.getvalue()
+
+
+class TestCSVSink(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.sink = CSVSink(self.directory.name, batch_size=7, flush_interval=60)
+
+    def tearDown(self):
+        self.sink.close()
+        self.directory.cleanup()
+
+    def read(self, filename):
+        with open(os.path.join(self.directory.name, filename), newline='', encoding='utf-8') as file:
+            return file.read()
+
+    def test_matches_the_per_row_writer(self):
+        for row in ROWS:
+            self.sink.write('ipv4.csv', row)
+        self.sink.close()
+        self.assertEqual(self.read('ipv4.csv'), dict_writer_output(ROWS))
+        self.assertEqual(self.sink.records_written, len(ROWS))
+
+    def test_header_is_written_once_across_flushes(self):
+        self.sink.write('ipv4.csv', ROWS[0])
+        self.sink.flush()
+        self.sink.write('ipv4.csv', ROWS[1])
+        self.sink.close()
+        self.assertEqual(self.read('ipv4.csv').count('Version'), 1)
+
+    def test_existing_file_gets_no_second_header(self):
+        with open(os.path.join(self.directory.name, 'arp.csv'), 'w', newline='') as file:
+            file.write(dict_writer_output(ROWS[:1]))
+        self.sink.write('arp.csv', ROWS[1])
+        self.sink.close()
+        self.assertEqual(self.read('arp.csv'), dict_writer_output(ROWS[:2]))
+
+    def test_rows_are_snapshots(self):
+        row = dict(ROWS[0])
+        self.sink.write('ipv4.csv', row)
+        row['time_stamps'] = 'later'  # RawFrame adds keys to the returned dict after saving
+        self.sink.close()
+        self.assertNotIn('later', self.read('ipv4.csv'))
+
+    def test_one_handle_per_file(self):
+        for row in ROWS:
+            self.sink.write('ipv4.csv', row)
+            self.sink.write('tcp.csv', {'TCP Segment': {'Source Port': row['TTL']}})
+        self.sink.flush()
+        self.assertEqual(sorted(self.sink.files), ['ipv4.csv', 'tcp.csv'])
+        self.sink.close()
+        self.assertEqual(self.read('tcp.csv').splitlines()[1], "{'Source Port': 64}")
+
+    def test_rows_after_close_are_not_written(self):
+        self.sink.write('ipv4.csv', ROWS[0])
+        self.sink.close()
+        self.sink.write('tcp.csv', ROWS[1])
+        self.sink.flush()
+        self.assertEqual((self.sink.files, self.sink.flushes), ({}, 1))
+        self.assertFalse(os.path.exists(os.path.join(self.directory.name, 'tcp.csv')))
+
+    def test_missing_directory_is_reported(self):
+        sink = CSVSink(os.path.join(self.directory.name, 'missing'), flush_interval=60)
+        sink.write('ipv4.csv', ROWS[0])
+        with unittest.mock.patch('builtins.print') as printed:
+            sink.close()
+        printed.assert_called_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
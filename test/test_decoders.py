@@ -0,0 +1,70 @@
+import ipaddress
+import struct
+import unittest
+
+from PacketProbe.protocols.decoders import decode_arp, decode_ethernet, decode_icmp, decode_ipv4, decode_ipv6, \
+    decode_mpls, decode_tcp, decode_udp, decode_vlan
+from PacketProbe.protocols.packet.ipv4 import IPV4
+from PacketProbe.protocols.packet.multicast import MPLSMulticast
+from PacketProbe.protocols.packet.rarp import RARP
+from PacketProbe.protocols.packet.vlan import VLAN
+from PacketProbe.protocols.segment.tcp import TCP
+from PacketProbe.protocols.segment.udp import UDP
+from helpers import FRAMES
+
+
+class TestHeaderDecoders(unittest.TestCase):
+    def test_ethernet_and_ipv4_at_offsets(self):
+        frame = FRAMES['fragment4']
+        self.assertEqual(decode_ethernet(frame), (bytes.fromhex('001122334455'), bytes.fromhex('66778899aabb'), 0x0800))
+        version, ihl, tos, total_length, identification, flags, fragment, ttl, protocol, _, source, destination \
+            = decode_ipv4(frame, 14)
+        self.assertEqual((version, ihl, tos, total_length, identification), (4, 5, 0, 40, 1))
+        self.assertEqual((flags, fragment, ttl, protocol), (0, 0x10, 64, 17))
+        self.assertEqual((source, destination), (bytes([10, 0, 0, 1]), bytes([10, 0, 0, 5])))
+
+    def test_ipv6(self):
+        source, destination = ipaddress.IPv6Address('2001:db8::1'), ipaddress.IPv6Address('fe80::8:7:6:5')
+        header = struct.pack('!IHBB16s16s', 0x6AB12345, 20, 6, 64, source.packed, destination.packed)
+        self.assertEqual(decode_ipv6(b'pad' + header, 3), (6, 0xAB, 0x12345, 20, 6, 64, source, destination))
+
+    def test_transport_headers(self):
+        tcp = struct.pack('!HHLLBBHHH', 1, 2, 3, 4, 0x80, 0x12, 5, 6, 7)
+        self.assertEqual(decode_tcp(tcp), (1, 2, 3, 4, 8, 0x12, 5, 6, 7))
+        self.assertEqual(decode_udp(struct.pack('!4H', 53, 5353, 8, 9)), (53, 5353, 8, 9))
+        self.assertEqual(decode_icmp(bytes([8, 0, 0, 1, 0, 2, 0, 3])), (8, 0, 1, 2, 3))
+
+    def test_link_headers(self):
+        self.assertEqual(decode_vlan(struct.pack('!HHH', 0x8100, 0xB064, 0x0800)), (0x8100, 5, 1, 100, 0x0800))
+        self.assertEqual(decode_mpls(struct.pack('!L', (1000 << 12) | (5 << 9) | (1 << 8) | 64)), (1000, 5, 1, 64))
+        arp = decode_arp(FRAMES['arp'], 14)
+        self.assertEqual(len(arp), 9)
+        self.assertEqual(arp[5], bytes(6))
+
+    def test_classes_build_from_decoders(self):
+        ipv4 = IPV4(FRAMES['udp4'][14:])
+        self.assertEqual((ipv4.protocol, ipv4.source_ip), (17, bytes([192, 168, 1, 7])))
+        udp = UDP(ipv4.data)
+        self.assertEqual((udp.source_port, udp.destination_port), (53, 5353))
+        vlan = VLAN(struct.pack('!HHH', 0x8100, 0x2005, 0x86DD) + b'rest')
+        self.assertEqual((vlan.priority, vlan.vlan_id, vlan.ethertype, vlan.payload), (1, 5, 0x86DD, b'rest'))
+        mpls = MPLSMulticast(struct.pack('!L', (42 << 12) | 0x1FF))
+        self.assertEqual((mpls.label, mpls.experimental, mpls.bottom_of_stack, mpls.ttl), (42, 0, 1, 0xFF))
+        rarp = RARP(bytes.fromhex('0001080006040003') + bytes(20))
+        self.assertEqual((rarp.hardware_address_type, rarp.opcode), (1, 3))
+
+    def test_tcp_data_skips_options(self):
+        header = struct.pack('!HHLLBBHHH', 1, 2, 0, 0, 0x60, 0x02, 0, 0, 0) + b'\x02\x04\x05\xb4'
+        tcp = TCP(header + b'data')
+        self.assertTrue(tcp.has_options())
+        self.assertEqual(tcp.data, b'data')
+
+    def test_short_transport_headers_raise(self):
+        with self.assertRaises(ValueError):
+            TCP(bytes(19))
+        with self.assertRaises(ValueError):
+            UDP(bytes(7))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import socket
+import struct
+import time
+import unittest
+
+from PacketProbe.bindsocket import BindSocket, join_fanout
+from PacketProbe.fanout import FanoutCapture
+from PacketProbe.filters.bpf import compile_filter
+from PacketProbe.utils.helpers import _worker_path
+from helpers import FRAMES, ParsingTestCase, ethernet, ipv4, packet_sockets_allowed, ports
+
+
+class TestJoinFanout(unittest.TestCase):
+    def test_rejects_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            join_fanout(None, 1, 'random')
+
+    def test_rejects_large_group_id(self):
+        with self.assertRaises(ValueError):
+            join_fanout(None, 1 << 16)
+
+    def test_worker_path(self):
+        self.assertEqual(_worker_path('capture.pcap', 3), 'capture.3.pcap')
+        self.assertEqual(_worker_path('capture', 3), 'capture.3')
+
+
+class TestFanoutCapture(unittest.TestCase):
+    def test_streams_need_hash_mode(self):
+        for mode in ('lb', 'cpu'):
+            with self.assertRaises(ValueError):
+                FanoutCapture('lo', 2, mode=mode, reassemble='streams')
+
+    def test_flows_need_hash_mode(self):
+        for mode in ('lb', 'cpu'):
+            with self.assertRaises(ValueError):
+                FanoutCapture('lo', 2, mode=mode, flows='flows.json')
+
+
+@unittest.skipUnless(packet_sockets_allowed(), "AF_PACKET sockets are not permitted")
+class TestFanoutGroup(unittest.TestCase):
+    def test_hash_mode_keeps_each_flow_on_one_socket(self):
+        group_id = os.getpid() & 0xFFFF
+        program = compile_filter('udp and dst port 9999')
+        members = [BindSocket('lo', bpf_program=program, fanout=(group_id, 'hash')).open_socket() for _ in range(2)]
+        sender = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+        sender.bind(('lo', 0))
+        flows = [ipv4(17, f'10.0.{index}.1', '10.0.0.5', ports(20000 + index, 9999)) for index in range(16)]
+        try:
+            for frame in flows * 4:
+                sender.send(frame)
+
+            seen = []
+            for member in members:
+                member.setblocking(False)
+                frames = set()
+                while True:
+                    try:
+                        frames.add(member.recv(2048))
+                    except BlockingIOError:
+                        break
+                seen.append(frames)
+        finally:
+            sender.close()
+            for member in members:
+                member.close()
+
+        self.assertEqual(seen[0] | seen[1], set(flows))
+        self.assertFalse(seen[0] & seen[1])
+
+
+@unittest.skipUnless(packet_sockets_allowed(), "AF_PACKET sockets are not permitted")
+class TestFanoutWorkers(ParsingTestCase):
+    def test_truncated_frames_do_not_stop_a_worker(self):
+        capture = FanoutCapture('lo', 1, bpf_program=compile_filter('host 10.0.0.1'), flush_interval=0.05,
+                                console_options={'stream': open(os.devnull, 'w')})
+        capture.start()
+        sender = socket.socket(socket.AF_PACKET, socket.SOCK_RAW)
+        sender.bind(('lo', 0))
+        output = 'packet_data.0.json'
+        try:
+            # Send until the worker has bound its socket and written the complete frame
+            deadline = time.monotonic() + 10
+            while time.monotonic() < deadline and not (os.path.exists(output) and os.path.getsize(output)):
+                sender.send(FRAMES['tcp4'][:40])  # The TCP header is cut short
+                sender.send(FRAMES['tcp4'])
+                time.sleep(0.05)
+            self.assertTrue(capture.processes[0].is_alive())
+        finally:
+            sender.close()
+            capture.stop()
+        with open(output) as file:
+            self.assertIn('"protocol": "TCP"', file.readline())
+
+
+@unittest.skipUnless(packet_sockets_allowed(), "AF_PACKET sockets are not permitted")
+class TestLiveVLANFilter(unittest.TestCase):
+    def received(self, program):
+        """Sends a tagged frame over lo and returns the EtherTypes of the copies the filter passes."""
+        receiver = BindSocket('lo', bpf_program=program).open_socket()
+        # Bound to the 802.1Q EtherType, so lo hands the frame back to the receive path as well
+        sender = socket.socket(socket.AF_PACKET, socket.SOCK_RAW, socket.htons(0x8100))
+        payload = os.urandom(8)
+        try:
+            sender.bind(('lo', 0x8100))
+            sender.send(ethernet(0x8100, struct.pack('!HH', 7, 0x0800) + ipv4(17, '10.0.0.1', '10.0.0.5')[14:])
+                        + payload)
+            receiver.settimeout(0.5)
+            copies = []
+            while True:
+                try:
+                    frame = receiver.recv(2048)
+                except socket.timeout:
+                    break
+                if frame.endswith(payload):
+                    copies.append(frame[12:14])
+        finally:
+            sender.close()
+            receiver.close()
+        return sorted(copies)
+
+    def test_tags_moved_into_metadata_are_matched(self):
+        # The outgoing copy keeps the tag in the data, the kernel takes it out of the received one
+        self.assertEqual(self.received(compile_filter('vlan', live=True)), [b'\x08\x00', b'\x81\x00'])
+        self.assertEqual(self.received(compile_filter('vlan')), [b'\x81\x00'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import datetime
+import unittest
+
+from PacketProbe.flowtable import FlowTable
+
+
+def packet(source, destination, time_stamp, protocol='TCP', flags=0, length=60):
+    """Packet data as RawFrame hands it to a sink, reduced to the fields the flow table reads."""
+    (source_ip, source_port), (destination_ip, destination_port) = source, destination
+    return {
+        'protocol': protocol, 'Source IP': source_ip, 'Destination IP': destination_ip,
+        'source_port': source_port, 'destination_port': destination_port, 'flags': flags,
+        'time_stamps': datetime.datetime.fromtimestamp(time_stamp).isoformat(), 'bytes_length': length,
+    }
+
+
+CLIENT = ('10.0.0.1', 40000)
+SERVER = ('10.0.0.5', 443)
+
+
+class TestFlowTable(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+        self.table = FlowTable(self.emitted.append, idle_timeout=10, active_timeout=100, max_flows=3)
+
+    def test_both_directions_update_one_flow(self):
+        self.table(packet(CLIENT, SERVER, 1000.0, flags=0x02, length=60))
+        self.table(packet(SERVER, CLIENT, 1000.5, flags=0x12, length=70))
+        self.table(packet(CLIENT, SERVER, 1001.0, flags=0x10, length=54))
+        self.assertEqual(len(self.table), 1)
+        self.table.close()
+
+        flow, = self.emitted
+        self.assertEqual((flow['source_ip'], flow['source_port']), CLIENT)
+        self.assertEqual((flow['destination_ip'], flow['destination_port']), SERVER)
+        self.assertEqual((flow['packets'], flow['bytes'], flow['reverse_packets'], flow['reverse_bytes']),
+                         (2, 114, 1, 70))
+        self.assertEqual((flow['first_seen'], flow['last_seen']), (1000.0, 1001.0))
+        self.assertEqual((flow['protocol'], flow['tcp_flags'], flow['end_reason']), (6, 0x12, 'end'))
+
+    def test_idle_flows_expire_when_traffic_moves_on(self):
+        self.table(packet(CLIENT, SERVER, 1000.0))
+        self.table(packet(('10.0.0.2', 1), SERVER, 1005.0))
+        self.table(packet(('10.0.0.3', 1), SERVER, 1012.0))
+        self.assertEqual([(flow['source_ip'], flow['end_reason']) for flow in self.emitted], [('10.0.0.1', 'idle')])
+        self.table.expire(1016.0)
+        self.assertEqual(len(self.emitted), 2)
+        self.assertEqual(len(self.table), 1)
+
+    def test_a_flow_that_went_idle_starts_over(self):
+        self.table(packet(CLIENT, SERVER, 1000.0))
+        self.table(packet(SERVER, CLIENT, 1020.0))
+        self.assertEqual(self.emitted[0]['packets'], 1)
+        self.table.close()
+        self.assertEqual((self.emitted[1]['source_ip'], self.emitted[1]['reverse_packets']), (SERVER[0], 0))
+
+    def test_active_flows_are_reported_and_restarted(self):
+        for time_stamp in range(1000, 1250, 5):
+            self.table(packet(CLIENT, SERVER, float(time_stamp)))
+        self.assertEqual([flow['end_reason'] for flow in self.emitted], ['active', 'active'])
+        self.assertEqual(self.emitted[0]['packets'], 20)
+        self.assertEqual(self.table.packets_seen, 50)
+
+    def test_least_recently_seen_flow_is_evicted(self):
+        for index in range(3):
+            self.table(packet((f'10.0.0.{index + 10}', 1), SERVER, 1000.0 + index))
+        self.table(packet(('10.0.0.10', 1), SERVER, 1003.0))  # Refresh the oldest flow
+        self.table(packet(('10.0.0.20', 1), SERVER, 1004.0))
+        self.assertEqual([(flow['source_ip'], flow['end_reason']) for flow in self.emitted],
+                         [('10.0.0.11', 'evicted')])
+        self.assertEqual(len(self.table), 3)
+
+    def test_icmp_and_arp(self):
+        self.table({'protocol': 'ICMP', 'Source IP': '10.0.0.5', 'Destination IP': '10.0.0.1', 'bytes_length': 42,
+                    'time_stamps': datetime.datetime.fromtimestamp(1000).isoformat()})
+        self.table({'Opcode': 1, 'Sender IP': '10.0.0.1', 'bytes_length': 42})
+        self.table.close()
+        flow, = self.emitted
+        self.assertEqual((flow['protocol'], flow['source_port'], flow['destination_port']), (1, 0, 0))
+        self.assertEqual(self.table.packets_seen, 1)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            FlowTable(idle_timeout=0)
+        with self.assertRaises(ValueError):
+            FlowTable(max_flows=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,102 @@
+import contextlib
+import io
+import socket
+import struct
+import unittest
+
+from PacketProbe.rawframe import RawFrame
+from PacketProbe.reassembly.fragments import FragmentReassembler
+from helpers import ParsingTestCase, ethernet, ipv4_fragments
+
+DATAGRAM = struct.pack('!4H', 5353, 53, 8 + 40, 0) + bytes(range(40))  # UDP header and payload
+
+
+def ipv6_fragment(source, destination, identification, offset, more, data, next_header=17):
+    fragment = struct.pack('!BBHL', next_header, 0, offset | more, identification)
+    header = struct.pack('!IHBB16s16s', 6 << 28, len(fragment) + len(data), 44, 64,
+                         socket.inet_pton(socket.AF_INET6, source), socket.inet_pton(socket.AF_INET6, destination))
+    return ethernet(0x86DD, header + fragment + data)
+
+
+class TestFragmentReassembler(unittest.TestCase):
+    def setUp(self):
+        self.fragments = FragmentReassembler(timeout=30, memory_limit=1000)
+
+    def test_reassembles_in_any_order(self):
+        pieces = [(0, True, DATAGRAM[:16]), (32, False, DATAGRAM[32:]), (16, True, DATAGRAM[16:32])]
+        results = [self.fragments.add('key', offset, more, data, 100.0) for offset, more, data in pieces]
+        self.assertEqual(results, [None, None, DATAGRAM])
+        self.assertEqual((len(self.fragments.datagrams), self.fragments.memory), (0, 0))
+
+    def test_overlapping_and_duplicate_fragments(self):
+        self.assertIsNone(self.fragments.add('key', 0, True, DATAGRAM[:24], 100.0))
+        self.assertIsNone(self.fragments.add('key', 0, True, DATAGRAM[:24], 100.0))
+        self.assertEqual(self.fragments.add('key', 16, False, DATAGRAM[16:], 100.0), DATAGRAM)
+
+    def test_timer_wheel_expires_incomplete_datagrams(self):
+        self.fragments.add('old', 0, True, DATAGRAM[:16], 100.0)
+        self.fragments.add('new', 0, True, DATAGRAM[:16], 120.0)
+        self.fragments.advance(129.0)
+        self.assertEqual(set(self.fragments.datagrams), {'old', 'new'})
+        self.fragments.advance(131.0)
+        self.assertEqual(set(self.fragments.datagrams), {'new'})
+        self.assertIsNone(self.fragments.add('old', 16, False, DATAGRAM[16:], 131.0))
+        self.fragments.advance(10000.0)  # A jump past a whole rotation expires everything once
+        self.assertEqual(self.fragments.datagrams, {})
+        self.assertEqual(self.fragments.stats['timed_out'], 3)
+
+    def test_memory_limit_drops_the_oldest_datagrams(self):
+        for index in range(30):
+            self.fragments.add(index, 0, True, bytes(100), 100.0)
+        self.assertLessEqual(self.fragments.memory, 1000)
+        self.assertEqual(min(self.fragments.datagrams), 20)
+        self.assertEqual(self.fragments.stats['evicted'], 20)
+
+    def test_flood_limits(self):
+        self.assertIsNone(self.fragments.add('big', 65528, True, bytes(16), 100.0))
+        self.fragments.max_fragments = 4
+        for offset in range(0, 40, 8):
+            self.fragments.add('tiny', offset, True, bytes(8), 100.0)
+        self.assertNotIn('tiny', self.fragments.datagrams)
+        self.assertEqual(self.fragments.stats['oversized'], 2)
+        self.assertIsNone(self.fragments.add('conflict', 16, False, bytes(8), 100.0))
+        self.assertIsNone(self.fragments.add('conflict', 8, False, bytes(24), 100.0))
+        self.assertEqual(self.fragments.stats['inconsistent'], 1)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            FragmentReassembler(timeout=0)
+        with self.assertRaises(ValueError):
+            FragmentReassembler(memory_limit=0)
+
+
+class TestFragmentParsing(ParsingTestCase):
+    def parse(self, frames, fragments=None, lazy=False):
+        records = []
+        with contextlib.redirect_stdout(io.StringIO()):
+            for index, frame in enumerate(frames):
+                RawFrame(frame, time_stamp=1700000000.0 + index, lazy=lazy, sink=records.append, fragments=fragments)
+        return records
+
+    def test_ipv4_fragments_are_parsed_once_complete(self):
+        frames = ipv4_fragments(DATAGRAM)
+        for lazy in (False, True):
+            records = self.parse(frames[::-1], FragmentReassembler(), lazy=lazy)
+            self.assertEqual(len(records), len(frames))
+            self.assertEqual([record.get('source_port') for record in records], [None, None, 5353])
+            self.assertEqual(records[-1]['destination_port'], 53)
+
+    def test_without_reassembly_only_the_first_fragment_is_parsed(self):
+        records = self.parse(ipv4_fragments(DATAGRAM))
+        self.assertEqual([record.get('source_port') for record in records], [5353, None, None])
+
+    def test_ipv6_fragments(self):
+        frames = [ipv6_fragment('2001:db8::1', '2001:db8::5', 99, 24, 0, DATAGRAM[24:]),
+                  ipv6_fragment('2001:db8::1', '2001:db8::5', 99, 0, 1, DATAGRAM[:24])]
+        records = self.parse(frames, FragmentReassembler())
+        self.assertEqual([record['protocol'] for record in records], ['UDP', 'UDP'])
+        self.assertEqual([record.get('source_port') for record in records], [None, 5353])
+
+
+if __name__ == '__main__':
+    unittest.main()
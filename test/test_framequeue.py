@@ -0,0 +1,86 @@
+import threading
+import unittest
+from queue import Empty
+
+from PacketProbe.framequeue import FrameQueue
+
+
+def batch(first, count=10):
+    return [(float(index), bytes(4)) for index in range(first, first + count)]
+
+
+class TestFrameQueue(unittest.TestCase):
+    def test_drop_newest_keeps_the_first_batches(self):
+        frame_queue = FrameQueue(25, 'drop_newest')
+        results = [frame_queue.put(batch(index * 10)) for index in range(4)]
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(frame_queue.frames, 20)
+        self.assertEqual(frame_queue.drops['queue_full'], 20)
+        self.assertEqual(frame_queue.get()[0][0], 0.0)
+
+    def test_drop_oldest_keeps_the_last_batches(self):
+        frame_queue = FrameQueue(25, 'drop_oldest')
+        for index in range(4):
+            frame_queue.put(batch(index * 10))
+        self.assertEqual(frame_queue.drops['queue_evicted'], 20)
+        self.assertEqual([frame_queue.get()[0][0] for _ in range(2)], [20.0, 30.0])
+        self.assertEqual(frame_queue.frames, 0)
+
+    def test_oversized_batch_is_accepted_into_an_empty_queue(self):
+        frame_queue = FrameQueue(5)
+        self.assertTrue(frame_queue.put(batch(0)))
+        self.assertEqual(frame_queue.dropped, 0)
+
+    def test_end_marker_is_never_dropped(self):
+        frame_queue = FrameQueue(10, 'drop_oldest')
+        frame_queue.put(batch(0))
+        frame_queue.put(None)
+        frame_queue.put(batch(10))
+        self.assertIsNone(frame_queue.get())
+        self.assertEqual(frame_queue.drops['queue_evicted'], 10)
+
+    def test_single_frames_count_as_one(self):
+        frame_queue = FrameQueue(2)
+        for frame in (b'a', b'b', b'c'):
+            frame_queue.put(frame)
+        self.assertEqual(frame_queue.drops['queue_full'], 1)
+
+    def test_get_timeout(self):
+        with self.assertRaises(Empty):
+            FrameQueue().get(timeout=0.01)
+        with self.assertRaises(Empty):
+            FrameQueue().get(block=False)
+
+    def test_block_policy_loses_nothing(self):
+        frame_queue = FrameQueue(50, 'block')
+        received = []
+
+        def consume():
+            while (item := frame_queue.get()) is not None:
+                received.extend(item)
+
+        consumer = threading.Thread(target=consume)
+        consumer.start()
+        for index in range(200):
+            frame_queue.put(batch(index * 10))
+        frame_queue.put(None)
+        consumer.join(5)
+        self.assertEqual(len(received), 2000)
+        self.assertEqual([time_stamp for time_stamp, _ in received], [float(index) for index in range(2000)])
+        self.assertEqual(frame_queue.dropped, 0)
+
+    def test_kernel_drops_are_recorded(self):
+        frame_queue = FrameQueue()
+        frame_queue.record_drops('kernel', 7)
+        frame_queue.record_drops('kernel', 0)
+        self.assertEqual(frame_queue.drop_summary(), 'kernel: 7')
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            FrameQueue(policy='random')
+        with self.assertRaises(ValueError):
+            FrameQueue(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+import contextlib
+import io
+import json
+import os
+import signal
+import time
+import unittest
+
+from PacketProbe import instrumentation
+from PacketProbe.framequeue import FrameQueue
+from PacketProbe.instrumentation import BUCKETS, Histogram, Instrumentation, _bucket, _upper_bound
+from PacketProbe.rawframe import RawFrame
+from helpers import FRAMES, ParsingTestCase
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets_are_log_scale(self):
+        indexes = [_bucket(value) for value in range(1, 1 << 16)]
+        self.assertEqual(indexes, sorted(indexes))
+        for value in (1, 5, 100, 1000, 12345, 10 ** 9):
+            index = _bucket(value)
+            lower = _upper_bound(index - 1) if index else 0
+            self.assertTrue(lower <= value < _upper_bound(index), value)
+            self.assertLessEqual(_upper_bound(index) - lower, max(lower // 4, 1))
+        self.assertEqual(_bucket(1 << 100), BUCKETS - 1)
+
+    def test_percentiles(self):
+        histogram = Histogram(alert_above=5000)
+        for value in range(1, 101):
+            histogram.record(value * 100)
+        self.assertLessEqual(abs(histogram.percentile(50) - 5000), 5000 // 4)
+        self.assertEqual(histogram.percentile(100), 10000)
+        self.assertEqual(histogram.alerts, 50)
+        figures = histogram.to_dict()
+        self.assertEqual((figures['count'], figures['max_ns'], figures['mean_ns']), (100, 10000, 5050))
+        self.assertEqual(sum(figures['buckets'].values()), 100)
+        self.assertEqual(Histogram().percentile(99), 0)
+
+    def test_batch_records_count_every_frame(self):
+        histogram = Histogram()
+        histogram.record(300, frames=64)
+        self.assertEqual((histogram.count, histogram.total), (64, 300 * 64))
+
+
+class TestInstrumentation(ParsingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.previous_handler = signal.getsignal(signal.SIGUSR1)
+
+    def tearDown(self):
+        instrumentation.disable()
+        signal.signal(signal.SIGUSR1, self.previous_handler)
+        super().tearDown()
+
+    def test_sampled_frames_time_every_parsing_stage(self):
+        probe = instrumentation.enable(sample_every=2)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(5):
+                RawFrame(FRAMES['tcp4'], time_stamp=1700000000.0, sink=lambda data: None)
+            RawFrame(FRAMES['arp'], time_stamp=1700000000.0, sink=lambda data: None)
+        counts = {stage: histogram.count for stage, histogram in probe.histograms.items()}
+        self.assertEqual(counts, {'capture_recv': 0, 'queue_wait': 0, 'dispatch': 3, 'l3_parse': 3,
+                                  'l4_parse': 3, 'record_build': 3})
+
+    def test_disabled_instrumentation_records_nothing(self):
+        probe = Instrumentation(sample_every=1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            RawFrame(FRAMES['tcp4'], time_stamp=1700000000.0, sink=lambda data: None)
+        self.assertEqual(sum(histogram.count for histogram in probe.histograms.values()), 0)
+        self.assertIsNone(FrameQueue().wait_histogram)
+
+    def test_queue_wait_and_alerts(self):
+        probe = instrumentation.enable(queue_wait_alert=0.01)
+        frames = FrameQueue(maxsize=4, policy='drop_oldest')
+        frames.put([(0.0, b'a')])
+        time.sleep(0.02)
+        frames.put([(0.0, b'b'), (0.0, b'c')])
+        frames.put([(0.0, b'd'), (0.0, b'e')])  # Evicts the first batch and its enqueue time
+        frames.get()
+        frames.get()
+        frames.put(None)
+        self.assertIsNone(frames.get())
+        histogram = probe.histograms['queue_wait']
+        self.assertEqual((histogram.count, histogram.alerts), (2, 0))
+        self.assertEqual(len(frames.enqueue_times), 0)
+
+        frames.put([(0.0, b'f')])
+        time.sleep(0.02)
+        frames.get()
+        self.assertEqual(histogram.alerts, 1)
+        self.assertGreaterEqual(histogram.maximum, 10 ** 7)
+
+    def test_timed_sinks_are_sampled(self):
+        probe = Instrumentation(sample_every=3)
+        written = []
+        sink = probe.timed('sink.list', written.append)
+        for index in range(7):
+            sink(index)
+        self.assertEqual(written, list(range(7)))
+        self.assertEqual(probe.histograms['sink.list'].count, 3)
+
+    def test_dump_on_sigusr1(self):
+        probe = instrumentation.enable(sample_every=1, path='latency.json')
+        probe.record('dispatch', 1500)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            os.kill(os.getpid(), signal.SIGUSR1)
+        self.assertIn("dispatch", output.getvalue())
+        with open('latency.json') as file:
+            self.assertEqual(json.load(file)['stages']['dispatch']['count'], 1)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            Instrumentation(sample_every=0)
+        with self.assertRaises(ValueError):
+            Instrumentation(queue_wait_alert=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
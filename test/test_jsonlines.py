@@ -0,0 +1,63 @@
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from PacketProbe.rawframe import to_json_line
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+
+RECORDS = [{'index': index, 'data': bytes([index])} for index in range(25)]
+
+
+class TestJsonLinesWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'packet_data.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self):
+        with open(self.path) as file:
+            return file.read().splitlines()
+
+    def test_close_writes_everything_in_order(self):
+        with JsonLinesWriter(self.path, batch_size=10, flush_interval=60) as writer:
+            for record in RECORDS:
+                writer(record)
+        self.assertEqual(self.read(), [to_json_line(record) for record in RECORDS])
+        self.assertEqual(writer.records_written, len(RECORDS))
+        self.assertEqual(json.loads(self.read()[3])['data'], '03')
+
+    def test_full_batch_is_written_without_waiting_for_the_interval(self):
+        with JsonLinesWriter(self.path, batch_size=10, flush_interval=60) as writer:
+            for record in RECORDS[:10]:
+                writer(record)
+            deadline = time.monotonic() + 2
+            while writer.records_written < 10 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(self.read()), 10)
+
+    def test_interval_writes_a_partial_batch(self):
+        with JsonLinesWriter(self.path, batch_size=1000, flush_interval=0.05) as writer:
+            writer(RECORDS[0])
+            time.sleep(0.3)
+            self.assertEqual(len(self.read()), 1)
+
+    def test_appends_pre_encoded_lines(self):
+        with JsonLinesWriter(self.path) as writer:
+            writer.write_lines(['{"a": 1}', '{"a": 2}'])
+        with JsonLinesWriter(self.path) as writer:
+            writer.write_line('{"a": 3}')
+        self.assertEqual(self.read(), ['{"a": 1}', '{"a": 2}', '{"a": 3}'])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            JsonLinesWriter(self.path, batch_size=0)
+        with self.assertRaises(ValueError):
+            JsonLinesWriter(self.path, flush_interval=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
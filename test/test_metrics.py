@@ -0,0 +1,115 @@
+import os
+import re
+import tempfile
+import unittest
+import urllib.error
+import urllib.request
+
+from PacketProbe.framequeue import FrameQueue
+from PacketProbe.metrics import CaptureMetrics, MetricsServer
+from PacketProbe.sinks.jsonlines import JsonLinesWriter
+from PacketProbe.sinks.sqlitedb import SQLiteSink
+from PacketProbe.trafficstats import TrafficStats
+from helpers import FRAMES
+
+SAMPLE = re.compile(r'^packetprobe_[a-z_]+(\{[a-z_]+="[^"]*"(,[a-z_]+="[^"]*")*\})? \S+$')
+
+
+def samples(text):
+    """Returns {'name{labels}': value} of every sample, checking each line is valid text format."""
+    result = {}
+    for line in text.splitlines():
+        if line.startswith('#'):
+            continue
+        assert SAMPLE.match(line), line
+        name, value = line.rsplit(' ', 1)
+        result[name] = float(value)
+    return result
+
+
+class TestCaptureMetrics(unittest.TestCase):
+    def setUp(self):
+        self.stats = TrafficStats(report_interval=float('inf'), quiet=True)
+        self.metrics = CaptureMetrics(self.stats)
+        self.metrics.frame_queue = FrameQueue(maxsize=4)
+
+    def test_counters_are_rendered(self):
+        batch = [(1.0, FRAMES['tcp4']), (1.0, FRAMES['udp4']), (1.0, FRAMES['arp'])]
+        frame_queue = self.metrics.frame_queue
+        frame_queue.put(batch)
+        frame_queue.put(batch)  # Does not fit, dropped
+        frame_queue.record_drops('kernel', 5)
+        self.stats.count_batch(frame_queue.get())
+        self.metrics.frames_parsed += len(batch)
+
+        values = samples(self.metrics.render())
+        self.assertEqual(values['packetprobe_frames_captured_total'], 6)
+        self.assertEqual(values['packetprobe_frames_dropped_total{reason="kernel"}'], 5)
+        self.assertEqual(values['packetprobe_frames_dropped_total{reason="queue_full"}'], 3)
+        self.assertEqual(values['packetprobe_frames_parsed_total'], 3)
+        self.assertEqual(values['packetprobe_queue_frames'], 0)
+        self.assertEqual(values['packetprobe_ethertype_packets_total{ethertype="IPv4"}'], 2)
+        self.assertEqual(values['packetprobe_protocol_bytes_total{protocol="UDP"}'], len(FRAMES['udp4']))
+        self.assertGreater(values['packetprobe_protocol_bits_per_second{protocol="TCP"}'], 0)
+
+    def test_rates_cover_the_time_since_the_previous_scrape(self):
+        self.stats.count_batch([(1.0, FRAMES['tcp4'])])
+        self.metrics.render()
+        values = samples(self.metrics.render())
+        self.assertEqual(values['packetprobe_protocol_packets_per_second{protocol="TCP"}'], 0)
+        self.assertEqual(values['packetprobe_protocol_packets_total{protocol="TCP"}'], 1)
+
+    def test_parse_errors_by_frame_type(self):
+        self.metrics.parse_error(FRAMES['tcp4'][:20])
+        self.metrics.parse_error(FRAMES['tcp4'][:20])
+        self.metrics.parse_error(FRAMES['arp'][:20])
+        values = samples(self.metrics.render())
+        self.assertEqual(values['packetprobe_parse_errors_total{frame_type="IPv4"}'], 2)
+        self.assertEqual(values['packetprobe_parse_errors_total{frame_type="ARP"}'], 1)
+
+    def test_sink_backlog_and_flush_time(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = JsonLinesWriter(os.path.join(directory, 'packets.json'), flush_interval=60)
+            database = SQLiteSink(os.path.join(directory, 'packets.db'), flush_interval=60)
+            self.metrics.sinks = {'json': writer, 'sqlite': database, 'flows': None}
+            for sink in (writer, database):
+                sink({'protocol': 'TCP', 'time_stamps': '2023-11-14T22:13:20'})
+            values = samples(self.metrics.render())
+            self.assertEqual(values['packetprobe_sink_backlog_records{sink="json"}'], 1)
+            self.assertEqual(values['packetprobe_sink_backlog_records{sink="sqlite"}'], 1)
+            self.assertEqual(values['packetprobe_sink_flush_seconds_count{sink="json"}'], 0)
+            writer.close()
+            database.close()
+            values = samples(self.metrics.render())
+        self.assertEqual(values['packetprobe_sink_backlog_records{sink="sqlite"}'], 0)
+        self.assertEqual(values['packetprobe_sink_flush_seconds_count{sink="sqlite"}'], 1)
+        self.assertNotIn('packetprobe_sink_backlog_records{sink="flows"}', values)
+
+
+class TestMetricsServer(unittest.TestCase):
+    def setUp(self):
+        self.metrics = CaptureMetrics()
+        self.server = MetricsServer(self.metrics, port=0)
+        self.url = f'http://127.0.0.1:{self.server.port}'
+
+    def tearDown(self):
+        self.server.close()
+
+    def test_scrape(self):
+        self.metrics.frames_parsed += 7
+        with urllib.request.urlopen(self.url + '/metrics', timeout=5) as response:
+            self.assertEqual(response.status, 200)
+            self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+            values = samples(response.read().decode())
+        self.assertEqual(values['packetprobe_frames_parsed_total'], 7)
+        self.assertNotIn('packetprobe_queue_frames', values)
+
+    def test_unknown_path(self):
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(self.url + '/other', timeout=5)
+        self.assertEqual(error.exception.code, 404)
+        error.exception.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from PacketProbe.pcapreader import PcapReader, PcapFileSource
+
+FRAME_A = bytes.fromhex('ffffffffffff001122334455080600010800060400010011223344550a000001000000000000'
+                        '0a000002')
+FRAME_B = bytes.fromhex('00112233445566778899aabb86dd') + bytes(40)
+
+
+def pcap_bytes(frames, magic=0xA1B2C3D4, byte_order='<'):
+    data = struct.pack(byte_order + 'IHHiIII', magic, 2, 4, 0, 0, 65535, 1)
+    for (seconds, fraction), frame in frames:
+        data += struct.pack(byte_order + 'IIII', seconds, fraction, len(frame), len(frame)) + frame
+    return data
+
+
+def pcapng_block(block_type, body):
+    body += bytes(-len(body) % 4)
+    length = len(body) + 12
+    return struct.pack('<II', block_type, length) + body + struct.pack('<I', length)
+
+
+def pcapng_bytes(frames, tsresol=None):
+    data = pcapng_block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1))
+    options = b''
+    if tsresol is not None:
+        options = struct.pack('<HHB3x', 9, 1, tsresol) + struct.pack('<HH', 0, 0)
+    data += pcapng_block(1, struct.pack('<HHI', 1, 0, 65535) + options)
+    data += pcapng_block(0x00000BAD, b'custom block')
+    for ticks, frame in frames:
+        data += pcapng_block(6, struct.pack('<5I', 0, ticks >> 32, ticks & 0xFFFFFFFF, len(frame), len(frame)) + frame)
+    data += pcapng_block(3, struct.pack('<I', len(FRAME_A)) + FRAME_A)
+    return data
+
+
+class TestPcapReader(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'capture')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def read(self, data):
+        with open(self.path, 'wb') as file:
+            file.write(data)
+        with PcapReader(self.path) as reader:
+            return reader.format, reader.linktype, [(ts, bytes(frame)) for ts, frame in reader]
+
+    def test_pcap_microseconds(self):
+        fmt, linktype, frames = self.read(pcap_bytes([((10, 500000), FRAME_A), ((11, 0), FRAME_B)]))
+        self.assertEqual((fmt, linktype), ('pcap', 1))
+        self.assertEqual(frames, [(10.5, FRAME_A), (11.0, FRAME_B)])
+
+    def test_pcap_nanoseconds_big_endian(self):
+        _, _, frames = self.read(pcap_bytes([((10, 250000000), FRAME_A)], magic=0xA1B23C4D, byte_order='>'))
+        self.assertEqual(frames, [(10.25, FRAME_A)])
+
+    def test_pcap_truncated_record_is_dropped(self):
+        _, _, frames = self.read(pcap_bytes([((1, 0), FRAME_A), ((2, 0), FRAME_B)])[:-5])
+        self.assertEqual(frames, [(1.0, FRAME_A)])
+
+    def test_pcapng_blocks(self):
+        fmt, linktype, frames = self.read(pcapng_bytes([(1500000, FRAME_A), (2000000, FRAME_B)]))
+        self.assertEqual((fmt, linktype), ('pcapng', 1))
+        self.assertEqual(frames, [(1.5, FRAME_A), (2.0, FRAME_B), (None, FRAME_A)])
+
+    def test_pcapng_tsresol(self):
+        _, _, frames = self.read(pcapng_bytes([(3000, FRAME_B)], tsresol=3))
+        self.assertEqual(frames[0], (3.0, FRAME_B))
+
+    def test_rejects_unknown_format(self):
+        with self.assertRaises(ValueError):
+            self.read(b'not a capture file')
+
+    def test_file_source_batches_and_terminates(self):
+        with open(self.path, 'wb') as file:
+            file.write(pcap_bytes([((n, 0), FRAME_A) for n in range(5)]))
+        source = PcapFileSource(self.path, batch_size=2)
+        source.is_capturing = True
+        source.capture_packets()
+
+        batches = []
+        while (batch := source.raw_packets.get()) is not None:
+            batches.append(batch)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(batches[2][0], (4.0, FRAME_A))
+
+    def test_stopping_mid_replay_still_ends_the_queue(self):
+        with open(self.path, 'wb') as file:
+            file.write(pcap_bytes([((n, 0), FRAME_A) for n in range(100)]))
+        seen = []
+
+        def stop_after_three(frame):
+            seen.append(frame)
+            if len(seen) == 3:
+                source.is_capturing = False
+            return True
+
+        source = PcapFileSource(self.path, batch_size=2, frame_filter=stop_after_three)
+        source.is_capturing = True
+        source.capture_packets()  # Stops with the fourth frame in hand
+
+        frames = []
+        while (batch := source.raw_packets.get(timeout=1)) is not None:
+            frames.extend(batch)
+        self.assertEqual(len(frames), 3)
+        self.assertEqual(len(seen), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
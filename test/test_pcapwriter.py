@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from PacketProbe.pcapreader import PcapReader
+from PacketProbe.pcapwriter import PcapWriter
+
+FRAME = bytes.fromhex('00112233445566778899aabb0800') + bytes(range(47))
+
+
+class TestPcapWriter(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'capture.pcap')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @staticmethod
+    def read(path):
+        with PcapReader(path) as reader:
+            return reader.format, [(ts, bytes(frame)) for ts, frame in reader]
+
+    def test_round_trip(self):
+        for file_format in ('pcap', 'pcapng'):
+            with PcapWriter(self.path, file_format=file_format, buffer_size=128) as writer:
+                writer.write_batch([(1.25, FRAME), (2.5, FRAME[:14])])
+            self.assertEqual(self.read(self.path), (file_format, [(1.25, FRAME), (2.5, FRAME[:14])]))
+
+    def test_snaplen_truncates(self):
+        with PcapWriter(self.path, snaplen=20) as writer:
+            writer.write(FRAME, 1.0)
+        self.assertEqual(self.read(self.path)[1], [(1.0, FRAME[:20])])
+
+    def test_rotation_keeps_bounded_number_of_files(self):
+        with PcapWriter(self.path, buffer_size=1, rotate_size=200, max_files=2) as writer:
+            for n in range(12):
+                writer.write(FRAME, float(n))
+
+        remaining = sorted(os.listdir(self.directory.name))
+        self.assertEqual(remaining, [os.path.basename(path) for path in writer.files])
+        self.assertEqual(len(remaining), 2)
+        frames = [frame for name in remaining for frame in self.read(os.path.join(self.directory.name, name))[1]]
+        self.assertEqual(frames[-1], (11.0, FRAME))
+        self.assertEqual(writer.frames_written, 12)
+
+    def test_max_files_requires_rotation(self):
+        with self.assertRaises(ValueError):
+            PcapWriter(self.path, max_files=3)
+
+
+if __name__ == '__main__':
+    unittest.main()
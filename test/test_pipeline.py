@@ -0,0 +1,126 @@
+import contextlib
+import io
+import json
+import multiprocessing.process
+import threading
+import unittest
+from unittest import mock
+
+from PacketProbe.pipeline import FramePipeline, SharedFrameRing
+from PacketProbe.rawframe import RawFrame, to_json_line
+from helpers import FRAMES, ParsingTestCase, ipv4_fragments, ports
+
+PACKETS = [(1700000000.0 + index, frame) for index, frame in enumerate(list(FRAMES.values()) * 40)]
+
+
+class TestSharedFrameRing(unittest.TestCase):
+    def setUp(self):
+        self.ring = SharedFrameRing(SharedFrameRing.MIN_SIZE, workers=2)
+
+    def tearDown(self):
+        self.ring.close()
+
+    def test_round_trip(self):
+        batch = [(1.5, b'abc'), (None, bytes(range(256)) * 4), (2.0, b'')]
+        start, count = self.ring.write(batch, worker=1)
+        self.assertEqual(list(self.ring.read(start, count)), batch)
+        self.assertEqual(self.ring.pending(1), 1)
+
+    def test_space_is_reused_after_workers_finish(self):
+        frame = bytes(1000)
+        batch = [(0.0, frame)] * 200  # About a fifth of the ring
+        starts = []
+        for index in range(12):
+            worker = index % 2
+            starts.append(self.ring.write(batch, worker)[0])
+            self.ring.done[worker] += 1  # Stand in for the worker finishing the batch
+        self.assertEqual(starts[0], 0)
+        self.assertIn(0, starts[1:])  # Wrapped around to the start of the ring
+        self.assertEqual(len(self.ring.outstanding), 1)
+
+    def test_batches_are_split_to_fit(self):
+        batch = [(0.0, bytes(60000))] * 20
+        chunks = list(self.ring.split(batch))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(chunk) for chunk in chunks), 20)
+
+    def test_minimum_size(self):
+        with self.assertRaises(ValueError):
+            SharedFrameRing(4096)
+
+
+class TestFramePipeline(ParsingTestCase):
+    def run_pipeline(self, **options):
+        with contextlib.redirect_stdout(io.StringIO()) as console:
+            pipeline = FramePipeline(workers=3, buffer_size=SharedFrameRing.MIN_SIZE, **options)
+            for index in range(0, len(PACKETS), 25):
+                pipeline.submit(PACKETS[index:index + 25])
+            pipeline.close()
+        self.assertEqual(pipeline.frames_submitted, len(PACKETS))
+        return console.getvalue()
+
+    def expected(self):
+        lines = []
+        with contextlib.redirect_stdout(io.StringIO()) as console:
+            for time_stamp, frame in PACKETS:
+                RawFrame(frame, None, time_stamp, sink=lambda data: lines.append(to_json_line(data)))
+        return lines, console.getvalue()
+
+    def test_ordered_output_matches_in_process_parsing(self):
+        console = self.run_pipeline()
+        lines, expected_console = self.expected()
+        with open('packet_data.json') as file:
+            self.assertEqual(file.read().splitlines(), lines)
+        self.assertEqual(console, expected_console)
+
+    def test_per_worker_sinks(self):
+        self.run_pipeline(ordered=False)
+        lines, _ = self.expected()
+        written = []
+        for index in range(3):
+            with open(f'packet_data.{index}.json') as file:
+                written.extend(file.read().splitlines())
+        self.assertEqual(sorted(written), sorted(lines))
+
+    def test_first_fragments_are_parsed_beyond_ip(self):
+        # The fragments may reach different workers, which parse them without reassembly
+        datagram = ports(5353, 53) + bytes(40)
+        fragments = ipv4_fragments(datagram)
+        with contextlib.redirect_stdout(io.StringIO()):
+            pipeline = FramePipeline(workers=2, buffer_size=SharedFrameRing.MIN_SIZE)
+            for frame in fragments:
+                pipeline.submit([(1700000000.0, frame)])
+            pipeline.close()
+        with open('packet_data.json') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), len(fragments))
+        self.assertEqual((records[0]['source_port'], records[0]['destination_port']), (5353, 53))
+        self.assertTrue(all('source_port' not in record for record in records[1:]))
+
+    def test_workers_are_forked_before_any_pipeline_thread(self):
+        start = multiprocessing.process.BaseProcess.start
+        threads = []
+
+        def record_threads(process):
+            threads.append(threading.active_count())
+            start(process)
+
+        before = threading.active_count()
+        with mock.patch.object(multiprocessing.process.BaseProcess, 'start', record_threads):
+            pipeline = FramePipeline(workers=2, buffer_size=SharedFrameRing.MIN_SIZE, console_options={})
+        pipeline.close()
+        self.assertEqual(threads, [before, before])
+
+    def test_parse_errors_are_counted_in_both_modes(self):
+        batch = PACKETS[:10] + [(1.0, FRAMES['tcp4'][:20]), (1.0, FRAMES['tcp4'][:40]), (1.0, FRAMES['arp'][:20])]
+        for ordered in (True, False):
+            with self.subTest(ordered=ordered), contextlib.redirect_stdout(io.StringIO()):
+                pipeline = FramePipeline(workers=2, buffer_size=SharedFrameRing.MIN_SIZE, ordered=ordered)
+                pipeline.submit(batch)
+                pipeline.submit(batch)
+                pipeline.close()
+                self.assertEqual(pipeline.parse_errors, {'IPv4': 4, 'ARP': 2})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import ipaddress
+import os
+import tempfile
+import unittest
+
+from PacketProbe.sinks.recordlog import RecordLog, RecordLogWriter, Segment
+from helpers import FRAMES, ethernet, ipv4
+
+NAMES = ['tcp4', 'udp4', 'arp', 'icmp4', 'tcp6']
+PACKETS = [(1700000000.0 + index * 0.5, FRAMES[NAMES[index % len(NAMES)]]) for index in range(1000)]
+
+
+class TestRecordLog(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'capture.ppr')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, packets=PACKETS, **options):
+        with RecordLogWriter(self.path, **options) as writer:
+            writer.write_batch(packets)
+        return writer
+
+    def test_round_trip(self):
+        self.write()
+        with RecordLog(self.path) as log:
+            records = list(log)
+            self.assertEqual(len(log), len(PACKETS))
+            self.assertEqual([record.time_stamp for record in records], [time for time, _ in PACKETS])
+            tcp = records[0]
+            self.assertEqual((tcp.ip_version, tcp.protocol, tcp.source_port, tcp.destination_port), (4, 6, 40000, 443))
+            self.assertEqual(tcp.source_ip, ipaddress.IPv4Address('10.0.0.1'))
+            self.assertEqual(tcp.frame_length, len(FRAMES['tcp4']))
+            self.assertEqual(records[4].destination_ip, ipaddress.IPv6Address('2001:db8::5'))
+            self.assertIsNone(records[2].source_ip)  # ARP
+            self.assertEqual(records[2].payload, FRAMES['arp'][14:])
+
+    def test_segments_rotate_and_carry_an_index(self):
+        big = ipv4(17, '10.0.0.1', '10.0.0.5', bytes(8) + bytes(1400))
+        packets = [(1700000000.0 + index, big) for index in range(200)]
+        writer = self.write(packets, segment_size=1 << 16, index_stride=8)
+        self.assertGreater(len(writer.files), 2)
+        with RecordLog(self.path) as log:
+            self.assertTrue(all(segment.complete for segment in log.segments))
+            self.assertEqual(len(log), 200)
+            self.assertEqual([record.time_stamp for record in log.between(1700000050.0, 1700000120.0)],
+                             [1700000000.0 + index for index in range(50, 121)])
+
+    def test_time_range(self):
+        self.write(index_stride=16)
+        with RecordLog(self.path) as log:
+            selected = list(log.between(1700000010.2, 1700000020.0))
+            self.assertEqual([record.time_stamp for record in selected],
+                             [time for time, _ in PACKETS if 1700000010.2 <= time <= 1700000020.0])
+            self.assertEqual(list(log.between(0, 1)), [])
+
+    def test_repeated_timestamps_across_index_entries(self):
+        # Every frame of a capture batch gets the same timestamp
+        packets = [(1.0, FRAMES['tcp4'])] * 30 + [(5.0, FRAMES['udp4'])] * 200 + [(9.0, FRAMES['arp'])] * 30
+        self.write(packets, index_stride=64)
+        with RecordLog(self.path) as log:
+            self.assertEqual(len(list(log.between(5.0, 5.0))), 200)
+            self.assertEqual(len(list(log.between(1.0, 5.0))), 230)
+            self.assertEqual(len(list(log.between(5.0, 9.0))), 230)
+
+    def test_protocol_index(self):
+        self.write()
+        with RecordLog(self.path) as log:
+            udp = list(log.by_protocol(17))
+            self.assertEqual(len(udp), 200)
+            self.assertTrue(all(record.source_port == 53 for record in udp))
+            self.assertEqual(len(list(log.by_protocol(0))), 200)  # ARP has no IP layer
+            self.assertEqual(list(log.by_protocol(132)), [])
+
+    def test_unordered_timestamps_fall_back_to_a_scan(self):
+        packets = [(time, frame) for time, frame in reversed(PACKETS[:100])]
+        self.write(packets)
+        with RecordLog(self.path) as log:
+            self.assertFalse(log.segments[0].time_ordered)
+            self.assertEqual(len(list(log.between(1700000000.0, 1700000009.5))), 20)
+
+    def test_unfinished_segment_is_scanned(self):
+        writer = RecordLogWriter(self.path)
+        writer.write_batch(PACKETS[:50])
+        writer.flush()
+        segment = Segment(writer.files[0])
+        self.assertFalse(segment.complete)
+        self.assertEqual(len(segment), 50)
+        self.assertEqual(len(list(segment.by_protocol(6))), 20)
+        self.assertEqual(len(list(segment.between(1700000001.0, 1700000002.0))), 3)
+        segment.close()
+        writer.close()
+
+    def test_payload_limit(self):
+        frame = ethernet(0x0806, bytes(range(100)))
+        self.write([(1.0, frame)], payload_limit=10)
+        with RecordLog(self.path) as log:
+            record = next(iter(log))
+            self.assertEqual(record.payload, bytes(range(10)))
+            self.assertEqual(record.frame_length, len(frame))
+
+    def test_rejects_other_files(self):
+        other = os.path.join(self.directory.name, 'other.ppr')
+        with open(other, 'wb') as file:
+            file.write(b'not a record log')
+        with self.assertRaises(ValueError):
+            Segment(other)
+        with self.assertRaises(FileNotFoundError):
+            RecordLog(os.path.join(self.directory.name, 'missing.ppr'))
+
+
+if __name__ == '__main__':
+    unittest.main()
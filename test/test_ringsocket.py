@@ -0,0 +1,117 @@
+import mmap
+import socket
+import time
+import unittest
+from queue import Empty
+
+from PacketProbe.filters.bpf import compile_filter
+from PacketProbe.ringsocket import (TP_STATUS_KERNEL, TP_STATUS_USER, BindSocketRing, _BLOCK_HEADER_OFFSET,
+                                    _block_header, _frame_header)
+from helpers import FRAMES, packet_sockets_allowed
+
+PORT = 9996
+FIRST_PACKET = 48
+MAC_OFFSET = 80  # tpacket3_hdr plus padding, as the kernel lays it out
+
+
+def ring_block(frames, size=1 << 16):
+    """Builds a user-owned TPACKET_V3 block holding (seconds, nanoseconds, frame) records."""
+    block = bytearray(size)
+    position = FIRST_PACKET
+    for index, (seconds, nanoseconds, frame) in enumerate(frames):
+        record_length = (MAC_OFFSET + len(frame) + 15) & ~15
+        next_offset = record_length if index < len(frames) - 1 else 0
+        _frame_header.pack_into(block, position, next_offset, seconds, nanoseconds, len(frame), len(frame),
+                                TP_STATUS_USER, MAC_OFFSET, MAC_OFFSET + 14)
+        block[position + MAC_OFFSET:position + MAC_OFFSET + len(frame)] = frame
+        position += record_length
+    _block_header.pack_into(block, _BLOCK_HEADER_OFFSET, TP_STATUS_USER, len(frames), FIRST_PACKET, position)
+    return block
+
+
+class TestWalkBlock(unittest.TestCase):
+    def test_frames_are_copied_out_and_the_block_returned(self):
+        block = ring_block([(1700000000, 500000000, FRAMES['tcp4']), (1700000001, 0, FRAMES['arp'])])
+        batch = BindSocketRing('lo').walk_block(memoryview(block), 0)
+        self.assertEqual(batch, [(1700000000.5, FRAMES['tcp4']), (1700000001.0, FRAMES['arp'])])
+        self.assertTrue(all(type(frame) is bytes for _, frame in batch))
+        status = _block_header.unpack_from(block, _BLOCK_HEADER_OFFSET)[0]
+        self.assertEqual(status, TP_STATUS_KERNEL)
+
+    def test_blocks_further_into_the_ring(self):
+        size = 1 << 16
+        ring = bytearray(size) + ring_block([(1, 0, FRAMES['udp4'])], size)
+        self.assertEqual(BindSocketRing('lo').walk_block(memoryview(ring), size), [(1.0, FRAMES['udp4'])])
+
+    def test_filtered_frames_are_skipped(self):
+        block = ring_block([(1, 0, FRAMES['tcp4']), (2, 0, FRAMES['arp']), (3, 0, FRAMES['udp4'])])
+        capture = BindSocketRing('lo', frame_filter=lambda frame: frame[12:14] == b'\x08\x00')
+        self.assertEqual(capture.walk_block(memoryview(block), 0), [(1.0, FRAMES['tcp4']), (3.0, FRAMES['udp4'])])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            BindSocketRing('lo', block_size=mmap.PAGESIZE + 1)
+        with self.assertRaises(ValueError):
+            BindSocketRing('lo', frame_size=2047)
+        with self.assertRaises(ValueError):
+            BindSocketRing('lo', block_size=mmap.PAGESIZE, frame_size=2 * mmap.PAGESIZE)
+        with self.assertRaises(ValueError):
+            BindSocketRing('lo', block_count=0)
+
+
+@unittest.skipUnless(packet_sockets_allowed(), "AF_PACKET sockets are not permitted")
+class TestRingCapture(unittest.TestCase):
+    def setUp(self):
+        self.capture = BindSocketRing('lo', block_size=1 << 16, block_count=4, block_timeout=10, poll_timeout=0.05,
+                                      bpf_program=compile_filter(f'udp and dst port {PORT}'))
+        self.capture.start_capturing()
+        self.sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def tearDown(self):
+        self.capture.is_capturing = False
+        self.sender.close()
+
+    def send(self, payload):
+        self.sender.sendto(payload, ('127.0.0.1', PORT))
+
+    def frames(self, timeout=5.0):
+        """Yields the captured frames until none arrive for ``timeout`` seconds."""
+        while True:
+            try:
+                batch = self.capture.raw_packets.get(timeout=timeout)
+            except Empty:
+                return
+            yield from batch
+
+    def test_loopback_datagrams(self):
+        # The ring is set up by the capture thread; send until it sees something
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            self.send(b'\xff')
+            try:
+                self.capture.raw_packets.get(timeout=0.1)
+                break
+            except Empty:
+                pass
+        else:
+            self.fail("The ring captured nothing")
+        time.sleep(0.1)
+        while not self.capture.raw_packets.empty():
+            self.capture.raw_packets.get()
+
+        for index in range(50):
+            self.send(bytes([index]))
+        # lo delivers every frame twice to a packet socket, once outgoing and once incoming
+        payloads = []
+        for time_stamp, frame in self.frames(timeout=1.0):
+            self.assertEqual(frame[12:14], b'\x08\x00')
+            self.assertAlmostEqual(time_stamp, time.time(), delta=10)
+            payloads.append(frame[-1])
+            if len(payloads) == 100:
+                break
+        self.assertEqual(sorted(payloads), sorted(list(range(50)) * 2))
+        self.assertEqual(self.capture.raw_packets.dropped, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
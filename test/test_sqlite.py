@@ -0,0 +1,83 @@
+import os
+import sqlite3
+import time
+import unittest
+
+from PacketProbe.asynccapture import parse_batch
+from PacketProbe.sinks.sqlitedb import SQLiteSink
+from helpers import FRAMES, ParsingTestCase
+
+
+class TestSQLiteSink(ParsingTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.directory.name, 'packets.db')
+
+    def records(self, start=1700000000.0):
+        batch = [(start + index, FRAMES[name]) for index, name in enumerate(['tcp4', 'udp4', 'arp', 'tcp4'])]
+        return parse_batch(batch)
+
+    def query(self, sql):
+        with sqlite3.connect(self.path) as connection:
+            return connection.execute(sql).fetchall()
+
+    def test_records_are_normalised_into_three_tables(self):
+        with SQLiteSink(self.path, flush_interval=60) as database:
+            for record in self.records():
+                database(record)
+        self.assertEqual(database.records_written, 4)
+        self.assertEqual(self.query("SELECT id, time_stamp, protocol FROM frames"),
+                         [(1, 1700000000.0, 'TCP'), (2, 1700000001.0, 'UDP'), (3, 1700000002.0, 'ARP'),
+                          (4, 1700000003.0, 'TCP')])
+        self.assertEqual(self.query("SELECT frame_id, version, source_ip, destination_ip, protocol, ttl "
+                                    "FROM ip_headers"),
+                         [(1, 4, '10.0.0.1', '10.0.0.5', 6, 64), (2, 4, '192.168.1.7', '10.0.0.5', 17, 64),
+                          (4, 4, '10.0.0.1', '10.0.0.5', 6, 64)])
+        self.assertEqual(self.query("SELECT frame_id, source_port, destination_port FROM l4_headers"),
+                         [(1, 40000, 443), (2, 53, 5353), (4, 40000, 443)])
+        self.assertEqual(self.query("PRAGMA journal_mode"), [('wal',)])
+
+    def test_traffic_uses_the_indexes(self):
+        with SQLiteSink(self.path, flush_interval=60) as database:
+            for record in self.records():
+                database(record)
+            rows = database.traffic(destination_ip='10.0.0.5', destination_port=443, since=1700000001.0)
+            self.assertEqual(rows, [(1700000003.0, 'TCP', '10.0.0.1', 40000, '10.0.0.5', 443, 54)])
+            self.assertEqual(len(database.traffic(destination_ip='10.0.0.5')), 3)
+            self.assertEqual(database.traffic(source_port=53, until=1700000001.0), [])
+
+            plan = ' '.join(row[-1] for row in database.connection.execute(
+                "EXPLAIN QUERY PLAN SELECT * FROM ip_headers WHERE destination_ip = '10.0.0.5'"))
+            self.assertIn('ip_headers_destination', plan)
+
+    def test_reopening_continues_the_frame_ids(self):
+        with SQLiteSink(self.path) as database:
+            database(self.records()[0])
+        with SQLiteSink(self.path) as database:
+            database(self.records()[1])
+        self.assertEqual(self.query("SELECT frame_id FROM l4_headers"), [(1,), (2,)])
+
+    def test_interval_commits_a_partial_batch(self):
+        with SQLiteSink(self.path, batch_size=1000, flush_interval=0.05) as database:
+            database(self.records()[0])
+            time.sleep(0.3)
+            self.assertEqual(self.query("SELECT count(*) FROM frames"), [(1,)])
+
+    def test_flows_are_written_to_their_table(self):
+        flow = {'source_ip': '10.0.0.1', 'source_port': 40000, 'destination_ip': '10.0.0.5',
+                'destination_port': 443, 'protocol': 6, 'first_seen': 1.0, 'last_seen': 2.0, 'packets': 3,
+                'bytes': 180, 'reverse_packets': 2, 'reverse_bytes': 140, 'tcp_flags': 0x1b, 'end_reason': 'idle'}
+        with SQLiteSink(self.path, flush_interval=60) as database:
+            database.write_flow(flow)
+        self.assertEqual(self.query("SELECT source_ip, packets, reverse_bytes, end_reason FROM flows"),
+                         [('10.0.0.1', 3, 140, 'idle')])
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            SQLiteSink(self.path, batch_size=0)
+        with self.assertRaises(ValueError):
+            SQLiteSink(self.path, flush_interval=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
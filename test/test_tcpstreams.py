@@ -0,0 +1,147 @@
+import os
+import struct
+import tempfile
+import unittest
+
+from PacketProbe.protocols.decoders import decode_tcp_segment
+from PacketProbe.reassembly.tcpstreams import STREAM_OVERHEAD, StreamFileWriter, TCPReassembler
+from helpers import FRAMES, ipv4, ipv6
+
+CLIENT = ('10.0.0.1', 40000)
+SERVER = ('10.0.0.5', 443)
+MESSAGE = bytes(range(256)) * 8
+
+
+def tcp(source, destination, sequence, flags=0x10, payload=b'', version=4):
+    """An Ethernet frame with one TCP segment from (address, port) to (address, port)."""
+    segment = struct.pack('!HHLLBBHHH', source[1], destination[1], sequence & 0xFFFFFFFF, 0, 0x50, flags, 512, 0, 0)
+    build = ipv4 if version == 4 else ipv6
+    return build(6, source[0], destination[0], segment + payload)
+
+
+class TestTCPReassembler(unittest.TestCase):
+    def setUp(self):
+        self.reassembler = TCPReassembler()
+        self.chunks = {0: [], 1: []}
+        self.ends = []
+        self.reassembler.add_consumer(self.consume)
+
+    def consume(self, stream, direction, data):
+        if data is None:
+            self.ends.append(direction)
+        else:
+            self.chunks[direction].append(bytes(data))
+
+    def stream(self, direction=0):
+        return b''.join(self.chunks[direction])
+
+    def handshake(self, client_isn=1000, server_isn=5000):
+        self.reassembler.feed(tcp(CLIENT, SERVER, client_isn, 0x02))
+        self.reassembler.feed(tcp(SERVER, CLIENT, server_isn, 0x12))
+
+    def test_decode_tcp_segment_trims_padding(self):
+        frame = tcp(CLIENT, SERVER, 7, 0x18, b'hi') + bytes(6)
+        source, destination, source_port, destination_port, sequence, flags, start, end = decode_tcp_segment(frame)
+        self.assertEqual((source_port, destination_port, sequence, flags), (40000, 443, 7, 0x18))
+        self.assertEqual(frame[start:end], b'hi')
+        self.assertIsNone(decode_tcp_segment(FRAMES['udp4']))
+        self.assertIsNone(decode_tcp_segment(FRAMES['fragment4']))
+
+    def test_out_of_order_and_overlapping_segments(self):
+        self.handshake()
+        pieces = [(offset, MESSAGE[offset:offset + 100]) for offset in range(0, len(MESSAGE), 100)]
+        pieces = pieces[::-1] + [(50, MESSAGE[50:250])]
+        for offset, payload in pieces:
+            self.reassembler.feed(tcp(CLIENT, SERVER, 1001 + offset, payload=payload))
+        self.assertEqual(self.stream(), MESSAGE)
+        self.assertEqual(len(self.chunks[0]), 1)  # The buffered pieces are joined once
+        self.assertEqual(self.reassembler.stats['duplicate_bytes'], 200)
+        self.assertEqual(self.reassembler.memory, STREAM_OVERHEAD)
+
+    def test_both_directions_and_close(self):
+        self.handshake()
+        self.reassembler.feed(tcp(CLIENT, SERVER, 1001, payload=b'GET / HTTP/1.1\r\n\r\n'))
+        self.reassembler.feed(tcp(SERVER, CLIENT, 5001, payload=b'HTTP/1.1 200 OK\r\n\r\n'))
+        self.reassembler.feed(tcp(CLIENT, SERVER, 1019, 0x11))
+        self.assertEqual(self.ends, [])
+        self.reassembler.feed(tcp(SERVER, CLIENT, 5020, 0x11))
+        self.assertEqual(self.stream(0), b'GET / HTTP/1.1\r\n\r\n')
+        self.assertEqual(self.stream(1), b'HTTP/1.1 200 OK\r\n\r\n')
+        self.assertEqual(self.ends, [0, 1])
+        self.assertEqual(len(self.reassembler.streams), 0)
+        self.assertEqual(self.reassembler.stats['closed_streams'], 1)
+
+    def test_sequence_numbers_wrap(self):
+        self.handshake(client_isn=0xFFFFFFF0)
+        self.reassembler.feed(tcp(CLIENT, SERVER, 0xFFFFFFF1 + 100, payload=MESSAGE[100:200]))
+        self.reassembler.feed(tcp(CLIENT, SERVER, 0xFFFFFFF1, payload=MESSAGE[:100]))
+        self.assertEqual(self.stream(), MESSAGE[:200])
+
+    def test_depth_limit(self):
+        self.reassembler.max_depth = 150
+        self.handshake()
+        for offset in range(0, 300, 100):
+            self.reassembler.feed(tcp(CLIENT, SERVER, 1001 + offset, payload=MESSAGE[offset:offset + 100]))
+        self.assertEqual(self.stream(), MESSAGE[:150])
+        self.assertEqual(self.reassembler.stats['truncated_bytes'], 150)
+
+    def test_memory_budget_evicts_the_oldest_streams(self):
+        self.reassembler.memory_budget = 4 * STREAM_OVERHEAD + 500
+        for port in range(10):
+            self.reassembler.feed(tcp(('10.0.0.9', 1000 + port), SERVER, 1, 0x02))
+        self.assertEqual(len(self.reassembler.streams), 4)
+        self.assertEqual(self.reassembler.stats['evicted_streams'], 6)
+
+        # A gap keeps data buffered, which counts against the budget too
+        self.reassembler.feed(tcp(('10.0.0.9', 1009), SERVER, 1000, payload=bytes(1000)))
+        self.assertLessEqual(self.reassembler.memory, self.reassembler.memory_budget)
+        self.assertEqual(len(self.reassembler.streams), 3)
+        self.assertEqual(self.reassembler.stats['evicted_streams'], 7)
+
+    def test_reset_and_ipv6(self):
+        client, server = ('2001:db8::1', 50000), ('2001:db8::5', 80)
+        self.reassembler.feed(tcp(client, server, 10, 0x18, b'abc', version=6))
+        self.reassembler.feed(tcp(client, server, 13, 0x04, version=6))
+        self.assertEqual(self.stream(), b'abc')
+        self.assertEqual(self.ends, [0, 1])
+
+    def test_stream_file_writer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.reassembler.add_consumer(StreamFileWriter(directory))
+            self.handshake()
+            self.reassembler.feed(tcp(CLIENT, SERVER, 1001, payload=b'hello'))
+            self.reassembler.feed(tcp(SERVER, CLIENT, 5001, payload=b'world'))
+            self.reassembler.close()
+            with open(os.path.join(directory, '10.0.0.1.40000-10.0.0.5.443'), 'rb') as file:
+                self.assertEqual(file.read(), b'hello')
+            with open(os.path.join(directory, '10.0.0.5.443-10.0.0.1.40000'), 'rb') as file:
+                self.assertEqual(file.read(), b'world')
+
+    def test_stream_files_stay_open_up_to_a_limit(self):
+        with tempfile.TemporaryDirectory() as directory:
+            writer = StreamFileWriter(directory, max_open=2)
+            self.reassembler.add_consumer(writer)
+            clients = [('10.0.0.1', 40000 + index) for index in range(3)]
+            for offset in range(2):
+                for client in clients:
+                    self.reassembler.feed(tcp(client, SERVER, 1000 + offset, payload=bytes([offset])))
+                self.assertEqual(len(writer.files), 2)
+            self.reassembler.feed(tcp(clients[2], SERVER, 1002, 0x04))
+            self.assertEqual(len(writer.files), 1)  # Closed when the stream ended
+            self.reassembler.close()
+            self.assertEqual(len(writer.files), 0)
+            for client in clients:
+                with open(os.path.join(directory, f'10.0.0.1.{client[1]}-10.0.0.5.443'), 'rb') as file:
+                    self.assertEqual(file.read(), b'\x00\x01')
+        with self.assertRaises(ValueError):
+            StreamFileWriter(directory, max_open=0)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            TCPReassembler(max_depth=0)
+        with self.assertRaises(ValueError):
+            TCPReassembler(memory_budget=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
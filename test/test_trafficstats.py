@@ -0,0 +1,80 @@
+import contextlib
+import io
+import time
+import unittest
+
+from PacketProbe.trafficstats import TrafficStats
+from helpers import FRAMES
+
+
+class TestTrafficStats(unittest.TestCase):
+    def setUp(self):
+        self.reports = []
+        self.stats = TrafficStats(report_interval=10, sink=self.reports.append, quiet=True)
+
+    def test_counters_are_indexed_by_number(self):
+        self.stats.count_batch([(1.0, FRAMES['tcp4']), (1.0, FRAMES['udp4']), (1.0, FRAMES['arp']),
+                                (1.0, FRAMES['tcp6']), (1.0, b'\x00' * 10)])
+        self.assertEqual(self.stats.ethertype_packets[0x0800], 2)
+        self.assertEqual(self.stats.ethertype_bytes[0x0800], len(FRAMES['tcp4']) + len(FRAMES['udp4']))
+        self.assertEqual(self.stats.ethertype_packets[0x0806], 1)
+        self.assertEqual((self.stats.protocol_packets[6], self.stats.protocol_packets[17]), (2, 1))
+        self.assertEqual(self.stats.truncated, 1)
+        self.assertEqual(self.reports, [])
+
+    def test_interval_and_cumulative_reports(self):
+        self.stats.count_batch([(100.0, FRAMES['tcp4']), (105.0, FRAMES['arp'])])
+        self.stats.count_batch([(110.0, FRAMES['udp4'])])
+        self.stats.count_batch([(112.0, FRAMES['tcp4'])])
+        self.stats.close()
+
+        first, last = self.reports
+        self.assertEqual(first['interval_seconds'], 10.0)
+        self.assertEqual(first['interval']['packets'], 3)
+        self.assertEqual(first['interval']['ethertypes']['ARP'], [1, len(FRAMES['arp'])])
+        self.assertEqual(first['interval']['protocols'], {'TCP': [1, len(FRAMES['tcp4'])],
+                                                          'UDP': [1, len(FRAMES['udp4'])]})
+        self.assertEqual(last['interval']['packets'], 1)
+        self.assertEqual(last['interval']['protocols'], {'TCP': [1, len(FRAMES['tcp4'])]})
+        self.assertEqual(last['total']['packets'], 4)
+        self.assertEqual(last['total']['protocols']['TCP'][0], 2)
+
+    def test_unknown_numbers_are_reported_by_value(self):
+        frame = bytearray(FRAMES['tcp4'])
+        frame[23] = 200
+        self.stats.count_batch([(1.0, FRAMES['arp'][:12] + b'\x12\x34' + bytes(20)), (1.0, bytes(frame))])
+        self.stats.close()
+        self.assertEqual(set(self.reports[0]['total']['ethertypes']), {'0x1234', 'IPv4'})
+        self.assertEqual(set(self.reports[0]['total']['protocols']), {'200'})
+
+    def test_reports_are_printed(self):
+        stats = TrafficStats(report_interval=1)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            stats.count_batch([(0.0, FRAMES['tcp4']), (2.0, FRAMES['tcp4'])])
+            stats.count_batch([(3.0, FRAMES['tcp4'])])
+        self.assertIn("Stats: 2 packets", output.getvalue())
+        self.assertIn("Stats: 1 packets, 54 bytes in 1.0s, 1 packets/s (3 packets", output.getvalue())
+        self.assertIn("TCP: 1", output.getvalue())
+
+    def test_a_first_batch_spanning_the_interval_is_reported(self):
+        self.stats.count_batch([(100.0, FRAMES['tcp4']), (115.0, FRAMES['arp'])])
+        report, = self.reports
+        self.assertEqual((report['interval_seconds'], report['interval']['packets']), (15.0, 2))
+        self.stats.count_batch([(118.0, FRAMES['tcp4'])])
+        self.assertEqual(len(self.reports), 1)  # The next report is due at 120
+
+    def test_frames_without_a_timestamp_use_the_clock(self):
+        self.stats.count_batch([(None, FRAMES['tcp4'])])
+        self.assertAlmostEqual(self.stats.last_time_stamp, time.time(), delta=10)
+        self.stats.count_batch([(None, FRAMES['arp']), (self.stats.last_time_stamp + 30, FRAMES['tcp4'])])
+        report, = self.reports
+        self.assertEqual(report['interval']['packets'], 3)
+
+    def test_invalid_arguments(self):
+        with self.assertRaises(ValueError):
+            TrafficStats(report_interval=0)
+
+
+if __name__ == '__main__':
+    unittest.main()